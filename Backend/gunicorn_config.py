@@ -58,7 +58,22 @@ def on_starting(server):
     server.log.info("🚀 Lugn & Trygg backend starting for 10k concurrent users...")
 
 def when_ready(server):
-    """Called just after the server is started."""
+    """Called just after the server is started, before the first worker is forked."""
+    # Load ML models once in the master and freeze the heap so every worker,
+    # including those replacing recycled ones, shares them copy-on-write.
+    # MODEL_PRELOAD selects the models (see src/services/model_warmup.py).
+    # With INFERENCE_SERVER_ENABLED the embedding and transformer models live
+    # in one inference process per host instead (src/services/inference_server.py).
+    try:
+        from src.services.inference_server import start_inference_server
+        start_inference_server()
+    except Exception as e:
+        server.log.warning(f"⚠️ Inference server failed to start, models run in the workers: {e}")
+    try:
+        from src.services.model_warmup import warm_up
+        warm_up()
+    except Exception as e:
+        server.log.warning(f"⚠️ Model preload failed, workers load models on first use: {e}")
     server.log.info(f"✅ Server ready! Workers: {workers}, Bind: {bind}")
 
 def post_fork(server, worker):
@@ -67,7 +82,12 @@ def post_fork(server, worker):
 
 def pre_fork(server, worker):
     """Called just before a worker is forked."""
-    pass
+    # Restart the inference server if it died; workers fall back while it is down
+    try:
+        from src.services.inference_server import start_inference_server
+        start_inference_server()
+    except Exception as e:
+        server.log.warning(f"⚠️ Inference server restart failed: {e}")
 
 def pre_exec(server):
     """Called just before a new master process is forked."""
@@ -77,6 +97,14 @@ def child_exit(server, worker):
     """Called just after a worker has been exited."""
     server.log.info(f"Worker {worker.pid} exited")
 
+def on_exit(server):
+    """Called just before exiting gunicorn."""
+    try:
+        from src.services.inference_server import stop_inference_server
+        stop_inference_server()
+    except Exception:
+        pass
+
 def worker_abort(worker):
     """Called when a worker times out."""
     worker.log.warning(f"⚠️ Worker {worker.pid} timeout - aborting")
@@ -643,6 +643,11 @@ try:
     try:
         app.register_blueprint(peer_chat_bp)
         logger.info("✅ Registered peer_chat_bp (url_prefix defined in blueprint)")
+        # Live room events also go out over Socket.IO; SSE (/room/<id>/stream) works without it
+        if _SOCKETIO_INITIALIZED and socketio is not None:
+            from src.routes.peer_chat_routes import register_peer_chat_socket_handlers
+            register_peer_chat_socket_handlers(socketio)
+            logger.info("✅ Peer chat Socket.IO handlers registered on /peer-chat namespace")
     except Exception as e:
         logger.error(f"❌ Failed to register peer_chat_bp: {e}")
 
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+🗑️ Audit log retention for Lugn & Trygg
+Deletes audit_logs documents older than the HIPAA retention period
+(7 years) in batches. Audit writes no longer prune old logs themselves,
+so run this from cron, e.g. once a day.
+
+Usage:
+    python apply_audit_retention.py
+"""
+
+import sys
+from pathlib import Path
+
+# Add Backend directory to path (one level up from scripts/)
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from src.firebase_config import initialize_firebase
+
+
+def main():
+    print("🔥 Initializing Firebase...")
+    try:
+        initialize_firebase()
+        from src.firebase_config import db
+        if db is None:
+            print("❌ Firebase Firestore client (db) is not initialized. Check your credentials and .env configuration.")
+            return 1
+        print("✅ Firebase connected")
+    except Exception as e:
+        print(f"❌ Failed to initialize Firebase: {e}")
+        return 1
+
+    from src.services.audit_service import AUDIT_RETENTION_DAYS, get_audit_service
+
+    deleted = get_audit_service().apply_retention_policy()
+    print(f"✅ Deleted {deleted} audit logs older than {AUDIT_RETENTION_DAYS} days")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+📊 Backfill materialized mood aggregates for Lugn & Trygg
+Builds the mood_aggregates/{user_id} document (run-length encoded logged
+days + streak totals) from each user's full mood history.
+
+Usage:
+    python backfill_mood_aggregates.py [--user USER_ID] [--missing-only]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add Backend directory to path (one level up from scripts/)
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from src.firebase_config import initialize_firebase
+
+
+def backfill_user(user_id: str, missing_only: bool = False) -> bool:
+    """Rebuild one user's aggregate. Returns False on failure."""
+    from src.services.mood_aggregate_service import mood_aggregate_service
+
+    try:
+        if missing_only and mood_aggregate_service.get(user_id) is not None:
+            return True
+        aggregate = mood_aggregate_service.rebuild(user_id)
+        print(
+            f"  ✓ {user_id}: {aggregate['total_days']} days, "
+            f"{len(aggregate['runs'])} runs, longest={aggregate['longest_streak']}"
+        )
+        return True
+    except Exception as e:
+        print(f"  ❌ {user_id}: {e}")
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill materialized mood aggregates')
+    parser.add_argument('--user', type=str, help='Only backfill this user ID')
+    parser.add_argument('--missing-only', action='store_true',
+                        help='Skip users that already have an aggregate document')
+
+    args = parser.parse_args()
+
+    print("🔥 Initializing Firebase...")
+    try:
+        initialize_firebase()
+        from src.firebase_config import db
+        if db is None:
+            print("❌ Firebase Firestore client (db) is not initialized. Check your credentials and .env configuration.")
+            return 1
+        print("✅ Firebase connected")
+    except Exception as e:
+        print(f"❌ Failed to initialize Firebase: {e}")
+        return 1
+
+    if args.user:
+        return 0 if backfill_user(args.user, args.missing_only) else 1
+
+    processed = 0
+    failed = 0
+    for user_doc in db.collection('users').select([]).stream():
+        processed += 1
+        if not backfill_user(user_doc.id, args.missing_only):
+            failed += 1
+
+    print(f"✅ Backfill complete: {processed - failed}/{processed} users")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+⏱️ Rate limiter microbenchmark for Lugn & Trygg
+Compares the throughput of the previous rate-limit paths with the current ones:
+
+  memory:  list of timestamps per key (rebuilt on every request)
+           vs. SlidingWindowCounter ring (O(1) per request)
+  redis:   GET + INCR + EXPIRE (three round trips, fixed window)
+           vs. one EVALSHA of the GCRA Lua script
+
+The Redis comparison only runs when --redis-url (or REDIS_URL) is set.
+
+Usage:
+    python benchmark_rate_limiter.py [--requests N] [--limit N] [--keys N] [--redis-url URL]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add Backend directory to path (one level up from scripts/)
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from src.services.rate_limiting import GCRA_LUA_SCRIPT, SlidingWindowCounter
+
+
+def legacy_memory_check(store: dict, key: str, limit: int, window: int, now: float) -> bool:
+    """The previous in-memory fallback: filter and append a timestamp list."""
+    cutoff = now - window
+    timestamps = [ts for ts in store.get(key, []) if ts > cutoff]
+    if len(timestamps) >= limit:
+        store[key] = timestamps
+        return False
+    timestamps.append(now)
+    store[key] = timestamps
+    return True
+
+
+def ring_memory_check(store: dict, key: str, limit: int, window: int, now: float) -> bool:
+    counter = store.get(key)
+    if counter is None:
+        counter = store[key] = SlidingWindowCounter(window)
+    return counter.hit(now, limit)[0]
+
+
+def legacy_redis_check(client, key: str, limit: int, window: int) -> bool:
+    """The previous Redis path: read, compare, then increment and expire."""
+    current = int(client.get(key) or 0)
+    if current >= limit:
+        return False
+    client.incr(key)
+    client.expire(key, window)
+    return True
+
+
+def run(label: str, check, requests: int, keys: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        check(f"bench:{i % keys}")
+    elapsed = time.perf_counter() - started
+    rate = requests / elapsed if elapsed else float('inf')
+    print(f"  {label:<28} {rate:>12,.0f} req/s  ({elapsed * 1000:,.1f} ms)")
+    return rate
+
+
+def bench_memory(requests: int, limit: int, keys: int, window: int) -> None:
+    print(f"\n🧠 In-memory fallback ({requests:,} requests, {keys} keys, limit {limit}/{window}s)")
+    legacy_store: dict = {}
+    ring_store: dict = {}
+    legacy = run('timestamp list (old)', lambda key: legacy_memory_check(
+        legacy_store, key, limit, window, time.time()), requests, keys)
+    ring = run('ring counter (new)', lambda key: ring_memory_check(
+        ring_store, key, limit, window, time.time()), requests, keys)
+    print(f"  speedup: {ring / legacy:.1f}x")
+
+
+def bench_redis(url: str, requests: int, limit: int, keys: int, window: int) -> None:
+    from redis import Redis
+
+    client = Redis.from_url(url, decode_responses=True)
+    client.ping()
+    prefix_old, prefix_new = 'bench:legacy:', 'bench:gcra:'
+    script = client.register_script(GCRA_LUA_SCRIPT)
+    print(f"\n🗄️ Redis ({requests:,} requests, {keys} keys, limit {limit}/{window}s)")
+    try:
+        legacy = run('GET+INCR+EXPIRE (old)', lambda key: legacy_redis_check(
+            client, prefix_old + key, limit, window), requests, keys)
+        gcra = run('GCRA EVALSHA (new)', lambda key: script(
+            keys=[prefix_new + key], args=[limit, window * 1000])[0] == 1, requests, keys)
+        print(f"  speedup: {gcra / legacy:.1f}x")
+    finally:
+        for i in range(keys):
+            client.delete(f"{prefix_old}bench:{i}", f"{prefix_new}bench:{i}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark old vs new rate limiter paths')
+    parser.add_argument('--requests', type=int, default=50_000)
+    parser.add_argument('--limit', type=int, default=2000, help='requests allowed per window')
+    parser.add_argument('--window', type=int, default=3600, help='window in seconds')
+    parser.add_argument('--keys', type=int, default=10, help='distinct clients')
+    parser.add_argument('--redis-url', default=os.getenv('REDIS_URL'))
+    args = parser.parse_args()
+
+    bench_memory(args.requests, args.limit, args.keys, args.window)
+    if args.redis_url:
+        bench_redis(args.redis_url, args.requests, args.limit, args.keys, args.window)
+    else:
+        print("\nℹ️ Skipping Redis comparison (set --redis-url or REDIS_URL)")
+
+
+if __name__ == '__main__':
+    main()
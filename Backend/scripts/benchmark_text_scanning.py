@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+🔎 Text scanning benchmark for Lugn & Trygg
+Runs the previous per-pattern loops and the compiled TextScanner paths over
+the same corpus of Swedish chat messages and reports the time per message.
+It also checks that both paths give the same results:
+
+  moderation:  blocklist + email/phone/url re.search calls (peer chat)
+  sanitize:    one re.sub per XSS pattern (input_sanitization)
+  crisis:      keyword loops of the fallback crisis detector
+  mood:        the mood NLP lexicon scans (emotions, clinical markers,
+               arousal, dominance, intensity)
+
+The corpus is generated from fixed templates, so runs are comparable.
+Roughly one message in ten carries personal information, markup or a
+crisis phrase, as in the real chat.
+
+Usage:
+    python benchmark_text_scanning.py [--messages N] [--repeat N] [--seed N]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add Backend directory to path (one level up from scripts/)
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from src.services.crisis_nlp import _FALLBACK_SCANNER, FALLBACK_CATEGORY_SEVERITY, FALLBACK_CRISIS_KEYWORDS
+from src.services.mood_nlp_service import SwedishMoodNLP
+from src.utils.input_sanitization import InputSanitizer
+from src.utils.text_scanner import TextScanner
+
+OPENERS = ['Hej alla', 'Tack för att ni finns', 'Godmorgon', 'Ni anar inte hur skönt det är att skriva här',
+           'Jag vet inte riktigt hur jag ska börja', 'Hoppas ni har det bra', 'Orkar knappt skriva idag']
+MIDDLES = [
+    'jag har haft en jobbig vecka på jobbet och sover dåligt', 'idag kände jag faktiskt lite glädje',
+    'ångesten kommer mest på kvällarna', 'min terapeut sa att jag ska prova andningsövningar',
+    'jag är så trött på att vara trött', 'promenaden i skogen hjälpte mycket',
+    'det känns tungt men jag försöker', 'jag känner mig ensam fast jag har folk omkring mig',
+    'jag kan inte riktigt sätta ord på det', 'har någon tips på hur man hanterar oro inför möten?',
+    'det var extremt stressigt på bussen', 'jag har börjat skriva dagbok och det ger mig lugn',
+    'ibland känns allt så hopplöst', 'jag är tacksam för små saker just nu',
+]
+CLOSERS = ['Kram ❤️', 'Ha en fin dag!', 'Tack för att ni lyssnar.', '', 'Vi hörs.', 'Ta hand om er!!']
+FLAGGED = [
+    'skriv till mig på anna.svensson@gmail.com', 'ring mig på 070-123 45 67', 'kolla www.exempel.se',
+    '<script>alert(1)</script>', '<img src=x onerror=alert(1)>', 'jag vill inte leva längre, jag vill dö',
+    'jag orkar inte mer och vet inte vad jag ska göra', 'jag har tänkt på att skada mig själv',
+]
+
+
+def corpus(size: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(size):
+        parts = [rng.choice(OPENERS)] + rng.sample(MIDDLES, rng.randint(1, 3))
+        if rng.random() < 0.1:
+            parts.append(rng.choice(FLAGGED))
+        parts.append(rng.choice(CLOSERS))
+        messages.append('. '.join(p for p in parts if p))
+    return messages
+
+
+# ──────────────────────────────────────────────────────────────
+# Previous implementations
+# ──────────────────────────────────────────────────────────────
+
+BLOCKLIST = ['idiot', 'hora', 'fitta', 'jävla idiot']
+EMAIL = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+PHONE = r'(?:(?:\+|00)?\d{1,3}[\s.-]?)?(?:\(?\d{2,4}\)?[\s.-]?)?\d(?:[\s.-]?\d){6,12}'
+URL = r'(https?://\S+|www\.\S+|\b\S+\.(?:com|net|org|se|io|co)\b)'
+
+
+def legacy_moderation(message: str) -> str | None:
+    lower_message = message.lower()
+    for word in BLOCKLIST:
+        if word in lower_message:
+            return 'banned'
+    if re.search(EMAIL, message):
+        return 'email'
+    if re.search(PHONE, message):
+        return 'phone'
+    if re.search(URL, message, flags=re.IGNORECASE):
+        return 'url'
+    return None
+
+
+def legacy_sanitize(sanitizer: InputSanitizer, text: str) -> str:
+    text = text.replace('\x00', '')
+    for pattern in sanitizer.xss_patterns:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', text)
+    return text.strip()
+
+
+def legacy_crisis(text: str) -> tuple[list[str], float]:
+    text_lower = text.lower()
+    indicators, severity = [], 0
+    for category, keywords in FALLBACK_CRISIS_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in text_lower:
+                indicators.append(f"Nyckelord: '{keyword}' ({category})")
+                severity = max(severity, FALLBACK_CATEGORY_SEVERITY[category])
+    return indicators, severity
+
+
+def legacy_mood_counts(text: str) -> dict[str, int]:
+    """Each lexicon scanned separately, as the mood service did (emotions twice)."""
+    text_lower = text.lower()
+    lexicons = {**SwedishMoodNLP.EMOTION_CATEGORIES,
+                **{f'clinical:{n}': terms for n, (_, terms) in SwedishMoodNLP.CLINICAL_MARKERS.items()},
+                **SwedishMoodNLP.LINGUISTIC_MARKERS}
+    counts = {name: sum(1 for word in words if word in text_lower) for name, words in lexicons.items()}
+    for name in ('positive', 'negative'):  # _identify_emotions scanned these again
+        counts[name] = sum(1 for word in lexicons[name] if word in text_lower)
+    return {name: count for name, count in counts.items() if count}
+
+
+# ──────────────────────────────────────────────────────────────
+# Compiled paths
+# ──────────────────────────────────────────────────────────────
+
+MODERATION = TextScanner(keywords={'banned': BLOCKLIST},
+                         patterns={'email': EMAIL, 'phone': PHONE, 'url': f'(?i:{URL})'}, flags=0)
+
+
+def scanner_moderation(message: str) -> str | None:
+    return MODERATION.first(message)
+
+
+def scanner_crisis(text: str) -> tuple[list[str], float]:
+    hits = _FALLBACK_SCANNER.scan(text)
+    indicators = [f"Nyckelord: '{k}' ({c})" for c, keywords in hits.terms.items() for k in keywords]
+    return indicators, max((FALLBACK_CATEGORY_SEVERITY[c] for c in hits.terms), default=0)
+
+
+def scanner_mood_counts(text: str) -> dict[str, int]:
+    hits = SwedishMoodNLP._scanner.scan(text)
+    return {name: hits.count(name) for name in hits.categories}
+
+
+def time_path(repeat: int, fn, messages: list[str]) -> tuple[float, list]:
+    best, results = float('inf'), []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [fn(m) for m in messages]
+        best = min(best, time.perf_counter() - started)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compiled text scanning against per-pattern loops')
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    messages = corpus(args.messages, args.seed)
+    sanitizer = InputSanitizer()
+    average = sum(len(m) for m in messages) / len(messages)
+    print(f"📚 {len(messages)} messages, {average:.0f} characters on average")
+
+    paths = {
+        'moderation': (legacy_moderation, scanner_moderation),
+        'sanitize': (lambda m: legacy_sanitize(sanitizer, m), sanitizer._sanitize_text),
+        'crisis': (legacy_crisis, scanner_crisis),
+        'mood': (legacy_mood_counts, scanner_mood_counts),
+    }
+
+    print(f"\n⏱️ Time per message (best of {args.repeat})")
+    print(f"  {'path':<11} {'loops':>10} {'scanner':>10} {'speedup':>8}  same results")
+    mismatches = 0
+    for name, (legacy, compiled) in paths.items():
+        legacy_time, legacy_results = time_path(args.repeat, legacy, messages)
+        scanner_time, scanner_results = time_path(args.repeat, compiled, messages)
+        same = sum(a == b for a, b in zip(legacy_results, scanner_results, strict=True))
+        mismatches += len(messages) - same
+        print(f"  {name:<11} {legacy_time / len(messages) * 1e6:>8.2f}µs {scanner_time / len(messages) * 1e6:>8.2f}µs "
+              f"{legacy_time / scanner_time:>7.1f}x  {same}/{len(messages)}")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    exit(main())
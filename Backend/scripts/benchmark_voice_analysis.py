@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+🎙️ Voice analysis benchmark for Lugn & Trygg
+Times the pitch trackers on fixed synthetic speech-like clips (5s, 30s, 120s
+at 16 kHz) and reports their real-time factor and accuracy against the
+known pitch contour:
+
+  pyin:      librosa.pyin (the previous default; skipped without librosa)
+  yin:       vectorized numpy YIN
+  autocorr:  vectorized normalized autocorrelation
+
+With librosa installed, --full also times the complete feature extraction
+per mode. Those numbers are what PITCH_COST and BASE_COST in
+src/services/voice_analysis_engine.py are based on.
+
+Usage:
+    python benchmark_voice_analysis.py [--durations 5 30 120] [--repeat N] [--full]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add Backend directory to path (one level up from scripts/)
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from src.services.voice_analysis_engine import PITCH_FMAX, PITCH_FMIN, autocorr_pitch, decode_audio, yin_pitch
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+
+
+def synthetic_speech(seconds: float, seed: int = 7) -> tuple[np.ndarray, np.ndarray]:
+    """
+    A deterministic voice-like clip: a harmonic source gliding between 110 and
+    260 Hz, syllable-rate amplitude bursts, pauses and a little noise.
+    Returns the samples and the true F0 per sample (0 where silent).
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    contour = 185 + 60 * np.sin(2 * np.pi * 0.3 * t) + 15 * np.sin(2 * np.pi * 5.5 * t)
+    phase = 2 * np.pi * np.cumsum(contour) / SAMPLE_RATE
+    source = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4.5 * t) ** 2
+    speaking = (np.sin(2 * np.pi * 0.25 * t) > -0.6).astype(float)  # ~30% pauses
+    y = 0.3 * source * syllables * speaking + 0.003 * rng.standard_normal(n)
+    return y.astype(np.float32), contour * speaking
+
+
+def frame_truth(truth: np.ndarray, n_frames: int) -> np.ndarray:
+    centers = np.minimum(np.arange(n_frames) * HOP_LENGTH + FRAME_LENGTH // 2, len(truth) - 1)
+    return truth[centers]
+
+
+def track_pyin(y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    import librosa
+
+    f0, voiced, _ = librosa.pyin(y, fmin=PITCH_FMIN, fmax=PITCH_FMAX, sr=SAMPLE_RATE,
+                                 frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH, center=False)
+    return f0, voiced
+
+
+def track_fast(tracker):
+    return lambda y: tracker(y, SAMPLE_RATE, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH)
+
+
+def accuracy(f0: np.ndarray, voiced: np.ndarray, truth: np.ndarray) -> tuple[float, float]:
+    """(gross pitch error %, median absolute error in Hz) over frames voiced in both."""
+    truth = frame_truth(truth, len(f0))
+    both = voiced & (truth > 0)
+    if not both.any():
+        return 100.0, float('nan')
+    error = np.abs(f0[both] - truth[both])
+    return float(np.mean(error > 0.2 * truth[both]) * 100), float(np.median(error))
+
+
+def time_call(repeat: int, fn, *args):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def bench_pitch(durations: list[float], repeat: int, modes: dict) -> None:
+    print(f"\n🎵 Pitch tracking (best of {repeat})")
+    print(f"  {'clip':>6} {'mode':<9} {'time':>10} {'RTF':>8} {'GPE':>7} {'median err':>11}")
+    for seconds in durations:
+        y, truth = synthetic_speech(seconds)
+        pcm = (y * 32767).astype('<i2').tobytes()
+        decode_time, _ = time_call(repeat, decode_audio, pcm, SAMPLE_RATE)
+        print(f"  {seconds:>5.0f}s {'decode':<9} {decode_time * 1000:>8.1f}ms {decode_time / seconds:>8.4f}")
+        for mode, track in modes.items():
+            elapsed, (f0, voiced) = time_call(repeat, track, y)
+            gpe, median_err = accuracy(f0, voiced, truth)
+            print(f"  {seconds:>5.0f}s {mode:<9} {elapsed * 1000:>8.1f}ms {elapsed / seconds:>8.4f} "
+                  f"{gpe:>6.1f}% {median_err:>9.2f}Hz")
+
+
+def bench_full(durations: list[float], repeat: int, modes: list[str]) -> None:
+    from src.services.voice_emotion_service import ProfessionalVoiceEmotionAnalyzer
+
+    analyzer = ProfessionalVoiceEmotionAnalyzer()
+    print(f"\n🧪 Full feature extraction (best of {repeat})")
+    for seconds in durations:
+        pcm = (synthetic_speech(seconds)[0] * 32767).astype('<i2').tobytes()
+        for mode in modes:
+            elapsed, result = time_call(repeat, analyzer._analyze_with_librosa, pcm, mode)
+            print(f"  {seconds:>5.0f}s {mode:<9} {elapsed * 1000:>10.1f}ms  RTF {elapsed / seconds:.4f}  "
+                  f"pitch {result.prosody.pitch_mean:.0f}Hz")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark voice analysis pitch modes')
+    parser.add_argument('--durations', type=float, nargs='+', default=[5, 30, 120])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--full', action='store_true', help='also time the complete librosa feature extraction')
+    args = parser.parse_args()
+
+    modes = {'yin': track_fast(yin_pitch), 'autocorr': track_fast(autocorr_pitch)}
+    try:
+        import librosa  # noqa: F401
+        have_librosa = True
+        modes = {'pyin': track_pyin, **modes}
+    except ImportError:
+        have_librosa = False
+        print("ℹ️ librosa not installed; skipping pyin and --full")
+
+    bench_pitch(args.durations, args.repeat, modes)
+    if args.full and have_librosa:
+        bench_full(args.durations, args.repeat, list(modes))
+
+
+if __name__ == '__main__':
+    main()
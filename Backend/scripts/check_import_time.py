@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+⏱️ Startup import-time check for Lugn & Trygg
+Imports every blueprint module, which is what a gunicorn worker loads at
+boot and again after each ``max_requests`` restart. It runs them in a fresh
+interpreter under ``python -X importtime`` and checks two things:
+
+  budget:  the import time of the blueprint modules stays within
+           IMPORT_TIME_BUDGET_SECONDS (default 1.0s)
+  heavy:   none of the modules in utils.lazy_imports.HEAVY_MODULES
+           (pandas, sklearn, tensorflow, torch, transformers, ...) is
+           imported at startup; each offender is reported together with
+           the src module that pulled it in
+
+--offline replaces src.firebase_config with a stub and fills the required
+settings with generated values. The check then runs in CI without
+credentials and without a Firestore round-trip.
+
+Usage:
+    python check_import_time.py [--budget SECONDS] [--top N] [--offline] [--module NAME ...]
+
+Exits with status 1 when the budget is exceeded or a heavy module is imported.
+"""
+
+import argparse
+import os
+import re
+import secrets
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Add Backend directory to path (one level up from scripts/)
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from src.utils.lazy_imports import HEAVY_MODULES
+
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv('IMPORT_TIME_BUDGET_SECONDS', '1.0'))
+
+# Written to stderr right before the measured imports; interpreter startup is not counted
+START_MARKER = '--- lugn-trygg import-time start ---'
+IMPORT_TIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+OFFLINE_PREAMBLE = """
+from unittest.mock import MagicMock
+sys.modules['src.firebase_config'] = MagicMock()
+"""
+
+# Plain import statements: -X importtime does not log importlib.import_module calls
+CHILD = """
+import sys
+{preamble}
+sys.stderr.write({marker!r} + '\\n')
+{imports}
+"""
+
+
+@dataclass
+class ImportRecord:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+    parent: 'ImportRecord | None' = None
+
+
+@dataclass
+class ImportReport:
+    records: list[ImportRecord]
+    total_seconds: float
+    # Heavy top-level package -> chain of modules that imported it, outermost first
+    heavy: dict[str, list[str]] = field(default_factory=dict)
+
+    def slowest(self, count: int) -> list[ImportRecord]:
+        top_level = [r for r in self.records if r.depth == 0]
+        return sorted(top_level, key=lambda r: r.cumulative_us, reverse=True)[:count]
+
+
+def blueprint_modules() -> list[str]:
+    from src.routes import blueprint_modules as modules
+    return modules()
+
+
+def offline_env() -> dict[str, str]:
+    """Environment with generated values for the settings src.config requires at import."""
+    env = dict(os.environ)
+    env.setdefault('FLASK_ENV', 'development')
+    env.setdefault('JWT_SECRET_KEY', secrets.token_urlsafe(48))
+    env.setdefault('JWT_REFRESH_SECRET_KEY', secrets.token_urlsafe(48))
+    env.setdefault('FIREBASE_CREDENTIALS', '{}')
+    env.setdefault('FIREBASE_WEB_API_KEY', 'import-time-check')
+    env.setdefault('FIREBASE_API_KEY', 'import-time-check')
+    env.setdefault('FIREBASE_PROJECT_ID', 'import-time-check')
+    env.setdefault('FIREBASE_STORAGE_BUCKET', 'import-time-check.appspot.com')
+    return env
+
+
+def run_importtime(modules: list[str], offline: bool = False) -> str:
+    """Import ``modules`` in a fresh interpreter and return its ``-X importtime`` output."""
+    code = CHILD.format(
+        preamble=OFFLINE_PREAMBLE if offline else '',
+        marker=START_MARKER,
+        imports='\n'.join(f'import {name}' for name in modules),
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=backend_dir,
+        env=offline_env() if offline else None,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    if result.returncode != 0:
+        errors = '\n'.join(line for line in result.stderr.splitlines() if not IMPORT_TIME_LINE.match(line))
+        raise RuntimeError(f"Importing the modules failed:\n{errors[-4000:]}")
+    return result.stderr
+
+
+def parse_importtime(output: str) -> list[ImportRecord]:
+    """Parse ``-X importtime`` lines after the start marker, linking each module to its importer."""
+    _, found, measured = output.partition(START_MARKER)
+    records = []
+    for line in (measured if found else output).splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append(ImportRecord(name, int(self_us), int(cumulative_us), len(indent) // 2))
+
+    # Children are printed before their parent, one level deeper
+    pending: dict[int, list[ImportRecord]] = {}
+    for record in records:
+        for child in pending.pop(record.depth + 1, []):
+            child.parent = record
+        pending.setdefault(record.depth, []).append(record)
+    return records
+
+
+def measure(modules: list[str], offline: bool = False) -> ImportReport:
+    records = parse_importtime(run_importtime(modules, offline))
+    total = sum(r.cumulative_us for r in records if r.depth == 0) / 1e6
+
+    heavy: dict[str, list[str]] = {}
+    for record in records:
+        top_level = record.name.partition('.')[0]
+        importer = record.parent.name.partition('.')[0] if record.parent else None
+        if top_level in HEAVY_MODULES and importer != top_level and top_level not in heavy:
+            chain, parent = [], record.parent
+            while parent is not None:
+                chain.append(parent.name)
+                parent = parent.parent
+            heavy[top_level] = list(reversed(chain))
+    return ImportReport(records, total, heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check blueprint import time against the startup budget')
+    parser.add_argument('--budget', type=float, default=IMPORT_TIME_BUDGET_SECONDS, help='seconds')
+    parser.add_argument('--top', type=int, default=15, help='slowest top-level imports to list')
+    parser.add_argument('--offline', action='store_true', help='stub Firebase and required settings')
+    parser.add_argument('--module', action='append', help='measure these modules instead of the blueprints')
+    args = parser.parse_args()
+
+    modules = args.module or blueprint_modules()
+    print(f"⏱️ Importing {len(modules)} modules{' (offline)' if args.offline else ''}...")
+    report = measure(modules, offline=args.offline)
+
+    print("\n🐢 Slowest top-level imports")
+    for record in report.slowest(args.top):
+        print(f"  {record.cumulative_us / 1000:>8.1f}ms  {record.name}")
+
+    failed = False
+    if report.heavy:
+        failed = True
+        print("\n❌ Heavy modules imported at startup (load them on first use, see src/utils/lazy_imports.py)")
+        for name, chain in sorted(report.heavy.items()):
+            importer = next((m for m in reversed(chain) if m.startswith('src.')), chain[-1] if chain else '?')
+            print(f"  {name:<24} imported by {importer}")
+    else:
+        print("\n✅ No heavy modules imported at startup")
+
+    status = '✅' if report.total_seconds <= args.budget else '❌'
+    print(f"{status} Import time {report.total_seconds:.2f}s (budget {args.budget:.2f}s)")
+    failed = failed or report.total_seconds > args.budget
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    exit(main())
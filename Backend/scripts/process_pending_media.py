@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+🖼️ Resume stalled memory media jobs for Lugn & Trygg
+Finds multimedia memories whose thumbnails/analysis are still pending or
+processing but have not reported progress for MEDIA_STALE_SECONDS (e.g. the
+worker restarted mid-job) and runs their media job again. Photos that were
+already finished are skipped. Run from cron every few minutes.
+
+Usage:
+    python process_pending_media.py [--limit N] [--dry-run]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add Backend directory to path (one level up from scripts/)
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from src.firebase_config import initialize_firebase
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resume stalled memory media jobs')
+    parser.add_argument('--limit', type=int, default=100, help='Maximum memories to resume per run')
+    parser.add_argument('--dry-run', action='store_true', help='Only list stalled memories')
+    args = parser.parse_args()
+
+    print("🔥 Initializing Firebase...")
+    try:
+        initialize_firebase()
+        from src.firebase_config import db
+        if db is None:
+            print("❌ Firebase Firestore client (db) is not initialized. Check your credentials and .env configuration.")
+            return 1
+        print("✅ Firebase connected")
+    except Exception as e:
+        print(f"❌ Failed to initialize Firebase: {e}")
+        return 1
+
+    from src.services.memory_media_pipeline import memory_media_pipeline
+
+    stalled = memory_media_pipeline.find_stalled(limit=args.limit)
+    print(f"🔎 {len(stalled)} stalled memories")
+    if args.dry_run:
+        for memory_id in stalled:
+            print(f"  • {memory_id}")
+        return 0
+
+    failed = False
+    for memory_id in stalled:
+        state = memory_media_pipeline.process_memory(memory_id)
+        print(f"  {'❌' if state == 'failed' else '✓'} {memory_id}: {state}")
+        failed = failed or state == 'failed'
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    exit(main())
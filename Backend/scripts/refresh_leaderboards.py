@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+🏆 Refresh materialized leaderboards for Lugn & Trygg
+Rebuilds the cached XP, streak and mood leaderboard pages and freezes last
+week's winners into leaderboard_snapshots (no-op once the week is frozen).
+Run from cron every minute or so; pages older than the refresh interval are
+also rebuilt lazily by the API.
+
+Usage:
+    python refresh_leaderboards.py [--close-week-only]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add Backend directory to path (one level up from scripts/)
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from src.firebase_config import initialize_firebase
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh materialized leaderboard pages')
+    parser.add_argument('--close-week-only', action='store_true',
+                        help='Only freeze last week\'s winners snapshot')
+    args = parser.parse_args()
+
+    print("🔥 Initializing Firebase...")
+    try:
+        initialize_firebase()
+        from src.firebase_config import db
+        if db is None:
+            print("❌ Firebase Firestore client (db) is not initialized. Check your credentials and .env configuration.")
+            return 1
+        print("✅ Firebase connected")
+    except Exception as e:
+        print(f"❌ Failed to initialize Firebase: {e}")
+        return 1
+
+    from src.services.leaderboard_pages import leaderboard_pages
+
+    failed = False
+    if not args.close_week_only:
+        for board in ('xp', 'streaks', 'moods'):
+            try:
+                page = leaderboard_pages.refresh(board)
+                print(f"  ✓ {board}: {len(page.rows)} rows (etag {page.etag})")
+            except Exception as e:
+                print(f"  ❌ {board}: {e}")
+                failed = True
+
+    try:
+        week = leaderboard_pages.close_week()
+        print(f"  ✓ weekly winners for {week.extra.get('weekStart', '?')[:10]}: {len(week.rows)} rows")
+    except Exception as e:
+        print(f"  ❌ weekly winners: {e}")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -1180,6 +1180,20 @@ def _register_paths():
             }
         },
     )
+    spec.path(
+        path='/api/v1/peer-chat/room/{room_id}/stream',
+        operations={
+            'get': {
+                'tags': ['Peer Chat'],
+                'summary': 'Stream live room events (SSE: message, like, typing, presence)',
+                'parameters': [
+                    {'name': 'room_id', 'in': 'path', 'required': True, 'schema': {'type': 'string'}},
+                    {'name': 'session_id', 'in': 'query', 'required': True, 'schema': {'type': 'string'}},
+                ],
+                'responses': {'200': {'description': 'text/event-stream of room events'}},
+            }
+        },
+    )
 
     # ================================================================
     #  Voice
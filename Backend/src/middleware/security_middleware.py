@@ -6,7 +6,7 @@ Provides comprehensive security middleware including:
 - Rate limiting
 - CSRF protection
 - Security headers
-- Request logging and monitoring
+- Request logging and monitoring (routine reads rolled up, see audit_policy)
 """
 
 import logging
@@ -18,6 +18,7 @@ from typing import Any
 
 from flask import g, jsonify, request
 
+from ..services.audit_policy import ROLLUP, AccessRollup, AuditPolicy
 from ..services.audit_service import AuditService
 from ..services.security_service import SecurityService
 
@@ -26,10 +27,13 @@ logger = logging.getLogger(__name__)
 class SecurityMiddleware:
     """Security middleware for Flask applications"""
 
-    def __init__(self, app=None, security_service: SecurityService | None = None):
+    def __init__(self, app=None, security_service: SecurityService | None = None,
+                 audit_policy: AuditPolicy | None = None):
         self.app = app
         self.security_service = security_service or SecurityService(AuditService())
         self.rate_limits: dict[str, dict[str, Any]] = {}
+        self.audit_policy = audit_policy or AuditPolicy()
+        self.access_rollup = AccessRollup(self.security_service.audit.log_event)
 
         if app:
             self.init_app(app)
@@ -82,7 +86,7 @@ class SecurityMiddleware:
                 return jsonify({"error": "Ogiltig CSRF-token"}), 403
 
         # Log security event
-        self.security_service.log_security_event(
+        request_event = (
             'REQUEST',
             safe_user_id,
             {
@@ -95,6 +99,11 @@ class SecurityMiddleware:
             self._anonymize_ip(ip_address),
             user_agent
         )
+        if self.audit_policy.is_routine_read(request.method, request.path):
+            # Decided after the response: rolled up on success, logged in full on failure
+            g.deferred_request_event = request_event
+        else:
+            self.security_service.log_security_event(*request_event)
         # Return None to continue request processing
         return None
 
@@ -112,9 +121,23 @@ class SecurityMiddleware:
                     duration,
                 )
 
+        user_id = getattr(g, 'user_id', 'anonymous')
+        request_event = g.pop('deferred_request_event', None)
+        if request_event is not None:
+            if self.audit_policy.classify(request.method, request.path, response.status_code) == ROLLUP:
+                # One counter stands in for both the REQUEST and the ACCESS_AUDIT event
+                endpoint = request.url_rule.rule if request.url_rule else request.path
+                self.access_rollup.record(
+                    str(user_id), request.method, endpoint, self._anonymize_ip(self._get_client_ip())
+                )
+                return response
+            event_type, safe_user_id, details, ip_address, user_agent = request_event
+            self.security_service.log_security_event(
+                event_type, safe_user_id, {**details, 'status_code': response.status_code}, ip_address, user_agent
+            )
+
         # Audit successful responses
         if response.status_code < 400:
-            user_id = getattr(g, 'user_id', 'anonymous')
             self.security_service.audit_access(
                 user_id,
                 request.path,
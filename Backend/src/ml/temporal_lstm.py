@@ -10,41 +10,17 @@ from typing import Any
 
 import numpy as np
 
-# Deep learning with graceful fallback
-try:
-    import tensorflow as tf
-    from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
-    from tensorflow.keras.layers import (
-        LSTM,
-        BatchNormalization,
-        Concatenate,
-        Dense,
-        Dropout,
-        Input,
-        Lambda,
-        Multiply,
-        Permute,
-        Reshape,
-    )
-    from tensorflow.keras.layers import Attention as KerasAttention
-    from tensorflow.keras.models import Model, Sequential, load_model
-    from tensorflow.keras.optimizers import Adam
-    from tensorflow.keras.regularizers import l2
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
-    logger = logging.getLogger(__name__)
-    logger.warning("TensorFlow not available, LSTM features disabled")
+from ..utils.lazy_imports import is_available, lazy_module
 
-try:
-    from sklearn.model_selection import train_test_split
-    from sklearn.preprocessing import MinMaxScaler, StandardScaler
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
+logger = logging.getLogger(__name__)
 
+# Deep learning with graceful fallback; TensorFlow and scikit-learn are imported on first use
+TENSORFLOW_AVAILABLE = is_available('tensorflow')
+if not TENSORFLOW_AVAILABLE:
+    logger.warning("TensorFlow not available, LSTM features disabled")
+SKLEARN_AVAILABLE = is_available('sklearn')
 
-logger = logging.getLogger(__name__)
+tf = lazy_module('tensorflow')
 
 
 @dataclass
@@ -82,7 +58,10 @@ class TemporalAttentionLSTM:
         self.sequence_length = sequence_length
         self.n_features = n_features
         self.model = None
-        self.scaler = StandardScaler() if SKLEARN_AVAILABLE else None
+        self.scaler = None
+        if SKLEARN_AVAILABLE:
+            from sklearn.preprocessing import StandardScaler
+            self.scaler = StandardScaler()
         self.feature_names = [
             # Core mood features
             'valence', 'arousal', 'dominance', 'intensity',
@@ -106,6 +85,11 @@ class TemporalAttentionLSTM:
 
     def _build_model(self):
         """Build the attention-based LSTM architecture."""
+        from tensorflow.keras.layers import LSTM, BatchNormalization, Concatenate, Dense, Dropout, Input
+        from tensorflow.keras.models import Model
+        from tensorflow.keras.optimizers import Adam
+        from tensorflow.keras.regularizers import l2
+
         # Input layers
         mood_input = Input(shape=(self.sequence_length, self.n_features), name='mood_sequence')
 
@@ -310,6 +294,9 @@ class TemporalAttentionLSTM:
             if len(X) < 5:  # Need at least 5 sequences for training
                 return {'success': False, 'error': f'Insufficient sequences: need 5+, got {len(X)}'}
 
+            from sklearn.model_selection import train_test_split
+            from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+
             # Split data
             X_train, X_val, y_train, y_val = train_test_split(
                 X, y, test_size=validation_split, shuffle=False
@@ -571,3 +558,26 @@ def get_lstm_forecaster() -> TemporalAttentionLSTM:
     if _lstm_model is None:
         _lstm_model = TemporalAttentionLSTM()
     return _lstm_model
+
+
+def forecast_mood(mood_entries: list[dict],
+                  contextual_data: dict | None = None,
+                  days: int = 7,
+                  include_patterns: bool = False) -> tuple[list[MoodForecast], list[TemporalPattern] | None]:
+    """
+    Train on the user's history when it is long enough, then forecast ``days`` ahead.
+
+    Runs as the ``lstm_forecast`` task of the inference server, or inline
+    when the host has none.
+    """
+    forecaster = get_lstm_forecaster()
+
+    # Train if needed (or load pre-trained)
+    if len(mood_entries) >= 21:
+        training_result = forecaster.train(mood_entries)
+        if not training_result.get('success'):
+            logger.warning(f"LSTM training failed: {training_result.get('error')}")
+
+    forecasts = forecaster.predict(mood_entries, contextual_data, days)
+    patterns = forecaster.discover_patterns(mood_entries) if include_patterns else None
+    return forecasts, patterns
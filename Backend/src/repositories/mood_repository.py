@@ -15,6 +15,7 @@ from google.cloud.firestore_v1.base_query import FieldFilter
 
 from ..firebase_config import db
 from ..schemas.firestore_schemas import MoodEntryDoc
+from ..utils.tombstones import TOMBSTONE_COLLECTION, tombstone_id, tombstone_payload
 
 logger = logging.getLogger(__name__)
 
@@ -80,7 +81,7 @@ class MoodRepository:
         doc_ref.update(updates)
 
     def delete(self, mood_id: str, user_id: str) -> None:
-        """Delete a mood entry after ownership check."""
+        """Delete a mood entry after ownership check, leaving a backup tombstone."""
         uid = _normalize_uid(user_id)
         mid = str(mood_id).strip()
         if not mid:
@@ -95,7 +96,14 @@ class MoodRepository:
         if data.get("user_id") != uid:
             raise PermissionError("Not the owner of this mood entry")
 
-        doc_ref.delete()
+        # Delete and tombstone atomically so incremental backups can replay the delete
+        batch = self._db.batch()
+        batch.delete(doc_ref)
+        batch.set(
+            self._db.collection(TOMBSTONE_COLLECTION).document(tombstone_id("moods", mid)),
+            tombstone_payload("moods", mid),
+        )
+        batch.commit()
 
     # ──────────────────────────────────────────────────────────────
     # Read operations
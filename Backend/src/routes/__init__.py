@@ -1,49 +1,58 @@
 """
 Routes Package - Flask Blueprints
-All API route blueprints are registered here for easy importing
+All API route blueprints are registered here for easy importing.
+
+Blueprints are imported on first access (``from src.routes import mood_bp``),
+not when the package is imported, so loading one blueprint does not pull in
+the modules of all the others.
 """
 
-# Import all blueprints for easy access
-from .admin_routes import admin_bp
-from .advanced_mood_routes import advanced_mood_bp
-from .ai_helpers_routes import ai_helpers_bp
-from .ai_music_routes import ai_music_bp
-from .ai_routes import ai_bp
-from .audio_routes import audio_bp
-from .auth_routes import auth_bp
-from .biofeedback_ws_routes import biofeedback_ws_bp
-from .cbt_routes import cbt_bp
-from .challenges_routes import challenges_bp, init_challenges_defaults
-from .chatbot_routes import chatbot_bp
-from .consent_routes import consent_bp
-from .crisis_routes import crisis_bp
-from .dashboard_routes import dashboard_bp
-from .docs_routes import docs_bp
-from .feedback_routes import feedback_bp
-from .health_routes import health_bp
-from .insights_routes import insights_bp
-from .integration_routes import integration_bp
-from .journal_routes import journal_bp
-from .leaderboard_routes import leaderboard_bp
-from .memory_routes import memory_bp
-from .metrics_routes import metrics_bp
-from .mood_analytics_routes import mood_analytics_bp
-from .mood_routes import mood_bp
-from .mood_stats_routes import mood_stats_bp
-from .multimedia_memory_routes import multimedia_memory_bp
-from .notifications_routes import notifications_bp
-from .onboarding_routes import onboarding_bp
-from .peer_chat_routes import peer_chat_bp
-from .predictive_routes import predictive_bp
-from .privacy_routes import privacy_bp
-from .rate_limit_routes import rate_limit_bp
-from .referral_routes import referral_bp
-from .rewards_routes import rewards_bp
-from .security_routes import security_bp
-from .subscription_routes import subscription_bp
-from .sync_history_routes import sync_history_bp
-from .users_routes import users_bp
-from .voice_routes import voice_bp
+import importlib
+
+# Exported name -> route module that defines it
+_BLUEPRINT_MODULES = {
+    'admin_bp': 'admin_routes',
+    'advanced_mood_bp': 'advanced_mood_routes',
+    'ai_helpers_bp': 'ai_helpers_routes',
+    'ai_music_bp': 'ai_music_routes',
+    'ai_bp': 'ai_routes',
+    'audio_bp': 'audio_routes',
+    'auth_bp': 'auth_routes',
+    'biofeedback_ws_bp': 'biofeedback_ws_routes',
+    'cbt_bp': 'cbt_routes',
+    'challenges_bp': 'challenges_routes',
+    'init_challenges_defaults': 'challenges_routes',
+    'chatbot_bp': 'chatbot_routes',
+    'consent_bp': 'consent_routes',
+    'crisis_bp': 'crisis_routes',
+    'dashboard_bp': 'dashboard_routes',
+    'docs_bp': 'docs_routes',
+    'feedback_bp': 'feedback_routes',
+    'health_bp': 'health_routes',
+    'insights_bp': 'insights_routes',
+    'integration_bp': 'integration_routes',
+    'journal_bp': 'journal_routes',
+    'leaderboard_bp': 'leaderboard_routes',
+    'memory_bp': 'memory_routes',
+    'metrics_bp': 'metrics_routes',
+    'mood_analytics_bp': 'mood_analytics_routes',
+    'mood_bp': 'mood_routes',
+    'mood_stats_bp': 'mood_stats_routes',
+    'multimedia_memory_bp': 'multimedia_memory_routes',
+    'notifications_bp': 'notifications_routes',
+    'onboarding_bp': 'onboarding_routes',
+    'peer_chat_bp': 'peer_chat_routes',
+    'predictive_bp': 'predictive_routes',
+    'privacy_bp': 'privacy_routes',
+    'rate_limit_bp': 'rate_limit_routes',
+    'referral_bp': 'referral_routes',
+    'rewards_bp': 'rewards_routes',
+    'security_bp': 'security_routes',
+    'subscription_bp': 'subscription_routes',
+    'sync_history_bp': 'sync_history_routes',
+    'users_bp': 'users_routes',
+    'voice_bp': 'voice_routes',
+}
 
 __all__ = [
     # Authentication & User Management
@@ -112,3 +121,16 @@ __all__ = [
     'docs_bp',
 ]
 
+
+def __getattr__(name):
+    module = _BLUEPRINT_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def blueprint_modules() -> list[str]:
+    """Fully qualified names of every route module that defines an exported blueprint."""
+    return sorted({f'{__name__}.{module}' for module in _BLUEPRINT_MODULES.values()})
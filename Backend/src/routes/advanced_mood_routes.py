@@ -12,6 +12,7 @@ from pydantic import BaseModel, field_validator
 from src.firebase_config import db
 from src.services.audit_service import audit_log
 from src.services.auth_service import AuthService
+from src.services.inference_server import InferenceUnavailable, run_inference
 from src.services.rate_limiting import rate_limit_by_endpoint
 from src.utils.response_utils import APIResponse
 
@@ -23,7 +24,7 @@ except ImportError:
     NLP_AVAILABLE = False
 
 try:
-    from src.ml.temporal_lstm import get_lstm_forecaster
+    from src.ml.temporal_lstm import forecast_mood  # noqa: F401 — availability check; called through run_inference
     LSTM_AVAILABLE = True
 except ImportError:
     LSTM_AVAILABLE = False
@@ -218,16 +219,17 @@ def get_advanced_forecast():
         # Get contextual data
         contextual_data = _get_contextual_data(user_id)
 
-        # Generate forecast
-        forecaster = get_lstm_forecaster()
-
-        # Train if needed (or load pre-trained)
-        if len(mood_entries) >= 21:
-            training_result = forecaster.train(mood_entries)
-            if not training_result.get('success'):
-                logger.warning(f"LSTM training failed: {training_result.get('error')}")
-
-        forecasts = forecaster.predict(mood_entries, contextual_data, days)
+        # Generate forecast (in the inference server when the host runs one)
+        try:
+            forecasts, patterns = run_inference('lstm_forecast', {
+                'mood_entries': mood_entries,
+                'contextual_data': contextual_data,
+                'days': days,
+                'include_patterns': include_patterns,
+            })
+        except InferenceUnavailable as e:
+            logger.warning(f"LSTM forecast unavailable, using statistical fallback: {e}")
+            return _fallback_forecast_endpoint()
 
         response = {
             'forecasts': [
@@ -249,8 +251,7 @@ def get_advanced_forecast():
         }
 
         # Discover patterns if requested
-        if include_patterns:
-            patterns = forecaster.discover_patterns(mood_entries)
+        if patterns is not None:
             response['temporal_patterns'] = [
                 {
                     'type': p.pattern_type,
@@ -14,7 +14,7 @@ from src.services.subscription_service import (
 
 # Import new advanced AI services
 try:
-    from src.services.chat_rag_service import get_chat_rag_service
+    from src.services.chat_rag_service import get_chat_rag_service, index_chat_exchange
     RAG_AVAILABLE = True
 except ImportError:
     RAG_AVAILABLE = False
@@ -249,6 +249,16 @@ def chat_with_ai():
             "progress_tracking_enabled": ai_response.get("progress_tracking_enabled", False)
         })
 
+        # Embed the exchange for chat RAG retrieval (runs in the background)
+        if RAG_AVAILABLE:
+            try:
+                index_chat_exchange(user_id, f"user_{timestamp}", [
+                    {"role": "user", "content": user_message, "timestamp": timestamp},
+                    {"role": "assistant", "content": ai_response["response"], "timestamp": timestamp},
+                ])
+            except Exception as idx_err:
+                logger.warning(f"Chat RAG indexing failed (non-blocking): {idx_err}")
+
         # Audit log for crisis detection (security-relevant event)
         if ai_response.get("crisis_detected", False):
             audit_log('crisis_detected', user_id, {
@@ -560,6 +570,14 @@ def chat_stream():
                             "parse_errors": error_count,
                             "crisis_detected": crisis_detected  # Persist crisis flag for history
                         })
+                        if RAG_AVAILABLE:
+                            try:
+                                index_chat_exchange(user_id, f"user_{timestamp}", [
+                                    {"role": "user", "content": user_message, "timestamp": timestamp},
+                                    {"role": "assistant", "content": full_text, "timestamp": ai_timestamp},
+                                ])
+                            except Exception as idx_err:
+                                logger.warning(f"Chat RAG indexing failed (non-blocking): {idx_err}")
                         # Award XP
                         try:
                             from ..services.rewards_helper import award_xp
@@ -588,6 +606,17 @@ def chat_stream():
         return APIResponse.error("An internal error occurred during streaming")
 
 
+def _log_rag_timings(timings: dict) -> None:
+    """Log per-source RAG latencies; they are never stored or sent to the client."""
+    if not timings:
+        return
+    summary = ", ".join(f"{name}={meta.get('status')}/{meta.get('elapsed_ms')}ms" for name, meta in timings.items())
+    logger.info(f"⏱️ RAG retrieval: {summary}")
+    failed = {name: meta['error'] for name, meta in timings.items() if meta.get('error')}
+    if failed:
+        logger.warning(f"RAG sources failed: {failed}")
+
+
 def generate_enhanced_therapeutic_response(user_message: str, conversation_history: list, user_id: str = None) -> dict:
     """
     Generate enhanced therapeutic AI response with:
@@ -615,6 +644,7 @@ def generate_enhanced_therapeutic_response(user_message: str, conversation_histo
                 recency_days=30
             )
 
+            _log_rag_timings(getattr(contexts, 'timings', {}))
             if contexts:
                 rag_context_used = True
                 logger.info(f"RAG: Retrieved {len(contexts)} context items for user {user_id}")
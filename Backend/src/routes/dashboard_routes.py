@@ -16,6 +16,7 @@ from ..middleware.csrf_middleware import CSRF_COOKIE_NAME, CSRF_TTL_SECONDS
 from ..services.audit_service import audit_log
 from ..services.auth_service import AuthService
 from ..services.rate_limiting import rate_limit_by_endpoint
+from ..utils.cache import get_cache, user_tag
 from ..utils.input_sanitization import input_sanitizer
 from ..utils.response_utils import APIResponse
 
@@ -93,62 +94,27 @@ def _get_score_from_mood_text(mood_text: str) -> str:
     # Default to neutral if no match
     return "5/10"
 
-# In-memory cache for dashboard data (5 minute TTL)
-_dashboard_cache: dict[str, dict[str, Any]] = {}
+# Shared two-tier cache for dashboard data (5 minute TTL)
 CACHE_TTL_SECONDS = 300  # 5 minutes
-CACHE_MAX_SIZE = 1000  # Max entries before cleanup
-_last_cleanup = 0.0
-
-
-def _cleanup_expired_cache() -> None:
-    """Remove expired cache entries to prevent memory leak"""
-    global _last_cleanup
-    now = datetime.now(UTC).timestamp()
-
-    # Only cleanup every 60 seconds to avoid overhead
-    if now - _last_cleanup < 60:
-        return
-
-    _last_cleanup = now
-    expired_keys = [
-        key for key, data in _dashboard_cache.items()
-        if now - data.get('_cached_at', 0) >= CACHE_TTL_SECONDS
-    ]
-
-    for key in expired_keys:
-        del _dashboard_cache[key]
-
-    # If still too large, remove oldest entries
-    if len(_dashboard_cache) > CACHE_MAX_SIZE:
-        sorted_keys = sorted(
-            _dashboard_cache.keys(),
-            key=lambda k: _dashboard_cache[k].get('_cached_at', 0)
-        )
-        for key in sorted_keys[:len(_dashboard_cache) - CACHE_MAX_SIZE]:
-            del _dashboard_cache[key]
-
-    if expired_keys:
-        logger.debug(f"🧹 Cache cleanup: removed {len(expired_keys)} expired entries")
+CACHE_MAX_SIZE = 1000  # Bounded LRU size
+QUICK_STATS_TTL_SECONDS = 60
+_dashboard_cache = get_cache('dashboard', default_ttl=CACHE_TTL_SECONDS, max_size=CACHE_MAX_SIZE)
 
 
 def _get_cached_data(user_id: str) -> dict[str, Any] | None:
     """Get cached dashboard data if still valid"""
-    _cleanup_expired_cache()  # Cleanup on read
-
-    if user_id in _dashboard_cache:
-        cached = _dashboard_cache[user_id]
-        if datetime.now(UTC).timestamp() - cached.get('_cached_at', 0) < CACHE_TTL_SECONDS:
-            return cached
-        else:
-            # Remove expired entry
-            del _dashboard_cache[user_id]
-    return None
+    cached = _dashboard_cache.get(f"summary:{user_id}", tags=(user_tag(user_id),))
+    return dict(cached) if cached is not None else None
 
 
 def _set_cached_data(user_id: str, data: dict[str, Any]) -> None:
     """Cache dashboard data"""
-    data['_cached_at'] = datetime.now(UTC).timestamp()
-    _dashboard_cache[user_id] = data
+    _dashboard_cache.set(f"summary:{user_id}", data, tags=(user_tag(user_id),))
+
+
+def invalidate_dashboard_cache(user_id: str) -> None:
+    """Invalidate a user's cached dashboard summary and quick stats (called on mood writes)"""
+    _dashboard_cache.invalidate_tag(user_tag(user_id))
 
 
 @dashboard_bp.route('/<user_id>/summary', methods=['GET', 'OPTIONS'])
@@ -528,14 +494,9 @@ def get_quick_stats(user_id: str):
 
         # Check short-lived cache first (60s TTL for quick stats)
         cache_key = f"quick_stats:{user_id}"
-        if cache_key in _dashboard_cache:
-            cached = _dashboard_cache[cache_key]
-            if datetime.now(UTC).timestamp() - cached.get('_cached_at', 0) < 60:
-                cached_copy = {k: v for k, v in cached.items() if k != '_cached_at'}
-                cached_copy['cached'] = True
-                return APIResponse.success(data=cached_copy, message='Quick stats retrieved (cached)')
-            else:
-                del _dashboard_cache[cache_key]
+        cached = _dashboard_cache.get(cache_key, tags=(user_tag(user_id),))
+        if cached is not None:
+            return APIResponse.success(data={**cached, 'cached': True}, message='Quick stats retrieved (cached)')
 
         # Check database availability
         if db is None:
@@ -581,7 +542,7 @@ def get_quick_stats(user_id: str):
         }
 
         # Cache for 60 seconds
-        _dashboard_cache[cache_key] = {**stats_data, '_cached_at': datetime.now(UTC).timestamp()}
+        _dashboard_cache.set(cache_key, stats_data, ttl=QUICK_STATS_TTL_SECONDS, tags=(user_tag(user_id),))
 
         return APIResponse.success(
             data=stats_data,
@@ -252,6 +252,13 @@ def save_journal_entry(user_id):
         doc_ref = db.collection('journal_entries').document()
         doc_ref.set(entry_data)
 
+        # Embed for chat RAG retrieval (runs in the background)
+        try:
+            from src.services.chat_rag_service import index_journal_entry
+            index_journal_entry(user_id, doc_ref.id, entry_data)
+        except Exception as idx_err:
+            logger.warning(f"Journal RAG indexing failed (non-blocking): {idx_err}")
+
         # Audit log for journal creation
         audit_log(
             event_type="JOURNAL_ENTRY_CREATED",
@@ -368,6 +375,12 @@ def update_journal_entry(user_id, entry_id):
 
         entry_ref.update(update_data)
 
+        try:
+            from src.services.chat_rag_service import index_journal_entry
+            index_journal_entry(user_id, entry_id, {**existing_entry_data, **update_data})
+        except Exception as idx_err:
+            logger.warning(f"Journal RAG indexing failed (non-blocking): {idx_err}")
+
         # Audit log for journal update
         audit_log(
             event_type="JOURNAL_ENTRY_UPDATED",
@@ -448,6 +461,12 @@ def delete_journal_entry(user_id, entry_id):
         # Delete entry
         entry_ref.delete()
 
+        try:
+            from src.services.chat_rag_service import remove_indexed
+            remove_indexed(user_id, 'journal', entry_id)
+        except Exception as idx_err:
+            logger.warning(f"Journal RAG index removal failed (non-blocking): {idx_err}")
+
         # Audit log for journal deletion
         audit_log(
             event_type="JOURNAL_ENTRY_DELETED",
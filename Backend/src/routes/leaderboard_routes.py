@@ -5,13 +5,15 @@ Uses Firebase Firestore for user rankings based on XP, streaks, and achievements
 
 import logging
 import re
-from datetime import UTC, datetime
 
-from flask import Blueprint, request
+from flask import Blueprint, Response, request
 from google.cloud.firestore import FieldFilter
 
 from src.firebase_config import db
 from src.services.auth_service import AuthService
+from src.services.leaderboard_index import BoardPosition, leaderboard_index, xp_from_rewards
+from src.services.leaderboard_index import anonymize_username as _anonymize_username
+from src.services.leaderboard_pages import leaderboard_pages
 
 # Absolute imports (project standard)
 from src.services.rate_limiting import rate_limit_by_endpoint
@@ -23,6 +25,9 @@ logger = logging.getLogger(__name__)
 # Validation patterns
 USER_ID_PATTERN = re.compile(r'^[a-zA-Z0-9]{20,128}$')
 
+# Browser cache lifetime for leaderboard pages; revalidation is a cheap 304
+LEADERBOARD_PAGE_MAX_AGE = 30
+
 # Remove url_prefix here - it's set in main.py register_blueprint
 leaderboard_bp = Blueprint("leaderboard", __name__)
 
@@ -43,21 +48,35 @@ def _validate_limit(limit_param: str, default: int = 20, max_val: int = 100) ->
         return default
 
 
-def _anonymize_username(email_or_name: str) -> str:
-    """Create anonymous display name from email or name"""
-    if not email_or_name:
-        return "Anonymous"
+def _score_value(score: float) -> float:
+    """Scores come back from Redis as floats; show whole numbers as ints."""
+    return int(score) if float(score).is_integer() else score
+
+
+def _ranking_payload(position: BoardPosition, user_id: str, names: dict[str, str]) -> dict:
+    """Rank, percentile and anonymized neighbors for one board."""
+    return {
+        'rank': position.rank,
+        'value': _score_value(position.score),
+        'percentile': position.percentile,
+        'neighbors': [
+            {
+                'rank': entry.rank,
+                'displayName': names.get(entry.user_id, 'Anonymous'),
+                'value': _score_value(entry.score),
+                'isCurrentUser': entry.user_id == user_id,
+            }
+            for entry in position.neighbors
+        ],
+    }
 
-    # If it's an email, use the part before @
-    if "@" in email_or_name:
-        name = email_or_name.split("@")[0]
-    else:
-        name = email_or_name
 
-    # Anonymize: show first 2 chars + *** + last char
-    if len(name) > 3:
-        return f"{name[:2]}***{name[-1]}"
-    return f"{name[0]}***"
+def _cached_response(body: str, etag: str) -> Response:
+    """Serve a pre-rendered page with its ETag; a matching If-None-Match gets a 304."""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={LEADERBOARD_PAGE_MAX_AGE}'
+    return response.make_conditional(request)
 
 
 # ============================================================================
@@ -84,51 +103,8 @@ def get_xp_leaderboard():
         if timeframe not in ['all', 'weekly', 'monthly']:
             timeframe = 'all'
 
-        # Query user_rewards collection sorted by XP (this is where XP is actually stored)
-        query = db.collection('user_rewards').order_by('xp', direction='DESCENDING').limit(limit)
-        docs = query.stream()
-
-        leaderboard = []
-        rank = 1
-
-        for doc in docs:
-            user_data = doc.to_dict()
-
-            # Only include users with XP > 0
-            xp = user_data.get('xp', user_data.get('total_xp', 0))
-            if xp <= 0:
-                continue
-
-            # Get display name from users collection
-            user_id = doc.id
-            display_name = 'Anonymous'
-            try:
-                user_doc = db.collection('users').document(user_id).get()
-                if user_doc.exists:
-                    u = user_doc.to_dict() or {}
-                    display_name = _anonymize_username(u.get('display_name') or u.get('email', ''))
-            except Exception:
-                pass
-
-            leaderboard.append({
-                'rank': rank,
-                'userId': user_id,
-                'displayName': display_name,
-                'xp': xp,
-                'level': user_data.get('level', 1),
-                'badgeCount': len(user_data.get('badges', [])),
-                'avatar': '🌟'
-            })
-            rank += 1
-
-        return APIResponse.success(
-            data={
-                'leaderboard': leaderboard,
-                'timeframe': timeframe,
-                'updatedAt': datetime.now(UTC).isoformat()
-            },
-            message=f'Retrieved {len(leaderboard)} users'
-        )
+        page = leaderboard_pages.get_page('xp')
+        return _cached_response(*page.render_leaderboard(limit, timeframe=timeframe))
 
     except Exception as e:
         logger.error(f"Failed to get XP leaderboard: {str(e)}")
@@ -146,37 +122,8 @@ def get_streak_leaderboard():
 
         limit = _validate_limit(request.args.get('limit', '20'), default=20, max_val=100)
 
-        # Query users sorted by current streak
-        query = db.collection('users').order_by('current_streak', direction='DESCENDING').limit(limit)
-        docs = query.stream()
-
-        leaderboard = []
-        rank = 1
-
-        for doc in docs:
-            user_data = doc.to_dict()
-
-            streak = user_data.get('current_streak', 0)
-            if streak <= 0:
-                continue
-
-            leaderboard.append({
-                'rank': rank,
-                'userId': doc.id,
-                'displayName': _anonymize_username(user_data.get('display_name') or user_data.get('email', '')),
-                'currentStreak': streak,
-                'longestStreak': user_data.get('longest_streak', streak),
-                'avatar': user_data.get('avatar_emoji', '🔥')
-            })
-            rank += 1
-
-        return APIResponse.success(
-            data={
-                'leaderboard': leaderboard,
-                'updatedAt': datetime.now(UTC).isoformat()
-            },
-            message=f'Retrieved {len(leaderboard)} users'
-        )
+        page = leaderboard_pages.get_page('streaks')
+        return _cached_response(*page.render_leaderboard(limit))
 
     except Exception as e:
         logger.error(f"Failed to get streak leaderboard: {str(e)}")
@@ -194,43 +141,44 @@ def get_mood_leaderboard():
 
         limit = _validate_limit(request.args.get('limit', '20'), default=20, max_val=100)
 
-        # Query users sorted by mood count
-        query = db.collection('users').order_by('mood_count', direction='DESCENDING').limit(limit)
-        docs = query.stream()
-
-        leaderboard = []
-        rank = 1
-
-        for doc in docs:
-            user_data = doc.to_dict()
-
-            mood_count = user_data.get('mood_count', 0)
-            if mood_count <= 0:
-                continue
-
-            leaderboard.append({
-                'rank': rank,
-                'userId': doc.id,
-                'displayName': _anonymize_username(user_data.get('display_name') or user_data.get('email', '')),
-                'moodCount': mood_count,
-                'averageMood': round(user_data.get('average_mood', 5), 1),
-                'avatar': user_data.get('avatar_emoji', '📊')
-            })
-            rank += 1
-
-        return APIResponse.success(
-            data={
-                'leaderboard': leaderboard,
-                'updatedAt': datetime.now(UTC).isoformat()
-            },
-            message=f'Retrieved {len(leaderboard)} users'
-        )
+        page = leaderboard_pages.get_page('moods')
+        return _cached_response(*page.render_leaderboard(limit))
 
     except Exception as e:
         logger.error(f"Failed to get mood leaderboard: {str(e)}")
         return APIResponse.error('Failed to load leaderboard')
 
 
+def _count(query) -> int:
+    return int(query.count().get()[0][0].value)
+
+
+def _positions_from_documents(user_id: str) -> dict[str, BoardPosition] | None:
+    """
+    Ranks from the user's ``users`` and ``user_rewards`` documents plus Firestore
+    count aggregations, for use while the rank index is cold. No neighbors, and
+    legacy ``total_xp``-only reward documents are not counted ahead of the user.
+    """
+    user_doc = db.collection('users').document(user_id).get()
+    rewards_doc = db.collection('user_rewards').document(user_id).get()
+    if not user_doc.exists and not rewards_doc.exists:
+        return None
+
+    user_data = (user_doc.to_dict() or {}) if user_doc.exists else {}
+    scores = {
+        'xp': ('user_rewards', 'xp', xp_from_rewards(rewards_doc.to_dict() or {}) if rewards_doc.exists else 0),
+        'streak': ('users', 'current_streak', user_data.get('current_streak', 0)),
+        'moods': ('users', 'mood_count', user_data.get('mood_count', 0)),
+    }
+    total = max(_count(db.collection('users')), _count(db.collection('user_rewards')), 1)
+    return {
+        board: BoardPosition(
+            _count(db.collection(collection).where(filter=FieldFilter(field, '>', score))) + 1, score, total, []
+        )
+        for board, (collection, field, score) in scores.items()
+    }
+
+
 # Support both /user/<user_id>/rank AND /user/<user_id> for frontend compatibility
 @leaderboard_bp.route('/user/<user_id>/rank', methods=['GET'])
 @leaderboard_bp.route('/user/<user_id>', methods=['GET'])
@@ -245,66 +193,49 @@ def get_user_rank(user_id: str):
         return APIResponse.bad_request('Invalid user ID format')
 
     try:
-        if db is None:
-            return APIResponse.error('Database connection unavailable', 'DB_ERROR', 503)
-
-        # Get user data from both users and user_rewards collections
-        user_doc = db.collection('users').document(user_id_clean).get()
-        rewards_doc = db.collection('user_rewards').document(user_id_clean).get()
-
-        if not user_doc.exists and not rewards_doc.exists:
-            return APIResponse.not_found('User not found')
-
-        user_data = user_doc.to_dict() if user_doc.exists else {}
-        rewards_data = rewards_doc.to_dict() if rewards_doc.exists else {}
-
-        # XP comes from user_rewards, streaks/moods from users
-        user_xp = rewards_data.get('xp', rewards_data.get('total_xp', 0))
-        user_streak = user_data.get('current_streak', 0)
-        user_moods = user_data.get('mood_count', 0)
-
-        # Calculate XP rank from user_rewards collection with compatibility for legacy total_xp records.
-        xp_rank = 1
-        for rewards_doc in db.collection('user_rewards').select(['xp', 'total_xp']).stream():
-            rewards_data_doc = rewards_doc.to_dict() or {}
-            candidate_xp = rewards_data_doc.get('xp', rewards_data_doc.get('total_xp', 0))
-            if candidate_xp > user_xp:
-                xp_rank += 1
-
-        # Calculate streak rank from users collection
-        streak_rank_query = db.collection('users').where(filter=FieldFilter('current_streak', '>', user_streak)).stream()
-        streak_rank = len(list(streak_rank_query)) + 1
-
-        # Calculate mood count rank from users collection
-        mood_rank_query = db.collection('users').where(filter=FieldFilter('mood_count', '>', user_moods)).stream()
-        mood_rank = len(list(mood_rank_query)) + 1
-
-        # Get total user count for percentile
-        total_users_users = len(list(db.collection('users').select([]).stream()))
-        total_users_rewards = len(list(db.collection('user_rewards').select([]).stream()))
-        total_users = max(total_users_users, total_users_rewards, 1)
+        if not leaderboard_index.ensure_ready():
+            # The index is still being built in the background on this worker
+            if db is None:
+                return APIResponse.error('Database connection unavailable', 'DB_ERROR', 503)
+            positions = _positions_from_documents(user_id_clean)
+            if positions is None:
+                return APIResponse.not_found('User not found')
+        else:
+            positions = leaderboard_index.positions(user_id_clean)
+        if positions is None:
+            # Not indexed yet (e.g. signed up since the last rebuild): index the user's own documents
+            if db is None:
+                return APIResponse.error('Database connection unavailable', 'DB_ERROR', 503)
+
+            user_doc = db.collection('users').document(user_id_clean).get()
+            rewards_doc = db.collection('user_rewards').document(user_id_clean).get()
+            if not user_doc.exists and not rewards_doc.exists:
+                return APIResponse.not_found('User not found')
+
+            user_data = (user_doc.to_dict() or {}) if user_doc.exists else {}
+            leaderboard_index.record_scores(
+                user_id_clean,
+                xp=xp_from_rewards(rewards_doc.to_dict() or {}) if rewards_doc.exists else None,
+                streak=user_data.get('current_streak', 0) if user_doc.exists else None,
+                moods=user_data.get('mood_count', 0) if user_doc.exists else None,
+                display_name=_anonymize_username(user_data.get('display_name') or user_data.get('email', '')),
+            )
+            positions = leaderboard_index.positions(user_id_clean)
+            if positions is None:
+                return APIResponse.error('Failed to load user rankings')
+
+        neighbor_ids = [entry.user_id for position in positions.values() for entry in position.neighbors]
+        names = leaderboard_index.display_names(list(dict.fromkeys(neighbor_ids)))
 
         return APIResponse.success(
             data={
                 'userId': user_id_clean,
                 'rankings': {
-                    'xp': {
-                        'rank': xp_rank,
-                        'value': user_xp,
-                        'percentile': round((1 - xp_rank / max(total_users, 1)) * 100, 1)
-                    },
-                    'streak': {
-                        'rank': streak_rank,
-                        'value': user_streak,
-                        'percentile': round((1 - streak_rank / max(total_users, 1)) * 100, 1)
-                    },
-                    'moods': {
-                        'rank': mood_rank,
-                        'value': user_moods,
-                        'percentile': round((1 - mood_rank / max(total_users, 1)) * 100, 1)
-                    }
+                    'xp': _ranking_payload(positions['xp'], user_id_clean, names),
+                    'streak': _ranking_payload(positions['streak'], user_id_clean, names),
+                    'moods': _ranking_payload(positions['moods'], user_id_clean, names),
                 },
-                'totalUsers': total_users
+                'totalUsers': max(position.total for position in positions.values())
             },
             message='User rankings retrieved'
         )
@@ -318,52 +249,13 @@ def get_user_rank(user_id: str):
 @AuthService.jwt_required
 @rate_limit_by_endpoint
 def get_weekly_winners():
-    """Get last week's top performers"""
+    """Get last week's top performers (frozen when the week closed)"""
     try:
         if db is None:
             return APIResponse.error('Database connection unavailable', 'DB_ERROR', 503)
 
-        from datetime import timedelta
-
-        # Calculate last week's date range
-        today = datetime.now(UTC)
-        last_week_start = today - timedelta(days=today.weekday() + 7)
-        last_week_end = last_week_start + timedelta(days=6)
-
-        # For now, just return current top performers
-        # Query user_rewards collection (where XP is actually stored), not users.total_xp
-        xp_query = db.collection('user_rewards').order_by('xp', direction='DESCENDING').limit(3)
-        xp_winners = []
-
-        for doc in xp_query.stream():
-            user_data = doc.to_dict()
-            winner_xp = user_data.get('xp', user_data.get('total_xp', 0))
-            if winner_xp > 0:
-                # Get display name from users collection
-                display_name = 'Anonymous'
-                try:
-                    user_doc = db.collection('users').document(doc.id).get()
-                    if user_doc.exists:
-                        u = user_doc.to_dict() or {}
-                        display_name = _anonymize_username(u.get('display_name') or u.get('email', ''))
-                except Exception:
-                    pass
-                xp_winners.append({
-                    'displayName': display_name,
-                    'xp': winner_xp,
-                    'avatar': user_data.get('avatar_emoji', '🏆')
-                })
-
-        return APIResponse.success(
-            data={
-                'weekStart': last_week_start.isoformat(),
-                'weekEnd': last_week_end.isoformat(),
-                'winners': {
-                    'xp': xp_winners[:3] if xp_winners else []
-                }
-            },
-            message='Weekly winners retrieved'
-        )
+        page = leaderboard_pages.get_weekly_winners()
+        return _cached_response(*page.render_winners())
 
     except Exception as e:
         logger.error(f"Failed to get weekly winners: {str(e)}")
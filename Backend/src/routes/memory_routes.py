@@ -9,7 +9,7 @@ from __future__ import annotations
 import logging
 import os
 import re
-from datetime import UTC, datetime, timedelta
+from datetime import UTC, datetime
 
 from firebase_admin import storage
 from flask import Blueprint, Response, g
@@ -21,6 +21,7 @@ from src.firebase_config import db
 from src.services.audit_service import audit_log
 from src.services.auth_service import AuthService
 from src.services.rate_limiting import rate_limit_by_endpoint
+from src.services.signed_url_service import signed_url_service
 from src.utils.input_sanitization import input_sanitizer
 from src.utils.response_utils import APIResponse
 
@@ -162,8 +163,8 @@ def upload_memory() -> Response | tuple[Response, int]:
             "created_at": datetime.now(UTC).isoformat()
         })
 
-        # Generate secure temporary URL (1 hour validity)
-        signed_url = blob.generate_signed_url(expiration=timedelta(hours=1))
+        # Generate secure temporary URL (cached per expiry window)
+        signed_url = signed_url_service.url_for(bucket, secure_name)
 
         audit_log(
             event_type="MEMORY_UPLOADED",
@@ -238,6 +239,17 @@ def list_memories(user_id: str) -> Response | tuple[Response, int]:
             })
         memory_list.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
 
+        # Sign the whole page in one batch (cached signatures are reused)
+        paths = [m["filePath"] for m in memory_list if m["filePath"] and _validate_file_path(m["filePath"])]
+        if paths:
+            try:
+                bucket_name = os.getenv("FIREBASE_STORAGE_BUCKET", "lugn-trygg-53d75.appspot.com")
+                urls = signed_url_service.urls_for(storage.bucket(bucket_name), paths)
+                for memory in memory_list:
+                    memory["url"] = urls.get(memory["filePath"])
+            except Exception as e:
+                logger.warning(f"Signing memory URLs failed (non-blocking): {e}")
+
         logger.info(f"✅ MEMORY - Retrieved {len(memory_list)} memories for user {user_id}")
         return APIResponse.success({"memories": memory_list}, f"Retrieved {len(memory_list)} memories")
 
@@ -289,16 +301,11 @@ def get_memory(memory_id: str) -> Response | tuple[Response, int]:
         if not _validate_file_path(file_path):
             return APIResponse.bad_request("Invalid file path")
 
-        # Get file from Firebase Storage
+        # Sign the stored path without an exists() round trip. A missing object
+        # surfaces as a 404 from Storage when the URL is fetched
         bucket_name = os.getenv("FIREBASE_STORAGE_BUCKET", "lugn-trygg-53d75.appspot.com")
         bucket = storage.bucket(bucket_name)
-        blob = bucket.blob(file_path)
-
-        if not blob.exists():
-            return APIResponse.not_found("File not found in storage")
-
-        # Generate signed URL (1 hour validity)
-        signed_url = blob.generate_signed_url(expiration=timedelta(hours=1))
+        signed_url = signed_url_service.url_for(bucket, file_path)
 
         return APIResponse.success({
             "url": signed_url,
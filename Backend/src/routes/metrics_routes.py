@@ -262,6 +262,142 @@ def business_metrics():
         return Response("# Error generating business metrics\n", status=500)
 
 
+@metrics_bp.route('/metrics/cache', methods=['GET'])
+@AuthService.jwt_required
+@rate_limit_by_endpoint
+def cache_metrics():
+    """
+    Shared cache counters (hits, misses, evictions, ...) in Prometheus format.
+    One series per registered cache namespace.
+    """
+    from src.utils.cache import get_all_cache_stats
+
+    counters = ('l1_hits', 'l2_hits', 'misses', 'sets', 'evictions', 'expirations',
+                'invalidations', 'loads', 'coalesced', 'l2_errors', 'size')
+    metrics_lines = [
+        "# HELP lugn_trygg_cache Shared two-tier cache counters",
+        "# TYPE lugn_trygg_cache gauge",
+    ]
+    for namespace, stats in sorted(get_all_cache_stats().items()):
+        for counter in counters:
+            metrics_lines.append(
+                f'lugn_trygg_cache{{namespace="{namespace}",counter="{counter}"}} {stats.get(counter, 0)}'
+            )
+    metrics_lines.append("")
+
+    return Response('\n'.join(metrics_lines), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@metrics_bp.route('/metrics/audit', methods=['GET'])
+@AuthService.jwt_required
+@rate_limit_by_endpoint
+def audit_metrics():
+    """
+    Buffered audit writer counters of this worker process in Prometheus format:
+    queue depth and capacity, events written, spilled and replayed.
+    """
+    from src.services.audit_service import audit_writer
+
+    stats = audit_writer.stats()
+    counters = ('enqueued', 'written', 'batches', 'failed_batches', 'spilled', 'replayed',
+                'encrypt_errors', 'queue_depth', 'max_queue_depth', 'queue_capacity', 'last_flush_ms')
+    metrics_lines = [
+        "# HELP lugn_trygg_audit_writer Buffered audit writer counters",
+        "# TYPE lugn_trygg_audit_writer gauge",
+    ]
+    for counter in counters:
+        metrics_lines.append(f'lugn_trygg_audit_writer{{counter="{counter}"}} {stats.get(counter, 0)}')
+    metrics_lines.append(f'lugn_trygg_audit_writer{{counter="spill_pending"}} {int(stats["spill_pending"])}')
+    metrics_lines.append("")
+
+    return Response('\n'.join(metrics_lines), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@metrics_bp.route('/metrics/models', methods=['GET'])
+@AuthService.jwt_required
+@rate_limit_by_endpoint
+def model_metrics():
+    """
+    ML models of this worker process in Prometheus format: which are loaded,
+    which were preloaded in the gunicorn master and are shared copy-on-write,
+    their load time and RSS growth, and the worker's RSS/USS/PSS.
+    """
+    from src.services.model_warmup import model_status
+
+    status = model_status()
+    metrics_lines = [
+        "# HELP lugn_trygg_model_loaded ML model loaded in this worker (1) or not (0)",
+        "# TYPE lugn_trygg_model_loaded gauge",
+    ]
+    for model in status['models']:
+        metrics_lines.append(f'lugn_trygg_model_loaded{{model="{model["name"]}"}} {int(model["loaded"])}')
+    metrics_lines += [
+        "# HELP lugn_trygg_model_preloaded ML model inherited from the master before fork",
+        "# TYPE lugn_trygg_model_preloaded gauge",
+    ]
+    for model in status['models']:
+        metrics_lines.append(f'lugn_trygg_model_preloaded{{model="{model["name"]}"}} {int(model["preloaded"])}')
+    metrics_lines += [
+        "# HELP lugn_trygg_model_load_seconds Time spent loading the model during warm-up",
+        "# TYPE lugn_trygg_model_load_seconds gauge",
+        "# HELP lugn_trygg_model_rss_bytes RSS growth while loading the model during warm-up",
+        "# TYPE lugn_trygg_model_rss_bytes gauge",
+    ]
+    for model in status['models']:
+        if model['load_seconds'] is not None:
+            metrics_lines.append(f'lugn_trygg_model_load_seconds{{model="{model["name"]}"}} {model["load_seconds"]}')
+            metrics_lines.append(f'lugn_trygg_model_rss_bytes{{model="{model["name"]}"}} {model["rss_delta_bytes"]}')
+    metrics_lines += [
+        "# HELP lugn_trygg_process_memory_bytes Memory of this worker process",
+        "# TYPE lugn_trygg_process_memory_bytes gauge",
+    ]
+    for kind, value in sorted(status['memory'].items()):
+        metrics_lines.append(f'lugn_trygg_process_memory_bytes{{kind="{kind}"}} {value}')
+    metrics_lines += [
+        "# HELP lugn_trygg_gc_frozen_objects Objects in the permanent GC generation (gc.freeze)",
+        "# TYPE lugn_trygg_gc_frozen_objects gauge",
+        f"lugn_trygg_gc_frozen_objects {status['gc_frozen_objects']}",
+        "",
+    ]
+
+    return Response('\n'.join(metrics_lines), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@metrics_bp.route('/metrics/inference', methods=['GET'])
+@AuthService.jwt_required
+@rate_limit_by_endpoint
+def inference_metrics():
+    """
+    Per-task counters of the host's inference server in Prometheus format:
+    requests, batches, average batch size, rejections, timeouts, errors and
+    queue depth. ``lugn_trygg_inference_up`` is 0 when workers run models inline.
+    """
+    from src.services.inference_server import InferenceUnavailable, inference_stats, use_inference_server
+
+    tasks: dict[str, dict[str, Any]] = {}
+    if use_inference_server():
+        try:
+            tasks = inference_stats()['tasks']
+        except InferenceUnavailable as e:
+            logger.warning(f"Inference server stats unavailable: {e}")
+
+    counters = ('requests', 'batches', 'batched_items', 'avg_batch', 'max_batch', 'rejected', 'timeouts',
+                'errors', 'queue_depth', 'busy_runners', 'concurrency', 'run_seconds')
+    metrics_lines = [
+        "# HELP lugn_trygg_inference_up Inference server reachable from this worker",
+        "# TYPE lugn_trygg_inference_up gauge",
+        f"lugn_trygg_inference_up {int(bool(tasks))}",
+        "# HELP lugn_trygg_inference Inference server counters per task",
+        "# TYPE lugn_trygg_inference gauge",
+    ]
+    for task, stats in sorted(tasks.items()):
+        for counter in counters:
+            metrics_lines.append(f'lugn_trygg_inference{{task="{task}",counter="{counter}"}} {stats.get(counter, 0)}')
+    metrics_lines.append("")
+
+    return Response('\n'.join(metrics_lines), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
 # ============================================================================
 # Database Stats Functions (replaces mock data)
 # ============================================================================
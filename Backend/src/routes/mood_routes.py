@@ -7,11 +7,8 @@ and related functionality including voice emotion analysis and predictive foreca
 
 from __future__ import annotations
 
-import json
 import logging
-import os
 import re
-import time
 import uuid
 from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
@@ -26,8 +23,16 @@ from google.cloud.firestore import FieldFilter
 from src.firebase_config import db
 from src.services.audit_service import audit_log
 from src.services.auth_service import AuthService
+from src.services.mood_aggregate_service import (
+    day_key,
+    encode_runs,
+    mood_aggregate_service,
+    runs_from_days,
+    summarize,
+)
 from src.services.rate_limiting import rate_limit_by_endpoint
 from src.services.subscription_service import SubscriptionLimitError, SubscriptionService
+from src.utils.cache import get_cache, user_tag
 from src.utils.input_sanitization import input_sanitizer
 from src.utils.response_utils import APIResponse
 
@@ -51,38 +56,22 @@ logger = logging.getLogger(__name__)
 # Blueprint definition
 mood_bp = Blueprint('mood', __name__)
 
-# CRITICAL FIX: Use Redis for caching (production ready for 10k users)
-# Fallback to in-memory cache if Redis not available
-_mood_cache = {}
+# Shared two-tier cache (in-process LRU + Redis L2 when available)
 MOOD_CACHE_TTL = 300  # 5 minutes for mood data (API is slow, cache aggressively)
-MOOD_CACHE_MAX_SIZE = 5000  # CRITICAL FIX: Limit cache size to prevent memory leaks (10k users)
-MOOD_CACHE_CLEANUP_BATCH = 500  # Remove 500 entries at once when cleaning up
-_redis_client = None
-_redis_unavailable = False  # Track if Redis failed to avoid repeated connection attempts
+MOOD_CACHE_MAX_SIZE = 5000  # Bounded LRU to prevent memory leaks (10k users)
+_mood_cache = get_cache('mood', default_ttl=MOOD_CACHE_TTL, max_size=MOOD_CACHE_MAX_SIZE)
 
-def _get_redis_client() -> Any:
-    """Get Redis client for caching (lazy initialization with failure tracking)"""
-    global _redis_client, _redis_unavailable
 
-    # Skip if Redis already marked as unavailable (avoid repeated connection attempts)
-    if _redis_unavailable:
-        return None
+class _UncacheableResult(Exception):
+    """Raised inside the cache loader to pass a non-cacheable response through."""
+
+    def __init__(self, result: Any) -> None:
+        super().__init__('uncacheable result')
+        self.result = result
 
-    if _redis_client is None:
-        try:
-            import redis  # type: ignore
-            redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-            _redis_client = redis.from_url(redis_url, decode_responses=True, socket_timeout=1, socket_connect_timeout=1)
-            _redis_client.ping()  # Test connection
-            logger.info(f"✅ Redis connected for caching: {redis_url}")
-        except Exception as e:
-            logger.warning(f"⚠️ Redis not available for caching ({e}), using in-memory cache")
-            _redis_client = None
-            _redis_unavailable = True  # Don't try again until restart
-    return _redis_client
 
 def cached_mood_data(ttl: int = MOOD_CACHE_TTL) -> Callable[[Callable], Callable]:
-    """Cache decorator for mood endpoints - FULLY OPTIMIZED for dict returns"""
+    """Cache decorator for mood endpoints - only 200 dict payloads are cached"""
     def decorator(f: Callable) -> Callable:
         @wraps(f)
         def wrapper(*args: Any, **kwargs: Any) -> Response | tuple[Response, int]:
@@ -96,71 +85,38 @@ def cached_mood_data(ttl: int = MOOD_CACHE_TTL) -> Callable[[Callable], Callable
 
             # Generate cache key from function name, user_id, and query params
             query_params = str(sorted(request.args.items()))
-            cache_key = f"mood:{f.__name__}:{user_id}:{query_params}"
-
-            # PERFORMANCE FIX: Check in-memory cache FIRST (fastest path)
-            cached_item = _mood_cache.get(cache_key)
-            if cached_item and isinstance(cached_item, tuple) and len(cached_item) == 2:
-                data, timestamp = cached_item
-                if time.time() - timestamp < ttl:
-                    # CACHE HIT - return immediately
-                    return jsonify({**data, "cached": True}), 200
-
-            # Try Redis as secondary cache (skip if unavailable)
-            redis_client = _get_redis_client()
-            if redis_client:
-                try:
-                    cached_data = redis_client.get(cache_key)
-                    if cached_data and isinstance(cached_data, (str, bytes)):
-                        cached_response = json.loads(str(cached_data))
-                        # Store in memory for faster access next time
-                        _mood_cache[cache_key] = (cached_response, time.time())
-                        return jsonify({**cached_response, "cached": True}), 200
-                except Exception:
-                    pass
-
-            # CACHE MISS - Call the actual function
-            result = f(*args, **kwargs)
-
-            # Handle dict return from function
-            if isinstance(result, tuple) and len(result) == 2:
-                response_data, status_code = result
+            cache_key = f"{f.__name__}:{user_id}:{query_params}"
+            tags = (user_tag(user_id),)
+
+            cached = _mood_cache.get(cache_key, tags=tags)
+            if cached is not None:
+                return jsonify({**cached, "cached": True}), 200
 
+            def _load() -> dict[str, Any]:
+                result = f(*args, **kwargs)
+                if not (isinstance(result, tuple) and len(result) == 2):
+                    raise _UncacheableResult(result)
+
+                response_data, status_code = result
                 # Extract dict from Flask Response objects (e.g. from APIResponse.success())
                 if hasattr(response_data, 'get_json'):
                     try:
                         response_data = response_data.get_json()
-                    except Exception:
-                        return result
+                    except Exception as e:
+                        raise _UncacheableResult(result) from e
 
                 if status_code == 200 and isinstance(response_data, dict):
-                    # Store in memory cache
-                    _mood_cache[cache_key] = (response_data, time.time())
-
-                    # Store in Redis if available
-                    if redis_client:
-                        try:
-                            redis_client.setex(cache_key, ttl, json.dumps(response_data))
-                        except Exception:
-                            pass
-
-                    # Cleanup old cache entries if needed
-                    if len(_mood_cache) > MOOD_CACHE_MAX_SIZE:
-                        sorted_keys = sorted(
-                            _mood_cache.keys(),
-                            key=lambda k: _mood_cache[k][1] if isinstance(_mood_cache[k], tuple) else 0
-                        )
-                        for key in sorted_keys[:MOOD_CACHE_CLEANUP_BATCH]:
-                            _mood_cache.pop(key, None)
-
-                    return jsonify(response_data), status_code
-
-                # Non-200 or non-dict response
+                    return response_data
                 if isinstance(response_data, dict):
-                    return jsonify(response_data), status_code
-                return result
+                    raise _UncacheableResult((jsonify(response_data), status_code))
+                raise _UncacheableResult(result)
 
-            return result
+            # CACHE MISS - single-flight so concurrent requests share one Firestore fetch
+            try:
+                response_data = _mood_cache.get_or_set(cache_key, _load, ttl=ttl, tags=tags)
+            except _UncacheableResult as uncacheable:
+                return uncacheable.result
+            return jsonify(response_data), 200
 
         return wrapper
     return decorator
@@ -168,32 +124,18 @@ def cached_mood_data(ttl: int = MOOD_CACHE_TTL) -> Callable[[Callable], Callable
 
 def invalidate_mood_cache(user_id: str) -> None:
     """Invalidate cached mood data for a user after new mood is logged"""
-    global _mood_cache
+    _mood_cache.invalidate_tag(user_tag(user_id))
+    # The dashboard summary and quick stats are built from moods as well
+    from .dashboard_routes import invalidate_dashboard_cache
+    invalidate_dashboard_cache(user_id)
 
-    # Remove all cache entries for this user
-    keys_to_remove = [k for k in _mood_cache.keys() if f":{user_id}:" in k]
-    for key in keys_to_remove:
-        del _mood_cache[key]
 
-    # Also try to invalidate Redis cache
-    redis_client = _get_redis_client()
-    if redis_client:
-        try:
-            # Find and delete all keys for this user (pattern matching)
-            pattern = f"mood:*:{user_id}:*"
-            cursor: int = 0
-            while True:
-                scan_result = redis_client.scan(cursor, match=pattern, count=100)
-                if isinstance(scan_result, tuple) and len(scan_result) == 2:
-                    cursor, keys = int(scan_result[0]), scan_result[1]
-                    if keys:
-                        redis_client.delete(*keys)
-                    if cursor == 0:
-                        break
-                else:
-                    break
-        except Exception:
-            logger.warning("[B3] Redis cache invalidation failed — cache will expire naturally", exc_info=True)
+def _stamp_mood_write(user_id: str, written_at: str) -> None:
+    """Stamp ``moodsLastWrite`` on the user: the version mood prediction keys its cached features on."""
+    try:
+        db.collection('users').document(user_id).set({'moodsLastWrite': written_at}, merge=True)
+    except Exception as e:
+        logger.warning(f"Mood write stamp failed (non-blocking): {e}")
 
 
 # Max text length for analysis
@@ -481,6 +423,7 @@ def log_mood() -> Response | tuple[Response, int]:
             logger.info(f"💾 Mood data: score={user_score}, text='{final_mood_text}', timestamp={timestamp}")
 
             mood_ref = db.collection('users').document(user_id).collection('moods')
+            written_at = datetime.now(UTC).isoformat()
 
             # CRITICAL FIX: Use user's score (1-10) instead of sentiment score
             # If no user score provided, try to infer from sentiment or default to 5
@@ -511,7 +454,9 @@ def log_mood() -> Response | tuple[Response, int]:
                 'arousal': arousal,  # Energy/Activation (1-10)
                 # Tags and context for correlation analysis
                 'tags': tags,
-                'context': context
+                'context': context,
+                # Write time, for incremental backups
+                'lastWrite': written_at,
             }
 
             if voice_url:
@@ -533,8 +478,22 @@ def log_mood() -> Response | tuple[Response, int]:
             except Exception as xp_err:
                 logger.warning(f"XP award failed (non-blocking): {xp_err}")
 
+            # Keep the materialized streak aggregate in sync (non-blocking)
+            try:
+                mood_aggregate_service.record_log(user_id, timestamp)
+            except Exception as agg_err:
+                logger.warning(f"Mood aggregate update failed (non-blocking): {agg_err}")
+
+            # Embed for chat RAG retrieval (runs in the background)
+            try:
+                from ..services.chat_rag_service import index_mood
+                index_mood(user_id, doc_id, mood_data)
+            except Exception as idx_err:
+                logger.warning(f"Mood RAG indexing failed (non-blocking): {idx_err}")
+
             # PERFORMANCE: Invalidate cache so next GET returns fresh data
             invalidate_mood_cache(user_id)
+            _stamp_mood_write(user_id, written_at)
 
             # CRISIS DETECTION: Check for crisis indicators after mood is saved
             # Only trigger on clinically meaningful signals:
@@ -802,7 +761,20 @@ def delete_mood(mood_id: str) -> Response | tuple[Response, int]:
             return APIResponse.not_found('Mood entry not found')
 
         # Delete the mood entry
+        deleted_timestamp = (mood_doc.to_dict() or {}).get('timestamp')
         mood_ref.delete()
+        _stamp_mood_write(user_id, datetime.now(UTC).isoformat())
+
+        try:
+            mood_aggregate_service.record_removal(user_id, deleted_timestamp)
+        except Exception as agg_err:
+            logger.warning(f"Mood aggregate update failed (non-blocking): {agg_err}")
+        try:
+            from ..services.chat_rag_service import remove_indexed
+            remove_indexed(user_id, 'mood_logs', mood_id)
+        except Exception as idx_err:
+            logger.warning(f"Mood RAG index removal failed (non-blocking): {idx_err}")
+        invalidate_mood_cache(user_id)
 
         # Audit log the deletion
         audit_log('mood_deleted', user_id, {'mood_id': mood_id})
@@ -914,7 +886,22 @@ def update_mood(mood_id: str) -> Response | tuple[Response, int]:
             update_data['sentiment_analysis'] = sentiment_analysis
 
         # Update the mood entry
-        mood_ref.update(update_data)
+        written_at = datetime.now(UTC).isoformat()
+        mood_ref.update({**update_data, 'lastWrite': written_at})
+        _stamp_mood_write(user_id, written_at)
+
+        if 'timestamp' in update_data:
+            try:
+                previous_timestamp = (mood_doc.to_dict() or {}).get('timestamp')
+                mood_aggregate_service.record_move(user_id, previous_timestamp, update_data['timestamp'])
+            except Exception as agg_err:
+                logger.warning(f"Mood aggregate update failed (non-blocking): {agg_err}")
+        try:
+            from ..services.chat_rag_service import index_mood
+            index_mood(user_id, mood_id, {**(mood_doc.to_dict() or {}), **update_data})
+        except Exception as idx_err:
+            logger.warning(f"Mood RAG indexing failed (non-blocking): {idx_err}")
+        invalidate_mood_cache(user_id)
 
         # Audit log the update
         audit_log('mood_updated', user_id, {'mood_id': mood_id, 'updates': list(update_data.keys())})
@@ -995,84 +982,37 @@ def get_mood_streaks() -> Response | tuple[Response, int]:
         if not user_id:
             return APIResponse.unauthorized('User ID missing from context')
 
-        # Get all mood entries for streak calculation
-        mood_ref = db.collection('users').document(user_id).collection('moods')
-        mood_docs = list(mood_ref.order_by('timestamp', direction='DESCENDING').stream())
-
-        if not mood_docs:
-            return APIResponse.success({
-                'currentStreak': 0,
-                'longestStreak': 0,
-                'totalLoggedDays': 0,
-                'consistencyPercentage': 0,
-                'lastLogDate': None
-            })
-
-        # Extract dates from mood entries
-        logged_dates = set()
-        for doc in mood_docs:
-            mood_data = doc.to_dict()
-            timestamp = mood_data.get('timestamp', '')
-            if timestamp:
-                if isinstance(timestamp, str):
-                    date_key = timestamp[:10]  # YYYY-MM-DD
-                else:
-                    date_key = timestamp.strftime('%Y-%m-%d')
-                logged_dates.add(date_key)
-
-        # Calculate streaks
-        sorted_dates = sorted(logged_dates, reverse=True)
-        current_streak = 0
-        longest_streak = 0
-        temp_streak = 0
-
-        if sorted_dates:
-            # Calculate current streak
-            today = datetime.now(UTC).date()
-            current_date = today
-
-            for _ in range(len(sorted_dates) + 1):  # +1 to check today
-                date_str = current_date.strftime('%Y-%m-%d')
-                if date_str in logged_dates:
-                    current_streak += 1
-                    current_date -= timedelta(days=1)
-                else:
-                    break
-
-            # Calculate longest streak
-            for i in range(len(sorted_dates)):
-                if i == 0:
-                    temp_streak = 1
-                else:
-                    current_date_obj = datetime.strptime(sorted_dates[i], '%Y-%m-%d').date()
-                    prev_date_obj = datetime.strptime(sorted_dates[i-1], '%Y-%m-%d').date()
-                    days_diff = (prev_date_obj - current_date_obj).days
-
-                    if days_diff == 1:
-                        temp_streak += 1
-                    else:
-                        longest_streak = max(longest_streak, temp_streak)
-                        temp_streak = 1
-
-            longest_streak = max(longest_streak, temp_streak)
+        # FAST PATH: materialized aggregate (single document read)
+        try:
+            streaks = mood_aggregate_service.get_streaks(user_id)
+        except Exception as agg_err:
+            logger.warning(f"Mood aggregate read failed, falling back to full scan: {agg_err}")
+            streaks = None
 
-        # Calculate consistency (last 30 days)
-        thirty_days_ago = (datetime.now(UTC) - timedelta(days=30)).date()
-        recent_dates = [d for d in logged_dates if datetime.strptime(d, '%Y-%m-%d').date() >= thirty_days_ago]
-        consistency_percentage = (len(recent_dates) / 30) * 100 if thirty_days_ago else 0
+        if streaks is None:
+            # SLOW PATH: aggregate not built yet — scan history once and materialize it
+            mood_ref = db.collection('users').document(user_id).collection('moods')
+            mood_docs = list(mood_ref.order_by('timestamp', direction='DESCENDING').stream())
 
-        # Get last log date
-        last_log_date = sorted_dates[0] if sorted_dates else None
+            logged_dates = set()
+            for doc in mood_docs:
+                date_key = day_key((doc.to_dict() or {}).get('timestamp'))
+                if date_key:
+                    logged_dates.add(date_key)
 
-        logger.info(f"🔥 Calculated streaks for user {user_id}: current={current_streak}, longest={longest_streak}")
+            try:
+                aggregate = mood_aggregate_service.materialize(user_id, logged_dates)
+            except Exception as agg_err:
+                logger.warning(f"Mood aggregate materialization failed (non-blocking): {agg_err}")
+                aggregate = {'runs': encode_runs(runs_from_days(logged_dates))}
+            streaks = summarize(aggregate)
+
+        logger.info(
+            f"🔥 Calculated streaks for user {user_id}: "
+            f"current={streaks['currentStreak']}, longest={streaks['longestStreak']}"
+        )
 
-        return APIResponse.success({
-            'currentStreak': current_streak,
-            'longestStreak': longest_streak,
-            'totalLoggedDays': len(logged_dates),
-            'consistencyPercentage': round(consistency_percentage, 1),
-            'lastLogDate': last_log_date
-        })
+        return APIResponse.success(streaks)
 
     except Exception as e:
         logger.error(f"❌ Failed to get mood streaks: {str(e)}", exc_info=True)
@@ -5,43 +5,38 @@ Supports text, audio, and photos in a single memory entry
 
 import logging
 import os
-from datetime import UTC, datetime, timedelta
-from io import BytesIO
+from datetime import UTC, datetime
 
 from firebase_admin import storage
 from flask import Blueprint, g, request
 from werkzeug.utils import secure_filename
 
-_IS_PRODUCTION = os.getenv('FLASK_ENV', 'development').lower() == 'production'
-
-try:
-    from PIL import Image as PilImage
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    if _IS_PRODUCTION:
-        import logging as _log
-        _log.getLogger(__name__).warning(
-            "[F2] Pillow (PIL) is not installed — image compression and thumbnail "
-            "generation are DISABLED. Photos will be stored at original size without "
-            "thumbnails. Add 'Pillow' to requirements.txt and rebuild the Docker image."
-        )
-    else:
-        import logging as _log
-        _log.getLogger(__name__).warning(
-            "⚠️  Pillow not installed — image resize/thumbnails disabled (pip install Pillow)"
-        )
-
 from src.firebase_config import db
 from src.services.audit_service import audit_log
 from src.services.auth_service import AuthService
-from src.services.memory_analysis_service import get_memory_analysis_service
-from src.services.photo_analysis_service import get_photo_analysis_service
+from src.services.memory_media_pipeline import (
+    DEFAULT_THUMBNAIL_SIZE,
+    PIL_AVAILABLE,
+    media_status_response,
+    memory_media_pipeline,
+    processing_status,
+)
 from src.services.rate_limiting import rate_limit_by_endpoint
+from src.services.signed_url_service import signed_url_service
 from src.utils.response_utils import APIResponse
 
 logger = logging.getLogger(__name__)
 
+if not PIL_AVAILABLE:
+    if os.getenv('FLASK_ENV', 'development').lower() == 'production':
+        logger.warning(
+            "[F2] Pillow (PIL) is not installed — image compression and thumbnail "
+            "generation are DISABLED. Photos will be stored at original size without "
+            "thumbnails. Add 'Pillow' to requirements.txt and rebuild the Docker image."
+        )
+    else:
+        logger.warning("⚠️  Pillow not installed — image resize/thumbnails disabled (pip install Pillow)")
+
 multimedia_memory_bp = Blueprint("multimedia_memory", __name__)
 
 # Supported file types
@@ -61,40 +56,6 @@ def allowed_image(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_IMAGES
 
 
-def _get_storage_url(blob) -> str:
-    """
-    Get a publicly accessible URL for a Firebase Storage blob.
-
-    Strategy:
-    1. Try generate_signed_url() — works when the service account has
-       roles/iam.serviceAccountTokenCreator.
-    2. Fall back to make_public() + blob.public_url — works when the Storage
-       bucket/object allows public access (e.g. allUsers has Storage Object Viewer).
-    3. Last resort: return the gs:// path so callers know where the file is.
-    """
-    try:
-        return blob.generate_signed_url(expiration=timedelta(hours=24), method='GET')
-    except Exception as sign_err:
-        logger.warning(f"Signed URL failed ({sign_err}), trying make_public fallback")
-        try:
-            blob.make_public()
-            return blob.public_url
-        except Exception as pub_err:
-            if _IS_PRODUCTION:
-                logger.warning(
-                    f"[F2] Firebase Storage URL generation failed — neither signed URL "
-                    f"nor public URL could be created for {blob.name}. "
-                    f"The stored gs:// path is NOT usable by frontend clients. "
-                    f"Fix: grant the backend service account ONE of: "
-                    f"(a) roles/iam.serviceAccountTokenCreator for signed URLs, OR "
-                    f"(b) roles/storage.objectCreator + allUsers Storage Object Viewer "
-                    f"for public URLs. Signed URL error: {sign_err}. Public error: {pub_err}"
-                )
-            else:
-                logger.warning(f"make_public failed ({pub_err}), returning gs:// path")
-            return f"gs://{blob.bucket.name}/{blob.name}"
-
-
 @multimedia_memory_bp.route("/create", methods=["POST"])
 @AuthService.jwt_required
 @rate_limit_by_endpoint
@@ -109,6 +70,11 @@ def create_multimedia_memory():
     - Multiple photos (up to 10)
     - Combined AI analysis of all modalities
 
+    Originals are streamed to storage and the memory is saved right away;
+    thumbnails and AI analysis run in the background media pipeline. The
+    response is 202 with the memory ID and a status URL to poll for
+    progress (the finished analysis is also on the memory detail).
+
     Request: multipart/form-data
     - content: text content (optional)
     - audio: audio file (optional)
@@ -143,7 +109,7 @@ def create_multimedia_memory():
             'errors': []
         }
 
-        # 1. Process audio file
+        # 1. Upload audio file
         if 'audio' in request.files:
             audio_file = request.files['audio']
             if audio_file and audio_file.filename:
@@ -153,14 +119,14 @@ def create_multimedia_memory():
                 else:
                     uploaded_files['errors'].append(f"Audio: {result['error']}")
 
-        # 2. Process photo files
+        # 2. Upload photo originals (thumbnails and analysis are queued below)
         photos = request.files.getlist('photos[]')
         if len(photos) > MAX_PHOTOS_PER_MEMORY:
             return APIResponse.bad_request(f"Maximum {MAX_PHOTOS_PER_MEMORY} photos allowed")
 
         for photo in photos:
             if photo and photo.filename:
-                result = _process_photo_file(photo, user_id)
+                result = _upload_photo_file(photo, user_id)
                 if result['success']:
                     uploaded_files['photos'].append(result)
                 else:
@@ -170,15 +136,20 @@ def create_multimedia_memory():
         if not content and not uploaded_files['audio'] and not uploaded_files['photos']:
             return APIResponse.bad_request("Memory must include text, audio, or photos")
 
-        # 3. AI Analysis of all modalities
-        ai_analysis = _analyze_multimodal_memory(
-            content=content,
-            audio_data=uploaded_files['audio'],
-            photos=uploaded_files['photos']
-        )
-
-        # 4. Save to Firestore
+        # 3. Save to Firestore as pending
         memory_id = f"{user_id}_{datetime.now(UTC).strftime('%Y%m%d%H%M%S')}"
+        photo_details = [
+            {
+                'photo_id': p['photo_id'],
+                'storage_path': p['storage_path'],
+                'thumbnail_paths': {},
+                'analysis': None,
+                'size': p['size'],
+                'format': p['format'],
+                'status': 'pending',
+            }
+            for p in uploaded_files['photos']
+        ]
 
         memory_data = {
             'user_id': user_id,
@@ -192,9 +163,11 @@ def create_multimedia_memory():
             'media': {
                 'audio': uploaded_files['audio']['storage_path'] if uploaded_files['audio'] else None,
                 'photos': [p['storage_path'] for p in uploaded_files['photos']],
-                'photo_count': len(uploaded_files['photos'])
+                'photo_count': len(uploaded_files['photos']),
+                'photo_details': photo_details
             },
-            'ai_analysis': ai_analysis,
+            'ai_analysis': None,
+            'media_processing': processing_status('pending', 0, len(photo_details) + 1),
             'has_text': bool(content),
             'has_audio': uploaded_files['audio'] is not None,
             'has_photos': len(uploaded_files['photos']) > 0,
@@ -203,6 +176,9 @@ def create_multimedia_memory():
 
         db.collection('memories').document(memory_id).set(memory_data)
 
+        # 4. Queue thumbnails and AI analysis of all modalities
+        memory_media_pipeline.submit(memory_id)
+
         # 5. Audit logging
         audit_log(
             event_type="MULTIMEDIA_MEMORY_CREATED",
@@ -212,40 +188,46 @@ def create_multimedia_memory():
                 "has_text": bool(content),
                 "has_audio": uploaded_files['audio'] is not None,
                 "photo_count": len(uploaded_files['photos']),
-                "ai_analysis": ai_analysis['primary_emotion'] if ai_analysis else None
             }
         )
 
-        # Build response
+        # Build response (URLs are signed from the stored paths)
+        bucket = storage.bucket()
+        media_status = media_status_response(memory_data, bucket)
+        audio_path = memory_data['media']['audio']
         response_data = {
             'memoryId': memory_id,
             'content': content,
             'mood': mood,
             'tags': tags,
             'media': {
-                'audioUrl': uploaded_files['audio']['public_url'] if uploaded_files['audio'] else None,
+                'audioUrl': signed_url_service.url_for(bucket, audio_path, allow_public=True) if audio_path else None,
                 'photos': [
                     {
-                        'url': p['public_url'],
-                        'thumbnail': p['thumbnail_url'],
+                        'url': p['url'],
+                        'thumbnail': p['thumbnail'],
                         'analysis': p['analysis']
                     }
-                    for p in uploaded_files['photos']
+                    for p in media_status['photos']
                 ]
             },
-            'aiAnalysis': ai_analysis,
+            'aiAnalysis': None,
+            'mediaStatus': media_status,
+            'statusUrl': f"/api/v1/memory-unified/{memory_id}/status",
+            'errors': uploaded_files['errors'],
             'createdAt': memory_data['created_at'].isoformat()
         }
 
         logger.info(
             f"✅ Multimedia memory created: {memory_id} "
             f"(text={bool(content)}, audio={uploaded_files['audio'] is not None}, "
-            f"photos={len(uploaded_files['photos'])})"
+            f"photos={len(uploaded_files['photos'])}, media queued)"
         )
 
         return APIResponse.success(
             data=response_data,
-            message=f"Memory saved with {len(uploaded_files['photos'])} photos"
+            message=f"Memory saved with {len(uploaded_files['photos'])} photos",
+            status_code=202
         )
 
     except Exception as e:
@@ -280,13 +262,9 @@ def _process_audio_file(audio_file, user_id: str) -> dict:
         content_type = "audio/webm" if ext == "webm" else f"audio/{ext}"
         blob.upload_from_file(audio_file, content_type=content_type)
 
-        # Get URL — signed with fallback to public
-        public_url = _get_storage_url(blob)
-
         return {
             'success': True,
             'storage_path': storage_path,
-            'public_url': public_url,
             'size': size,
             'format': ext
         }
@@ -296,8 +274,8 @@ def _process_audio_file(audio_file, user_id: str) -> dict:
         return {'success': False, 'error': str(e)}
 
 
-def _process_photo_file(photo_file, user_id: str) -> dict:
-    """Process, analyze, and upload photo to Firebase Storage."""
+def _upload_photo_file(photo_file, user_id: str) -> dict:
+    """Validate a photo and stream the original to Firebase Storage."""
     try:
         # Validate
         if not allowed_image(photo_file.filename):
@@ -311,14 +289,6 @@ def _process_photo_file(photo_file, user_id: str) -> dict:
         if size > MAX_FILE_SIZE:
             return {'success': False, 'error': 'Photo too large (max 10MB)'}
 
-        # Read for analysis
-        photo_bytes = photo_file.read()
-        photo_file.seek(0)  # Reset for upload
-
-        # AI Analysis
-        photo_service = get_photo_analysis_service()
-        analysis = photo_service.analyze_photo(photo_bytes, "temp")
-
         # Generate filename — only secure the basename, not the full storage path
         timestamp = datetime.now(UTC).strftime("%Y%m%d%H%M%S")
         ext = photo_file.filename.rsplit(".", 1)[1].lower()
@@ -326,105 +296,24 @@ def _process_photo_file(photo_file, user_id: str) -> dict:
         safe_basename = secure_filename(f"{photo_id}.{ext}")
         storage_path = f"memories/{user_id}/{safe_basename}"
 
-        # Upload original
+        # Stream the upload straight from the request body
         bucket = storage.bucket()
         blob = bucket.blob(storage_path)
-        blob.upload_from_string(photo_bytes, content_type=f"image/{ext}")
-        public_url = _get_storage_url(blob)
-
-        # Generate and upload real thumbnail (400px wide) using Pillow
-        thumbnail_url = public_url  # default: same as original
-        if PIL_AVAILABLE:
-            try:
-                thumb_img = PilImage.open(BytesIO(photo_bytes))
-                thumb_img.thumbnail((400, 400), PilImage.LANCZOS)
-                # Always save thumbnail as JPEG for universality
-                thumb_buf = BytesIO()
-                thumb_img.convert('RGB').save(thumb_buf, format='JPEG', quality=75, optimize=True)
-                thumb_buf.seek(0)
-                thumb_basename = secure_filename(f"{photo_id}_thumb.jpg")
-                thumb_path = f"memories/{user_id}/{thumb_basename}"
-                thumb_blob = bucket.blob(thumb_path)
-                thumb_blob.upload_from_file(thumb_buf, content_type='image/jpeg')
-                thumbnail_url = _get_storage_url(thumb_blob)
-                logger.debug(f"Thumbnail uploaded: {thumb_path} ({thumb_img.size})")
-            except Exception as thumb_err:
-                logger.warning(f"Thumbnail generation failed: {thumb_err}")
+        blob.upload_from_file(photo_file.stream, size=size, content_type=f"image/{ext}")
 
         return {
             'success': True,
+            'photo_id': photo_id,
             'storage_path': storage_path,
-            'public_url': public_url,
-            'thumbnail_url': thumbnail_url,
             'size': size,
-            'format': ext,
-            'analysis': {
-                'emotion': analysis.dominant_emotion,
-                'scene': analysis.scene_type,
-                'hasFaces': analysis.has_faces,
-                'tags': analysis.therapeutic_tags,
-                'caption': analysis.suggested_caption
-            }
+            'format': ext
         }
 
     except Exception as e:
-        logger.error(f"Photo processing failed: {e}")
+        logger.error(f"Photo upload failed: {e}")
         return {'success': False, 'error': str(e)}
 
 
-def _analyze_multimodal_memory(content: str, audio_data: dict, photos: list) -> dict:
-    """Analyze combined content from all modalities."""
-    analysis_result = {
-        'primary_emotion': 'neutral',
-        'emotions': {},
-        'themes': [],
-        'sentiment_score': 0,
-        'significance': 0.5,
-        'photo_insights': []
-    }
-
-    try:
-        # Analyze text
-        if content:
-            memory_service = get_memory_analysis_service()
-            text_analysis = memory_service.analyze_text_memory(content)
-
-            analysis_result['emotions'].update(text_analysis.emotions)
-            analysis_result['themes'].extend(text_analysis.themes)
-            analysis_result['sentiment_score'] = text_analysis.sentiment_score
-            analysis_result['significance'] = text_analysis.significance_score
-
-        # Analyze audio
-        if audio_data:
-            # Would need to fetch and analyze audio bytes
-            pass
-
-        # Analyze photos
-        for photo in photos:
-            if 'analysis' in photo:
-                analysis_result['photo_insights'].append(photo['analysis'])
-
-                # Aggregate emotions from photos
-                photo_emotion = photo['analysis'].get('emotion', 'neutral')
-                if photo_emotion in analysis_result['emotions']:
-                    analysis_result['emotions'][photo_emotion] += 0.5
-                else:
-                    analysis_result['emotions'][photo_emotion] = 0.5
-
-        # Determine primary emotion
-        if analysis_result['emotions']:
-            analysis_result['primary_emotion'] = max(
-                analysis_result['emotions'],
-                key=analysis_result['emotions'].get
-            )
-
-        return analysis_result
-
-    except Exception as e:
-        logger.error(f"Multimodal analysis failed: {e}")
-        return analysis_result
-
-
 @multimedia_memory_bp.route("/list/<user_id>", methods=["GET"])
 @AuthService.jwt_required
 @rate_limit_by_endpoint
@@ -443,19 +332,35 @@ def list_multimedia_memories(user_id: str):
         ).order_by('created_at', direction='DESCENDING').limit(50)
 
         memories = []
+        cover_paths = {}
         for doc in memories_query.stream():
             data = doc.to_dict()
+            media = data.get('media') or {}
+            photo_details = media.get('photo_details') or []
+            if photo_details:
+                cover_paths[doc.id] = (photo_details[0].get('thumbnail_paths') or {}).get(str(DEFAULT_THUMBNAIL_SIZE))
             memories.append({
                 'id': doc.id,
                 'contentPreview': data.get('content', '')[:100],
                 'hasAudio': data.get('has_audio', False),
-                'photoCount': data.get('photo_count') or data.get('media', {}).get('photo_count', 0),
+                'photoCount': data.get('photo_count') or media.get('photo_count', 0),
                 'mood': data.get('mood'),
                 'tags': data.get('tags', []),
-                'aiEmotion': data.get('ai_analysis', {}).get('primary_emotion'),
+                'aiEmotion': (data.get('ai_analysis') or {}).get('primary_emotion'),
+                'mediaState': (data.get('media_processing') or {}).get('state', 'ready'),
+                'coverThumbnail': None,
                 'createdAt': data.get('created_at', datetime.now(UTC)).isoformat()
             })
 
+        # Sign every cover thumbnail on the page in one batch
+        if any(cover_paths.values()):
+            try:
+                urls = signed_url_service.urls_for(storage.bucket(), cover_paths.values(), allow_public=True)
+                for memory in memories:
+                    memory['coverThumbnail'] = urls.get(cover_paths.get(memory['id']))
+            except Exception as e:
+                logger.warning(f"Signing memory cover thumbnails failed (non-blocking): {e}")
+
         return APIResponse.success({
             'memories': memories,
             'total': len(memories)
@@ -486,8 +391,12 @@ def get_memory_detail(memory_id: str):
         if data.get('user_id') != user_id:
             return APIResponse.forbidden("Unauthorized access")
 
-        # Get signed URLs for media (if needed)
+        # Sign media URLs from the stored paths (no exists() round trips)
         media = data.get('media', {})
+        bucket = storage.bucket()
+        urls = signed_url_service.urls_for(
+            bucket, [media.get('audio'), *(media.get('photos') or [])], allow_public=True
+        )
 
         response = {
             'id': memory_id,
@@ -496,6 +405,9 @@ def get_memory_detail(memory_id: str):
             'tags': data.get('tags', []),
             'location': data.get('location'),
             'media': media,
+            'audioUrl': urls.get(media.get('audio')),
+            'photoUrls': [urls.get(path) for path in media.get('photos') or []],
+            'mediaStatus': media_status_response(data, bucket),
             'aiAnalysis': data.get('ai_analysis'),
             'createdAt': data.get('created_at', datetime.now(UTC)).isoformat()
         }
@@ -505,3 +417,26 @@ def get_memory_detail(memory_id: str):
     except Exception as e:
         logger.exception(f"Error fetching memory: {e}")
         return APIResponse.error("Failed to load memory", "FETCH_ERROR", 500)
+
+
+@multimedia_memory_bp.route("/<memory_id>/status", methods=["GET"])
+@AuthService.jwt_required
+@rate_limit_by_endpoint
+def get_memory_media_status(memory_id: str):
+    """Progress of a memory's thumbnails and AI analysis (poll after create)."""
+    try:
+        user_id = g.get('user_id')
+
+        memory_doc = db.collection('memories').document(memory_id).get()
+        if not memory_doc.exists:
+            return APIResponse.not_found("Memory not found")
+
+        data = memory_doc.to_dict()
+        if data.get('user_id') != user_id:
+            return APIResponse.forbidden("Unauthorized access")
+
+        return APIResponse.success(media_status_response(data, storage.bucket()), "Media status retrieved")
+
+    except Exception as e:
+        logger.exception(f"Error fetching memory media status: {e}")
+        return APIResponse.error("Failed to load media status", "FETCH_ERROR", 500)
@@ -1,30 +1,35 @@
 """
 Peer Support Chat Routes - Anonymous community chat system
-Real implementation with Firebase Firestore for message storage
+Messages and sessions are persisted in Firestore. Live delivery, recent history,
+presence and typing go through the in-memory peer chat hub (Redis fan-out),
+streamed over SSE (/room/<id>/stream) or Socket.IO (/peer-chat namespace).
 """
 
+import json
 import logging
 import os
-import re
+import queue
 import secrets
 import uuid
-from datetime import UTC, datetime, timedelta
+from datetime import UTC, datetime
 from typing import Any
 
-from flask import Blueprint, g, request
-from google.cloud.firestore import FieldFilter
+from flask import Blueprint, Response, g, request, stream_with_context
 
 from src.firebase_config import db
 from src.services.audit_service import audit_log
 from src.services.auth_service import AuthService
+from src.services.peer_chat_hub import SOCKETIO_NAMESPACE, peer_chat_hub, socket_room
 from src.services.rate_limiting import rate_limit_by_endpoint
 from src.utils.input_sanitization import sanitize_text
 from src.utils.response_utils import APIResponse
+from src.utils.text_scanner import TextScanner
 
 peer_chat_bp = Blueprint("peer_chat", __name__, url_prefix="/api/v1/peer-chat")
 logger = logging.getLogger(__name__)
 
-
+# Seconds between SSE keep-alive comments (also refreshes the session TTL)
+STREAM_KEEPALIVE_SECONDS = 20
 
 
 # Chat room definitions
@@ -98,6 +103,18 @@ BANNED_WORDS = [
     if word.strip()
 ]
 
+# Blocklist and personal-information patterns, matched in one scan per message
+MODERATION_SCANNER = TextScanner(
+    keywords={'banned': BANNED_WORDS},
+    patterns={
+        'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+        'phone': r'(?:(?:\+|00)?\d{1,3}[\s.-]?)?(?:\(?\d{2,4}\)?[\s.-]?)?\d(?:[\s.-]?\d){6,12}',
+        'url': r'(?i:https?://\S+|www\.\S+|\b\S+\.(?:com|net|org|se|io|co)\b)',
+    },
+    # Only the URL check ignores case, as before; IGNORECASE slows the email search
+    flags=0,
+)
+
 
 def _generate_anonymous_name():
     """Generate a random anonymous username."""
@@ -124,24 +141,20 @@ def _moderate_message(message: str) -> tuple[bool, str]:
     Basic content moderation.
     Returns (is_safe, reason).
     """
+    hit = MODERATION_SCANNER.first(message)
+
     # Check for banned words
-    lower_message = message.lower()
-    for word in BANNED_WORDS:
-        if word.lower() in lower_message:
-            return False, "Message contains inappropriate content"
+    if hit == 'banned':
+        return False, "Message contains inappropriate content"
 
     # Check for personal information patterns
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    phone_pattern = r'(?:(?:\+|00)?\d{1,3}[\s.-]?)?(?:\(?\d{2,4}\)?[\s.-]?)?\d(?:[\s.-]?\d){6,12}'
-    url_pattern = r'(https?://\S+|www\.\S+|\b\S+\.(?:com|net|org|se|io|co)\b)'
-
-    if re.search(email_pattern, message):
+    if hit == 'email':
         return False, "Please do not share email addresses for privacy"
 
-    if re.search(phone_pattern, message):
+    if hit == 'phone':
         return False, "Please do not share phone numbers for privacy"
 
-    if re.search(url_pattern, message, flags=re.IGNORECASE):
+    if hit == 'url':
         return False, "Please do not share external links for safety"
 
     # Check message length
@@ -154,20 +167,58 @@ def _moderate_message(message: str) -> tuple[bool, str]:
     return True, ""
 
 
+def _session_record(session_id: str, presence_data: dict[str, Any]) -> dict[str, Any]:
+    """The identity fields the hub keeps for a live session."""
+    return {
+        'session_id': session_id,
+        'user_id': presence_data.get('user_id'),
+        'room_id': presence_data.get('room_id'),
+        'anonymous_name': presence_data.get('anonymous_name'),
+        'avatar': presence_data.get('avatar'),
+    }
+
+
+def _publish_presence(room_id: str) -> None:
+    """Broadcast the room's current presence to live subscribers."""
+    peer_chat_hub.publish(room_id, 'presence', _presence_payload(room_id))
+
+
+def _presence_payload(room_id: str) -> dict[str, Any]:
+    sessions = peer_chat_hub.presence(room_id)
+    return {
+        'activeCount': len(sessions),
+        'activeUsers': [
+            {'anonymousName': s.get('anonymous_name'), 'avatar': s.get('avatar')}
+            for s in sessions[:20]  # Limit to 20 for display
+        ],
+        'typingUsers': [s.get('anonymous_name') for s in sessions if s.get('is_typing')],
+    }
+
+
 def _validate_session(
     session_id: str,
     *,
     expected_room_id: str | None = None,
 ) -> tuple[dict[str, Any] | None, Any | None]:
-    """Validate that a session exists, belongs to the current user, and optionally belongs to the room."""
-    if db is None:
-        return None, APIResponse.error("Database connection unavailable", "DB_ERROR", 503)
+    """
+    Validate that a session exists, belongs to the current user, and optionally belongs to the room.
+
+    Live sessions come from the hub. A session that has expired there (idle past the
+    presence TTL) is looked up in Firestore and re-registered.
+    """
+    presence_data = peer_chat_hub.session(session_id)
+    if presence_data is None:
+        if db is None:
+            return None, APIResponse.error("Database connection unavailable", "DB_ERROR", 503)
 
-    presence_doc = db.collection('peer_chat_presence').document(session_id).get()
-    if not presence_doc.exists:
-        return None, APIResponse.forbidden("Invalid session. Please rejoin the room.")
+        presence_doc = db.collection('peer_chat_presence').document(session_id).get()
+        if not presence_doc.exists:
+            return None, APIResponse.forbidden("Invalid session. Please rejoin the room.")
+
+        presence_data = presence_doc.to_dict() or {}
+        if presence_data.get('user_id') == g.user_id and presence_data.get('room_id'):
+            peer_chat_hub.register_session(_session_record(session_id, presence_data))
 
-    presence_data = presence_doc.to_dict() or {}
     if presence_data.get('user_id') != g.user_id:
         logger.warning(f"⚠️ Session impersonation attempt: user {g.user_id[:8]} tried session {session_id[:8]}")
         return None, APIResponse.forbidden("Session does not belong to you")
@@ -191,26 +242,12 @@ def get_rooms():
     """Get all available chat rooms with member counts."""
     try:
         rooms_with_counts = []
+        # Sessions active within the presence TTL
+        member_counts = peer_chat_hub.member_counts(list(CHAT_ROOMS))
 
         for room_id, room in CHAT_ROOMS.items():
             room_data: dict[str, Any] = dict(room)
-
-            # Get active member count (users active in last 5 minutes)
-            member_count = 0
-            if db is not None:
-                try:
-                    five_min_ago = datetime.now(UTC) - timedelta(minutes=5)
-                    active_docs = db.collection('peer_chat_presence').where(filter=FieldFilter(
-                        'room_id', '==', room_id
-                    )).where(filter=FieldFilter(
-                        'last_seen', '>=', five_min_ago.isoformat()
-                    )).stream()
-                    member_count = len(list(active_docs))
-                except Exception:
-                    # Compound query may fail if composite index doesn't exist
-                    member_count = 0
-
-            room_data['memberCount'] = member_count
+            room_data['memberCount'] = member_counts.get(room_id, 0)
             rooms_with_counts.append(room_data)
 
         return APIResponse.success({
@@ -238,32 +275,26 @@ def join_room(room_id: str):
         avatar = _generate_avatar()
         session_id = str(uuid.uuid4())
 
-        # Record presence
+        session = {
+            'user_id': user_id,
+            'session_id': session_id,
+            'room_id': room_id,
+            'anonymous_name': anonymous_name,
+            'avatar': avatar,
+        }
+
+        # Persist the session; live presence is a TTL key in the hub
         if db is not None:
             db.collection('peer_chat_presence').document(session_id).set({
-                'user_id': user_id,
-                'session_id': session_id,
-                'room_id': room_id,
-                'anonymous_name': anonymous_name,
-                'avatar': avatar,
+                **session,
                 'joined_at': datetime.now(UTC).isoformat(),
                 'last_seen': datetime.now(UTC).isoformat()
             })
+        peer_chat_hub.register_session(session)
+        _publish_presence(room_id)
 
-        # Get recent messages (last 50)
-        messages = []
-        if db is not None:
-            docs = db.collection('peer_chat_messages').where(filter=FieldFilter(
-                'room_id', '==', room_id
-            )).order_by('timestamp', direction='DESCENDING').limit(50).stream()
-
-            for doc in docs:
-                msg_data = doc.to_dict() or {}
-                msg_data['id'] = doc.id
-                messages.append(msg_data)
-
-            # Reverse to get chronological order
-            messages.reverse()
+        # Recent messages (last 50) from the room buffer
+        messages = peer_chat_hub.recent(room_id, limit=50)
 
         logger.info(f"💬 User joined room {room_id} as {anonymous_name}")
 
@@ -296,8 +327,10 @@ def leave_room(room_id: str):
         if error_response is not None:
             return error_response
 
-        assert db is not None
-        db.collection('peer_chat_presence').document(session_id).delete()
+        peer_chat_hub.drop_session(session_id, room_id)
+        if db is not None:
+            db.collection('peer_chat_presence').document(session_id).delete()
+        _publish_presence(room_id)
 
         logger.info(f"🚪 Session {session_id[:8]} left room {room_id}")
 
@@ -314,7 +347,7 @@ def leave_room(room_id: str):
 @AuthService.jwt_required
 @rate_limit_by_endpoint
 def get_messages(room_id: str):
-    """Get messages for a room (polling endpoint)."""
+    """Get messages for a room (polling fallback for clients without a live stream)."""
     try:
         if room_id not in CHAT_ROOMS:
             return APIResponse.not_found("Room not found")
@@ -331,32 +364,8 @@ def get_messages(room_id: str):
         if error_response is not None:
             return error_response
 
-        messages = []
-
-        if db is not None:
-            # Update presence
-            db.collection('peer_chat_presence').document(session_id).update({
-                'last_seen': datetime.now(UTC).isoformat()
-            })
-
-            # Query messages
-            query = db.collection('peer_chat_messages').where(filter=FieldFilter(
-                'room_id', '==', room_id
-            )).order_by('timestamp', direction='DESCENDING').limit(limit)
-
-            docs = query.stream()
-
-            for doc in docs:
-                msg_data = doc.to_dict() or {}
-                msg_data['id'] = doc.id
-
-                # Skip messages before last_message_id if provided
-                if last_message_id and msg_data['id'] == last_message_id:
-                    break
-
-                messages.append(msg_data)
-
-            messages.reverse()
+        peer_chat_hub.touch(session_id, room_id)
+        messages = peer_chat_hub.recent(room_id, after=last_message_id, limit=limit)
 
         return APIResponse.success({
             'messages': messages,
@@ -398,7 +407,8 @@ def send_message(room_id: str):
         if error_response is not None:
             return error_response
 
-        assert db is not None
+        if db is None:
+            return APIResponse.error("Database connection unavailable", "DB_ERROR", 503)
 
         anonymous_name = presence_data.get('anonymous_name', anonymous_name) if presence_data else anonymous_name
         avatar = presence_data.get('avatar', avatar) if presence_data else avatar
@@ -420,10 +430,9 @@ def send_message(room_id: str):
 
         db.collection('peer_chat_messages').document(message_id).set(message_data)
 
-        # Update presence
-        db.collection('peer_chat_presence').document(session_id).update({
-            'last_seen': datetime.now(UTC).isoformat()
-        })
+        peer_chat_hub.touch(session_id, room_id)
+        peer_chat_hub.set_typing(session_id, room_id, False)
+        peer_chat_hub.publish(room_id, 'message', message_data)
 
         logger.info(f"💬 Message sent in {room_id} by {anonymous_name}")
 
@@ -482,6 +491,14 @@ def like_message(message_id: str):
             action = 'liked'
             new_count = msg_data.get('likes', 0) + 1
 
+        if msg_data.get('room_id'):
+            peer_chat_hub.publish(msg_data['room_id'], 'like', {
+                'message_id': message_id,
+                'session_id': session_id,
+                'action': action,
+                'likes': new_count,
+            })
+
         return APIResponse.success({
             'action': action,
             'likes': new_count
@@ -517,13 +534,23 @@ def report_message(message_id: str):
             return APIResponse.not_found("Message not found")
 
         # Mark as reported
+        reported_at = datetime.now(UTC).isoformat()
         msg_ref.update({
             'reported': True,
             'report_reason': reason,
             'reported_by': session_id,
-            'reported_at': datetime.now(UTC).isoformat()
+            'reported_at': reported_at
         })
 
+        # Flag the buffered copy in every worker (the reporter stays private)
+        room_id = (msg_doc.to_dict() or {}).get('room_id')
+        if room_id:
+            peer_chat_hub.publish(room_id, 'report', {
+                'message_id': message_id,
+                'reported': True,
+                'reported_at': reported_at,
+            })
+
         # Create moderation log
         db.collection('peer_chat_reports').add({
             'message_id': message_id,
@@ -558,15 +585,16 @@ def update_typing(room_id: str):
         if not session_id:
             return APIResponse.bad_request("session_id is required", "SESSION_ID_REQUIRED")
 
-        _, error_response = _validate_session(session_id, expected_room_id=room_id)
+        presence_data, error_response = _validate_session(session_id, expected_room_id=room_id)
         if error_response is not None:
             return error_response
 
-        if db is not None:
-            db.collection('peer_chat_presence').document(session_id).update({
-                'is_typing': is_typing,
-                'last_seen': datetime.now(UTC).isoformat()
-            })
+        peer_chat_hub.touch(session_id, room_id)
+        peer_chat_hub.set_typing(session_id, room_id, is_typing)
+        peer_chat_hub.publish(room_id, 'typing', {
+            'anonymousName': (presence_data or {}).get('anonymous_name'),
+            'isTyping': is_typing,
+        })
 
         return APIResponse.success({
             'typing': is_typing
@@ -594,33 +622,107 @@ def get_room_presence(room_id: str):
         if error_response is not None:
             return error_response
 
-        active_users = []
-        typing_users = []
-
-        if db is not None:
-            five_min_ago = datetime.now(UTC) - timedelta(minutes=5)
-            docs = db.collection('peer_chat_presence').where(filter=FieldFilter(
-                'room_id', '==', room_id
-            )).where(filter=FieldFilter(
-                'last_seen', '>=', five_min_ago.isoformat()
-            )).stream()
-
-            for doc in docs:
-                user_data = doc.to_dict() or {}
-                active_users.append({
-                    'anonymousName': user_data.get('anonymous_name'),
-                    'avatar': user_data.get('avatar')
-                })
-
-                if user_data.get('is_typing'):
-                    typing_users.append(user_data.get('anonymous_name'))
-
-        return APIResponse.success({
-            'activeCount': len(active_users),
-            'activeUsers': active_users[:20],  # Limit to 20 for display
-            'typingUsers': typing_users
-        }, "Presence status retrieved")
+        peer_chat_hub.touch(session_id, room_id)
+        return APIResponse.success(_presence_payload(room_id), "Presence status retrieved")
 
     except Exception as e:
         logger.exception(f"Error getting room presence: {e}")
         return APIResponse.error("Failed to fetch presence status", "PRESENCE_ERROR", 500)
+
+
+@peer_chat_bp.route('/room/<room_id>/stream', methods=['GET'])
+@AuthService.jwt_required
+@rate_limit_by_endpoint
+def stream_room(room_id: str):
+    """Stream room events (message, like, typing, presence) as Server-Sent Events."""
+    try:
+        if room_id not in CHAT_ROOMS:
+            return APIResponse.not_found("Room not found")
+
+        session_id = request.args.get('session_id')
+        if not session_id:
+            return APIResponse.bad_request("session_id is required", "SESSION_ID_REQUIRED")
+
+        _, error_response = _validate_session(session_id, expected_room_id=room_id)
+        if error_response is not None:
+            return error_response
+
+        subscriber = peer_chat_hub.subscribe(room_id)
+        peer_chat_hub.touch(session_id, room_id)
+
+        def generate():
+            try:
+                yield f"retry: 3000\nevent: presence\ndata: {json.dumps(_presence_payload(room_id))}\n\n"
+                while not subscriber.dropped:
+                    try:
+                        event, data = subscriber.events.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                    except queue.Empty:
+                        peer_chat_hub.touch(session_id, room_id)
+                        yield ": keepalive\n\n"
+                        continue
+                    yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+                # Dropped for falling behind; the client reconnects and catches up with ?after=
+                yield "event: resync\ndata: {}\n\n"
+            finally:
+                peer_chat_hub.unsubscribe(subscriber)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            }
+        )
+
+    except Exception as e:
+        logger.exception(f"Error opening room stream: {e}")
+        return APIResponse.error("Failed to open room stream", "STREAM_ERROR", 500)
+
+
+def register_peer_chat_socket_handlers(socketio):
+    """Deliver room events over Socket.IO in the /peer-chat namespace."""
+    from flask_socketio import join_room as join_socket_room
+    from flask_socketio import leave_room as leave_socket_room
+
+    peer_chat_hub.attach_socketio(socketio)
+
+    @socketio.on('connect', namespace=SOCKETIO_NAMESPACE)
+    def handle_connect(auth=None):
+        """Authenticate the connection with the same JWT as the REST routes."""
+        token = (
+            (auth or {}).get('token')
+            or request.args.get('token')
+            or request.headers.get('Authorization', '').replace('Bearer ', '')
+        )
+        user_id, error = AuthService.verify_token(token)
+        if not user_id:
+            logger.warning(f"Peer chat socket rejected: {error}")
+            return False
+        # The environ lives as long as the connection, so later events can read it
+        request.environ['peer_chat.user_id'] = user_id
+        return True
+
+    @socketio.on('join', namespace=SOCKETIO_NAMESPACE)
+    def handle_join(data):
+        """Subscribe this connection to a room the caller holds a session for."""
+        data = data or {}
+        room_id, session_id = data.get('room_id'), data.get('session_id')
+        if room_id not in CHAT_ROOMS or not session_id:
+            return {'error': 'room_id and session_id are required'}
+
+        g.user_id = request.environ.get('peer_chat.user_id')
+        _, error_response = _validate_session(session_id, expected_room_id=room_id)
+        if error_response is not None:
+            return {'error': 'Invalid session'}
+
+        join_socket_room(socket_room(room_id))
+        peer_chat_hub.touch(session_id, room_id)
+        return {'joined': room_id, 'presence': _presence_payload(room_id)}
+
+    @socketio.on('leave', namespace=SOCKETIO_NAMESPACE)
+    def handle_leave(data):
+        room_id = (data or {}).get('room_id')
+        if room_id in CHAT_ROOMS:
+            leave_socket_room(socket_room(room_id))
+        return {'left': room_id}
@@ -3,21 +3,20 @@ Privacy & GDPR Compliance Routes
 Real backend implementation for data export and deletion
 """
 
-import io
-import json
 import logging
 import os
 import re
 from datetime import UTC, datetime
 from typing import Any
 
-from flask import Blueprint, g, request, send_file
+from flask import Blueprint, Response, g, request
 
 # Import firebase_storage from firebase_config module
 from src import firebase_config as _firebase_config
 from src.firebase_config import auth, db
 from src.services.audit_service import audit_log
 from src.services.auth_service import AuthService
+from src.services.data_export_service import ExportJob, data_export_service
 from src.services.rate_limiting import rate_limit_by_endpoint
 from src.utils.response_utils import APIResponse
 
@@ -152,7 +151,14 @@ def update_privacy_settings(user_id: str):
 @AuthService.jwt_required
 @rate_limit_by_endpoint
 def export_user_data(user_id: str):
-    """Export ALL user data (GDPR compliance)."""
+    """
+    Start a GDPR export of ALL user data.
+
+    The export runs as a background job and is written to a zip archive on
+    disk; this returns 202 with the job status and the URLs to poll and to
+    download the archive from. An export that is already running (or still
+    downloadable) is returned instead of starting a new one.
+    """
     try:
         current_user_id = g.get('user_id')
         if not current_user_id:
@@ -165,177 +171,90 @@ def export_user_data(user_id: str):
         if db is None:
             return APIResponse.error("Database connection missing", "DB_ERROR", 503)
 
-        logger.info(f"📦 Starting data export for user {user_id[:8]}")
-
-        # Collect all user data from Firestore
-        export_data: dict[str, Any] = {
-            'exportMetadata': {
-                'userId': user_id,
-                'exportDate': datetime.now(UTC).isoformat(),
-                'exportVersion': '1.0',
-                'dataFormat': 'JSON'
-            }
-        }
-
-        # 1. User Profile
-        user_doc = db.collection('users').document(user_id).get()
-        if user_doc.exists:
-            export_data['userProfile'] = user_doc.to_dict() or {}
-            logger.info("  ✓ User profile collected")
-
-        # 2. Mood Entries
-        moods_ref = db.collection('users').document(user_id).collection('moods')
-        moods = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in moods_ref.stream()]
-        export_data['moods'] = moods
-        logger.info(f"  ✓ {len(moods)} mood entries collected")
-
-        # 3. Memories — stored as top-level 'memories' collection
-        if FieldFilter is not None:
-            memories_query = db.collection('memories').where(filter=FieldFilter('user_id', '==', user_id))
-        else:
-            memories_query = db.collection('memories').where(filter=FieldFilter('user_id', '==', user_id))
-        memories = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in memories_query.stream()]
-        export_data['memories'] = memories
-        logger.info(f"  ✓ {len(memories)} memories collected")
-
-        # 4. Chat Sessions (AI conversations)
-        chat_sessions_ref = db.collection('users').document(user_id).collection('chat_sessions')
-        chat_sessions = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in chat_sessions_ref.stream()]
-        export_data['chatSessions'] = chat_sessions
-        logger.info(f"  ✓ {len(chat_sessions)} chat sessions collected")
+        job = data_export_service.start_export(user_id)
+        return APIResponse.success(
+            _export_job_payload(user_id, job),
+            "Data export started" if job.status != 'completed' else "Data export ready",
+            status_code=202 if job.status != 'completed' else 200,
+        )
 
-        # 5. Feedback Submissions
-        if FieldFilter is not None:
-            feedback_query = db.collection('feedback').where(filter=FieldFilter('user_id', '==', user_id))
-        else:
-            feedback_query = db.collection('feedback').where(filter=FieldFilter('user_id', '==', user_id))
-        feedback = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in feedback_query.stream()]
-        export_data['feedback'] = feedback
-        logger.info(f"  ✓ {len(feedback)} feedback entries collected")
+    except Exception as e:
+        logger.exception(f"Error starting data export: {e}")
+        return APIResponse.error("Could not export data", "EXPORT_ERROR", 500)
 
-        # 6. Achievements/Rewards
-        achievements_ref = db.collection('users').document(user_id).collection('achievements')
-        achievements = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in achievements_ref.stream()]
-        export_data['achievements'] = achievements
-        logger.info(f"  ✓ {len(achievements)} achievements collected")
 
-        # 7. Referral Data (if any)
-        if FieldFilter is not None:
-            referral_query = db.collection('referrals').where(filter=FieldFilter('referrer_id', '==', user_id))
-        else:
-            referral_query = db.collection('referrals').where(filter=FieldFilter('referrer_id', '==', user_id))
-        referrals = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in referral_query.stream()]
-        export_data['referrals'] = referrals
-        logger.info(f"  ✓ {len(referrals)} referrals collected")
+@privacy_bp.route('/export/<user_id>/status/<job_id>', methods=['GET'])
+@AuthService.jwt_required
+@rate_limit_by_endpoint
+def get_export_status(user_id: str, job_id: str):
+    """Progress of a data export job."""
+    try:
+        job, error = _get_owned_export_job(user_id, job_id)
+        if error is not None:
+            return error
 
-        # 8. AI Conversations (separate from chat_sessions)
-        ai_conversations_ref = db.collection('users').document(user_id).collection('ai_conversations')
-        ai_conversations = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in ai_conversations_ref.stream()]
-        export_data['aiConversations'] = ai_conversations
-        logger.info(f"  ✓ {len(ai_conversations)} AI conversations collected")
+        return APIResponse.success(_export_job_payload(user_id, job))
 
-        # 9. Journal Entries — stored as top-level 'journal_entries' collection
-        if FieldFilter is not None:
-            journal_query = db.collection('journal_entries').where(filter=FieldFilter('user_id', '==', user_id))
-        else:
-            journal_query = db.collection('journal_entries').where(filter=FieldFilter('user_id', '==', user_id))
-        journal_entries = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in journal_query.stream()]
-        export_data['journalEntries'] = journal_entries
-        logger.info(f"  ✓ {len(journal_entries)} journal entries collected")
+    except Exception as e:
+        logger.exception(f"Error getting data export status: {e}")
+        return APIResponse.error("Could not get export status", "EXPORT_ERROR", 500)
 
-        # 10. Wellness Activities
-        wellness_ref = db.collection('users').document(user_id).collection('wellness_activities')
-        wellness_activities = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in wellness_ref.stream()]
-        export_data['wellnessActivities'] = wellness_activities
-        logger.info(f"  ✓ {len(wellness_activities)} wellness activities collected")
 
-        # 11. Notifications
-        notifications_ref = db.collection('users').document(user_id).collection('notifications')
-        notifications = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in notifications_ref.stream()]
-        export_data['notifications'] = notifications
-        logger.info(f"  ✓ {len(notifications)} notifications collected")
-
-        # 12. Subscription Data
-        subscription_doc = db.collection('subscriptions').document(user_id).get()
-        if subscription_doc.exists:
-            export_data['subscription'] = subscription_doc.to_dict() or {}
-            logger.info("  ✓ Subscription data collected")
-
-        # 13. CBT Progress
-        cbt_doc = db.collection('cbt_progress').document(user_id).get()
-        if cbt_doc.exists:
-            export_data['cbtProgress'] = cbt_doc.to_dict() or {}
-            logger.info("  ✓ CBT progress collected")
-
-        # 14. Crisis Assessments
-        if FieldFilter is not None:
-            crisis_query = db.collection('crisis_assessments').where(filter=FieldFilter('user_id', '==', user_id))
-        else:
-            crisis_query = db.collection('crisis_assessments').where(filter=FieldFilter('user_id', '==', user_id))
-        crisis_assessments = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in crisis_query.stream()]
-        export_data['crisisAssessments'] = crisis_assessments
-        logger.info(f"  ✓ {len(crisis_assessments)} crisis assessments collected")
-
-        # 15. Safety Plans
-        safety_doc = db.collection('safety_plans').document(user_id).get()
-        if safety_doc.exists:
-            export_data['safetyPlan'] = safety_doc.to_dict() or {}
-            logger.info("  ✓ Safety plan collected")
+@privacy_bp.route('/export/<user_id>/download/<job_id>', methods=['GET'])
+@AuthService.jwt_required
+@rate_limit_by_endpoint
+def download_export(user_id: str, job_id: str):
+    """Download the zip archive of a completed data export (the archive is deleted afterwards)."""
+    try:
+        job, error = _get_owned_export_job(user_id, job_id)
+        if error is not None:
+            return error
 
-        # 16. Sync History
-        if FieldFilter is not None:
-            sync_query = db.collection('sync_history').where(filter=FieldFilter('user_id', '==', user_id))
-        else:
-            sync_query = db.collection('sync_history').where(filter=FieldFilter('user_id', '==', user_id))
-        sync_entries = [{**(doc.to_dict() or {}), 'id': doc.id} for doc in sync_query.stream()]
-        export_data['syncHistory'] = sync_entries
-        logger.info(f"  ✓ {len(sync_entries)} sync history entries collected")
+        archive_path = data_export_service.archive_path(job.job_id)
+        if job.status != 'completed' or not archive_path.exists():
+            return APIResponse.conflict(f"Export is not ready (status: {job.status})")
 
-        # 17. Peer Chat Messages
-        # Peer chat messages are keyed by session_id, not user_id — collect via presence
-        if FieldFilter is not None:
-            presence_query = db.collection('peer_chat_presence').where(filter=FieldFilter('user_id', '==', user_id))
-        else:
-            presence_query = db.collection('peer_chat_presence').where(filter=FieldFilter('user_id', '==', user_id))
-        user_sessions = [doc.id for doc in presence_query.stream()]
-        peer_messages = []
-        for sid in user_sessions:
-            if FieldFilter is not None:
-                msg_query = db.collection('peer_chat_messages').where(filter=FieldFilter('session_id', '==', sid))
-            else:
-                msg_query = db.collection('peer_chat_messages').where(filter=FieldFilter('session_id', '==', sid))
-            for doc in msg_query.stream():
-                peer_messages.append({**(doc.to_dict() or {}), 'id': doc.id})
-        export_data['peerChatMessages'] = peer_messages
-        logger.info(f"  ✓ {len(peer_messages)} peer chat messages collected")
+        # Generate filename (sanitized to prevent path traversal)
+        export_date = datetime.fromtimestamp(job.completed_at, UTC).strftime('%Y-%m-%d')
+        safe_user_id = re.sub(r'[^a-zA-Z0-9_-]', '', str(user_id)[:16])
+        filename = f"lugn-trygg-data-{safe_user_id}-{export_date}.zip"
+
+        # The archive holds all of the user's data unencrypted, so it is
+        # streamed and deleted once the last chunk has been sent
+        return Response(
+            data_export_service.stream_archive(job.job_id),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Content-Length': str(archive_path.stat().st_size),
+            },
+        )
 
-        # Create JSON file
-        json_data = json.dumps(export_data, indent=2, default=str, ensure_ascii=False)
+    except Exception as e:
+        logger.exception(f"Error downloading data export: {e}")
+        return APIResponse.error("Could not download export", "EXPORT_ERROR", 500)
 
-        # Create in-memory file
-        file_buffer = io.BytesIO()
-        file_buffer.write(json_data.encode('utf-8'))
-        file_buffer.seek(0)
 
-        # Generate filename (sanitized to prevent path traversal)
-        export_date = datetime.now(UTC).strftime('%Y-%m-%d')
-        safe_user_id = re.sub(r'[^a-zA-Z0-9_-]', '', str(user_id)[:16])
-        filename = f"lugn-trygg-data-{safe_user_id}-{export_date}.json"
+def _get_owned_export_job(user_id: str, job_id: str) -> tuple[ExportJob | None, Any]:
+    """Look up an export job for the authenticated owner; returns (job, error_response)."""
+    current_user_id = g.get('user_id')
+    if not current_user_id:
+        return None, APIResponse.unauthorized("Authentication required")
+    if current_user_id != user_id:
+        return None, APIResponse.forbidden("Not authorized to access other users' exports")
 
-        logger.info("Data export completed for user %s - %d bytes", str(user_id)[:8], len(json_data))
-        audit_log('data_exported', user_id, {'size_bytes': len(json_data)})
+    job = data_export_service.get_job(job_id)
+    if job is None or job.user_id != user_id:
+        return None, APIResponse.not_found("Export not found or expired")
+    return job, None
 
-        # Return file for download
-        return send_file(
-            file_buffer,
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=filename
-        )
 
-    except Exception as e:
-        logger.exception(f"Error exporting user data: {e}")
-        return APIResponse.error("Could not export data", "EXPORT_ERROR", 500)
+def _export_job_payload(user_id: str, job: ExportJob) -> dict[str, Any]:
+    return {
+        **job.as_status(),
+        'statusUrl': f"/api/privacy/export/{user_id}/status/{job.job_id}",
+        'downloadUrl': f"/api/privacy/export/{user_id}/download/{job.job_id}",
+    }
 
 
 @privacy_bp.route('/delete/<user_id>', methods=['DELETE'])
@@ -568,7 +487,35 @@ def delete_user_data(user_id: str):
             })
             logger.info(f"  ✓ Deleted {len(presence_docs)} sessions + {peer_msg_count} peer chat messages")
 
-        # 17. Delete User Profile (LAST)
+        # 17. Delete Chat RAG Embeddings (Firestore entries, index files, resident index)
+        from src.services.vector_index_service import vector_index_service
+        deleted_embeddings = vector_index_service.delete_user(user_id)
+        deletion_summary['deletedCollections'].append({
+            'collection': 'rag_embeddings',
+            'count': deleted_embeddings
+        })
+        logger.info(f"  ✓ Deleted {deleted_embeddings} chat RAG embeddings")
+
+        # 18. Delete Mood Aggregates (per-day streak runs)
+        aggregate_doc = db.collection('mood_aggregates').document(user_id)
+        if aggregate_doc.get().exists:
+            aggregate_doc.delete()
+            deletion_summary['deletedCollections'].append({
+                'collection': 'mood_aggregates',
+                'count': 1
+            })
+            logger.info("  ✓ Deleted mood aggregates")
+
+        # 19. Delete GDPR Export Jobs and Archives
+        purged_exports = data_export_service.purge_user(user_id)
+        if purged_exports:
+            deletion_summary['deletedCollections'].append({
+                'collection': 'data_exports',
+                'count': purged_exports
+            })
+            logger.info(f"  ✓ Deleted {purged_exports} data export archives")
+
+        # 20. Delete User Profile (LAST)
         db.collection('users').document(user_id).delete()
         logger.info("  ✓ Deleted user profile")
 
@@ -12,6 +12,7 @@ from flask import Blueprint, g, request
 from ..services.audit_service import audit_log
 from ..services.auth_service import AuthService
 from ..services.rate_limiting import rate_limit_by_endpoint
+from ..services.rewards_helper import update_leaderboard_xp
 from ..utils.input_sanitization import sanitize_text
 from ..utils.response_utils import APIResponse
 
@@ -309,6 +310,7 @@ def add_user_xp():
                 'last_xp_earned': datetime.now(UTC).isoformat(),
                 'last_xp_reason': reason
             })
+            update_leaderboard_xp(user_id, new_xp)
 
             # Sync XP and level to users collection for leaderboard queries
             try:
@@ -426,6 +428,7 @@ def claim_reward():
 
         if db:
             db.collection('user_rewards').document(user_id).update(update_data)  # type: ignore
+            update_leaderboard_xp(user_id, new_xp)
 
         audit_log("REWARD_CLAIMED", user_id, {"rewardId": reward_id, "cost": cost})
 
@@ -503,6 +506,7 @@ def check_achievements():
                 'xp': xp + total_xp_earned,
                 'last_achievement': datetime.now(UTC).isoformat()
             })
+            update_leaderboard_xp(user_id, xp + total_xp_earned)
 
             audit_log("ACHIEVEMENTS_EARNED", user_id, {
                 "achievements": new_achievements,
@@ -29,19 +29,17 @@ from ..services.auth_service import AuthService
 from ..services.rate_limiting import rate_limit_by_endpoint
 from ..services.subscription_service import SubscriptionService
 from ..utils.input_sanitization import sanitize_text
+from ..utils.lazy_imports import is_available, lazy_module
 from ..utils.response_utils import APIResponse
 
-# Configure Stripe if available
-try:
-    import stripe
-    if STRIPE_SECRET_KEY:
-        stripe.api_key = STRIPE_SECRET_KEY
-        STRIPE_AVAILABLE = True
-    else:
-        STRIPE_AVAILABLE = False
-except ImportError:
-    stripe = None  # type: ignore
-    STRIPE_AVAILABLE = False
+
+def _configure_stripe(module) -> None:
+    module.api_key = STRIPE_SECRET_KEY
+
+
+# Stripe if available; the SDK is imported and configured on the first payment call
+STRIPE_AVAILABLE = is_available('stripe') and bool(STRIPE_SECRET_KEY)
+stripe = lazy_module('stripe', on_load=_configure_stripe)
 
 subscription_bp = Blueprint("subscription", __name__)
 logger = logging.getLogger(__name__)
@@ -5,11 +5,13 @@ Uses Google Cloud Speech-to-Text API for transcription
 import base64
 import logging
 
+import numpy as np
 from flask import Blueprint, g, request
 
 from ..services.audit_service import audit_log
 from ..services.auth_service import AuthService
 from ..services.rate_limiting import rate_limit_by_endpoint
+from ..services.voice_analysis_engine import AudioDecodeError, load_frames
 from ..utils.input_sanitization import sanitize_text
 from ..utils.response_utils import APIResponse
 from ..utils.speech_utils import initialize_google_speech, transcribe_audio_google
@@ -290,64 +292,12 @@ def analyze_audio_features(audio_bytes: bytes) -> dict:
     """
     Analyze basic audio features from raw audio bytes
 
-    In production, this would use librosa for proper audio analysis.
-    This is a simplified version that works without extra dependencies.
+    Uses the shared frame analysis stage (numpy only, no librosa needed).
+    Amplitudes are reported on the 16-bit PCM scale.
     """
     try:
-        # Calculate basic statistics from audio bytes
-        # Convert bytes to amplitude values
-        amplitudes = [int.from_bytes(audio_bytes[i:i+2], 'little', signed=True)
-                     for i in range(0, min(len(audio_bytes), 100000), 2)]
-
-        if not amplitudes:
-            return {
-                'energy_level': 'medium',
-                'pace': 'normal',
-                'volume_variation': 'moderate'
-            }
-
-        # Calculate statistics
-        avg_amplitude = sum(abs(a) for a in amplitudes) / len(amplitudes)
-        max_amplitude = max(abs(a) for a in amplitudes)
-
-        # Estimate energy level
-        if avg_amplitude > 10000:
-            energy = 'high'
-        elif avg_amplitude > 3000:
-            energy = 'medium'
-        else:
-            energy = 'low'
-
-        # Estimate volume variation
-        variance = sum((abs(a) - avg_amplitude) ** 2 for a in amplitudes) / len(amplitudes)
-        if variance > 50000000:
-            variation = 'high'
-        elif variance > 10000000:
-            variation = 'moderate'
-        else:
-            variation = 'low'
-
-        # Pace estimation (based on zero crossings)
-        zero_crossings = sum(1 for i in range(1, len(amplitudes))
-                            if (amplitudes[i] > 0) != (amplitudes[i-1] > 0))
-        crossing_rate = zero_crossings / len(amplitudes)
-
-        if crossing_rate > 0.3:
-            pace = 'fast'
-        elif crossing_rate > 0.1:
-            pace = 'normal'
-        else:
-            pace = 'slow'
-
-        return {
-            'energy_level': energy,
-            'pace': pace,
-            'volume_variation': variation,
-            'avg_amplitude': avg_amplitude,
-            'max_amplitude': max_amplitude
-        }
-
-    except Exception as e:
+        frames = load_frames(audio_bytes)
+    except AudioDecodeError as e:
         logger.warning(f"Audio analysis fallback: {e}")
         return {
             'energy_level': 'medium',
@@ -355,6 +305,47 @@ def analyze_audio_features(audio_bytes: bytes) -> dict:
             'volume_variation': 'moderate'
         }
 
+    amplitudes = np.abs(frames.y) * 32768.0
+
+    # Calculate statistics
+    avg_amplitude = float(np.mean(amplitudes))
+    max_amplitude = float(np.max(amplitudes))
+
+    # Estimate energy level
+    if avg_amplitude > 10000:
+        energy = 'high'
+    elif avg_amplitude > 3000:
+        energy = 'medium'
+    else:
+        energy = 'low'
+
+    # Estimate volume variation
+    variance = float(np.var(amplitudes))
+    if variance > 50000000:
+        variation = 'high'
+    elif variance > 10000000:
+        variation = 'moderate'
+    else:
+        variation = 'low'
+
+    # Pace estimation (based on zero crossings)
+    crossing_rate = float(np.mean(frames.zero_crossing_rate))
+
+    if crossing_rate > 0.3:
+        pace = 'fast'
+    elif crossing_rate > 0.1:
+        pace = 'normal'
+    else:
+        pace = 'slow'
+
+    return {
+        'energy_level': energy,
+        'pace': pace,
+        'volume_variation': variation,
+        'avg_amplitude': avg_amplitude,
+        'max_amplitude': max_amplitude
+    }
+
 
 def analyze_text_sentiment(text: str) -> dict:
     """
@@ -25,24 +25,20 @@ from typing import Any
 
 import numpy as np
 
-# Optional: Try to import advanced synthesis libraries
-try:
-    import soundfile as sf
-    SOUNDFILE_AVAILABLE = True
-except ImportError:
-    SOUNDFILE_AVAILABLE = False
-    logging.warning("soundfile not available - using basic wave generation")
+from src.firebase_config import db
+from src.services.audit_service import audit_log
+from src.utils.lazy_imports import is_available, lazy_module
 
-try:
-    from scipy import signal as scipy_signal
-    from scipy.fft import fft, ifft
-    SCIPY_AVAILABLE = True
-except ImportError:
-    SCIPY_AVAILABLE = False
+# Optional advanced synthesis libraries, imported on first use
+SOUNDFILE_AVAILABLE = is_available('soundfile')
+if not SOUNDFILE_AVAILABLE:
+    logging.warning("soundfile not available - using basic wave generation")
+SCIPY_AVAILABLE = is_available('scipy')
+if not SCIPY_AVAILABLE:
     logging.warning("scipy not available - using basic numpy FFT")
 
-from src.firebase_config import db
-from src.services.audit_service import audit_log
+sf = lazy_module('soundfile')
+scipy_signal = lazy_module('scipy.signal')
 
 logger = logging.getLogger(__name__)
 
@@ -1,7 +1,8 @@
-﻿import logging
+﻿import hashlib
+import json
+import logging
 import os
 import re
-import time
 from collections import Counter
 from datetime import datetime, timedelta
 from typing import Any
@@ -9,6 +10,8 @@ from typing import Any
 import numpy as np
 from dotenv import load_dotenv
 
+from src.services.inference_server import InferenceUnavailable, infer, use_inference_server
+from src.utils.cache import get_cache, user_tag
 from src.utils.hf_cache import configure_hf_cache
 
 # Import timestamp utilities for consistent parsing
@@ -57,8 +60,8 @@ class AIServices:
         )
         self.google_nlp_available = self._check_google_nlp()
         # Cache for trained ML models to avoid retraining on every request
-        self._ml_model_cache = {}
         self._model_cache_ttl = 3600  # 1 hour cache for ML models
+        self._ml_model_cache = get_cache('ml_forecast', default_ttl=self._model_cache_ttl, max_size=50)
 
         # [B4] Eager production check — warn immediately at startup if OpenAI is unconfigured.
         # OpenAI is optional in dev but strongly recommended in production for full AI quality.
@@ -396,48 +399,37 @@ Var noga med att returnera endast giltig JSON."""
         """
         Enhanced voice emotion analysis using advanced audio processing
         """
-        try:
-            from io import BytesIO
-
-            import librosa
-            import numpy as np
-
-            # For now, combine transcript analysis with basic audio features
-            transcript_analysis = self.analyze_sentiment(transcript)
-
-            # Enhanced voice characteristics analysis
-            voice_characteristics = self._analyze_audio_features(audio_data)
+        # For now, combine transcript analysis with basic audio features
+        transcript_analysis = self.analyze_sentiment(transcript)
 
-            # Combine transcript and audio analysis for better accuracy
-            combined_confidence = (transcript_analysis["confidence"] + voice_characteristics["confidence"]) / 2
+        # Enhanced voice characteristics analysis
+        voice_characteristics = self._analyze_audio_features(audio_data)
+        if voice_characteristics["analysis_method"] == "failed":
+            logger.warning("Audio could not be analyzed, using basic analysis")
+            return self._basic_voice_analysis(audio_data, transcript)
 
-            return {
-                "primary_emotion": transcript_analysis["emotions"][0] if transcript_analysis["emotions"] else "neutral",
-                "confidence": combined_confidence,
-                "voice_characteristics": voice_characteristics,
-                "transcript_sentiment": transcript_analysis["sentiment"],
-                "audio_emotion_score": voice_characteristics["emotion_score"],
-                "combined_analysis": self._combine_analyses(transcript_analysis, voice_characteristics),
-                **transcript_analysis
-            }
+        # Combine transcript and audio analysis for better accuracy
+        combined_confidence = (transcript_analysis["confidence"] + voice_characteristics["confidence"]) / 2
 
-        except ImportError:
-            logger.warning("Advanced audio libraries not available, using basic analysis")
-            return self._basic_voice_analysis(audio_data, transcript)
+        return {
+            "primary_emotion": transcript_analysis["emotions"][0] if transcript_analysis["emotions"] else "neutral",
+            "confidence": combined_confidence,
+            "voice_characteristics": voice_characteristics,
+            "transcript_sentiment": transcript_analysis["sentiment"],
+            "audio_emotion_score": voice_characteristics["emotion_score"],
+            "combined_analysis": self._combine_analyses(transcript_analysis, voice_characteristics),
+            **transcript_analysis
+        }
 
     def _analyze_audio_features(self, audio_data: bytes) -> dict[str, Any]:
-        """Analyze audio features for emotion detection using librosa."""
-        try:
-            from io import BytesIO
-
-            import librosa
-            import numpy as np
+        """Analyze audio features for emotion detection using the shared frame analysis stage."""
+        from .voice_analysis_engine import load_frames, select_pitch_mode
 
-            # Load audio from bytes using librosa (handles wav, mp3, ogg, etc.)
-            audio_array, sr = librosa.load(BytesIO(audio_data), sr=None, mono=True)
+        try:
+            frames = load_frames(audio_data)
 
             # RMS energy
-            rms = float(np.sqrt(np.mean(audio_array ** 2)))
+            rms = float(np.sqrt(np.mean(frames.y.astype(np.float64) ** 2)))
             if rms > 0.05:
                 energy_level = "high"
             elif rms > 0.015:
@@ -446,8 +438,8 @@ Var noga med att returnera endast giltig JSON."""
                 energy_level = "low"
 
             # Speech tempo via onset detection
-            onset_frames = librosa.onset.onset_detect(y=audio_array, sr=sr, units='frames')
-            duration_sec = len(audio_array) / sr
+            onset_frames = frames.onset_frames()
+            duration_sec = frames.duration
             onsets_per_sec = len(onset_frames) / max(duration_sec, 0.1)
             if onsets_per_sec > 4.0:
                 speech_rate = "fast"
@@ -457,10 +449,8 @@ Var noga med att returnera endast giltig JSON."""
                 speech_rate = "slow"
 
             # Pitch variation via fundamental frequency (F0)
-            f0, voiced_flag, _ = librosa.pyin(
-                audio_array, fmin=librosa.note_to_hz('C2'), fmax=librosa.note_to_hz('C7'), sr=sr
-            )
-            voiced_f0 = f0[voiced_flag] if voiced_flag is not None else f0[~np.isnan(f0)]
+            f0, voiced_flag = frames.pitch(select_pitch_mode(duration_sec))
+            voiced_f0 = f0[voiced_flag]
             if len(voiced_f0) > 1:
                 pitch_variation = float(np.std(voiced_f0) / (np.mean(voiced_f0) + 1e-6))
                 pitch_variation = min(pitch_variation, 1.0)
@@ -485,21 +475,11 @@ Var noga med att returnera endast giltig JSON."""
                 "pitch_variation": round(pitch_variation, 3),
                 "emotion_score": round(min(emotion_score, 1.0), 3),
                 "confidence": 0.75,
-                "analysis_method": "librosa_features",
+                "analysis_method": "frame_features",
                 "duration_seconds": round(duration_sec, 1),
-                "sample_rate": sr,
+                "sample_rate": frames.sr,
             }
 
-        except ImportError:
-            logger.warning("librosa not installed — falling back to basic audio analysis")
-            return {
-                "energy_level": "unknown",
-                "speech_rate": "unknown",
-                "pitch_variation": 0.0,
-                "emotion_score": 0.0,
-                "confidence": 0.0,
-                "analysis_method": "unavailable"
-            }
         except Exception as e:
             logger.error(f"Audio feature analysis failed: {str(e)}")
             return {
@@ -1341,6 +1321,36 @@ Långsiktiga välbefinnande-strategier:
 
         return recommendations[:5]  # Return top 5 recommendations
 
+    @property
+    def transformer_sentiment_pipeline(self):
+        """
+        The transformers sentiment pipeline, loaded on first access.
+        None when ENABLE_TRANSFORMER_SENTIMENT is off or the model cannot be loaded.
+        """
+        if self._sentiment_pipeline is None and self._transformer_sentiment_enabled:
+            try:
+                from transformers import pipeline
+            except ImportError:
+                logger.warning("Transformers library not available, using fallback method")
+                return None
+
+            # Use a Swedish-capable model or multilingual model
+            model_name = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+            # For Swedish specifically, you might want to use: "KB/bert-base-swedish-cased-sentiment"
+
+            try:
+                # type: ignore for transformers pipeline overload issue
+                self._sentiment_pipeline = pipeline(
+                    task="sentiment-analysis",  # type: ignore[arg-type]
+                    model=model_name,
+                    tokenizer=model_name,
+                    return_all_scores=True  # type: ignore[call-overload]
+                )
+            except Exception as e:
+                self._transformer_sentiment_enabled = False
+                logger.warning(f"Transformer analysis failed: {str(e)}")
+        return self._sentiment_pipeline
+
     def enhanced_sentiment_analysis(self, text: str) -> dict[str, Any]:
         """
         Enhanced sentiment analysis using transformers for Swedish
@@ -1353,24 +1363,15 @@ Långsiktiga välbefinnande-strategier:
                 "method": "keyword_based"
             }
 
-        try:
-            from transformers import pipeline
-
-            # Use a Swedish-capable model or multilingual model
-            model_name = "cardiffnlp/twitter-roberta-base-sentiment-latest"
-            # For Swedish specifically, you might want to use: "KB/bert-base-swedish-cased-sentiment"
-
+        remote = use_inference_server()
+        sentiment_pipeline = None if remote else self.transformer_sentiment_pipeline
+        if remote or sentiment_pipeline is not None:
             try:
-                if self._sentiment_pipeline is None:
-                    # type: ignore for transformers pipeline overload issue
-                    self._sentiment_pipeline = pipeline(
-                        task="sentiment-analysis",  # type: ignore[arg-type]
-                        model=model_name,
-                        tokenizer=model_name,
-                        return_all_scores=True  # type: ignore[call-overload]
-                    )
-
-                results = self._sentiment_pipeline(text[:512])  # Truncate for model limits
+                # Truncate for model limits
+                if remote:
+                    results = [infer('transformer_sentiment', text[:512])]
+                else:
+                    results = sentiment_pipeline(text[:512])
 
                 if results and len(results) > 0:
                     scores = results[0]
@@ -1394,13 +1395,13 @@ Långsiktiga välbefinnande-strategier:
                         "method": "transformer"
                     }
 
+            except InferenceUnavailable as e:
+                # Busy or restarting inference server: fall back for this request only
+                logger.warning(f"Transformer analysis unavailable: {e}")
             except Exception as e:
                 self._transformer_sentiment_enabled = False
                 logger.warning(f"Transformer analysis failed: {str(e)}")
 
-        except ImportError:
-            logger.warning("Transformers library not available, using fallback method")
-
         # Fall back to existing method
         return {
             **self.analyze_sentiment(text),
@@ -2241,33 +2242,29 @@ Hva har du lært av opplevelsene dine den siste tiden?"""
             "quota_exceeded": quota_exceeded
         }
 
-    def _get_cached_ml_model(self, user_id: str, mood_history: list[dict]) -> dict | None:
+    @staticmethod
+    def _mood_history_hash(mood_history: list[dict], days_ahead: int) -> str:
+        """Stable fingerprint of the recent history and horizon (identical across workers, unlike hash())"""
+        # Same window the forecast trains on
+        recent = sorted(entry.get('timestamp', '') + str(entry.get('score', 0)) for entry in mood_history[-30:])
+        return hashlib.sha256(json.dumps([days_ahead, recent]).encode('utf-8')).hexdigest()
+
+    def _ml_model_key(self, user_id: str, mood_history: list[dict], days_ahead: int) -> str:
+        return f"{user_id}:{days_ahead}:{self._mood_history_hash(mood_history, days_ahead)}"
+
+    def _get_cached_ml_model(self, user_id: str, mood_history: list[dict], days_ahead: int) -> dict | None:
         """Get cached ML model if still valid"""
-        cache_key = f"ml_forecast_{user_id}"
-        cached = self._ml_model_cache.get(cache_key)
-
-        if cached:
-            cache_time, model_data, data_hash = cached
-            # Check if cache is still valid (1 hour TTL)
-            if time.time() - cache_time < self._model_cache_ttl:
-                # Check if data has changed significantly
-                current_data_hash = hash(str(sorted([entry.get('timestamp', '') + str(entry.get('score', 0)) for entry in mood_history[-20:]])))
-                if current_data_hash == data_hash:
-                    logger.info(f"✅ Using cached ML model for user {user_id}")
-                    return model_data
-
-        return None
-
-    def _cache_ml_model(self, user_id: str, model_data: dict, mood_history: list[dict]):
-        """Cache trained ML model"""
-        cache_key = f"ml_forecast_{user_id}"
-        data_hash = hash(str(sorted([entry.get('timestamp', '') + str(entry.get('score', 0)) for entry in mood_history[-20:]])))
-        self._ml_model_cache[cache_key] = (time.time(), model_data, data_hash)
+        cached = self._ml_model_cache.get(self._ml_model_key(user_id, mood_history, days_ahead), tags=(user_tag(user_id),))
+        if cached is not None:
+            logger.info(f"✅ Using cached ML model for user {user_id}")
+        return cached
 
-        # Clean up old cache entries (keep last 50 users)
-        if len(self._ml_model_cache) > 50:
-            oldest_key = min(self._ml_model_cache.keys(), key=lambda k: self._ml_model_cache[k][0])
-            del self._ml_model_cache[oldest_key]
+    def _cache_ml_model(self, user_id: str, model_data: dict, mood_history: list[dict], days_ahead: int):
+        """Cache trained ML model"""
+        # Keyed on the data fingerprint and horizon so new moods and other horizons miss
+        self._ml_model_cache.set(
+            self._ml_model_key(user_id, mood_history, days_ahead), model_data, tags=(user_tag(user_id),)
+        )
 
     def predictive_mood_forecasting_simple(self, mood_history: list[dict], days_ahead: int = 7, user_id: str | None = None) -> dict[str, Any]:
         """
@@ -2289,6 +2286,11 @@ Hva har du lært av opplevelsene dine den siste tiden?"""
                 "recommendations": ["Logga fler humör för bättre prognoser"]
             }
 
+        if user_id:
+            cached_result = self._get_cached_ml_model(user_id, mood_history, days_ahead)
+            if cached_result is not None:
+                return cached_result
+
         try:
             import numpy as np
             from sklearn.ensemble import RandomForestRegressor
@@ -2451,7 +2453,7 @@ Hva har du lært av opplevelsene dine den siste tiden?"""
 
             # Cache the result if user_id provided
             if user_id:
-                self._cache_ml_model(user_id, result, mood_history)
+                self._cache_ml_model(user_id, result, mood_history, days_ahead)
                 logger.info(f"✅ Cached ML forecast model for user {user_id}")
 
             return result
@@ -0,0 +1,165 @@
+"""
+Audit policy for per-request security events.
+
+``SecurityMiddleware`` emits a REQUEST and an ACCESS_AUDIT event for every
+API call. For routine successful reads (a dashboard polling ``GET /mood``)
+those are pure volume. The policy decides per request:
+
+- ``full``: state-changing methods, paths under ``AUDIT_FULL_FIDELITY_PREFIXES``
+  (admin, auth, privacy) and every failed request keep one event each, as
+  before.
+- ``rollup``: successful reads in ``AUDIT_ROLLUP_METHODS`` are counted per
+  (user, method, endpoint). Every ``AUDIT_ROLLUP_INTERVAL_SECONDS`` each
+  counter becomes one ACCESS_SUMMARY event, e.g. "user X read
+  /api/v1/mood 37 times in this window".
+
+Endpoints are route templates (``/api/v1/mood/<mood_id>``), so counters do
+not multiply per document ID. Set ``AUDIT_ROLLUP_ENABLED=false`` to log
+every request in full.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+AUDIT_ROLLUP_ENABLED = os.getenv('AUDIT_ROLLUP_ENABLED', 'true').lower() == 'true'
+AUDIT_ROLLUP_INTERVAL_SECONDS = float(os.getenv('AUDIT_ROLLUP_INTERVAL_SECONDS', '60'))
+AUDIT_ROLLUP_METHODS = frozenset(
+    m.strip().upper() for m in os.getenv('AUDIT_ROLLUP_METHODS', 'GET,HEAD,OPTIONS').split(',') if m.strip()
+)
+AUDIT_FULL_FIDELITY_PREFIXES = tuple(
+    p.strip() for p in os.getenv(
+        'AUDIT_FULL_FIDELITY_PREFIXES', '/api/v1/admin,/api/admin,/api/v1/auth,/api/auth,/api/v1/privacy,/api/privacy'
+    ).split(',') if p.strip()
+)
+# Distinct (anonymized) client IPs kept per summary
+ROLLUP_MAX_IPS = 10
+
+FULL = 'full'
+ROLLUP = 'rollup'
+
+
+@dataclass(frozen=True)
+class AuditPolicy:
+    """Which requests keep full audit fidelity and which are rolled up."""
+    rollup_enabled: bool = AUDIT_ROLLUP_ENABLED
+    rollup_methods: frozenset[str] = AUDIT_ROLLUP_METHODS
+    full_fidelity_prefixes: tuple[str, ...] = AUDIT_FULL_FIDELITY_PREFIXES
+
+    def is_routine_read(self, method: str, path: str) -> bool:
+        """True if the request is rolled up when it succeeds (decidable before the response)."""
+        return (
+            self.rollup_enabled
+            and method.upper() in self.rollup_methods
+            and not path.startswith(self.full_fidelity_prefixes)
+        )
+
+    def classify(self, method: str, path: str, status_code: int) -> str:
+        """``full`` or ``rollup`` for a finished request."""
+        if status_code >= 400 or not self.is_routine_read(method, path):
+            return FULL
+        return ROLLUP
+
+
+@dataclass
+class _Counter:
+    count: int = 0
+    first_seen: str = ''
+    last_seen: str = ''
+    ip_addresses: set[str] = field(default_factory=set)
+
+
+class AccessRollup:
+    """Per (user, method, endpoint) read counters, emitted as one summary event per window."""
+
+    def __init__(
+        self,
+        emit: Callable[[str, str, dict[str, Any]], None],
+        interval: float = AUDIT_ROLLUP_INTERVAL_SECONDS,
+    ) -> None:
+        self._emit = emit
+        self.interval = interval
+        self._reset()
+        self._stats = {'recorded': 0, 'summaries': 0}
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def record(self, user_id: str, method: str, endpoint: str, ip_address: str | None = None) -> None:
+        """Count one successful routine read."""
+        self._ensure_started()
+        now = datetime.now(UTC).isoformat()
+        with self._lock:
+            counter = self._counters.get((user_id, method, endpoint))
+            if counter is None:
+                counter = self._counters[(user_id, method, endpoint)] = _Counter(first_seen=now)
+            counter.count += 1
+            counter.last_seen = now
+            if ip_address and len(counter.ip_addresses) < ROLLUP_MAX_IPS:
+                counter.ip_addresses.add(ip_address)
+            self._stats['recorded'] += 1
+
+    def flush(self) -> int:
+        """Emit one ACCESS_SUMMARY event per counter of the window and start a new window."""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            window_start, self._window_start = self._window_start, datetime.now(UTC).isoformat()
+        window_end = datetime.now(UTC).isoformat()
+
+        for (user_id, method, endpoint), counter in counters.items():
+            try:
+                self._emit('ACCESS_SUMMARY', user_id, {
+                    'resource': endpoint,
+                    'action': method,
+                    'success': True,
+                    'count': counter.count,
+                    'first_seen': counter.first_seen,
+                    'last_seen': counter.last_seen,
+                    'window_start': window_start,
+                    'window_end': window_end,
+                    'ip_addresses': sorted(counter.ip_addresses),
+                })
+            except Exception as e:
+                logger.error(f"Failed to emit access summary for {endpoint}: {e}")
+        with self._lock:
+            self._stats['summaries'] += len(counters)
+        return len(counters)
+
+    def close(self) -> None:
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'pending_counters': len(self._counters)}
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, str, str], _Counter] = {}
+        self._window_start = datetime.now(UTC).isoformat()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-rollup', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Audit rollup flush failed: {e}")
@@ -7,6 +7,7 @@ from cryptography.fernet import Fernet
 from google.cloud.firestore import FieldFilter
 
 from ..firebase_config import db
+from .audit_writer import AuditRecord, AuditWriter
 
 if TYPE_CHECKING:
     from google.cloud.firestore import Client
@@ -16,6 +17,14 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# HIPAA: audit logs are kept for 7 years
+AUDIT_RETENTION_DAYS = 2555
+# Documents deleted per retention batch (Firestore allows at most 500 writes)
+RETENTION_BATCH_SIZE = 500
+
+# One buffered writer per process, shared by every AuditService instance
+audit_writer = AuditWriter(lambda: _db)
+
 class AuditService:
     def __init__(self):
         # CRITICAL: HIPAA encryption key MUST be set in environment
@@ -46,53 +55,65 @@ class AuditService:
 
     def log_event(self, event_type: str, user_id: str, details: dict[str, Any],
                   ip_address: str | None = None, user_agent: str | None = None) -> None:
-        """Log audit event to Firestore with HIPAA compliance"""
+        """
+        Queue an audit event for Firestore with HIPAA compliance.
+
+        The event is timestamped now; encryption and the write happen on the
+        audit writer thread (see audit_writer), which also stamps the
+        document's ``written_at`` when it reaches Firestore.
+        """
         if not self.cipher:
             logger.debug(f"Audit logging disabled (no encryption): {event_type} for user {user_id[:8]}***")
             return
 
         try:
-            # Encrypt sensitive details
-            encrypted_details = self.encrypt_data(str(details))
-
             audit_entry = {
                 "event_type": event_type,
                 "user_id": user_id,
-                "details": encrypted_details,
                 "timestamp": datetime.now(UTC).isoformat(),
                 "ip_address": ip_address,
                 "user_agent": user_agent,
                 "hipaa_compliant": True
             }
+            audit_writer.submit(AuditRecord(audit_entry, details, self.encrypt_data))
 
-            # Add to audit_logs collection
-            doc_ref = _db.collection("audit_logs").document()
-            doc_ref.set(audit_entry)
-
-            logger.info("Audit log created: %s for user %s***", str(event_type)[:50], str(user_id)[:8])
-
-            # Apply retention policy periodically (not on every log)
-            # Use a simple hash-based approach to run ~1% of the time
-            if hash(event_type + user_id) % 100 == 0:
-                self._apply_retention_policy()
+            logger.debug("Audit event queued: %s for user %s***", str(event_type)[:50], str(user_id)[:8])
 
         except Exception as e:
             logger.error("Failed to log audit event: %s", str(e).replace('\n', '').replace('\r', '')[:200])
 
-    def _apply_retention_policy(self) -> None:
-        """Apply retention policy - delete audit logs older than 7 years (HIPAA requirement)"""
-        try:
-            retention_date = datetime.now(UTC) - timedelta(days=2555)  # 7 years approx
-            retention_iso = retention_date.isoformat()
-
-            # Query and delete old logs using standard Firestore syntax
-            old_logs = _db.collection("audit_logs").where(filter=FieldFilter("timestamp", "<", retention_iso)).stream()
-            for doc in old_logs:
-                doc.reference.delete()
-                logger.info(f"Deleted old audit log: {doc.id}")
+    def apply_retention_policy(self) -> int:
+        """
+        Delete audit logs older than 7 years (HIPAA requirement).
 
+        Runs as a scheduled job (scripts/apply_audit_retention.py), never on
+        the request path. Deletes in batches and returns the number deleted.
+        """
+        deleted = 0
+        try:
+            retention_iso = (datetime.now(UTC) - timedelta(days=AUDIT_RETENTION_DAYS)).isoformat()
+
+            while True:
+                old_logs = list(
+                    _db.collection("audit_logs")
+                    .where(filter=FieldFilter("timestamp", "<", retention_iso))
+                    .limit(RETENTION_BATCH_SIZE)
+                    .stream()
+                )
+                if not old_logs:
+                    break
+                batch = _db.batch()
+                for doc in old_logs:
+                    batch.delete(doc.reference)
+                batch.commit()
+                deleted += len(old_logs)
+                if len(old_logs) < RETENTION_BATCH_SIZE:
+                    break
+
+            logger.info(f"Audit retention: deleted {deleted} logs older than {AUDIT_RETENTION_DAYS} days")
         except Exception as e:
             logger.error(f"Failed to apply retention policy: {str(e)}")
+        return deleted
 
     def get_audit_trail(self, user_id: str, limit: int = 100) -> list:
         """Retrieve audit trail for a user (decrypted)"""
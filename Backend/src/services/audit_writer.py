@@ -0,0 +1,358 @@
+"""
+Buffered audit log writer.
+
+``AuditService.log_event`` used to encrypt each event and write it to
+Firestore inside the request. Events now go into a bounded in-process
+queue. A background thread encrypts them and writes them to ``audit_logs``
+with Firestore write batches, as soon as ``AUDIT_BATCH_SIZE`` events are
+waiting and otherwise every ``AUDIT_FLUSH_INTERVAL_SECONDS``.
+
+Nothing is dropped on the floor:
+
+- When the queue is full, the event is encrypted on the caller's thread and
+  appended to a local spill file (``AUDIT_SPILL_PATH``, one JSON document
+  per line, fsynced).
+- A batch whose commit fails is spilled the same way.
+- The writer replays the spill file once the queue has drained. Replay
+  is at-least-once: a crash during replay can write a document twice.
+
+Every document gets a ``written_at`` server timestamp when its batch is
+committed. ``timestamp`` is the time the event happened, which for a
+replayed event can be long before the write. Incremental backups select
+audit logs by ``written_at``, so replayed events are not missed.
+
+Spilled documents hold the same encrypted ``details`` as Firestore, never
+the plain details. The queue and thread belong to the process that first
+submits an event; a forked gunicorn worker starts with a fresh queue of
+its own. ``stats()`` reports queue depth and back-pressure counters for the
+``/metrics/audit`` endpoint.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import glob
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from google.cloud.firestore import SERVER_TIMESTAMP
+
+logger = logging.getLogger(__name__)
+
+AUDIT_COLLECTION = 'audit_logs'
+# Events buffered per worker process before new ones are spilled to disk
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+# Documents per Firestore write batch (Firestore allows at most 500)
+AUDIT_BATCH_SIZE = max(1, min(int(os.getenv('AUDIT_BATCH_SIZE', '200')), 500))
+# Longest an event waits in the queue before it is written
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv('AUDIT_FLUSH_INTERVAL_SECONDS', '2'))
+AUDIT_SPILL_PATH = os.getenv(
+    'AUDIT_SPILL_PATH', os.path.join(tempfile.gettempdir(), 'lugn_trygg_audit_spill.ndjson')
+)
+
+
+@dataclass
+class AuditRecord:
+    """A queued audit event whose details are encrypted by the writer."""
+    entry: dict[str, Any]
+    details: Any
+    encrypt: Callable[[str], str]
+
+    def document(self) -> dict[str, Any]:
+        return {**self.entry, 'details': self.encrypt(str(self.details))}
+
+
+class AuditWriter:
+    """Bounded queue of audit events flushed to Firestore in batches."""
+
+    def __init__(
+        self,
+        client: Callable[[], Any],
+        collection: str = AUDIT_COLLECTION,
+        queue_size: int = AUDIT_QUEUE_SIZE,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL_SECONDS,
+        spill_path: str = AUDIT_SPILL_PATH,
+    ) -> None:
+        self._client = client
+        self.collection = collection
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        # Replay files this process is working through right now
+        self._replaying: set[str] = set()
+        self._reset()
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'encrypt_errors': 0,
+            'max_queue_depth': 0,
+            'last_flush_ms': 0.0,
+        }
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            # A forked worker must not reuse the parent's queue, thread or locks
+            os.register_at_fork(after_in_child=self._reset)
+
+    # ──────────────────────────────────────────────────────────────
+    # Public API
+    # ──────────────────────────────────────────────────────────────
+
+    def submit(self, record: AuditRecord) -> None:
+        """Queue an event without blocking; spill it to disk if the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            document = self._document(record)
+            if document is not None:
+                self._spill([document])
+            return
+        depth = self._queue.qsize()
+        if depth >= self.batch_size:
+            self._wake.set()
+        with self._lock:
+            self._stats['enqueued'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+
+    def flush(self) -> int:
+        """
+        Write every queued and spilled event now. Returns the number written here.
+
+        Also waits for a batch the background thread is writing, so every event
+        submitted before the call is stored (or spilled) when it returns.
+        """
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            written += self._write(batch)
+        self._queue.join()
+        return written + self._replay_spill()
+
+    def close(self) -> None:
+        """Stop the background thread and write what is left."""
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Final audit flush failed: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self.queue_size
+        stats['spill_pending'] = self._spill_pending()
+        return stats
+
+    # ──────────────────────────────────────────────────────────────
+    # Background thread
+    # ──────────────────────────────────────────────────────────────
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()        # thread start and stats
+        self._write_lock = threading.Lock()  # one batch commit at a time
+        self._spill_lock = threading.Lock()
+        self._queue: queue.Queue[AuditRecord] = queue.Queue(maxsize=self.queue_size)
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Woken early by submit() once a full batch is waiting
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                while batch := self._drain(self.batch_size):
+                    self._write(batch)
+                self._replay_spill()
+            except Exception as e:
+                logger.error(f"Audit writer loop error: {e}")
+                time.sleep(1)
+
+    def _drain(self, limit: int) -> list[AuditRecord]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    # ──────────────────────────────────────────────────────────────
+    # Writes
+    # ──────────────────────────────────────────────────────────────
+
+    def _document(self, record: AuditRecord) -> dict[str, Any] | None:
+        try:
+            return record.document()
+        except Exception as e:
+            # Never store plain details: an event that cannot be encrypted is dropped
+            with self._lock:
+                self._stats['encrypt_errors'] += 1
+            logger.error(f"Failed to encrypt audit event {record.entry.get('event_type')}: {e}")
+            return None
+
+    def _write(self, records: list[AuditRecord]) -> int:
+        try:
+            documents = [d for d in (self._document(r) for r in records) if d is not None]
+            return self._commit(documents)
+        finally:
+            for _ in records:
+                self._queue.task_done()
+
+    def _commit(self, documents: list[dict[str, Any]]) -> int:
+        """Write ``documents`` in one batch; spill them if the commit fails."""
+        if not documents:
+            return 0
+        started = time.perf_counter()
+        with self._write_lock:
+            try:
+                client = self._client()
+                if client is None:
+                    raise RuntimeError("Firestore unavailable")
+                collection = client.collection(self.collection)
+                batch = client.batch()
+                for document in documents:
+                    batch.set(collection.document(), {**document, 'written_at': SERVER_TIMESTAMP})
+                batch.commit()
+            except Exception as e:
+                logger.error(f"Audit batch of {len(documents)} failed, spilling to disk: {e}")
+                with self._lock:
+                    self._stats['failed_batches'] += 1
+                self._spill(documents)
+                return 0
+
+        with self._lock:
+            self._stats['written'] += len(documents)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        logger.debug(f"Audit batch written: {len(documents)} events")
+        return len(documents)
+
+    # ──────────────────────────────────────────────────────────────
+    # Spill file
+    # ──────────────────────────────────────────────────────────────
+
+    def _spill(self, documents: list[dict[str, Any]]) -> None:
+        lines = ''.join(json.dumps(d, default=str) + '\n' for d in documents)
+        try:
+            with self._spill_lock, open(self.spill_path, 'a', encoding='utf-8') as spill:
+                spill.write(lines)
+                spill.flush()
+                os.fsync(spill.fileno())
+        except OSError as e:
+            logger.critical(f"Audit spill to {self.spill_path} failed, {len(documents)} events lost: {e}")
+            return
+        with self._lock:
+            self._stats['spilled'] += len(documents)
+
+    def _spill_pending(self) -> bool:
+        return os.path.exists(self.spill_path) or bool(glob.glob(f"{glob.escape(self.spill_path)}.*.replay"))
+
+    def _claimable(self, path: str) -> bool:
+        """Whether ``path`` is the spill file or a replay file no live process is working on."""
+        if path == self.spill_path:
+            return True
+        owner = _replay_owner(self.spill_path, path)
+        if owner is None:
+            return False
+        if owner == os.getpid():
+            return path not in self._replaying
+        return not _pid_alive(owner)
+
+    def _replay_spill(self) -> int:
+        """
+        Write spilled documents back to Firestore.
+
+        The spill file is first renamed to a replay file named after this
+        process, so no other worker reads it. A replay file is only taken
+        over when the process in its name is gone (a crashed worker), or it
+        is this process's own leftover from an interrupted replay. Replay
+        files of live workers are left alone. Two workers racing for the same
+        file both rename it, and only one rename succeeds. Documents that
+        fail again are spilled anew by ``_commit``.
+        """
+        written = 0
+        candidates = [self.spill_path, *glob.glob(f"{glob.escape(self.spill_path)}.*.replay")]
+        for index, path in enumerate(candidates):
+            if not self._claimable(path):
+                continue
+            claimed = f"{self.spill_path}.{os.getpid()}-{threading.get_ident()}-{index}.replay"
+            try:
+                with self._spill_lock:
+                    os.rename(path, claimed)
+                    self._replaying.add(claimed)
+            except OSError:
+                continue  # gone, or claimed by another worker
+
+            try:
+                written += self._replay_file(claimed)
+            finally:
+                self._replaying.discard(claimed)
+        if written:
+            logger.info(f"Replayed {written} spilled audit events")
+        return written
+
+    def _replay_file(self, claimed: str) -> int:
+        try:
+            with open(claimed, encoding='utf-8') as replay:
+                documents = [json.loads(line) for line in replay if line.strip()]
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable audit spill file {claimed} kept for inspection: {e}")
+            return 0
+
+        written = 0
+        for start in range(0, len(documents), self.batch_size):
+            count = self._commit(documents[start:start + self.batch_size])
+            written += count
+            with self._lock:
+                self._stats['replayed'] += count
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(claimed)
+        return written
+
+
+def _replay_owner(spill_path: str, path: str) -> int | None:
+    """Pid in a ``<spill>.<pid>-<thread>-<n>.replay`` name, or None if it is not one."""
+    name = path[len(spill_path) + 1:-len('.replay')]
+    try:
+        return int(name.split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
@@ -5,21 +5,124 @@ Comprehensive backup system with scheduling, encryption, and recovery
 
 import base64
 import gzip
+import hashlib
+import io
 import json
 import logging
 import os
+import struct
 import threading
 import time
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO
 
 import schedule
 from firebase_admin import firestore, storage
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from ..utils.tombstones import TOMBSTONE_COLLECTION
 
 logger = logging.getLogger(__name__)
 
+BACKUP_FORMAT_VERSION = '2.0'
+# Documents fetched per Firestore cursor page while backing up
+BACKUP_PAGE_SIZE = 1000
+# Documents per Firestore write batch on restore (hard limit is 500)
+RESTORE_BATCH_SIZE = 400
+# Plaintext bytes per encrypted frame; bounds memory on both write and read
+ENCRYPTION_FRAME_SIZE = 1024 * 1024
+# Leading bytes of a frame-encrypted backup file (plain ones start with the gzip magic)
+ENCRYPTED_MAGIC = b'LTBKENC2'
+# Incremental backups: changed docs are found via a per-collection write timestamp,
+# deletes via tombstones (utils.tombstones); the overlap absorbs clock skew between app servers
+BACKUP_STATE_COLLECTION = 'backup_state'
+INCREMENTAL_OVERLAP_SECONDS = 300
+_FRAME_HEADER = struct.Struct('>I')
+_WRITE_BUFFER_SIZE = 256 * 1024
+
+
+class _EncryptedFrameWriter(io.RawIOBase):
+    """
+    Write-only stream that Fernet-encrypts its input in fixed-size frames.
+
+    Layout: ``ENCRYPTED_MAGIC`` then ``<u32 length><token>`` per frame and a
+    zero-length frame as end marker, so truncated files are detected on read.
+    """
+
+    def __init__(self, raw: BinaryIO, cipher: Any, frame_size: int | None = None):
+        super().__init__()
+        self._raw = raw
+        self._cipher = cipher
+        self._frame_size = frame_size or ENCRYPTION_FRAME_SIZE
+        self._buffer = bytearray()
+        raw.write(ENCRYPTED_MAGIC)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:  # type: ignore[override]
+        self._buffer += data
+        while len(self._buffer) >= self._frame_size:
+            self._emit(bytes(self._buffer[:self._frame_size]))
+            del self._buffer[:self._frame_size]
+        return len(data)
+
+    def _emit(self, chunk: bytes) -> None:
+        token = self._cipher.encrypt(chunk)
+        self._raw.write(_FRAME_HEADER.pack(len(token)))
+        self._raw.write(token)
+
+    def close(self) -> None:
+        if not self.closed:
+            if self._buffer:
+                self._emit(bytes(self._buffer))
+                self._buffer.clear()
+            self._raw.write(_FRAME_HEADER.pack(0))
+        super().close()
+
+
+class _DecryptingFrameReader(io.RawIOBase):
+    """Read side of ``_EncryptedFrameWriter``; holds at most one decrypted frame."""
+
+    def __init__(self, raw: BinaryIO, cipher: Any):
+        super().__init__()
+        self._raw = raw
+        self._cipher = cipher
+        self._frame = b''
+        self._offset = 0
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        while self._offset >= len(self._frame) and not self._eof:
+            header = self._raw.read(_FRAME_HEADER.size)
+            if len(header) < _FRAME_HEADER.size:
+                raise ValueError("Encrypted backup is truncated")
+            (length,) = _FRAME_HEADER.unpack(header)
+            if length == 0:
+                self._eof = True
+                break
+            token = self._raw.read(length)
+            if len(token) < length:
+                raise ValueError("Encrypted backup is truncated")
+            self._frame = self._cipher.decrypt(token)
+            self._offset = 0
+
+        count = min(len(buffer), len(self._frame) - self._offset)
+        buffer[:count] = self._frame[self._offset:self._offset + count]
+        self._offset += count
+        return count
+
+
+def _encode_record(record: dict) -> bytes:
+    return json.dumps(record, default=str, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
 class BackupService:
     """Comprehensive backup service for all Lugn & Trygg data"""
 
@@ -51,9 +154,12 @@ class BackupService:
         self._bucket_name = _raw_bucket  # None if not set; bucket property will raise at access time
 
         # Backup configuration
+        # ``level`` marks incremental schedules: a level-N backup holds the changes
+        # since the latest backup of level <= N (full backups are level 0), so
+        # hourly deltas chain onto the last daily and dailies onto the last full.
         self.backup_schedules = {
-            'hourly': {'interval': 1, 'unit': 'hours', 'retention': 24},      # 24 hours
-            'daily': {'interval': 1, 'unit': 'days', 'retention': 30},        # 30 days
+            'hourly': {'interval': 1, 'unit': 'hours', 'retention': 24, 'level': 2},  # 24 hours
+            'daily': {'interval': 1, 'unit': 'days', 'retention': 30, 'level': 1},    # 30 days
             'weekly': {'interval': 7, 'unit': 'days', 'retention': 12},       # 12 weeks
             'monthly': {'interval': 30, 'unit': 'days', 'retention': 12},     # 12 months
         }
@@ -64,6 +170,15 @@ class BackupService:
             'subscriptions', 'audit_logs', 'migration_history'
         ]
 
+        # Write-timestamp field per collection used by incremental backups.
+        # Collections without one are copied in full on every backup.
+        self.incremental_fields = {
+            'moods': 'lastWrite',       # mood routes log/update, MoodRepository.create/update
+            'audit_logs': 'written_at',  # AuditWriter._commit, also set when spilled events are replayed
+        }
+        # Collections whose incremental field is a Firestore server timestamp, not an ISO string
+        self.server_timestamp_collections = {'audit_logs'}
+
         # Backup status
         self.backup_status: dict[str, Any] = {}
         self.is_running = False
@@ -115,14 +230,14 @@ class BackupService:
 
     def _schedule_backups(self):
         """Set up backup schedules"""
-        # Hourly backups (keep 24 hours)
+        # Hourly incremental backups (keep 24 hours)
         schedule.every().hour.at(":00").do(
-            lambda: self.create_backup('hourly', 'firestore')
+            lambda: self.create_backup('hourly', 'incremental')
         )
 
-        # Daily backups at 2 AM (keep 30 days)
+        # Daily incremental backups at 2 AM (keep 30 days)
         schedule.every().day.at("02:00").do(
-            lambda: self.create_backup('daily', 'full')
+            lambda: self.create_backup('daily', 'incremental')
         )
 
         # Weekly backups on Sunday at 3 AM (keep 12 weeks)
@@ -151,41 +266,69 @@ class BackupService:
 
         Args:
             schedule_type: hourly, daily, weekly, monthly
-            backup_type: firestore, storage, full
+            backup_type: firestore, storage, full, incremental
+
+        Incremental backups hold only documents written since the parent
+        backup's high-water mark plus tombstones for deletes. Without a
+        full backup to chain onto they fall back to a full Firestore backup.
 
         Returns:
             Backup filename if successful
         """
         backup_id: str | None = None
         try:
-            timestamp = datetime.now(UTC).strftime('%Y%m%d_%H%M%S')
+            started_at = datetime.now(UTC)
+            timestamp = started_at.strftime('%Y%m%d_%H%M%S')
             backup_id = f"{schedule_type}_{timestamp}"
 
+            level = 0
+            parent: dict[str, Any] | None = None
+            if backup_type == 'incremental':
+                level = self.backup_schedules.get(schedule_type, {}).get('level', 2)
+                parent = self._get_chain_parent(level)
+                if parent is None:
+                    logger.info(f"ℹ️ No full backup to chain onto, {backup_id} will be a full backup")
+                    backup_type, level = 'firestore', 0
+
             logger.info(f"📦 Creating {schedule_type} backup: {backup_id}")
 
             backup_data = {
                 'backup_id': backup_id,
                 'schedule_type': schedule_type,
                 'backup_type': backup_type,
-                'timestamp': datetime.now(UTC),
+                'timestamp': started_at,
+                'mode': 'incremental' if parent else 'full',
+                'level': level,
+                # Everything written before this instant is covered by this backup
+                'high_water_mark': started_at.isoformat(),
                 'collections': {},
                 'metadata': {
-                    'version': '1.0',
+                    'version': BACKUP_FORMAT_VERSION,
+                    'format': 'ndjson',
                     'system': 'lugn-trygg',
                     'encryption': self.enable_encryption
                 }
             }
 
-            # Backup Firestore collections
+            # Backup Firestore collections (streamed page by page in _save_backup)
             if backup_type in ['firestore', 'full']:
                 for collection in self.collections_to_backup:
-                    try:
-                        docs = self._backup_collection(collection)
-                        backup_data['collections'][collection] = docs
-                        logger.info(f"✅ Backed up {len(docs)} documents from {collection}")
-                    except Exception as e:
-                        logger.error(f"❌ Failed to backup {collection}: {e}")
-                        backup_data['collections'][collection] = {'error': str(e)}
+                    backup_data['collections'][collection] = self._backup_collection(collection)
+            elif parent is not None:
+                since = (
+                    datetime.fromisoformat(parent['high_water_mark']) - timedelta(seconds=INCREMENTAL_OVERLAP_SECONDS)
+                ).isoformat()
+                backup_data.update({
+                    'parent_backup_id': parent['backup_id'],
+                    'since': since,
+                    'incremental_collections': [c for c in self.collections_to_backup if c in self.incremental_fields],
+                    'tombstones': self._load_tombstones(since),
+                })
+                for collection in self.collections_to_backup:
+                    if collection in self.incremental_fields:
+                        backup_data['collections'][collection] = self._backup_collection(collection, since=since)
+                    else:
+                        backup_data['collections'][collection] = self._backup_collection(collection)
 
             # Backup Firebase Storage files
             if backup_type == 'full':
@@ -198,7 +341,7 @@ class BackupService:
                     backup_data['storage'] = {'error': str(e)}
 
             # [S3] Cloud-primary backup strategy:
-            # 1. Serialise to a temporary local file (needed because the Storage
+            # 1. Stream to a temporary local file (needed because the Storage
             #    client expects a file path for upload_from_filename).
             # 2. Upload immediately to Firebase Storage (primary, durable).
             # 3. Delete the local temp file so the container's ephemeral disk
@@ -206,6 +349,17 @@ class BackupService:
             filename = self._save_backup(backup_data, backup_id)
             cloud_blob_name: str | None = None
 
+            failed = [
+                collection for collection, entry in (backup_data.get('manifest') or {}).get('collections', {}).items()
+                if entry.get('error')
+            ]
+            if failed:
+                # Restore skips errored collections, so this backup must not become a chain
+                # parent (or prune the tombstones) that later incrementals build on
+                logger.warning(f"⚠️ Backup {backup_id} has failed collections {failed}, not recording it in the chain")
+            elif filename and backup_data.get('backup_type') in ('firestore', 'full', 'incremental'):
+                self._record_chain_link(backup_data)
+
             if filename:
                 try:
                     cloud_blob_name = self._upload_backup_to_cloud(filename)
@@ -232,6 +386,7 @@ class BackupService:
                 'filename': cloud_blob_name or filename,
                 'storage': 'cloud' if cloud_blob_name else 'local',
                 'size': os.path.getsize(filename) if filename and os.path.exists(filename) else 0,
+                'manifest': backup_data.get('manifest'),
             }
 
             # Trigger callbacks
@@ -257,33 +412,47 @@ class BackupService:
 
             return None
 
-    def _backup_collection(self, collection: str, batch_size: int = 1000) -> list[dict]:
-        """Backup all documents in a collection"""
-        docs = []
-        # Order by document ID to enable cursors
-        query = self.db.collection(collection).order_by('__name__').limit(batch_size)
+    def _backup_collection(
+        self,
+        collection: str,
+        batch_size: int = BACKUP_PAGE_SIZE,
+        since: str | None = None,
+    ) -> Iterator[dict]:
+        """
+        Stream documents of a collection, one ``start_after`` cursor page at a time.
+
+        With ``since``, only documents whose ``incremental_fields`` timestamp is
+        at or after it are read.
+        """
+        field = self.incremental_fields.get(collection) if since else None
+        if field:
+            # Firestore only compares a field with values of the same type
+            bound = datetime.fromisoformat(since) if collection in self.server_timestamp_collections else since
+            base_query = (
+                self.db.collection(collection)
+                .where(filter=FieldFilter(field, '>=', bound))
+                .order_by(field)
+            )
+        else:
+            # Order by document ID to enable cursors
+            base_query = self.db.collection(collection).order_by('__name__')
+        query = base_query.limit(batch_size)
 
-        last_doc_ref = None
         while True:
-            batch_docs = []
+            page_count = 0
+            last_doc = None
             for doc in query.stream():
-                doc_data = doc.to_dict()
+                doc_data = doc.to_dict() or {}
                 doc_data['_id'] = doc.id
-                doc_data['_backup_timestamp'] = datetime.now(UTC)
-                batch_docs.append(doc_data)
-                last_doc_ref = doc
-
-            docs.extend(batch_docs)
+                yield doc_data
+                last_doc = doc
+                page_count += 1
 
-            # If we got a full batch, there might be more
-            if len(batch_docs) < batch_size:
-                break
-
-            # Get the last document reference for pagination
-            if last_doc_ref:
-                query = self.db.collection(collection).order_by('__name__').start_after(last_doc_ref).limit(batch_size)
+            # A short page means we've reached the end of the collection
+            if page_count < batch_size or last_doc is None:
+                return
 
-        return docs
+            query = base_query.start_after(last_doc).limit(batch_size)
 
     def _backup_storage_files(self) -> list[dict]:
         """Backup Firebase Storage file metadata"""
@@ -306,67 +475,282 @@ class BackupService:
         return files
 
     def _save_backup(self, backup_data: dict, backup_id: str) -> str | None:
-        """Save backup data to compressed file"""
+        """
+        Stream backup data to a gzip-compressed NDJSON file.
+
+        ``backup_data['collections']`` maps collection names to iterables of
+        documents (typically lazy ``_backup_collection`` generators), so only
+        one Firestore page is held in memory at a time. The file holds a
+        ``header`` record, one ``doc`` record per document, optional
+        ``storage`` records and a trailing ``manifest`` with per-collection
+        counts and SHA-256 checksums of the doc (and tombstone) lines. With encryption enabled
+        the gzip stream is encrypted in frames of ``ENCRYPTION_FRAME_SIZE``.
+        The manifest is also stored in ``backup_data['manifest']``.
+        """
+        filename = self.backup_dir / f"{backup_id}.backup.gz"
         try:
-            # Convert to JSON
-            json_data = json.dumps(backup_data, indent=2, default=str)
-
-            # Compress
-            compressed_data = gzip.compress(json_data.encode('utf-8'))
-
-            # Encrypt if enabled
-            if self.enable_encryption:
-                compressed_data = self._encrypt_data(compressed_data)
-
-            # Save to file
-            filename = self.backup_dir / f"{backup_id}.backup.gz"
-            with open(filename, 'wb') as f:
-                f.write(compressed_data)
-
-            logger.info(f"💾 Backup saved: {filename} ({len(compressed_data)} bytes)")
+            manifest: dict[str, Any] = {'backup_id': backup_id, 'collections': {}}
+            for key in ('mode', 'level', 'parent_backup_id', 'high_water_mark', 'since'):
+                if key in backup_data:
+                    manifest[key] = backup_data[key]
+            tombstones = backup_data.get('tombstones') or {}
+
+            with self._open_backup_writer(filename) as out:
+                header = {
+                    k: v for k, v in backup_data.items()
+                    if k not in ('collections', 'storage', 'manifest', 'tombstones')
+                }
+                out.write(_encode_record({'type': 'header', **header}))
+
+                for collection, docs in backup_data.get('collections', {}).items():
+                    manifest['collections'][collection] = self._write_collection(
+                        out, collection, docs, tombstones.get(collection, ())
+                    )
+
+                storage_files = backup_data.get('storage')
+                if isinstance(storage_files, list):
+                    for file_info in storage_files:
+                        out.write(_encode_record({'type': 'storage', 'file': file_info}))
+                    manifest['storage'] = {'count': len(storage_files)}
+                elif storage_files is not None:
+                    manifest['storage'] = storage_files
+
+                manifest['completed_at'] = datetime.now(UTC)
+                out.write(_encode_record({'type': 'manifest', **manifest}))
+
+            backup_data['manifest'] = manifest
+            logger.info(f"💾 Backup saved: {filename} ({filename.stat().st_size} bytes)")
             return str(filename)
 
         except Exception as e:
             logger.error(f"Failed to save backup: {e}")
+            filename.unlink(missing_ok=True)
             return None
 
-    def _encrypt_data(self, data: bytes) -> bytes:
-        """Encrypt backup data"""
-        if not self.encryption_key:
-            logger.warning("No encryption key provided, skipping encryption")
-            return data
-
+    def _write_collection(
+        self,
+        out: BinaryIO,
+        collection: str,
+        docs: Iterable[dict],
+        tombstones: Iterable[dict] = (),
+    ) -> dict[str, Any]:
+        """Write one collection's doc and tombstone records and return its manifest entry"""
+        checksum = hashlib.sha256()
+        count = 0
+        tombstone_count = 0
+        entry: dict[str, Any] = {}
+        field = self.incremental_fields.get(collection)
+        written: dict[str, str] = {}
         try:
-            from cryptography.fernet import Fernet
+            if isinstance(docs, dict):  # {'error': ...} placeholder
+                raise ValueError(docs.get('error', 'invalid collection data'))
+            for doc in docs:
+                line = _encode_record({'type': 'doc', 'collection': collection, 'doc': doc})
+                out.write(line)
+                checksum.update(line)
+                count += 1
+                if tombstones and field:
+                    written[doc.get('_id', '')] = str(doc.get(field, ''))
+
+            for tombstone in tombstones:
+                # A doc re-created after its delete is already restored from the doc record
+                if written.get(tombstone['doc_id'], '') >= tombstone.get('deleted_at', ''):
+                    continue
+                line = _encode_record({'type': 'tombstone', 'collection': collection, **tombstone})
+                out.write(line)
+                checksum.update(line)
+                tombstone_count += 1
+            logger.info(f"✅ Backed up {count} documents from {collection}")
+        except Exception as e:
+            logger.error(f"❌ Failed to backup {collection}: {e}")
+            entry['error'] = str(e)
+
+        entry.update({'count': count, 'sha256': checksum.hexdigest()})
+        if tombstone_count:
+            entry['tombstones'] = tombstone_count
+        return entry
+
+    def _load_tombstones(self, since: str) -> dict[str, list[dict]]:
+        """Deletes recorded at or after ``since``, grouped by collection"""
+        tombstones: dict[str, list[dict]] = {}
+        query = self.db.collection(TOMBSTONE_COLLECTION).where(filter=FieldFilter('deleted_at', '>=', since))
+        for snap in query.stream():
+            data = snap.to_dict() or {}
+            collection = data.get('collection')
+            if collection and data.get('doc_id'):
+                tombstones.setdefault(collection, []).append(
+                    {'doc_id': data['doc_id'], 'deleted_at': data.get('deleted_at', '')}
+                )
+        return tombstones
+
+    def _prune_tombstones(self, before: str) -> int:
+        """Delete tombstones older than ``before``; a newer full backup already reflects them"""
+        removed = 0
+        query = self.db.collection(TOMBSTONE_COLLECTION).where(filter=FieldFilter('deleted_at', '<', before))
+        batch = self.db.batch()
+        pending = 0
+        for snap in query.stream():
+            batch.delete(snap.reference)
+            pending += 1
+            if pending >= RESTORE_BATCH_SIZE:
+                batch.commit()
+                removed += pending
+                batch, pending = self.db.batch(), 0
+        if pending:
+            batch.commit()
+            removed += pending
+        return removed
+
+    # ──────────────────────────────────────────────────────────────
+    # Incremental backup chain
+    # ──────────────────────────────────────────────────────────────
+
+    def _get_chain_state(self) -> dict[str, Any]:
+        snap = self.db.collection(BACKUP_STATE_COLLECTION).document('chain').get()
+        return (snap.to_dict() or {}) if snap.exists else {}
+
+    def _get_chain_parent(self, level: int) -> dict[str, Any] | None:
+        """Latest completed backup with level <= ``level`` (None without a full backup)"""
+        try:
+            levels = self._get_chain_state().get('levels', {})
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read backup chain state: {e}")
+            return None
+        if '0' not in levels:
+            return None
+        candidates = [entry for lvl, entry in levels.items() if int(lvl) <= level]
+        return max(candidates, key=lambda entry: entry['high_water_mark'])
 
-            # Use encryption key to create cipher
-            key = base64.urlsafe_b64encode(self.encryption_key.encode()[:32].ljust(32, b'\0'))
-            cipher = Fernet(key)
-            return cipher.encrypt(data)
+    def _record_chain_link(self, backup_data: dict) -> None:
+        """Make this backup the parent for later incrementals of its level and above (non-blocking)"""
+        try:
+            level = int(backup_data.get('level', 0))
+            state = self._get_chain_state()
+            levels = {lvl: entry for lvl, entry in state.get('levels', {}).items() if int(lvl) < level}
+            levels[str(level)] = {
+                'backup_id': backup_data['backup_id'],
+                'high_water_mark': backup_data['high_water_mark'],
+            }
+            self.db.collection(BACKUP_STATE_COLLECTION).document('chain').set({
+                'levels': levels,
+                'updated_at': datetime.now(UTC).isoformat(),
+            })
+
+            if level == 0:
+                cutoff = (
+                    datetime.fromisoformat(backup_data['high_water_mark']) - timedelta(seconds=INCREMENTAL_OVERLAP_SECONDS)
+                ).isoformat()
+                removed = self._prune_tombstones(cutoff)
+                if removed:
+                    logger.info(f"🗑️ Pruned {removed} tombstones covered by full backup {backup_data['backup_id']}")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not record backup chain link (non-blocking): {e}")
 
+    def _get_cipher(self):
+        """Fernet cipher for the configured key (None when encryption is off or unavailable)"""
+        if not self.encryption_key:
+            return None
+        try:
+            from cryptography.fernet import Fernet
         except ImportError:
             logger.warning("Cryptography library not available, skipping encryption")
-            return data
-        except Exception as e:
-            logger.error(f"Encryption failed: {e}")
-            return data
+            return None
+
+        # Use encryption key to create cipher
+        key = base64.urlsafe_b64encode(self.encryption_key.encode()[:32].ljust(32, b'\0'))
+        return Fernet(key)
+
+    @contextmanager
+    def _open_backup_writer(self, filename: Path) -> Iterator[BinaryIO]:
+        """Open ``filename`` for streaming NDJSON → gzip (→ frame encryption) writes"""
+        cipher = self._get_cipher() if self.enable_encryption else None
+        with open(filename, 'wb') as raw:
+            sink: BinaryIO = _EncryptedFrameWriter(raw, cipher) if cipher else raw  # type: ignore[assignment]
+            with io.BufferedWriter(gzip.GzipFile(fileobj=sink, mode='wb'), _WRITE_BUFFER_SIZE) as out:  # type: ignore[arg-type]
+                yield out  # type: ignore[misc]
+            if sink is not raw:
+                sink.close()
+
+    @contextmanager
+    def _open_backup_reader(self, filename: str) -> Iterator[BinaryIO]:
+        """Open a streaming backup for line-by-line reads, decrypting frame by frame"""
+        with open(filename, 'rb') as raw:
+            source: BinaryIO = raw
+            if raw.read(len(ENCRYPTED_MAGIC)) == ENCRYPTED_MAGIC:
+                cipher = self._get_cipher()
+                if cipher is None:
+                    raise ValueError("Backup is encrypted but no usable BACKUP_ENCRYPTION_KEY is configured")
+                source = io.BufferedReader(_DecryptingFrameReader(raw, cipher), ENCRYPTION_FRAME_SIZE)  # type: ignore[assignment]
+            else:
+                raw.seek(0)
+            with gzip.GzipFile(fileobj=source, mode='rb') as gz:
+                yield gz  # type: ignore[misc]
+
+    def _is_streaming_backup(self, filename: str) -> bool:
+        """True for NDJSON backups, False for legacy single-document JSON backups"""
+        try:
+            with open(filename, 'rb') as raw:
+                if raw.read(len(ENCRYPTED_MAGIC)) == ENCRYPTED_MAGIC:
+                    return True
+            with self._open_backup_reader(filename) as stream:
+                first = json.loads(stream.readline() or b'null')
+            return isinstance(first, dict) and first.get('type') == 'header'
+        except Exception:
+            return False
+
+    def _iter_backup_lines(self, filename: str) -> Iterator[tuple[dict, bytes]]:
+        """Yield ``(record, raw_line)`` pairs from a streaming backup"""
+        with self._open_backup_reader(filename) as stream:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line), line
+
+    def verify_backup(self, backup_id_or_file: str) -> dict[str, Any]:
+        """
+        Stream through a backup and check it against its manifest.
+
+        Returns the manifest record. Raises ValueError when the file is
+        truncated or a collection's count or checksum does not match.
+        """
+        filename = self._resolve_backup_file(backup_id_or_file)
+        if not filename:
+            raise ValueError(f"Backup not found: {backup_id_or_file}")
+
+        checksums: dict[str, Any] = {}
+        counts: dict[str, int] = {}
+        manifest: dict[str, Any] | None = None
+        for record, line in self._iter_backup_lines(filename):
+            record_type = record.get('type')
+            if record_type in ('doc', 'tombstone'):
+                collection = record['collection']
+                checksums.setdefault(collection, hashlib.sha256()).update(line)
+                if record_type == 'doc':
+                    counts[collection] = counts.get(collection, 0) + 1
+            elif record_type == 'manifest':
+                manifest = record
+
+        if manifest is None:
+            raise ValueError(f"Backup {filename} has no manifest (truncated?)")
+
+        for collection, entry in manifest.get('collections', {}).items():
+            actual_count = counts.get(collection, 0)
+            actual_sha = checksums[collection].hexdigest() if collection in checksums else hashlib.sha256().hexdigest()
+            if actual_count != entry.get('count') or actual_sha != entry.get('sha256'):
+                raise ValueError(
+                    f"Backup {filename} failed verification for {collection}: "
+                    f"{actual_count} docs (manifest {entry.get('count')})"
+                )
+        return manifest
 
     def _decrypt_data(self, data: bytes) -> bytes:
-        """Decrypt backup data"""
+        """Decrypt a legacy (whole-file) encrypted backup"""
         if not self.encryption_key:
             logger.warning("No encryption key provided, using unencrypted data")
             return data
 
         try:
-            from cryptography.fernet import Fernet
-
-            key = base64.urlsafe_b64encode(self.encryption_key.encode()[:32].ljust(32, b'\0'))
-            cipher = Fernet(key)
-            return cipher.decrypt(data)
-
-        except ImportError:
-            logger.warning("Cryptography library not available, using unencrypted data")
-            return data
+            cipher = self._get_cipher()
+            return cipher.decrypt(data) if cipher else data
         except Exception as e:
             logger.error(f"Decryption failed: {e}")
             return data
@@ -447,6 +831,13 @@ class BackupService:
         """
         Restore from backup
 
+        Streaming (NDJSON) backups are verified against their manifest first
+        and then written back in batches of ``RESTORE_BATCH_SIZE`` documents.
+        An incremental backup is replayed on top of the current data (docs
+        written, tombstones deleted); use ``restore_backup_chain`` to rebuild
+        from a full backup. Legacy single-document backups are loaded whole
+        as before.
+
         Args:
             backup_id_or_file: Backup ID or filename
             collections: Specific collections to restore (None = all)
@@ -454,8 +845,12 @@ class BackupService:
         Returns:
             Success status
         """
+        filename = self._resolve_backup_file(backup_id_or_file)
+        if filename and self._is_streaming_backup(filename):
+            return self._restore_streaming_backup(filename, collections)
+
         try:
-            # Load backup data
+            # Legacy backup: load the whole document
             backup_data = self._load_backup(backup_id_or_file)
             if not backup_data:
                 return False
@@ -491,20 +886,123 @@ class BackupService:
             logger.error(f"❌ Backup restoration failed: {e}")
             return False
 
+    def restore_backup_chain(self, backup_ids_or_files: list[str], collections: list[str] | None = None) -> bool:
+        """
+        Restore a full backup followed by its chain of incremental backups.
+
+        Every link is verified first: the chain must start with a full backup
+        and each incremental's ``parent_backup_id`` must be the previous link.
+        Links are then replayed in order, so later writes and deletes win.
+        """
+        try:
+            links: list[tuple[str, dict[str, Any]]] = []
+            for backup_id_or_file in backup_ids_or_files:
+                filename = self._resolve_backup_file(backup_id_or_file)
+                if not filename or not self._is_streaming_backup(filename):
+                    logger.error(f"❌ Backup chain link not found or not a streaming backup: {backup_id_or_file}")
+                    return False
+                manifest = self.verify_backup(filename)
+                if not links:
+                    if manifest.get('mode', 'full') != 'full':
+                        logger.error(f"❌ Backup chain must start with a full backup, got {manifest.get('backup_id')}")
+                        return False
+                elif manifest.get('parent_backup_id') != links[-1][1].get('backup_id'):
+                    logger.error(
+                        f"❌ Broken backup chain: {manifest.get('backup_id')} follows "
+                        f"{manifest.get('parent_backup_id')}, not {links[-1][1].get('backup_id')}"
+                    )
+                    return False
+                links.append((filename, manifest))
+        except Exception as e:
+            logger.error(f"❌ Backup chain verification failed: {e}")
+            return False
+
+        for filename, manifest in links:
+            if not self._restore_streaming_backup(filename, collections, manifest=manifest):
+                return False
+        return True
+
+    def _restore_streaming_backup(
+        self,
+        filename: str,
+        collections: list[str] | None = None,
+        manifest: dict[str, Any] | None = None,
+    ) -> bool:
+        """Verify a streaming backup, then replay its docs and tombstones in bounded batches"""
+        try:
+            manifest = manifest or self.verify_backup(filename)
+            backup_id = manifest.get('backup_id', Path(filename).name)
+            logger.info(f"🔄 Restoring backup: {backup_id}")
+
+            restorable = set()
+            for collection in collections or self.collections_to_backup:
+                entry = manifest.get('collections', {}).get(collection)
+                if entry is None:
+                    continue
+                if entry.get('error'):
+                    logger.warning(f"Skipping {collection}: backup recorded an error ({entry['error']})")
+                    continue
+                restorable.add(collection)
+
+            restored: dict[str, int] = {collection: 0 for collection in restorable}
+            deleted: dict[str, int] = {collection: 0 for collection in restorable}
+            batch: list = []
+            batch_key: tuple[str, str] | None = None
+
+            def flush() -> None:
+                if not batch or batch_key is None:
+                    return
+                collection, record_type = batch_key
+                if record_type == 'doc':
+                    restored[collection] += self._restore_collection(collection, batch)
+                else:
+                    deleted[collection] += self._delete_documents(collection, batch)
+
+            for record, _line in self._iter_backup_lines(filename):
+                record_type = record.get('type')
+                if record_type not in ('doc', 'tombstone') or record.get('collection') not in restorable:
+                    continue
+                key = (record['collection'], record_type)
+                if batch and (key != batch_key or len(batch) >= RESTORE_BATCH_SIZE):
+                    flush()
+                    batch = []
+                batch_key = key
+                batch.append(record['doc'] if record_type == 'doc' else record['doc_id'])
+            flush()
+
+            for collection, count in restored.items():
+                logger.info(f"✅ Restored {count} documents to {collection}")
+                if deleted[collection]:
+                    logger.info(f"🗑️ Replayed {deleted[collection]} deletes in {collection}")
+
+            # Trigger callbacks
+            for callback in self.restore_callbacks:
+                try:
+                    callback(backup_id, 'completed', {'backup_id': backup_id, 'manifest': manifest, 'restored': restored})
+                except Exception as e:
+                    logger.error(f"Restore callback error: {e}")
+
+            logger.info("✅ Backup restoration completed")
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ Backup restoration failed: {e}")
+            return False
+
+    def _resolve_backup_file(self, backup_id_or_file: str) -> str | None:
+        """Map a backup ID or path to a local backup file"""
+        if os.path.isfile(backup_id_or_file):
+            return backup_id_or_file
+        matches = sorted(self.backup_dir.glob(f"*{backup_id_or_file}*.backup.gz"))
+        return str(matches[0]) if matches else None
+
     def _load_backup(self, backup_id_or_file: str) -> dict | None:
-        """Load backup data from file"""
+        """Load a legacy (single JSON document) backup from file"""
         try:
-            # Check if it's a file path
-            if os.path.isfile(backup_id_or_file):
-                filename = backup_id_or_file
-            else:
-                # Look for backup file by ID
-                pattern = f"*{backup_id_or_file}*.backup.gz"
-                matches = list(self.backup_dir.glob(pattern))
-                if not matches:
-                    logger.error(f"Backup not found: {backup_id_or_file}")
-                    return None
-                filename = str(matches[0])
+            filename = self._resolve_backup_file(backup_id_or_file)
+            if not filename:
+                logger.error(f"Backup not found: {backup_id_or_file}")
+                return None
 
             # Load and decompress
             with open(filename, 'rb') as f:
@@ -525,12 +1023,12 @@ class BackupService:
             return None
 
     def _restore_collection(self, collection: str, docs: list[dict]) -> int:
-        """Restore documents to a collection"""
+        """Restore documents to a collection with batched writes"""
         restored_count = 0
 
-        for doc in docs:
-            doc_id = None
-            try:
+        for start in range(0, len(docs), RESTORE_BATCH_SIZE):
+            prepared: list[tuple[str, dict]] = []
+            for doc in docs[start:start + RESTORE_BATCH_SIZE]:
                 doc_copy = doc.copy()  # Don't mutate source — allows safe retry
                 doc_id = doc_copy.pop('_id', None)
                 # Remove backup metadata
@@ -539,17 +1037,44 @@ class BackupService:
                 if not doc_id:
                     logger.warning(f"Skipping document without _id in {collection}")
                     continue
+                prepared.append((doc_id, doc_copy))
 
-                # Restore document
-                doc_ref = self.db.collection(collection).document(doc_id)
-                doc_ref.set(doc_copy)
-                restored_count += 1
+            if not prepared:
+                continue
 
+            try:
+                batch = self.db.batch()
+                for doc_id, data in prepared:
+                    batch.set(self.db.collection(collection).document(doc_id), data)
+                batch.commit()
+                restored_count += len(prepared)
             except Exception as e:
-                logger.error(f"Failed to restore document {doc_id or 'unknown'}: {e}")
+                # Fall back to per-document writes so one bad document doesn't drop the batch
+                logger.warning(f"Batch restore to {collection} failed ({e}), retrying per document")
+                for doc_id, data in prepared:
+                    try:
+                        self.db.collection(collection).document(doc_id).set(data)
+                        restored_count += 1
+                    except Exception as doc_error:
+                        logger.error(f"Failed to restore document {doc_id}: {doc_error}")
 
         return restored_count
 
+    def _delete_documents(self, collection: str, doc_ids: list[str]) -> int:
+        """Replay tombstones: delete documents from a collection with batched writes"""
+        deleted_count = 0
+        for start in range(0, len(doc_ids), RESTORE_BATCH_SIZE):
+            chunk = doc_ids[start:start + RESTORE_BATCH_SIZE]
+            try:
+                batch = self.db.batch()
+                for doc_id in chunk:
+                    batch.delete(self.db.collection(collection).document(doc_id))
+                batch.commit()
+                deleted_count += len(chunk)
+            except Exception as e:
+                logger.error(f"Failed to replay {len(chunk)} deletes in {collection}: {e}")
+        return deleted_count
+
     def get_backup_status(self) -> dict[str, Any]:
         """Get comprehensive backup status"""
         status = {
@@ -700,6 +1225,10 @@ def restore_backup(backup_id: str, collections: list[str] | None = None) -> bool
     """Restore from backup"""
     return _get_backup_service().restore_backup(backup_id, collections)
 
+def restore_backup_chain(backup_ids: list[str], collections: list[str] | None = None) -> bool:
+    """Restore a full backup plus its incremental chain"""
+    return _get_backup_service().restore_backup_chain(backup_ids, collections)
+
 def get_backup_status() -> dict[str, Any]:
     """Get backup service status"""
     return _get_backup_service().get_backup_status()
@@ -711,5 +1240,6 @@ __all__ = [
     'stop_backup_service',
     'create_backup',
     'restore_backup',
+    'restore_backup_chain',
     'get_backup_status'
 ]
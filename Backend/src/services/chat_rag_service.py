@@ -6,19 +6,16 @@ Provides personalized context-aware conversations using vector similarity search
 import hashlib
 import logging
 import os
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Any
 
 import numpy as np
 
-# Vector store with graceful fallback
-try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
-    logging.warning("sentence-transformers not available, using fallback embeddings")
+from ..utils.fanout import fan_out
+from .embedding_engine import CHAT_RAG_EMBEDDING_MODEL, EmbeddingEngine, cosine_similarities, get_embedding_engine
+from .vector_index_service import IndexEntry, SourceFilter, vector_index_service
 
 try:
     import pinecone
@@ -39,6 +36,57 @@ class RetrievedContext:
     metadata: dict[str, Any]
 
 
+# Minimum cosine similarity for a document to be used as context, per source.
+# Calibrated on paraphrase-multilingual-MiniLM-L12-v2 (CHAT_RAG_EMBEDDING_MODEL);
+# score distributions differ between models, so re-tune these when changing it.
+SOURCE_THRESHOLDS_MODEL = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+SOURCE_THRESHOLDS = {
+    'mood_logs': 0.6,
+    'journal': 0.65,  # Higher threshold for journal entries
+    'goals': 0.55,  # Lower threshold for goals
+    'coping_strategies': 0.6,
+    'conversations': 0.7,  # High threshold for conversations
+}
+
+if CHAT_RAG_EMBEDDING_MODEL != SOURCE_THRESHOLDS_MODEL:
+    logger.warning(
+        f"⚠️ CHAT_RAG_EMBEDDING_MODEL={CHAT_RAG_EMBEDDING_MODEL} but SOURCE_THRESHOLDS are calibrated "
+        f"for {SOURCE_THRESHOLDS_MODEL}; retrieval precision and recall will shift"
+    )
+
+# retrieve_context() context_types -> RetrievedContext.source
+CONTEXT_TYPE_SOURCES = {
+    'mood': 'mood_logs',
+    'journal': 'journal',
+    'goals': 'goals',
+    'strategies': 'coping_strategies',
+    'conversations': 'conversations',
+}
+
+# Sources limited to the recency window (goals and strategies are always eligible)
+RECENCY_BOUND_SOURCES = {'mood_logs', 'journal', 'conversations'}
+
+# Goals and coping strategies are written by the client straight to Firestore, so no
+# backend hook keeps them indexed; they are small and are scanned live next to the index
+LIVE_SCANNED_SOURCES = {'goals', 'coping_strategies'}
+
+# How far back the one-off index bootstrap scans time-bound sources
+INDEX_BOOTSTRAP_DAYS = 365
+
+# Per-source budget for the concurrent Firestore fetches; slower sources are dropped
+RAG_SOURCE_TIMEOUT_SECONDS = float(os.getenv('RAG_SOURCE_TIMEOUT_SECONDS', '1.5'))
+# The background index bootstrap is not latency sensitive
+INDEX_BOOTSTRAP_TIMEOUT_SECONDS = 30.0
+
+
+class RetrievalResults(list):
+    """RetrievedContext list that also carries per-source timing metadata"""
+
+    def __init__(self, contexts: list[RetrievedContext] | None = None, timings: dict[str, dict] | None = None):
+        super().__init__(contexts or [])
+        self.timings = timings or {}
+
+
 @dataclass
 class ConversationMemory:
     """Structured conversation memory for RAG"""
@@ -52,6 +100,138 @@ class ConversationMemory:
     last_updated: datetime
 
 
+def _parse_timestamp(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value or datetime.now().isoformat())
+
+
+# ──────────────────────────────────────────────────────────────
+# Document -> context entry builders (shared by retrieval and write-time indexing)
+# ──────────────────────────────────────────────────────────────
+
+def mood_entry(doc_id: str, data: dict[str, Any]) -> IndexEntry | None:
+    label = data.get('mood_label') or data.get('mood_text', '')
+    mood_text = f"{label} {data.get('note', '')}"
+    if not mood_text.strip():
+        return None
+    return IndexEntry(
+        source='mood_logs',
+        doc_id=doc_id,
+        text=mood_text,
+        content=f"Mood: {label or 'Unknown'} - {data.get('note', '')}",
+        timestamp=_parse_timestamp(data.get('timestamp')),
+        metadata={
+            'valence': data.get('valence'),
+            'intensity': data.get('intensity'),
+            'tags': data.get('tags', [])
+        }
+    )
+
+
+def journal_entry(doc_id: str, data: dict[str, Any]) -> IndexEntry | None:
+    entry_text = f"{data.get('title', '')} {data.get('content', '')}"
+    if not entry_text.strip():
+        return None
+    return IndexEntry(
+        source='journal',
+        doc_id=doc_id,
+        text=entry_text,
+        content=f"Journal: {data.get('title', 'Untitled')} - {data.get('content', '')[:200]}...",
+        timestamp=_parse_timestamp(data.get('timestamp') or data.get('created_at')),
+        metadata={
+            'tags': data.get('tags', []),
+            'mood_at_time': data.get('mood_at_time', data.get('mood'))
+        }
+    )
+
+
+def goal_entry(doc_id: str, data: dict[str, Any]) -> IndexEntry | None:
+    goal_text = f"{data.get('title', '')} {data.get('description', '')}"
+    if not goal_text.strip():
+        return None
+    return IndexEntry(
+        source='goals',
+        doc_id=doc_id,
+        text=goal_text,
+        content=f"Goal: {data.get('title', '')} - {data.get('description', '')}",
+        timestamp=_parse_timestamp(data.get('created_at')),
+        metadata={
+            'category': data.get('category'),
+            'progress': data.get('progress', 0)
+        }
+    )
+
+
+def coping_strategy_entry(doc_id: str, data: dict[str, Any]) -> IndexEntry | None:
+    strategy_text = f"{data.get('name', '')} {data.get('description', '')}"
+    if not strategy_text.strip():
+        return None
+    return IndexEntry(
+        source='coping_strategies',
+        doc_id=doc_id,
+        text=strategy_text,
+        content=f"Coping Strategy: {data.get('name', '')} - {data.get('description', '')}",
+        timestamp=_parse_timestamp(data.get('last_used')),
+        metadata={
+            'effectiveness': data.get('effectiveness_rating'),
+            'usage_count': data.get('usage_count', 0)
+        }
+    )
+
+
+def conversation_entry(exchange_id: str, messages: list[dict]) -> IndexEntry | None:
+    session_text = ' '.join([m.get('content', '') for m in messages])
+    if not session_text.strip():
+        return None
+    # Get AI responses from this exchange
+    ai_responses = [
+        m.get('content', '')[:150]
+        for m in messages
+        if m.get('role') == 'assistant'
+    ]
+    return IndexEntry(
+        source='conversations',
+        doc_id=exchange_id,
+        text=session_text,
+        content=f"Previous conversation: {' '.join(ai_responses[:2])}",
+        timestamp=_parse_timestamp(messages[0].get('timestamp')),
+        metadata={
+            'exchange_id': exchange_id,
+            'message_count': len(messages)
+        }
+    )
+
+
+# ──────────────────────────────────────────────────────────────
+# Write-time indexing hooks (run off the request path)
+# ──────────────────────────────────────────────────────────────
+
+def _index_async(user_id: str, entry: IndexEntry | None) -> None:
+    if entry is not None:
+        vector_index_service.submit(vector_index_service.index_document, user_id, entry)
+
+
+def index_mood(user_id: str, doc_id: str, data: dict[str, Any]) -> None:
+    """Embed and index a saved mood entry"""
+    _index_async(user_id, mood_entry(doc_id, data))
+
+
+def index_journal_entry(user_id: str, doc_id: str, data: dict[str, Any]) -> None:
+    """Embed and index a saved journal entry"""
+    _index_async(user_id, journal_entry(doc_id, data))
+
+
+def index_chat_exchange(user_id: str, exchange_id: str, messages: list[dict]) -> None:
+    """Embed and index one saved user/assistant exchange as a conversation"""
+    _index_async(user_id, conversation_entry(exchange_id, messages))
+
+
+def remove_indexed(user_id: str, source: str, doc_id: str) -> None:
+    """Drop a deleted document from the user's vector index"""
+    vector_index_service.submit(vector_index_service.remove_document, user_id, source, doc_id)
+
+
 class ChatRAGService:
     """
     Professional RAG service for therapeutic AI conversations
@@ -62,30 +242,30 @@ class ChatRAGService:
     - Multi-source context retrieval (moods, journal, goals, strategies)
     - Duplicate detection and semantic caching
     - Privacy-preserving context selection
+
+    Embeddings come from the worker-wide ``EmbeddingEngine``. Once a user's
+    persistent vector index is bootstrapped, retrieval is a single top-k
+    search over it plus one batched Firestore read of the hits; until then
+    every candidate document of a turn is encoded in one batched call.
     """
 
-    def __init__(self, user_id: str):
+    def __init__(self, user_id: str, engine: EmbeddingEngine | None = None):
         self.user_id = user_id
         self.session_id = hashlib.sha256(f"{user_id}_{datetime.now().isoformat()}".encode()).hexdigest()[:16]
 
-        # Initialize embedding model
-        self.embedding_model = None
-        if SENTENCE_TRANSFORMERS_AVAILABLE:
-            try:
-                # Use Swedish-compatible multilingual model
-                self.embedding_model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
-                logger.info(f"RAG: Loaded embedding model for user {user_id}")
-            except Exception as e:
-                logger.warning(f"RAG: Failed to load embedding model: {e}")
+        # Shared, lazily loaded embedding model
+        self.engine = engine or get_embedding_engine(CHAT_RAG_EMBEDDING_MODEL)
 
         # Pinecone or Firestore vector store
         self.vector_store = None
         self._init_vector_store()
 
-        # Semantic cache to avoid repeated embeddings
-        self._embedding_cache: dict[str, np.ndarray] = {}
-        self._cache_hits = 0
-        self._cache_misses = 0
+        self._bootstrap_submitted = False
+
+    @property
+    def embedding_model(self):
+        """The shared SentenceTransformer (None when unavailable)"""
+        return self.engine.model
 
     def _init_vector_store(self):
         """Initialize vector store (Pinecone preferred, Firestore fallback)"""
@@ -105,35 +285,10 @@ class ChatRAGService:
         logger.info("RAG: Using Firestore fallback for vector storage")
 
     def embed_text(self, text: str) -> np.ndarray | None:
-        """Generate embedding for text with caching"""
+        """Generate embedding for text (cached by the shared engine)"""
         if not text:
             return None
-
-        # Check cache
-        cache_key = hashlib.md5(text.encode()).hexdigest()[:16]
-        if cache_key in self._embedding_cache:
-            self._cache_hits += 1
-            return self._embedding_cache[cache_key]
-
-        # Generate embedding
-        if self.embedding_model:
-            try:
-                embedding = self.embedding_model.encode(text, convert_to_numpy=True)
-                self._embedding_cache[cache_key] = embedding
-                self._cache_misses += 1
-
-                # Limit cache size
-                if len(self._embedding_cache) > 1000:
-                    # Remove oldest entries (simple FIFO)
-                    oldest_keys = list(self._embedding_cache.keys())[:100]
-                    for key in oldest_keys:
-                        del self._embedding_cache[key]
-
-                return embedding
-            except Exception as e:
-                logger.error(f"RAG: Embedding generation failed: {e}")
-
-        return None
+        return self.engine.encode(text)
 
     def retrieve_context(
         self,
@@ -141,7 +296,7 @@ class ChatRAGService:
         context_types: list[str] = None,
         max_results: int = 5,
         recency_days: int = 30
-    ) -> list[RetrievedContext]:
+    ) -> RetrievalResults:
         """
         Retrieve relevant context from user's mental health data
 
@@ -152,268 +307,285 @@ class ChatRAGService:
             recency_days: Only consider data from last N days
 
         Returns:
-            List of RetrievedContext ordered by relevance
+            List of RetrievedContext ordered by relevance; its ``timings`` attribute
+            maps each source (and ranking stage) to ``{'status', 'elapsed_ms'}``
         """
         if context_types is None:
             context_types = ['mood', 'journal', 'goals', 'strategies', 'conversations']
 
-        query_embedding = self.embed_text(query)
-        if query_embedding is None:
+        if not query or not self.engine.available:
             logger.warning("RAG: No embedding available, returning empty context")
-            return []
-
-        all_contexts = []
+            return RetrievalResults()
 
+        timings: dict[str, dict] = {}
         try:
             from src.firebase_config import db
 
             cutoff_date = datetime.now() - timedelta(days=recency_days)
 
-            # Retrieve from each context type
-            if 'mood' in context_types:
-                mood_contexts = self._retrieve_mood_contexts(db, query_embedding, cutoff_date, max_results)
-                all_contexts.extend(mood_contexts)
+            if vector_index_service.is_ready(self.user_id):
+                return self._retrieve_from_index(db, query, context_types, cutoff_date, max_results)
 
-            if 'journal' in context_types:
-                journal_contexts = self._retrieve_journal_contexts(db, query_embedding, cutoff_date, max_results)
-                all_contexts.extend(journal_contexts)
-
-            if 'goals' in context_types:
-                goals_contexts = self._retrieve_goals_contexts(db, query_embedding, max_results)
-                all_contexts.extend(goals_contexts)
-
-            if 'strategies' in context_types:
-                strategy_contexts = self._retrieve_coping_strategies(db, query_embedding, max_results)
-                all_contexts.extend(strategy_contexts)
-
-            if 'conversations' in context_types:
-                conversation_contexts = self._retrieve_conversation_history(db, query_embedding, cutoff_date, max_results)
-                all_contexts.extend(conversation_contexts)
-
-            # Sort by similarity and return top results
-            all_contexts.sort(key=lambda x: x.similarity, reverse=True)
-            return all_contexts[:max_results]
+            # Fetch candidate documents from each context type concurrently; the
+            # query embedding is computed alongside and reused from the engine cache
+            candidates = self._collect_candidates(
+                db, context_types, cutoff_date, timings, extra_tasks={'query_embedding': lambda: self.engine.encode(query)}
+            )
+            started = time.perf_counter()
+            contexts = self._rank_candidates(query, candidates, max_results)
+            timings['ranking'] = {'status': 'ok', 'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+            self._schedule_bootstrap()
+            return RetrievalResults(contexts, timings)
 
         except Exception as e:
             logger.error(f"RAG: Context retrieval failed: {e}")
-            return []
+            return RetrievalResults(timings=timings)
 
-    def _calculate_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
-        """Calculate cosine similarity between embeddings"""
-        return float(np.dot(embedding1, embedding2) / (np.linalg.norm(embedding1) * np.linalg.norm(embedding2)))
-
-    def _retrieve_mood_contexts(
-        self, db, query_embedding: np.ndarray, cutoff_date: datetime, max_results: int
-    ) -> list[RetrievedContext]:
-        """Retrieve relevant mood entries"""
-        contexts = []
-
-        try:
-            mood_docs = db.collection('users').document(self.user_id)\
-                .collection('moods')\
-                .where('timestamp', '>=', cutoff_date.isoformat())\
-                .order_by('timestamp', direction='DESCENDING')\
-                .limit(50)\
-                .get()
-
-            for doc in mood_docs:
-                data = doc.to_dict()
-                mood_text = f"{data.get('mood_label', '')} {data.get('note', '')}"
-
-                if mood_text.strip():
-                    mood_embedding = self.embed_text(mood_text)
-                    if mood_embedding is not None:
-                        similarity = self._calculate_similarity(query_embedding, mood_embedding)
-
-                        if similarity > 0.6:  # Threshold for relevance
-                            contexts.append(RetrievedContext(
-                                content=f"Mood: {data.get('mood_label', 'Unknown')} - {data.get('note', '')}",
-                                source='mood_logs',
-                                similarity=similarity,
-                                timestamp=datetime.fromisoformat(data.get('timestamp', datetime.now().isoformat())),
-                                metadata={
-                                    'valence': data.get('valence'),
-                                    'intensity': data.get('intensity'),
-                                    'tags': data.get('tags', [])
-                                }
-                            ))
-        except Exception as e:
-            logger.warning(f"RAG: Mood context retrieval failed: {e}")
-
-        return sorted(contexts, key=lambda x: x.similarity, reverse=True)[:max_results]
-
-    def _retrieve_journal_contexts(
-        self, db, query_embedding: np.ndarray, cutoff_date: datetime, max_results: int
-    ) -> list[RetrievedContext]:
-        """Retrieve relevant journal entries"""
-        contexts = []
-
-        try:
-            journal_docs = db.collection('users').document(self.user_id)\
-                .collection('journal_entries')\
-                .where('timestamp', '>=', cutoff_date.isoformat())\
-                .order_by('timestamp', direction='DESCENDING')\
-                .limit(30)\
-                .get()
-
-            for doc in journal_docs:
-                data = doc.to_dict()
-                entry_text = f"{data.get('title', '')} {data.get('content', '')}"
-
-                if entry_text.strip():
-                    entry_embedding = self.embed_text(entry_text)
-                    if entry_embedding is not None:
-                        similarity = self._calculate_similarity(query_embedding, entry_embedding)
-
-                        if similarity > 0.65:  # Higher threshold for journal entries
-                            contexts.append(RetrievedContext(
-                                content=f"Journal: {data.get('title', 'Untitled')} - {data.get('content', '')[:200]}...",
-                                source='journal',
-                                similarity=similarity,
-                                timestamp=datetime.fromisoformat(data.get('timestamp', datetime.now().isoformat())),
-                                metadata={
-                                    'tags': data.get('tags', []),
-                                    'mood_at_time': data.get('mood_at_time')
-                                }
-                            ))
-        except Exception as e:
-            logger.warning(f"RAG: Journal context retrieval failed: {e}")
+    def _collect_candidates(
+        self,
+        db,
+        context_types: list[str],
+        cutoff_date: datetime,
+        timings: dict[str, dict] | None = None,
+        timeout: float = RAG_SOURCE_TIMEOUT_SECONDS,
+        extra_tasks: dict | None = None,
+    ) -> list[IndexEntry]:
+        """Fetch every requested source in parallel, dropping sources that miss their time budget or fail
+
+        Collectors let Firestore errors propagate, so a failed source shows up as an
+        ``error`` result in the timings and the bootstrap never treats it as empty.
+        """
+        collectors = {
+            'mood': lambda: self._collect_mood_candidates(db, cutoff_date),
+            'journal': lambda: self._collect_journal_candidates(db, cutoff_date),
+            'goals': lambda: self._collect_goal_candidates(db),
+            'strategies': lambda: self._collect_coping_strategy_candidates(db),
+            'conversations': lambda: self._collect_conversation_candidates(db, cutoff_date),
+        }
+        tasks = {name: collector for name, collector in collectors.items() if name in context_types}
+        tasks.update(extra_tasks or {})
+        results = fan_out(tasks, timeout)
+
+        candidates: list[IndexEntry] = []
+        for name in collectors:
+            result = results.get(name)
+            if result is None:
+                continue
+            if result.ok:
+                candidates.extend(result.value)
+            else:
+                reason = f"{result.status}: {result.error}" if result.error else result.status
+                logger.warning(f"RAG: Dropped {name} context ({reason}, {result.elapsed_ms:.0f} ms)")
+        if timings is not None:
+            timings.update({name: result.as_metadata() for name, result in results.items()})
+        return candidates
+
+    def _retrieve_from_index(
+        self, db, query: str, context_types: list[str], cutoff_date: datetime, max_results: int
+    ) -> RetrievalResults:
+        """Top-k search over the user's vector index, hydrating only the hits; live-scanned sources are merged in"""
+        timings: dict[str, dict] = {}
+        live_types = [t for t in context_types if CONTEXT_TYPE_SOURCES.get(t) in LIVE_SCANNED_SOURCES]
+        live_candidates = self._collect_candidates(
+            db, live_types, cutoff_date, timings, extra_tasks={'query_embedding': lambda: self.engine.encode(query)}
+        )
+        query_embedding = self.engine.encode(query)
+        if query_embedding is None:
+            return RetrievalResults(timings=timings)
+
+        started = time.perf_counter()
+        since = cutoff_date.timestamp()
+        filters = {}
+        for context_type in context_types:
+            source = CONTEXT_TYPE_SOURCES.get(context_type)
+            if source and source not in LIVE_SCANNED_SOURCES:
+                filters[source] = SourceFilter(
+                    since=since if source in RECENCY_BOUND_SOURCES else None,
+                    min_score=SOURCE_THRESHOLDS[source],
+                )
 
-        return sorted(contexts, key=lambda x: x.similarity, reverse=True)[:max_results]
+        hits = vector_index_service.search(self.user_id, query_embedding, max_results, filters) if filters else []
+        searched = time.perf_counter()
+        records = vector_index_service.fetch_entries(self.user_id, [hit.key for hit in hits]) if hits else {}
+        hydrated = time.perf_counter()
 
-    def _retrieve_goals_contexts(
-        self, db, query_embedding: np.ndarray, max_results: int
-    ) -> list[RetrievedContext]:
-        """Retrieve user's goals and aspirations"""
         contexts = []
-
-        try:
-            goals_docs = db.collection('users').document(self.user_id)\
-                .collection('goals')\
-                .where('status', 'in', ['active', 'in_progress'])\
-                .limit(20)\
-                .get()
-
-            for doc in goals_docs:
-                data = doc.to_dict()
-                goal_text = f"{data.get('title', '')} {data.get('description', '')}"
-
-                if goal_text.strip():
-                    goal_embedding = self.embed_text(goal_text)
-                    if goal_embedding is not None:
-                        similarity = self._calculate_similarity(query_embedding, goal_embedding)
-
-                        if similarity > 0.55:  # Lower threshold for goals
-                            contexts.append(RetrievedContext(
-                                content=f"Goal: {data.get('title', '')} - {data.get('description', '')}",
-                                source='goals',
-                                similarity=similarity,
-                                timestamp=datetime.fromisoformat(data.get('created_at', datetime.now().isoformat())),
-                                metadata={
-                                    'category': data.get('category'),
-                                    'progress': data.get('progress', 0)
-                                }
-                            ))
-        except Exception as e:
-            logger.warning(f"RAG: Goals context retrieval failed: {e}")
-
-        return sorted(contexts, key=lambda x: x.similarity, reverse=True)[:max_results]
-
-    def _retrieve_coping_strategies(
-        self, db, query_embedding: np.ndarray, max_results: int
+        for hit in hits:
+            record = records.get(hit.key)
+            if not record or record.get('deleted'):
+                continue
+            contexts.append(RetrievedContext(
+                content=record.get('content', ''),
+                source=hit.source,
+                similarity=hit.score,
+                timestamp=_parse_timestamp(record.get('timestamp')),
+                metadata=record.get('metadata') or {},
+            ))
+        timings['index_search'] = {'status': 'ok', 'elapsed_ms': round((searched - started) * 1000, 1)}
+        timings['hydrate'] = {'status': 'ok', 'elapsed_ms': round((hydrated - searched) * 1000, 1)}
+
+        if live_candidates:
+            contexts.extend(self._rank_candidates(query, live_candidates, max_results))
+            contexts.sort(key=lambda x: x.similarity, reverse=True)
+        return RetrievalResults(contexts[:max_results], timings)
+
+    def _schedule_bootstrap(self) -> None:
+        """Seed the persistent index from a full scan of every source, once per worker"""
+        if self._bootstrap_submitted:
+            return
+        self._bootstrap_submitted = True
+        vector_index_service.submit(self._bootstrap_index)
+
+    def _bootstrap_index(self) -> None:
+        from src.firebase_config import db
+
+        cutoff_date = datetime.now() - timedelta(days=INDEX_BOOTSTRAP_DAYS)
+        timings: dict[str, dict] = {}
+        indexed_types = [t for t, source in CONTEXT_TYPE_SOURCES.items() if source not in LIVE_SCANNED_SOURCES]
+        entries = self._collect_candidates(
+            db, indexed_types, cutoff_date, timings, timeout=INDEX_BOOTSTRAP_TIMEOUT_SECONDS
+        )
+        if any(t['status'] != 'ok' for t in timings.values()):
+            # A partial scan must not be marked as a complete index
+            self._bootstrap_submitted = False
+            return
+        embeddings = self.engine.encode_many([entry.text for entry in entries])
+        if embeddings is None:
+            self._bootstrap_submitted = False
+            return
+        vector_index_service.bootstrap(self.user_id, entries, embeddings)
+        logger.info(f"RAG: Bootstrapped vector index for user {self.user_id[:8]} with {len(entries)} entries")
+
+    def _rank_candidates(
+        self, query: str, candidates: list[IndexEntry], max_results: int
     ) -> list[RetrievedContext]:
-        """Retrieve user's successful coping strategies"""
-        contexts = []
-
-        try:
-            # Get strategies that have been helpful (rated positively)
-            strategies_docs = db.collection('users').document(self.user_id)\
-                .collection('coping_strategies')\
-                .where('effectiveness_rating', '>=', 3)\
-                .order_by('effectiveness_rating', direction='DESCENDING')\
-                .limit(15)\
-                .get()
-
-            for doc in strategies_docs:
-                data = doc.to_dict()
-                strategy_text = f"{data.get('name', '')} {data.get('description', '')}"
-
-                if strategy_text.strip():
-                    strategy_embedding = self.embed_text(strategy_text)
-                    if strategy_embedding is not None:
-                        similarity = self._calculate_similarity(query_embedding, strategy_embedding)
-
-                        if similarity > 0.6:
-                            contexts.append(RetrievedContext(
-                                content=f"Coping Strategy: {data.get('name', '')} - {data.get('description', '')}",
-                                source='coping_strategies',
-                                similarity=similarity,
-                                timestamp=datetime.fromisoformat(data.get('last_used', datetime.now().isoformat())),
-                                metadata={
-                                    'effectiveness': data.get('effectiveness_rating'),
-                                    'usage_count': data.get('usage_count', 0)
-                                }
-                            ))
-        except Exception as e:
-            logger.warning(f"RAG: Coping strategies retrieval failed: {e}")
+        """Embed query and candidates in one batch and keep the best matches above each source's threshold"""
+        if not candidates:
+            return []
 
-        return sorted(contexts, key=lambda x: x.similarity, reverse=True)[:max_results]
+        embeddings = self.engine.encode_many([query] + [c.text for c in candidates])
+        if embeddings is None:
+            logger.warning("RAG: Embedding batch failed, returning empty context")
+            return []
 
-    def _retrieve_conversation_history(
-        self, db, query_embedding: np.ndarray, cutoff_date: datetime, max_results: int
-    ) -> list[RetrievedContext]:
-        """Retrieve relevant previous conversations"""
-        contexts = []
+        similarities = cosine_similarities(embeddings[0], embeddings[1:])
+        contexts = [
+            RetrievedContext(
+                content=candidate.content,
+                source=candidate.source,
+                similarity=float(similarity),
+                timestamp=candidate.timestamp,
+                metadata=candidate.metadata,
+            )
+            for candidate, similarity in zip(candidates, similarities, strict=True)
+            if similarity > SOURCE_THRESHOLDS[candidate.source]
+        ]
+        contexts.sort(key=lambda x: x.similarity, reverse=True)
+        return contexts[:max_results]
 
-        try:
-            conv_docs = db.collection('users').document(self.user_id)\
-                .collection('conversations')\
-                .where('timestamp', '>=', cutoff_date.isoformat())\
-                .where('role', '==', 'user')\
-                .order_by('timestamp', direction='DESCENDING')\
-                .limit(40)\
-                .get()
-
-            # Group by session/conversation thread
-            session_messages: dict[str, list[dict]] = {}
-            for doc in conv_docs:
-                data = doc.to_dict()
-                session_id = data.get('session_id', 'default')
-                if session_id not in session_messages:
-                    session_messages[session_id] = []
-                session_messages[session_id].append(data)
-
-            # Find most relevant conversation threads
-            for session_id, messages in session_messages.items():
-                session_text = ' '.join([m.get('content', '') for m in messages])
-
-                if session_text.strip():
-                    session_embedding = self.embed_text(session_text)
-                    if session_embedding is not None:
-                        similarity = self._calculate_similarity(query_embedding, session_embedding)
-
-                        if similarity > 0.7:  # High threshold for conversations
-                            # Get AI responses from this session
-                            ai_responses = [
-                                m.get('content', '')[:150]
-                                for m in messages
-                                if m.get('role') == 'assistant'
-                            ]
-
-                            contexts.append(RetrievedContext(
-                                content=f"Previous conversation: {' '.join(ai_responses[:2])}",
-                                source='conversations',
-                                similarity=similarity,
-                                timestamp=datetime.fromisoformat(messages[0].get('timestamp', datetime.now().isoformat())),
-                                metadata={
-                                    'session_id': session_id,
-                                    'message_count': len(messages)
-                                }
-                            ))
-        except Exception as e:
-            logger.warning(f"RAG: Conversation history retrieval failed: {e}")
+    def _calculate_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+        """Calculate cosine similarity between embeddings"""
+        return float(np.dot(embedding1, embedding2) / (np.linalg.norm(embedding1) * np.linalg.norm(embedding2)))
 
-        return sorted(contexts, key=lambda x: x.similarity, reverse=True)[:max_results]
+    def _collect_mood_candidates(self, db, cutoff_date: datetime) -> list[IndexEntry]:
+        """Fetch recent mood entries"""
+        candidates = []
+
+        mood_docs = db.collection('users').document(self.user_id)\
+            .collection('moods')\
+            .where('timestamp', '>=', cutoff_date.isoformat())\
+            .order_by('timestamp', direction='DESCENDING')\
+            .limit(50)\
+            .get()
+
+        for doc in mood_docs:
+            entry = mood_entry(doc.id, doc.to_dict())
+            if entry is not None:
+                candidates.append(entry)
+
+        return candidates
+
+    def _collect_journal_candidates(self, db, cutoff_date: datetime) -> list[IndexEntry]:
+        """Fetch recent journal entries"""
+        candidates = []
+
+        journal_docs = db.collection('users').document(self.user_id)\
+            .collection('journal_entries')\
+            .where('timestamp', '>=', cutoff_date.isoformat())\
+            .order_by('timestamp', direction='DESCENDING')\
+            .limit(30)\
+            .get()
+
+        for doc in journal_docs:
+            entry = journal_entry(doc.id, doc.to_dict())
+            if entry is not None:
+                candidates.append(entry)
+
+        return candidates
+
+    def _collect_goal_candidates(self, db) -> list[IndexEntry]:
+        """Fetch user's active goals and aspirations"""
+        candidates = []
+
+        goals_docs = db.collection('users').document(self.user_id)\
+            .collection('goals')\
+            .where('status', 'in', ['active', 'in_progress'])\
+            .limit(20)\
+            .get()
+
+        for doc in goals_docs:
+            entry = goal_entry(doc.id, doc.to_dict())
+            if entry is not None:
+                candidates.append(entry)
+
+        return candidates
+
+    def _collect_coping_strategy_candidates(self, db) -> list[IndexEntry]:
+        """Fetch user's successful coping strategies"""
+        candidates = []
+
+        # Get strategies that have been helpful (rated positively)
+        strategies_docs = db.collection('users').document(self.user_id)\
+            .collection('coping_strategies')\
+            .where('effectiveness_rating', '>=', 3)\
+            .order_by('effectiveness_rating', direction='DESCENDING')\
+            .limit(15)\
+            .get()
+
+        for doc in strategies_docs:
+            entry = coping_strategy_entry(doc.id, doc.to_dict())
+            if entry is not None:
+                candidates.append(entry)
+
+        return candidates
+
+    def _collect_conversation_candidates(self, db, cutoff_date: datetime) -> list[IndexEntry]:
+        """Fetch recent user/assistant exchanges, keyed like index_chat_exchange() by the user message id"""
+        candidates = []
+
+        conv_docs = db.collection('users').document(self.user_id)\
+            .collection('conversations')\
+            .where('timestamp', '>=', cutoff_date.isoformat())\
+            .order_by('timestamp', direction='DESCENDING')\
+            .limit(80)\
+            .get()
+
+        # Pair each user message with the assistant reply that follows it
+        exchanges: dict[str, list[dict]] = {}
+        current: list[dict] | None = None
+        for doc in reversed(list(conv_docs)):
+            data = doc.to_dict()
+            if data.get('role') == 'user':
+                current = exchanges[doc.id] = [data]
+            elif data.get('role') == 'assistant' and current is not None and len(current) == 1:
+                current.append(data)
+
+        for exchange_id, messages in exchanges.items():
+            entry = conversation_entry(exchange_id, messages)
+            if entry is not None:
+                candidates.append(entry)
+
+        return candidates
 
     def augment_prompt(self, user_message: str, base_prompt: str) -> str:
         """
@@ -462,16 +634,14 @@ The following information from the user's history may help you provide a more pe
 
         return augmented_prompt
 
-    def get_cache_stats(self) -> dict[str, int]:
-        """Get embedding cache statistics"""
-        total_requests = self._cache_hits + self._cache_misses
-        hit_rate = self._cache_hits / total_requests if total_requests > 0 else 0
-
+    def get_cache_stats(self) -> dict[str, Any]:
+        """Get embedding cache statistics (shared across all users in this worker)"""
+        stats = self.engine.stats()
         return {
-            'cache_hits': self._cache_hits,
-            'cache_misses': self._cache_misses,
-            'hit_rate': hit_rate,
-            'cache_size': len(self._embedding_cache)
+            'cache_hits': stats['cache_hits'],
+            'cache_misses': stats['cache_misses'],
+            'hit_rate': stats['hit_rate'],
+            'cache_size': stats['cache_size']
         }
 
 
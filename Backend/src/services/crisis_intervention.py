@@ -69,14 +69,21 @@ class CrisisInterventionService:
             'critical': 0.95
         }
 
-        # Initialize semantic crisis detector
-        self.semantic_detector = None
-        if SEMANTIC_DETECTOR_AVAILABLE:
-            try:
-                self.semantic_detector = get_semantic_crisis_detector()
-                logger.info("✅ Semantic crisis detector integrated")
-            except Exception as e:
-                logger.warning(f"⚠️ Failed to load semantic detector: {e}")
+        # Semantic crisis detector, created on first text assessment (loads the embedding model)
+        self._semantic_detector = None
+        self._semantic_detector_attempted = False
+
+    @property
+    def semantic_detector(self):
+        if not self._semantic_detector_attempted:
+            self._semantic_detector_attempted = True
+            if SEMANTIC_DETECTOR_AVAILABLE:
+                try:
+                    self._semantic_detector = get_semantic_crisis_detector()
+                    logger.info("✅ Semantic crisis detector integrated")
+                except Exception as e:
+                    logger.warning(f"⚠️ Failed to load semantic detector: {e}")
+        return self._semantic_detector
 
     def assess_text_crisis_risk(self, text: str, conversation_context: list | None = None) -> CrisisAssessment:
         """
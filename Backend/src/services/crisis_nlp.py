@@ -7,17 +7,44 @@ import logging
 from dataclasses import dataclass
 from typing import Any
 
-try:
-    import torch
-    import torch.nn.functional as F
-    from sentence_transformers import SentenceTransformer
-    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+import numpy as np
+
+from ..utils.lazy_imports import is_available, load
+from ..utils.text_scanner import TextScanner
+from .embedding_engine import SENTENCE_TRANSFORMERS_AVAILABLE, cosine_similarities, get_embedding_engine
 
 logger = logging.getLogger(__name__)
 
+TRANSFORMERS_AVAILABLE = is_available('transformers') and is_available('torch')
+
+# Keywords for the fallback detector (from original system but expanded)
+FALLBACK_CRISIS_KEYWORDS = {
+    'suicidal': [
+        'döda mig', 'ta livet av mig', 'självmord', 'inte orka längre',
+        'sluta leva', 'vill dö', 'inte vilja leva', 'hellre död'
+    ],
+    'self_harm': [
+        'skada mig själv', 'skära mig', 'göra illa mig', 'självskada',
+        'straffa mig själv', 'förtjänar smärta'
+    ],
+    'hopelessness': [
+        'hopplöst', 'ingen mening', 'allt är meningslöst', 'ge upp',
+        'ingen utväg', 'inget hopp', 'kommer aldrig bli bättre'
+    ],
+    'severe_distress': [
+        'kan inte fortsätta', 'håller på att bryta ihop',
+        'psykiskt sammanbrott', 'mår för jävligt', 'orkar inte mer',
+        'hjälp mig', 'vet inte vad jag ska göra'
+    ]
+}
+FALLBACK_CATEGORY_SEVERITY = {
+    'suicidal': 0.9,
+    'self_harm': 0.85,
+    'hopelessness': 0.7,
+    'severe_distress': 0.6,
+}
+_FALLBACK_SCANNER = TextScanner(FALLBACK_CRISIS_KEYWORDS)
+
 
 @dataclass
 class SemanticCrisisAssessment:
@@ -158,18 +185,20 @@ class SemanticCrisisDetector:
     def __init__(self, use_gpu: bool = False):
         logger.info("🔬 Initializing Semantic Crisis Detector...")
 
-        self.device = "cuda" if (use_gpu and torch.cuda.is_available()) else "cpu"
-        self.transformers_available = TRANSFORMERS_AVAILABLE
+        self.transformers_available = TRANSFORMERS_AVAILABLE and SENTENCE_TRANSFORMERS_AVAILABLE
+        self.device = "cuda" if (use_gpu and self.transformers_available and load('torch').cuda.is_available()) else "cpu"
 
-        if not TRANSFORMERS_AVAILABLE:
+        if not self.transformers_available:
             logger.warning("⚠️ Transformers not available, falling back to keyword detection")
             self._init_fallback()
             return
 
         try:
-            # Swedish BERT for embeddings (semantic similarity)
-            logger.info("📥 Loading Swedish sentence transformer...")
-            self.embedding_model = SentenceTransformer('KBLab/sentence-bert-swedish-cased')
+            # Swedish BERT for embeddings (semantic similarity), shared with the RAG services
+            self.engine = get_embedding_engine()
+            self.embedding_model = self.engine.model  # None when encoding runs in the inference server
+            if not self.engine.available:
+                raise RuntimeError("embedding model unavailable")
 
             # Pre-compute embeddings for crisis concepts
             self._precompute_concept_embeddings()
@@ -187,6 +216,7 @@ class SemanticCrisisDetector:
         """Initialize fallback keyword-based detection."""
         logger.warning("Using fallback keyword-based detection")
         self.fallback_mode = True
+        self.engine = None
         self.embedding_model = None
         self.concept_embeddings = {}
 
@@ -194,15 +224,21 @@ class SemanticCrisisDetector:
         """Pre-compute embeddings for all crisis concepts."""
         logger.info("🧮 Pre-computing concept embeddings...")
 
+        # Embed every concept description and example in a single batch
+        groups = [[concept.description] + concept.examples for concept in self.CRISIS_CONCEPTS]
+        all_embeddings = self.engine.encode_many([text for texts in groups for text in texts])
+        if all_embeddings is None:
+            raise RuntimeError("concept embedding failed")
+
         self.concept_embeddings = {}
-        for concept in self.CRISIS_CONCEPTS:
-            # Embed concept description and all examples
-            texts = [concept.description] + concept.examples
-            embeddings = self.embedding_model.encode(texts, convert_to_tensor=True)
+        offset = 0
+        for concept, texts in zip(self.CRISIS_CONCEPTS, groups, strict=True):
+            embeddings = all_embeddings[offset:offset + len(texts)]
+            offset += len(texts)
 
             # Store mean embedding for the concept
             self.concept_embeddings[concept.name] = {
-                'mean_embedding': embeddings.mean(dim=0),
+                'mean_embedding': embeddings.mean(axis=0),
                 'individual_embeddings': embeddings,
                 'concept': concept
             }
@@ -231,8 +267,12 @@ class SemanticCrisisDetector:
             return self._fallback_detection(text, conversation_context)
 
         try:
-            # 1. Semantic embedding of input text
-            text_embedding = self.embedding_model.encode(text, convert_to_tensor=True)
+            # 1. Semantic embedding of input text and recent user messages, in one batch
+            context_messages = self._context_user_messages(conversation_context)
+            embeddings = self.engine.encode_many([text] + context_messages)
+            if embeddings is None:
+                raise RuntimeError("embedding failed")
+            text_embedding = embeddings[0]
 
             # 2. Calculate similarity to each crisis concept
             concept_scores = self._calculate_concept_similarities(text_embedding)
@@ -241,7 +281,7 @@ class SemanticCrisisDetector:
             urgency_detected = self._detect_urgency(text)
 
             # 4. Consider conversation context
-            context_score = self._analyze_context(conversation_context) if conversation_context else 0.0
+            context_score = self._analyze_context(conversation_context, embeddings[1:]) if conversation_context else 0.0
 
             # 5. Calculate overall risk score
             semantic_score = self._calculate_semantic_risk(concept_scores, urgency_detected, context_score)
@@ -269,23 +309,17 @@ class SemanticCrisisDetector:
             logger.error(f"❌ Semantic detection failed: {e}, using fallback")
             return self._fallback_detection(text, conversation_context)
 
-    def _calculate_concept_similarities(self, text_embedding) -> dict[str, float]:
+    def _calculate_concept_similarities(self, text_embedding: np.ndarray) -> dict[str, float]:
         """Calculate cosine similarity between text and all crisis concepts."""
         similarities = {}
 
         for concept_name, concept_data in self.concept_embeddings.items():
             # Cosine similarity with mean embedding
-            mean_sim = F.cosine_similarity(
-                text_embedding.unsqueeze(0),
-                concept_data['mean_embedding'].unsqueeze(0)
-            ).item()
+            mean_sim = float(cosine_similarities(text_embedding, concept_data['mean_embedding'][np.newaxis, :])[0])
 
             # Also check max similarity with any individual example
-            individual_sims = F.cosine_similarity(
-                text_embedding.unsqueeze(0),
-                concept_data['individual_embeddings']
-            )
-            max_sim = individual_sims.max().item()
+            individual_sims = cosine_similarities(text_embedding, concept_data['individual_embeddings'])
+            max_sim = float(individual_sims.max())
 
             # Weighted combination
             final_score = 0.6 * mean_sim + 0.4 * max_sim
@@ -307,29 +341,30 @@ class SemanticCrisisDetector:
                 return True
         return False
 
-    def _analyze_context(self, conversation_context: list[dict]) -> float:
-        """Analyze conversation history for escalation patterns."""
+    @staticmethod
+    def _context_user_messages(conversation_context: list[dict] | None) -> list[str]:
+        """User messages among the last 5 exchanges, or [] if there is too little history."""
         if not conversation_context or len(conversation_context) < 2:
-            return 0.0
+            return []
+        return [msg.get('content', '') for msg in conversation_context[-5:] if msg.get('role') == 'user']
 
+    def _analyze_context(self, conversation_context: list[dict], message_embeddings: np.ndarray | None = None) -> float:
+        """Analyze conversation history for escalation patterns."""
         # Check for deteriorating sentiment across recent messages
-        recent_messages = conversation_context[-5:]  # Last 5 exchanges
+        messages = self._context_user_messages(conversation_context)
+        if not messages or self.engine is None:
+            return 0.0
+
+        if message_embeddings is None:
+            message_embeddings = self.engine.encode_many(messages)
+            if message_embeddings is None:
+                return 0.0
 
         # Simple heuristic: if multiple recent messages show distress, increase risk
-        distress_count = 0
-        for msg in recent_messages:
-            if msg.get('role') == 'user':
-                msg_text = msg.get('content', '')
-                # Quick embedding check
-                if self.embedding_model:
-                    msg_emb = self.embedding_model.encode(msg_text, convert_to_tensor=True)
-                    # Check similarity to severe_distress concept
-                    distress_sim = F.cosine_similarity(
-                        msg_emb.unsqueeze(0),
-                        self.concept_embeddings['severe_distress']['mean_embedding'].unsqueeze(0)
-                    ).item()
-                    if distress_sim > 0.5:
-                        distress_count += 1
+        distress_sims = cosine_similarities(
+            self.concept_embeddings['severe_distress']['mean_embedding'], message_embeddings
+        )
+        distress_count = int((distress_sims > 0.5).sum())
 
         # Return context escalation score
         return min(0.3, distress_count * 0.1)
@@ -416,44 +451,16 @@ class SemanticCrisisDetector:
     def _fallback_detection(self, text: str, conversation_context: list | None = None) -> SemanticCrisisAssessment:
         """Fallback to enhanced keyword-based detection."""
 
-        text_lower = text.lower()
-
-        # Enhanced keyword matching (from original system but expanded)
-        crisis_keywords = {
-            'suicidal': [
-                'döda mig', 'ta livet av mig', 'självmord', 'inte orka längre',
-                'sluta leva', 'vill dö', 'inte vilja leva', 'hellre död'
-            ],
-            'self_harm': [
-                'skada mig själv', 'skära mig', 'göra illa mig', 'självskada',
-                'straffa mig själv', 'förtjänar smärta'
-            ],
-            'hopelessness': [
-                'hopplöst', 'ingen mening', 'allt är meningslöst', 'ge upp',
-                'ingen utväg', 'inget hopp', 'kommer aldrig bli bättre'
-            ],
-            'severe_distress': [
-                'kan inte fortsätta', 'håller på att bryta ihop',
-                'psykiskt sammanbrott', 'mår för jävligt', 'orkar inte mer',
-                'hjälp mig', 'vet inte vad jag ska göra'
-            ]
-        }
+        # Every keyword category in one scan
+        hits = _FALLBACK_SCANNER.scan(text)
 
         detected_indicators = []
         max_severity = 0
 
-        for category, keywords in crisis_keywords.items():
+        for category, keywords in hits.terms.items():
             for keyword in keywords:
-                if keyword in text_lower:
-                    detected_indicators.append(f"Nyckelord: '{keyword}' ({category})")
-                    if category == 'suicidal':
-                        max_severity = max(max_severity, 0.9)
-                    elif category == 'self_harm':
-                        max_severity = max(max_severity, 0.85)
-                    elif category == 'hopelessness':
-                        max_severity = max(max_severity, 0.7)
-                    else:
-                        max_severity = max(max_severity, 0.6)
+                detected_indicators.append(f"Nyckelord: '{keyword}' ({category})")
+            max_severity = max(max_severity, FALLBACK_CATEGORY_SEVERITY[category])
 
         # Check urgency patterns
         urgency_detected = self._detect_urgency(text) if hasattr(self, '_detect_urgency') else False
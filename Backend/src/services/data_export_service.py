@@ -0,0 +1,474 @@
+"""
+Background GDPR data export.
+
+``start_export`` queues a job and returns immediately; the job fetches every
+section of the user's data in parallel, streams each Firestore collection in
+fixed-size cursor pages into a per-section NDJSON file and finally packs the
+files into one zip archive on disk. Only one page per section is ever held
+in memory, and no request thread waits on the export.
+
+Job status lives next to the archive as ``{job_id}.json``, so any worker on
+the same host can answer status polls and serve the download. Deployments
+with more than one host must mount ``DATA_EXPORT_DIR`` on a volume shared by
+every instance; otherwise a status poll routed to another instance answers
+"not found".
+
+Archives hold the user's complete data in plain form, so they are kept no
+longer than needed: an archive is deleted as soon as it has been downloaded
+(or after ``DATA_EXPORT_TTL_SECONDS``), and ``purge_user`` removes every job
+and archive of a user when the account is deleted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from google.cloud.firestore import FieldFilter
+
+from ..firebase_config import db
+from ..utils.firestore_paging import iter_pages
+
+logger = logging.getLogger(__name__)
+
+DATA_EXPORT_DIR = os.getenv('DATA_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'lugn_trygg_exports'))
+EXPORT_VERSION = '2.0'
+# Documents per Firestore cursor page
+EXPORT_PAGE_SIZE = int(os.getenv('DATA_EXPORT_PAGE_SIZE', '500'))
+# Sections fetched concurrently within one export
+EXPORT_SECTION_WORKERS = int(os.getenv('DATA_EXPORT_SECTION_WORKERS', '6'))
+# Exports running concurrently per worker process
+EXPORT_MAX_CONCURRENT_JOBS = int(os.getenv('DATA_EXPORT_MAX_JOBS', '2'))
+# Finished archives are deleted after this long
+EXPORT_TTL_SECONDS = int(os.getenv('DATA_EXPORT_TTL_SECONDS', str(24 * 3600)))
+# A running job whose status has not moved for this long is reported as failed
+EXPORT_STALE_SECONDS = 15 * 60
+# Bytes per chunk when streaming an archive to the client
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+ACTIVE_STATUSES = ('queued', 'running')
+# Jobs in these states no longer have an archive; a new request starts a fresh export
+FINISHED_STATUSES = ('failed', 'downloaded')
+
+
+class ExportPurged(Exception):
+    """The job's files were removed (account deletion) while it was running."""
+
+
+@dataclass
+class ExportSection:
+    """One part of the export: a single document or a (paged) collection query."""
+    name: str
+    kind: str  # 'document' or 'collection'
+    source: Callable[[str], Any]
+
+
+def _user_subcollection(name: str) -> Callable[[str], Any]:
+    return lambda user_id: db.collection('users').document(user_id).collection(name)
+
+
+def _owned_by(collection: str, owner_field: str = 'user_id') -> Callable[[str], Any]:
+    return lambda user_id: db.collection(collection).where(filter=FieldFilter(owner_field, '==', user_id))
+
+
+def _document(collection: str) -> Callable[[str], Any]:
+    return lambda user_id: db.collection(collection).document(user_id)
+
+
+# Everything a user can request under GDPR Art. 15/20, in archive order
+EXPORT_SECTIONS: tuple[ExportSection, ...] = (
+    ExportSection('userProfile', 'document', _document('users')),
+    ExportSection('moods', 'collection', _user_subcollection('moods')),
+    ExportSection('memories', 'collection', _owned_by('memories')),
+    ExportSection('chatSessions', 'collection', _user_subcollection('chat_sessions')),
+    ExportSection('feedback', 'collection', _owned_by('feedback')),
+    ExportSection('achievements', 'collection', _user_subcollection('achievements')),
+    ExportSection('referrals', 'collection', _owned_by('referrals', 'referrer_id')),
+    ExportSection('aiConversations', 'collection', _user_subcollection('ai_conversations')),
+    ExportSection('journalEntries', 'collection', _owned_by('journal_entries')),
+    ExportSection('wellnessActivities', 'collection', _user_subcollection('wellness_activities')),
+    ExportSection('notifications', 'collection', _user_subcollection('notifications')),
+    ExportSection('subscription', 'document', _document('subscriptions')),
+    ExportSection('cbtProgress', 'document', _document('cbt_progress')),
+    ExportSection('moodAggregates', 'document', _document('mood_aggregates')),
+    ExportSection('crisisAssessments', 'collection', _owned_by('crisis_assessments')),
+    ExportSection('safetyPlan', 'document', _document('safety_plans')),
+    ExportSection('syncHistory', 'collection', _owned_by('sync_history')),
+    ExportSection('peerChatMessages', 'peer_messages', _owned_by('peer_chat_presence')),
+    # Chat RAG entries: snippets of moods, journal entries and chats with their embeddings
+    ExportSection('ragEmbeddings', 'collection', _user_subcollection('rag_embeddings')),
+)
+
+
+@dataclass
+class ExportJob:
+    """Persisted state of one export job."""
+    job_id: str
+    user_id: str
+    status: str = 'queued'  # queued, running, completed, downloaded, failed
+    sections_total: int = len(EXPORT_SECTIONS)
+    sections_completed: int = 0
+    document_count: int = 0
+    counts: dict[str, int] = field(default_factory=dict)
+    size_bytes: int = 0
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    completed_at: float | None = None
+
+    @property
+    def progress(self) -> int:
+        if self.status == 'completed':
+            return 100
+        # Packing the archive is the last step, so sections cap at 95%
+        return int(95 * self.sections_completed / max(self.sections_total, 1))
+
+    @property
+    def expires_at(self) -> float | None:
+        return self.completed_at + EXPORT_TTL_SECONDS if self.completed_at else None
+
+    def as_status(self) -> dict[str, Any]:
+        """API representation of the job."""
+        def iso(ts: float | None) -> str | None:
+            return datetime.fromtimestamp(ts, UTC).isoformat() if ts else None
+
+        return {
+            'jobId': self.job_id,
+            'status': self.status,
+            'progress': self.progress,
+            'sectionsCompleted': self.sections_completed,
+            'sectionsTotal': self.sections_total,
+            'documentCount': self.document_count,
+            'counts': dict(self.counts),
+            'sizeBytes': self.size_bytes,
+            'createdAt': iso(self.created_at),
+            'completedAt': iso(self.completed_at),
+            'expiresAt': iso(self.expires_at),
+            'error': self.error,
+        }
+
+
+class DataExportService:
+    """Runs GDPR exports off the request path and serves their status and archives."""
+
+    def __init__(
+        self,
+        export_dir: str = DATA_EXPORT_DIR,
+        page_size: int = EXPORT_PAGE_SIZE,
+        section_workers: int = EXPORT_SECTION_WORKERS,
+        max_jobs: int = EXPORT_MAX_CONCURRENT_JOBS,
+    ) -> None:
+        self.export_dir = Path(export_dir)
+        self.page_size = page_size
+        self.section_workers = section_workers
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    # ──────────────────────────────────────────────────────────────
+    # Job state
+    # ──────────────────────────────────────────────────────────────
+
+    def _job_path(self, job_id: str) -> Path:
+        return self.export_dir / f"{job_id}.json"
+
+    def archive_path(self, job_id: str) -> Path:
+        return self.export_dir / f"{job_id}.zip"
+
+    def _user_pointer(self, user_id: str) -> Path:
+        return self.export_dir / f"user-{hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:32]}.json"
+
+    def _save_job(self, job: ExportJob) -> None:
+        job.updated_at = time.time()
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._job_path(job.job_id).with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(asdict(job)), encoding='utf-8')
+        os.replace(tmp_path, self._job_path(job.job_id))
+
+    def get_job(self, job_id: str) -> ExportJob | None:
+        """Load a job by ID; unknown, malformed or expired IDs return None."""
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        try:
+            job = ExportJob(**json.loads(self._job_path(job_id).read_text(encoding='utf-8')))
+        except (OSError, ValueError, TypeError):
+            return None
+
+        now = time.time()
+        if job.expires_at and job.expires_at < now:
+            return None
+        if job.status in ACTIVE_STATUSES and now - job.updated_at > EXPORT_STALE_SECONDS:
+            job.status = 'failed'
+            job.error = 'Export stopped responding'
+        return job
+
+    def latest_job(self, user_id: str) -> ExportJob | None:
+        try:
+            job_id = json.loads(self._user_pointer(user_id).read_text(encoding='utf-8')).get('job_id', '')
+        except (OSError, ValueError):
+            return None
+        job = self.get_job(job_id)
+        return job if job and job.user_id == user_id else None
+
+    # ──────────────────────────────────────────────────────────────
+    # Running exports
+    # ──────────────────────────────────────────────────────────────
+
+    def start_export(self, user_id: str) -> ExportJob:
+        """
+        Queue an export for ``user_id`` and return its job.
+
+        A queued, running or still downloadable export is returned instead of
+        starting a second one.
+        """
+        self.cleanup_expired()
+        with self._lock:
+            existing = self.latest_job(user_id)
+            if existing and existing.status not in FINISHED_STATUSES:
+                return existing
+
+            job = ExportJob(job_id=secrets.token_urlsafe(24), user_id=user_id)
+            self._save_job(job)
+            self._user_pointer(user_id).write_text(json.dumps({'job_id': job.job_id}), encoding='utf-8')
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix='data-export')
+
+        self._executor.submit(self.run_export, job)
+        logger.info(f"📦 Queued data export {job.job_id[:8]} for user {user_id[:8]}")
+        return job
+
+    def run_export(self, job: ExportJob) -> ExportJob:
+        """Build the archive for ``job``; failures are recorded on the job, never raised."""
+        work_dir = self.export_dir / f"{job.job_id}.parts"
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                self._check_not_purged(job)
+                job.status = 'running'
+                self._save_job(job)
+            work_dir.mkdir(parents=True, exist_ok=True)
+
+            files: dict[str, Path] = {}
+            with ThreadPoolExecutor(max_workers=self.section_workers, thread_name_prefix='data-export-section') as pool:
+                futures = {
+                    pool.submit(self._export_section, section, job.user_id, work_dir): section
+                    for section in EXPORT_SECTIONS
+                }
+                for future in as_completed(futures):
+                    section = futures[future]
+                    path, count = future.result()  # a failed section fails the export
+                    if path is not None:
+                        files[section.name] = path
+                    with self._lock:
+                        self._check_not_purged(job)
+                        job.counts[section.name] = count
+                        job.document_count += count
+                        job.sections_completed += 1
+                        self._save_job(job)
+
+            self._write_archive(job, files)
+            with self._lock:
+                if not self._job_path(job.job_id).exists():
+                    self.archive_path(job.job_id).unlink(missing_ok=True)
+                    raise ExportPurged(job.job_id)
+                job.status = 'completed'
+                job.completed_at = time.time()
+                job.size_bytes = self.archive_path(job.job_id).stat().st_size
+                self._save_job(job)
+            logger.info(
+                f"✅ Data export {job.job_id[:8]} completed: {job.document_count} documents, "
+                f"{job.size_bytes} bytes in {time.perf_counter() - started:.1f}s"
+            )
+            self._audit(job)
+        except ExportPurged:
+            logger.info(f"🗑️ Data export {job.job_id[:8]} discarded: user data was deleted")
+        except Exception as e:
+            logger.exception(f"❌ Data export {job.job_id[:8]} failed: {e}")
+            job.status = 'failed'
+            job.error = 'Export failed'
+            with self._lock:
+                if self._job_path(job.job_id).exists():
+                    self._save_job(job)
+                else:
+                    # Purged mid-write: do not leave a partial archive behind
+                    self.archive_path(job.job_id).unlink(missing_ok=True)
+                    (self.export_dir / f"{job.job_id}.zip.part").unlink(missing_ok=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return job
+
+    def _check_not_purged(self, job: ExportJob) -> None:
+        # purge_user removes the job file; saving again would resurrect it
+        if not self._job_path(job.job_id).exists():
+            raise ExportPurged(job.job_id)
+
+    def stream_archive(self, job_id: str) -> Iterator[bytes]:
+        """
+        Stream a completed archive and delete it once fully sent.
+
+        The file is opened before returning, so a concurrent deletion cannot
+        cut the download short; an interrupted download keeps the archive.
+        """
+        handle = open(self.archive_path(job_id), 'rb')
+
+        def _chunks() -> Iterator[bytes]:
+            with handle:
+                while chunk := handle.read(DOWNLOAD_CHUNK_SIZE):
+                    yield chunk
+            self.mark_downloaded(job_id)
+
+        return _chunks()
+
+    def mark_downloaded(self, job_id: str) -> None:
+        """Delete a delivered archive; the job stays visible as 'downloaded' until its TTL."""
+        with self._lock:
+            job = self.get_job(job_id)
+            if job is None or job.status != 'completed':
+                return
+            self.archive_path(job_id).unlink(missing_ok=True)
+            job.status = 'downloaded'
+            self._save_job(job)
+        logger.info(f"🗑️ Removed downloaded data export {job_id[:8]}")
+
+    def purge_user(self, user_id: str) -> int:
+        """Remove every export job and archive belonging to ``user_id``; returns jobs removed."""
+        removed = 0
+        if not self.export_dir.exists():
+            return removed
+        with self._lock:
+            for job_file in self.export_dir.glob('*.json'):
+                if job_file.name.startswith('user-'):
+                    continue
+                try:
+                    data = json.loads(job_file.read_text(encoding='utf-8'))
+                    if data.get('user_id') != user_id:
+                        continue
+                    job_id = data['job_id']
+                except (OSError, ValueError, KeyError):
+                    continue
+                job_file.unlink(missing_ok=True)
+                self.archive_path(job_id).unlink(missing_ok=True)
+                (self.export_dir / f"{job_id}.zip.part").unlink(missing_ok=True)
+                shutil.rmtree(self.export_dir / f"{job_id}.parts", ignore_errors=True)
+                removed += 1
+            self._user_pointer(user_id).unlink(missing_ok=True)
+        if removed:
+            logger.info(f"🗑️ Purged {removed} data exports for user {user_id[:8]}")
+        return removed
+
+    def _export_section(self, section: ExportSection, user_id: str, work_dir: Path) -> tuple[Path | None, int]:
+        """Write one section to disk; returns (file, document count)."""
+        if section.kind == 'document':
+            snap = section.source(user_id).get()
+            if not snap.exists:
+                return None, 0
+            path = work_dir / f"{section.name}.json"
+            path.write_text(
+                json.dumps(snap.to_dict() or {}, indent=2, default=str, ensure_ascii=False), encoding='utf-8'
+            )
+            return path, 1
+
+        if section.kind == 'peer_messages':
+            # Peer chat messages are keyed by session_id, not user_id — collect via presence
+            session_ids = [snap.id for snap in iter_pages(section.source(user_id), self.page_size)]
+            queries = [
+                db.collection('peer_chat_messages').where(filter=FieldFilter('session_id', '==', session_id))
+                for session_id in session_ids
+            ]
+        else:
+            queries = [section.source(user_id)]
+
+        path = work_dir / f"{section.name}.ndjson"
+        count = 0
+        with open(path, 'w', encoding='utf-8') as out:
+            for query in queries:
+                for snap in iter_pages(query, self.page_size):
+                    out.write(json.dumps({**(snap.to_dict() or {}), 'id': snap.id}, default=str, ensure_ascii=False))
+                    out.write('\n')
+                    count += 1
+        return path, count
+
+    def _write_archive(self, job: ExportJob, files: dict[str, Path]) -> None:
+        """Pack the section files and a manifest into ``{job_id}.zip`` (atomically)."""
+        part_path = self.export_dir / f"{job.job_id}.zip.part"
+        manifest = {
+            'exportMetadata': {
+                'userId': job.user_id,
+                'exportDate': datetime.now(UTC).isoformat(),
+                'exportVersion': EXPORT_VERSION,
+                'dataFormat': 'NDJSON (one JSON object per line) per collection, JSON per document',
+            },
+            'sections': {
+                section.name: {
+                    'file': files[section.name].name if section.name in files else None,
+                    'count': job.counts.get(section.name, 0),
+                }
+                for section in EXPORT_SECTIONS
+            },
+        }
+        with zipfile.ZipFile(part_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('manifest.json', json.dumps(manifest, indent=2, ensure_ascii=False))
+            for section in EXPORT_SECTIONS:
+                if section.name in files:
+                    archive.write(files[section.name], arcname=files[section.name].name)
+        os.replace(part_path, self.archive_path(job.job_id))
+
+    def _audit(self, job: ExportJob) -> None:
+        try:
+            from .audit_service import audit_log
+            audit_log('data_exported', job.user_id, {
+                'job_id': job.job_id,
+                'size_bytes': job.size_bytes,
+                'document_count': job.document_count,
+            })
+        except Exception as e:
+            logger.warning(f"Audit logging of data export failed (non-blocking): {e}")
+
+    def cleanup_expired(self) -> int:
+        """Delete archives and job files past their TTL; returns jobs removed."""
+        removed = 0
+        if not self.export_dir.exists():
+            return removed
+        now = time.time()
+        for job_file in self.export_dir.glob('*.json'):
+            if job_file.name.startswith('user-'):
+                # Pointers outlive their job by at most one TTL
+                try:
+                    if now - job_file.stat().st_mtime > 2 * EXPORT_TTL_SECONDS:
+                        job_file.unlink(missing_ok=True)
+                except OSError:
+                    pass
+                continue
+            try:
+                data = json.loads(job_file.read_text(encoding='utf-8'))
+                completed_at = data.get('completed_at')
+                reference = completed_at or data.get('updated_at', 0)
+                if now - reference <= EXPORT_TTL_SECONDS:
+                    continue
+                self.archive_path(data['job_id']).unlink(missing_ok=True)
+                job_file.unlink(missing_ok=True)
+                removed += 1
+            except (OSError, ValueError, KeyError):
+                continue
+        if removed:
+            logger.info(f"🗑️ Removed {removed} expired data exports")
+        return removed
+
+
+data_export_service = DataExportService()
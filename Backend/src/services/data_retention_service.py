@@ -269,6 +269,9 @@ class DataRetentionService:
         try:
             result = self.apply_retention_policy()
 
+            # Expired audit logs (pruned here instead of inside audit writes)
+            audit_service.apply_retention_policy()
+
             if result['success']:
                 logger.info(f"✅ Scheduled retention cleanup completed: {result['total_deleted']} records deleted")
             else:
@@ -0,0 +1,256 @@
+"""
+Shared sentence-embedding engine for Lugn & Trygg.
+
+One lazily loaded SentenceTransformer per model name and worker process,
+shared by the chat RAG service, the therapeutic RAG vector store and the
+semantic crisis detector. Callers hand over every text they need for a
+request in one ``encode_many`` call. Repeated texts are served from an
+in-process LRU, and the remaining ones go through the model as a single
+batched forward pass instead of one ``encode`` call per document.
+
+When the host runs an inference server (``inference_server.py``), the
+forward pass happens there and the LRU stays in the worker.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import logging
+import os
+import threading
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+from ..utils.cache import TwoTierCache
+from .inference_server import InferenceUnavailable, infer, use_inference_server
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec('sentence_transformers') is not None
+
+# Swedish sentence-BERT: used by RAG indexing (Pinecone index is 768-d) and crisis detection
+DEFAULT_EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL_NAME', 'KBLab/sentence-bert-swedish-cased')
+DEFAULT_EMBEDDING_DIMENSION = 768
+# Chat RAG keeps the model its SOURCE_THRESHOLDS were calibrated on; another model needs new thresholds
+CHAT_RAG_EMBEDDING_MODEL = os.getenv(
+    'CHAT_RAG_EMBEDDING_MODEL', 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+)
+# Widths known before a model is loaded (e.g. when encoding runs in the inference server)
+KNOWN_EMBEDDING_DIMENSIONS = {
+    'KBLab/sentence-bert-swedish-cased': 768,
+    'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2': 384,
+}
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '4096'))
+# Embeddings of a given text never change for a loaded model; TTL only bounds staleness of the LRU
+EMBEDDING_CACHE_TTL = 24 * 3600
+
+
+class EmbeddingEngine:
+    """Lazily loaded, thread-safe sentence encoder with batching and an embedding LRU."""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        cache_size: int = EMBEDDING_CACHE_SIZE,
+        device: str | None = None,
+    ) -> None:
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self._model: Any = None
+        self._load_attempted = False
+        self._dimension: int | None = None
+        self._load_lock = threading.Lock()
+        self._cache = TwoTierCache(
+            f"embeddings:{model_name}",
+            default_ttl=EMBEDDING_CACHE_TTL,
+            max_size=cache_size,
+            use_redis=False,
+        )
+        self._stats_lock = threading.Lock()
+        self._stats = {'batches': 0, 'encoded_texts': 0, 'errors': 0}
+
+    # ──────────────────────────────────────────────────────────────
+    # Model lifecycle
+    # ──────────────────────────────────────────────────────────────
+
+    @property
+    def model(self) -> Any:
+        """
+        The underlying SentenceTransformer, loading it on first access (None if unavailable).
+        Always None in web workers that encode through the inference server.
+        """
+        if use_inference_server():
+            return None
+        if not self._load_attempted:
+            self._load()
+        return self._model
+
+    @property
+    def available(self) -> bool:
+        return use_inference_server() or self.model is not None
+
+    @property
+    def disabled(self) -> bool:
+        """True when encoding can never succeed (library missing or model failed to load); does not load."""
+        return not SENTENCE_TRANSFORMERS_AVAILABLE or (self._load_attempted and self._model is None)
+
+    @property
+    def dimension(self) -> int:
+        """Embedding width; falls back to the model's known (or the default) width before/without a model."""
+        if self._dimension is None and not use_inference_server() and self.model is not None:
+            try:
+                self._dimension = int(self._model.get_sentence_embedding_dimension())
+            except Exception:
+                self._dimension = None
+        return self._dimension or KNOWN_EMBEDDING_DIMENSIONS.get(self.model_name, DEFAULT_EMBEDDING_DIMENSION)
+
+    def _load(self) -> None:
+        with self._load_lock:
+            if self._load_attempted:
+                return
+            try:
+                if not SENTENCE_TRANSFORMERS_AVAILABLE:
+                    logger.warning("sentence-transformers not available, embeddings disabled")
+                    return
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(f"📥 Loading embedding model {self.model_name}...")
+                self._model = SentenceTransformer(self.model_name, device=self.device)
+                logger.info(f"✅ Embedding model {self.model_name} loaded")
+            except Exception as e:
+                logger.error(f"❌ Failed to load embedding model {self.model_name}: {e}")
+                self._model = None
+            finally:
+                self._load_attempted = True
+
+    # ──────────────────────────────────────────────────────────────
+    # Encoding
+    # ──────────────────────────────────────────────────────────────
+
+    def encode(self, text: str) -> np.ndarray | None:
+        """Embed a single text. Returns None when no model is available."""
+        matrix = self.encode_many([text])
+        return None if matrix is None else matrix[0]
+
+    def encode_many(self, texts: Sequence[str]) -> np.ndarray | None:
+        """
+        Embed ``texts`` as a ``(len(texts), dim)`` float32 matrix, row-aligned with the input.
+
+        Duplicate and previously seen texts are looked up in the LRU; only the
+        rest reach the model, in one batched ``encode`` call. Returns None when
+        no model is available or encoding fails.
+        """
+        if not self.available:
+            return None
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        keys = [self._cache_key(text) for text in texts]
+        vectors: dict[str, np.ndarray] = {}
+        pending: dict[str, str] = {}
+        for key, text in zip(keys, texts, strict=True):
+            if key in vectors or key in pending:
+                continue
+            cached = self._cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                pending[key] = text
+
+        if pending:
+            encoded = self._encode(list(pending.values()))
+            if encoded is None:
+                with self._stats_lock:
+                    self._stats['errors'] += 1
+                return None
+
+            for key, vector in zip(pending, encoded, strict=True):
+                vector.setflags(write=False)
+                vectors[key] = vector
+                self._cache.set(key, vector)
+            with self._stats_lock:
+                self._stats['batches'] += 1
+                self._stats['encoded_texts'] += len(pending)
+
+        return np.stack([vectors[key] for key in keys])
+
+    def _encode(self, texts: list[str]) -> np.ndarray | None:
+        """One model call for ``texts``, in the inference server when this worker uses one."""
+        try:
+            if use_inference_server():
+                encoded = np.asarray(infer('embeddings', {'model': self.model_name, 'texts': texts}), dtype=np.float32)
+                if self._dimension is None and encoded.ndim == 2:
+                    self._dimension = int(encoded.shape[1])
+                return encoded
+            encoded = self._model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+            return np.asarray(encoded, dtype=np.float32)
+        except InferenceUnavailable as e:
+            logger.warning(f"⚠️ Embedding batch of {len(texts)} texts unavailable: {e}")
+        except Exception as e:
+            logger.error(f"❌ Embedding batch of {len(texts)} texts failed: {e}")
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        """Load state, batch counters and embedding LRU statistics."""
+        with self._stats_lock:
+            counters = dict(self._stats)
+        cache_stats = self._cache.stats()
+        return {
+            'model_name': self.model_name,
+            'loaded': self._model is not None,
+            **counters,
+            'cache_hits': cache_stats['l1_hits'],
+            'cache_misses': cache_stats['misses'],
+            'cache_size': cache_stats['size'],
+            'hit_rate': cache_stats['hit_rate'],
+        }
+
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def cosine_similarities(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Cosine similarity of ``query`` against every row of ``matrix`` (zero rows score 0)."""
+    if matrix.size == 0:
+        return np.empty(0, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = (matrix @ query) / norms
+    return np.nan_to_num(scores, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+# ──────────────────────────────────────────────────────────────
+# Per-process registry
+# ──────────────────────────────────────────────────────────────
+
+_engines: dict[str, EmbeddingEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_embedding_engine(model_name: str | None = None) -> EmbeddingEngine:
+    """Return the process-wide engine for ``model_name`` (default model if omitted)."""
+    name = model_name or DEFAULT_EMBEDDING_MODEL
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            engine = _engines[name] = EmbeddingEngine(name)
+        return engine
+
+
+def get_embedding_stats() -> dict[str, dict[str, Any]]:
+    """Stats for every engine created in this process, keyed by model name."""
+    with _engines_lock:
+        engines = list(_engines.values())
+    return {engine.model_name: engine.stats() for engine in engines}
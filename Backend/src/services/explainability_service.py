@@ -11,12 +11,10 @@ if TYPE_CHECKING:
     from .crisis_intervention import CrisisAssessment
     from .mood_predictor import MoodPrediction
 
-# SHAP with graceful fallback
-try:
-    import shap
-    SHAP_AVAILABLE = True
-except ImportError:
-    SHAP_AVAILABLE = False
+from ..utils.lazy_imports import is_available
+
+# SHAP with graceful fallback (checked without importing it)
+SHAP_AVAILABLE = is_available('shap')
 
 try:
     import numpy as np
@@ -0,0 +1,541 @@
+"""
+Local inference server: one process per host runs the ML models for every web worker.
+
+Sentence-transformer embeddings, the BERT and transformers sentiment
+pipelines and the LSTM forecaster are CPU-bound. Run inline in a gevent
+request greenlet, a single call stalls every other request on that worker,
+and each worker loads its own copy of every model.
+
+With ``INFERENCE_SERVER_ENABLED=true`` the gunicorn master starts one
+inference process (``start_inference_server``) before forking the workers.
+Workers send requests over a Unix socket (``INFERENCE_SOCKET_PATH``). The
+socket is cooperative under gevent, so a waiting greenlet yields to the
+others. The server process:
+
+- loads each model once and keeps it for the lifetime of the host
+- batches dynamically: requests for the same task that arrive within
+  ``INFERENCE_BATCH_WINDOW_MS`` of each other, or that queued while the
+  model was busy, run as one batch of at most ``max_batch_size``
+- limits concurrency per model: each task has ``concurrency`` runner
+  threads and a bounded queue (``INFERENCE_MAX_QUEUE``). A full queue
+  rejects the request at once instead of letting it wait.
+
+Timeout/fallback contract: ``infer(task, payload)`` returns the result or
+raises ``InferenceUnavailable``. That covers a missing server, a full
+queue, a model error, or no answer within the task's timeout. Callers catch
+it and use their existing non-ML fallback (keyword analysis, statistical
+forecast). They never load the model in the web worker.
+
+Once the master has started the server, ``use_inference_server()`` is True
+in every worker for the host's lifetime, including while the server is
+still loading its models (the socket only appears afterwards) or being
+restarted. Requests in that window get ``InferenceUnavailable`` and fall
+back; they never load a private copy of the model. When no server was
+started (flag off, no Unix sockets, the Flask dev server, or inside the
+server itself) it is False and call sites run the models in-process as
+before, which keeps local development and tests unchanged.
+
+Wire format: a 4-byte big-endian length followed by a pickled dict. The
+socket is created with mode 0600, so only processes of the same user can
+connect.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_SERVER_ENABLED = os.getenv('INFERENCE_SERVER_ENABLED', 'false').lower() == 'true'
+INFERENCE_SOCKET_PATH = os.getenv('INFERENCE_SOCKET_PATH', '')
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv('INFERENCE_TIMEOUT_SECONDS', '5'))
+# LSTM requests train on the user's history before forecasting
+INFERENCE_LSTM_TIMEOUT_SECONDS = float(os.getenv('INFERENCE_LSTM_TIMEOUT_SECONDS', '30'))
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv('INFERENCE_BATCH_WINDOW_MS', '5'))
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', '32'))
+INFERENCE_MAX_QUEUE = int(os.getenv('INFERENCE_MAX_QUEUE', '256'))
+# Per-model runner threads, e.g. "embeddings=2,mood_nlp=1" (default 1 each)
+INFERENCE_CONCURRENCY = {
+    name.strip(): int(value)
+    for name, _, value in (
+        item.partition('=') for item in os.getenv('INFERENCE_CONCURRENCY', '').split(',') if '=' in item
+    )
+}
+
+_FRAME = struct.Struct('>I')
+_MAX_FRAME_BYTES = 64 * 2**20
+# Extra client wait beyond the server-side deadline, for the reply to arrive
+_REPLY_GRACE_SECONDS = 0.5
+
+# True inside the inference process: models run locally there
+_serving = False
+# True once the master started the inference process; forked workers inherit it
+_started = False
+
+
+class InferenceUnavailable(Exception):
+    """The inference server could not produce a result; callers fall back to a non-ML path."""
+
+
+@dataclass
+class InferenceTask:
+    name: str
+    # Runs one batch: one result per payload, in order
+    run_batch: Callable[[list[Any]], list[Any]]
+    max_batch_size: int = INFERENCE_MAX_BATCH_SIZE
+    concurrency: int = 1
+    timeout: float = INFERENCE_TIMEOUT_SECONDS
+    # Loads the model when the server starts (a model_warmup name)
+    warm_model: str | None = None
+
+
+_tasks: dict[str, InferenceTask] = {}
+
+
+def register_task(task: InferenceTask) -> None:
+    task.concurrency = INFERENCE_CONCURRENCY.get(task.name, task.concurrency)
+    _tasks[task.name] = task
+
+
+def served_tasks() -> list[str]:
+    return list(_tasks)
+
+
+def served_models() -> set[str]:
+    """model_warmup names the inference server loads, so web workers and the master need not."""
+    if not use_inference_server():
+        return set()
+    return {task.warm_model for task in _tasks.values() if task.warm_model}
+
+
+# ──────────────────────────────────────────────────────────────
+# Framing
+# ──────────────────────────────────────────────────────────────
+
+def _send_frame(sock: socket.socket, message: dict[str, Any]) -> None:
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_FRAME.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("inference connection closed")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> dict[str, Any]:
+    (size,) = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    if size > _MAX_FRAME_BYTES:
+        raise ConnectionError(f"inference frame too large ({size} bytes)")
+    return pickle.loads(_recv_exact(sock, size))  # noqa: S301 — same-user socket, mode 0600
+
+
+# ──────────────────────────────────────────────────────────────
+# Server
+# ──────────────────────────────────────────────────────────────
+
+class _Pending:
+    __slots__ = ('payload', 'deadline', 'done', 'result', 'error')
+
+    def __init__(self, payload: Any, deadline: float) -> None:
+        self.payload = payload
+        self.deadline = deadline
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: str | None = None
+
+    def resolve(self, result: Any = None, error: str | None = None) -> None:
+        self.result, self.error = result, error
+        self.done.set()
+
+
+class _TaskQueue:
+    """Bounded queue and runner threads of one task: collects batches and runs them."""
+
+    def __init__(self, task: InferenceTask, batch_window: float, max_queue: int) -> None:
+        self.task = task
+        self.batch_window = batch_window
+        self._closed = False
+        self._queue: queue.Queue[_Pending | None] = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0, 'batched_items': 0, 'max_batch': 0, 'rejected': 0,
+                       'timeouts': 0, 'errors': 0, 'busy_runners': 0, 'run_seconds': 0.0}
+        self._runners = [
+            threading.Thread(target=self._run, name=f'inference-{task.name}-{n}', daemon=True)
+            for n in range(max(1, task.concurrency))
+        ]
+        for runner in self._runners:
+            runner.start()
+
+    def submit(self, item: _Pending) -> bool:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count('rejected')
+            return False
+        self._count('requests')
+        return True
+
+    def _count(self, counter: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[counter] += amount
+
+    def close(self) -> None:
+        self._closed = True
+        for _ in self._runners:
+            try:
+                self._queue.put_nowait(None)  # wakes an idle runner
+            except queue.Full:
+                break
+
+    def _collect(self) -> list[_Pending] | None:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        window_ends = time.monotonic() + self.batch_window
+        while len(batch) < self.task.max_batch_size:
+            try:
+                # Whatever queued while the model was busy joins without waiting
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = window_ends - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while not self._closed:
+            batch = self._collect()
+            if batch is None:
+                return
+            now = time.monotonic()
+            live = [item for item in batch if item.deadline > now]
+            for item in batch:
+                if item.deadline <= now:
+                    item.resolve(error='timeout')
+            self._count('timeouts', len(batch) - len(live))
+            if not live:
+                continue
+
+            self._count('busy_runners')
+            started = time.perf_counter()
+            try:
+                results = self.task.run_batch([item.payload for item in live])
+                if len(results) != len(live):
+                    raise RuntimeError(f"{self.task.name} returned {len(results)} results for {len(live)} inputs")
+                for item, result in zip(live, results, strict=True):
+                    item.resolve(result)
+            except Exception as e:
+                logger.warning(f"⚠️ Inference batch for {self.task.name} failed: {e}")
+                self._count('errors')
+                for item in live:
+                    item.resolve(error=f'error: {e}')
+            finally:
+                with self._stats_lock:
+                    self._stats['busy_runners'] -= 1
+                    self._stats['batches'] += 1
+                    self._stats['batched_items'] += len(live)
+                    self._stats['max_batch'] = max(self._stats['max_batch'], len(live))
+                    self._stats['run_seconds'] += time.perf_counter() - started
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(
+            queue_depth=self._queue.qsize(),
+            concurrency=len(self._runners),
+            max_batch_size=self.task.max_batch_size,
+            avg_batch=round(stats['batched_items'] / stats['batches'], 2) if stats['batches'] else 0.0,
+        )
+        return stats
+
+
+class InferenceServer:
+    """Unix-socket server that batches requests per task and runs them on bounded runner threads."""
+
+    def __init__(
+        self,
+        socket_path: str,
+        tasks: dict[str, InferenceTask] | None = None,
+        batch_window_ms: float = INFERENCE_BATCH_WINDOW_MS,
+        max_queue: int = INFERENCE_MAX_QUEUE,
+    ) -> None:
+        self.socket_path = socket_path
+        self._queues = {
+            name: _TaskQueue(task, batch_window_ms / 1000, max_queue)
+            for name, task in (tasks if tasks is not None else _tasks).items()
+        }
+        self._sock: socket.socket | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> InferenceServer:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        sock.listen(128)
+        self._sock = sock
+        threading.Thread(target=self._accept, name='inference-accept', daemon=True).start()
+        return self
+
+    def wait(self) -> None:
+        self._stopped.wait()
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        for task_queue in self._queues.values():
+            task_queue.close()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {name: task_queue.stats() for name, task_queue in self._queues.items()}
+
+    def _accept(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._sock.accept()  # type: ignore[union-attr]
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), name='inference-conn', daemon=True).start()
+
+    def _handle(self, conn: socket.socket) -> None:
+        with conn:
+            try:
+                request = _recv_frame(conn)
+                _send_frame(conn, self._dispatch(request))
+            except (OSError, ConnectionError, pickle.UnpicklingError, struct.error):
+                pass  # client went away; it has already fallen back
+
+    def _dispatch(self, request: dict[str, Any]) -> dict[str, Any]:
+        name = request.get('task')
+        if name == '__stats__':
+            return {'ok': True, 'result': {'pid': os.getpid(), 'tasks': self.stats()}}
+        task_queue = self._queues.get(name)  # type: ignore[arg-type]
+        if task_queue is None:
+            return {'ok': False, 'error': f'unknown task {name!r}'}
+
+        timeout = float(request.get('timeout') or task_queue.task.timeout)
+        item = _Pending(request.get('payload'), time.monotonic() + timeout)
+        if not task_queue.submit(item):
+            return {'ok': False, 'error': 'overloaded'}
+        if not item.done.wait(timeout):
+            return {'ok': False, 'error': 'timeout'}
+        if item.error is not None:
+            return {'ok': False, 'error': item.error}
+        return {'ok': True, 'result': item.result}
+
+
+# ──────────────────────────────────────────────────────────────
+# Client
+# ──────────────────────────────────────────────────────────────
+
+def inference_socket_path() -> str:
+    return INFERENCE_SOCKET_PATH or os.path.join(
+        tempfile.gettempdir(), f'lugn-trygg-inference-{os.getuid() if hasattr(os, "getuid") else 0}.sock'
+    )
+
+
+def use_inference_server() -> bool:
+    """True in the master and web workers once the host's inference server owns the models."""
+    return INFERENCE_SERVER_ENABLED and _started and not _serving
+
+
+def _request(message: dict[str, Any], timeout: float, socket_path: str | None = None) -> Any:
+    path = socket_path or inference_socket_path()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout + _REPLY_GRACE_SECONDS)
+            sock.connect(path)
+            _send_frame(sock, message)
+            reply = _recv_frame(sock)
+    except TimeoutError as e:
+        raise InferenceUnavailable(f"inference {message['task']} timed out after {timeout:.1f}s") from e
+    except (OSError, ConnectionError, pickle.UnpicklingError, struct.error) as e:
+        raise InferenceUnavailable(f"inference server unreachable: {e}") from e
+    if not reply.get('ok'):
+        raise InferenceUnavailable(f"inference {message['task']} failed: {reply.get('error')}")
+    return reply['result']
+
+
+def infer(task: str, payload: Any, timeout: float | None = None, socket_path: str | None = None) -> Any:
+    """
+    Run ``task`` on ``payload`` in the inference server.
+
+    Raises:
+        InferenceUnavailable: no result (server down, overloaded, model error or timeout)
+    """
+    if timeout is None:
+        timeout = _tasks[task].timeout if task in _tasks else INFERENCE_TIMEOUT_SECONDS
+    return _request({'task': task, 'payload': payload, 'timeout': timeout}, timeout, socket_path)
+
+
+def run_inference(task: str, payload: Any, timeout: float | None = None) -> Any:
+    """``infer`` when the inference server is in use, otherwise the task inline in this process."""
+    if use_inference_server():
+        return infer(task, payload, timeout)
+    return _tasks[task].run_batch([payload])[0]
+
+
+def inference_stats(socket_path: str | None = None) -> dict[str, Any]:
+    """Per-task queue, batch and error counters of the running server."""
+    return _request({'task': '__stats__'}, INFERENCE_TIMEOUT_SECONDS, socket_path)
+
+
+# ──────────────────────────────────────────────────────────────
+# Process lifecycle (called from gunicorn_config.py in the master)
+# ──────────────────────────────────────────────────────────────
+
+_process: multiprocessing.process.BaseProcess | None = None
+
+
+def serve(socket_path: str) -> None:
+    """Entry point of the inference process: load the models, then serve until terminated."""
+    global _serving
+    _serving = True
+    logging.basicConfig(level=logging.INFO)
+
+    # The socket only appears once the models are loaded; until then clients see the
+    # server as unreachable and fall back, instead of timing out behind the loading
+    from src.services.model_warmup import warm_up
+    warm_up([task.warm_model for task in _tasks.values() if task.warm_model], freeze=False)
+
+    server = InferenceServer(socket_path).start()
+    logger.info(f"🧠 Inference server listening on {socket_path} (pid {os.getpid()}, tasks {served_tasks()})")
+    server.wait()
+
+
+def _alive(process: multiprocessing.process.BaseProcess | None) -> bool:
+    # gunicorn's SIGCHLD handler may reap the process, so probe the pid directly
+    if process is None or process.pid is None:
+        return False
+    try:
+        os.kill(process.pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def start_inference_server() -> bool:
+    """Start the host's inference process if enabled and not running. Returns whether it runs."""
+    global _process, _started
+    if not INFERENCE_SERVER_ENABLED:
+        return False
+    if not hasattr(socket, 'AF_UNIX'):
+        logger.warning("⚠️ Unix sockets unavailable — models run inside the web workers")
+        return False
+    if _alive(_process):
+        return True
+    # spawn: a clean interpreter, no inherited locks or thread pools from the master
+    _process = multiprocessing.get_context('spawn').Process(
+        target=serve, args=(inference_socket_path(),), name='lugn-trygg-inference', daemon=True
+    )
+    _process.start()
+    _started = True
+    logger.info(f"🧠 Started inference server (pid {_process.pid})")
+    return True
+
+
+def stop_inference_server() -> None:
+    global _process, _started
+    process, _process = _process, None
+    _started = False
+    if _alive(process):
+        process.terminate()  # type: ignore[union-attr]
+        process.join(timeout=5)  # type: ignore[union-attr]
+    try:
+        os.unlink(inference_socket_path())
+    except OSError:
+        pass
+
+
+# ──────────────────────────────────────────────────────────────
+# Built-in tasks
+# ──────────────────────────────────────────────────────────────
+
+def _embeddings_batch(payloads: list[dict[str, Any]]) -> list[Any]:
+    """Payloads ``{'model': name, 'texts': [...]}``; one encode call per embedding model."""
+    from src.services.embedding_engine import get_embedding_engine
+
+    results: list[Any] = [None] * len(payloads)
+    by_model: dict[str, list[int]] = {}
+    for index, payload in enumerate(payloads):
+        by_model.setdefault(payload['model'], []).append(index)
+    for model_name, indexes in by_model.items():
+        texts = [text for index in indexes for text in payloads[index]['texts']]
+        matrix = get_embedding_engine(model_name).encode_many(texts)
+        if matrix is None:
+            raise RuntimeError(f"embedding model {model_name} unavailable")
+        offset = 0
+        for index in indexes:
+            count = len(payloads[index]['texts'])
+            results[index] = matrix[offset:offset + count]
+            offset += count
+    return results
+
+
+def _mood_nlp_batch(texts: list[str]) -> list[Any]:
+    from src.services.mood_nlp_service import get_mood_nlp
+
+    pipeline = get_mood_nlp().sentiment_pipeline
+    if pipeline is None:
+        raise RuntimeError("BERT sentiment model unavailable")
+    return list(pipeline(texts, batch_size=len(texts)))
+
+
+def _transformer_sentiment_batch(texts: list[str]) -> list[Any]:
+    from src.services.ai_service import ai_services
+
+    pipeline = ai_services.transformer_sentiment_pipeline
+    if pipeline is None:
+        raise RuntimeError("transformer sentiment model unavailable")
+    return list(pipeline(texts, batch_size=len(texts)))
+
+
+def _lstm_forecast_batch(payloads: list[dict[str, Any]]) -> list[Any]:
+    from src.ml.temporal_lstm import forecast_mood
+
+    return [forecast_mood(**payload) for payload in payloads]
+
+
+register_task(InferenceTask('embeddings', _embeddings_batch, warm_model='embeddings'))
+register_task(InferenceTask('mood_nlp', _mood_nlp_batch, warm_model='mood_nlp'))
+register_task(InferenceTask('transformer_sentiment', _transformer_sentiment_batch,
+                            warm_model='transformer_sentiment'))
+# Trains on the request's history, so one at a time and unbatched
+register_task(InferenceTask('lstm_forecast', _lstm_forecast_batch, max_batch_size=1,
+                            timeout=INFERENCE_LSTM_TIMEOUT_SECONDS))
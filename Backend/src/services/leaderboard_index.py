@@ -0,0 +1,435 @@
+"""
+Leaderboard rank index.
+
+Keeps every user's XP, current streak and mood count in score-ordered
+boards so a rank lookup never has to scan Firestore. Ranks use competition
+ordering: a user's rank is one plus the number of users with a strictly
+higher score, so tied users share a rank.
+
+With Redis available the boards are sorted sets shared by all workers
+(``ZCOUNT`` and ``ZREVRANK`` are O(log n)). Without Redis each process keeps
+its own boards: a bisect-searched list of ``(-score, user_id)`` pairs.
+Lookups are O(log n). An update is a bisect plus one contiguous shift of
+the list, which stays well under a millisecond at a million users.
+
+Writers that change a score call ``record_scores`` (XP awards do). Fields
+written outside the backend are picked up by a periodic rebuild that pages
+through ``user_rewards`` and ``users`` in the background. A cold index is
+built the same way; until it is ready ``ensure_ready`` returns False and
+callers rank from Firestore directly.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from ..firebase_config import db
+from ..utils.firestore_paging import iter_pages
+
+logger = logging.getLogger(__name__)
+
+BOARDS = ('xp', 'streak', 'moods')
+# Full resync interval; catches scores written outside record_scores()
+LEADERBOARD_REFRESH_SECONDS = int(os.getenv('LEADERBOARD_REFRESH_SECONDS', '900'))
+LEADERBOARD_NEIGHBOR_RADIUS = 2
+REDIS_KEY_PREFIX = 'leaderboard'
+REBUILD_PAGE_SIZE = 1000
+# Seconds before retrying Redis after a failure
+REDIS_RETRY_INTERVAL = 60.0
+
+
+def anonymize_username(email_or_name: str) -> str:
+    """Create anonymous display name from email or name"""
+    if not email_or_name:
+        return "Anonymous"
+
+    # If it's an email, use the part before @
+    if "@" in email_or_name:
+        name = email_or_name.split("@")[0]
+    else:
+        name = email_or_name
+
+    # Anonymize: show first 2 chars + *** + last char
+    if len(name) > 3:
+        return f"{name[:2]}***{name[-1]}"
+    return f"{name[0]}***"
+
+
+def xp_from_rewards(data: dict[str, Any]) -> int:
+    """XP from a ``user_rewards`` document, honouring legacy ``total_xp`` records."""
+    return data.get('xp', data.get('total_xp', 0)) or 0
+
+
+def display_name_from_user(data: dict[str, Any]) -> str:
+    return anonymize_username(data.get('display_name') or data.get('email', ''))
+
+
+@dataclass
+class BoardEntry:
+    """One row of a board."""
+    user_id: str
+    score: float
+    rank: int
+
+
+@dataclass
+class BoardPosition:
+    """A user's standing on one board."""
+    rank: int
+    score: float
+    total: int
+    neighbors: list[BoardEntry]
+
+    @property
+    def percentile(self) -> float:
+        return round((1 - self.rank / max(self.total, 1)) * 100, 1)
+
+
+class MemoryBoard:
+    """In-process order-statistic board: ``(-score, user_id)`` pairs kept sorted."""
+
+    def __init__(self, scores: dict[str, float] | None = None) -> None:
+        self._scores: dict[str, float] = dict(scores or {})
+        self._order: list[tuple[float, str]] = sorted((-score, uid) for uid, score in self._scores.items())
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def set(self, user_id: str, score: float) -> None:
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            del self._order[bisect.bisect_left(self._order, (-old, user_id))]
+        bisect.insort(self._order, (-score, user_id))
+        self._scores[user_id] = score
+
+    def score(self, user_id: str) -> float | None:
+        return self._scores.get(user_id)
+
+    def rank_of(self, score: float) -> int:
+        # '' sorts before every user id, so this counts strictly higher scores only
+        return bisect.bisect_left(self._order, (-score, '')) + 1
+
+    def entries(self, start: int, stop: int) -> list[tuple[str, float]]:
+        """Users at 0-based positions ``start``..``stop`` (exclusive), best first."""
+        return [(uid, -neg) for neg, uid in self._order[max(start, 0):stop]]
+
+    def position_of(self, user_id: str) -> int | None:
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._order, (-score, user_id))
+
+
+class LeaderboardIndex:
+    """Rank, percentile and neighbors per board without touching Firestore."""
+
+    def __init__(self, use_redis: bool = True, refresh_seconds: float = LEADERBOARD_REFRESH_SECONDS) -> None:
+        self.use_redis = use_redis
+        self.refresh_seconds = refresh_seconds
+        self._boards: dict[str, MemoryBoard] = {board: MemoryBoard() for board in BOARDS}
+        self._names: dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._built_at = 0.0
+        self._redis: Any = None
+        self._redis_retry_at = 0.0
+
+    # ──────────────────────────────────────────────────────────────
+    # Backend selection
+    # ──────────────────────────────────────────────────────────────
+
+    def _redis_client(self) -> Any:
+        if not self.use_redis:
+            return None
+        if self._redis is not None:
+            return self._redis
+        now = time.time()
+        if now < self._redis_retry_at:
+            return None
+        try:
+            from ..redis_config import get_redis_client
+            self._redis = get_redis_client()
+        except Exception as e:
+            logger.debug(f"Redis unavailable for leaderboard index: {e}")
+            self._redis = None
+        if self._redis is None:
+            self._redis_retry_at = now + REDIS_RETRY_INTERVAL
+        return self._redis
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"⚠️ Leaderboard index Redis error, using in-process boards: {error}")
+        self._redis = None
+        self._redis_retry_at = time.time() + REDIS_RETRY_INTERVAL
+        self._built_at = 0.0  # in-process boards may be cold or stale
+
+    @staticmethod
+    def _key(board: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:{board}"
+
+    # ──────────────────────────────────────────────────────────────
+    # Updates
+    # ──────────────────────────────────────────────────────────────
+
+    def record_scores(
+        self,
+        user_id: str,
+        xp: float | None = None,
+        streak: float | None = None,
+        moods: float | None = None,
+        display_name: str | None = None,
+    ) -> None:
+        """Apply changed scores for one user; ``None`` leaves a board untouched."""
+        scores = {board: value for board, value in (('xp', xp), ('streak', streak), ('moods', moods))
+                  if value is not None}
+        if not scores and display_name is None:
+            return
+
+        client = self._redis_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for board, value in scores.items():
+                    pipe.zadd(self._key(board), {user_id: value})
+                if display_name is not None:
+                    pipe.hset(self._key('names'), user_id, display_name)
+                pipe.execute()
+                return
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            for board, value in scores.items():
+                self._boards[board].set(user_id, value)
+            if display_name is not None:
+                self._names[user_id] = display_name
+
+    # ──────────────────────────────────────────────────────────────
+    # Reads
+    # ──────────────────────────────────────────────────────────────
+
+    def positions(self, user_id: str, radius: int = LEADERBOARD_NEIGHBOR_RADIUS) -> dict[str, BoardPosition] | None:
+        """
+        The user's position on every board, or None if the user is not indexed
+        or the boards are still being built (see ``ensure_ready``).
+
+        Missing boards (e.g. no ``user_rewards`` document yet) report a score
+        of 0 ranked against everyone else.
+        """
+        if not self.ensure_ready():
+            return None
+        client = self._redis_client()
+        if client is not None:
+            try:
+                return self._redis_positions(client, user_id, radius)
+            except Exception as e:
+                self._redis_failed(e)
+                if not self.ensure_ready():
+                    return None
+
+        with self._lock:
+            if all(self._boards[board].score(user_id) is None for board in BOARDS):
+                return None
+            total = max(len(board) for board in self._boards.values())
+            result = {}
+            for name, board in self._boards.items():
+                score = board.score(user_id)
+                position = board.position_of(user_id)
+                if score is None:
+                    score, neighbors = 0, []
+                else:
+                    neighbors = [
+                        BoardEntry(uid, value, board.rank_of(value))
+                        for uid, value in board.entries(position - radius, position + radius + 1)
+                    ]
+                result[name] = BoardPosition(board.rank_of(score), score, total, neighbors)
+            return result
+
+    def _redis_positions(self, client: Any, user_id: str, radius: int) -> dict[str, BoardPosition] | None:
+        pipe = client.pipeline(transaction=False)
+        for board in BOARDS:
+            pipe.zscore(self._key(board), user_id)
+            pipe.zrevrank(self._key(board), user_id)
+            pipe.zcard(self._key(board))
+        replies = pipe.execute()
+        stats = {board: replies[i * 3:i * 3 + 3] for i, board in enumerate(BOARDS)}
+        if all(score is None for score, _, _ in stats.values()):
+            return None
+        total = max(card for _, _, card in stats.values())
+
+        pipe = client.pipeline(transaction=False)
+        for board, (score, position, _) in stats.items():
+            pipe.zcount(self._key(board), f"({score or 0}", '+inf')
+            if position is not None:
+                pipe.zrevrange(self._key(board), max(position - radius, 0), position + radius, withscores=True)
+            else:
+                pipe.echo('')  # keep replies aligned
+        replies = pipe.execute()
+        ranks = {board: replies[i * 2] + 1 for i, board in enumerate(BOARDS)}
+        windows = {board: replies[i * 2 + 1] or [] for i, board in enumerate(BOARDS)}
+
+        # Competition ranks of the neighbors: one ZCOUNT per distinct score
+        neighbor_scores = sorted({(board, value) for board, rows in windows.items() for _, value in rows})
+        pipe = client.pipeline(transaction=False)
+        for board, value in neighbor_scores:
+            pipe.zcount(self._key(board), f"({value}", '+inf')
+        neighbor_ranks = {key: count + 1 for key, count in zip(neighbor_scores, pipe.execute(), strict=True)}
+
+        return {
+            board: BoardPosition(
+                ranks[board],
+                stats[board][0] or 0,
+                total,
+                [BoardEntry(uid, value, neighbor_ranks[(board, value)]) for uid, value in windows[board]],
+            )
+            for board in BOARDS
+        }
+
+    def display_names(self, user_ids: list[str]) -> dict[str, str]:
+        """Anonymized display names captured by the index."""
+        client = self._redis_client()
+        if client is not None and user_ids:
+            try:
+                names = client.hmget(self._key('names'), user_ids)
+                return {uid: name for uid, name in zip(user_ids, names, strict=True) if name}
+            except Exception as e:
+                self._redis_failed(e)
+        with self._lock:
+            return {uid: self._names[uid] for uid in user_ids if uid in self._names}
+
+    # ──────────────────────────────────────────────────────────────
+    # Rebuild
+    # ──────────────────────────────────────────────────────────────
+
+    def ensure_ready(self) -> bool:
+        """
+        Whether the boards are built. Cold and stale boards are rebuilt in the
+        background, so a rank request never waits for a full paged rebuild.
+        """
+        if self._redis_client() is not None:
+            return self._ensure_redis_ready()
+        if not self._built_at:
+            self._rebuild_in_background()
+            return False
+        if time.time() - self._built_at > self.refresh_seconds:
+            self._rebuild_in_background()
+        return True
+
+    def _ensure_redis_ready(self) -> bool:
+        client = self._redis
+        try:
+            built = client.get(self._key('built_at'))
+        except Exception as e:
+            self._redis_failed(e)
+            return self.ensure_ready()
+        if built is None:
+            self._rebuild_in_background()
+            return False
+        if time.time() - float(built) > self.refresh_seconds:
+            self._rebuild_in_background()
+        return True
+
+    def _rebuild_in_background(self) -> None:
+        if self._rebuild_lock.locked():
+            return
+        threading.Thread(target=self.rebuild, name='leaderboard-rebuild', daemon=True).start()
+
+    def rebuild(self) -> bool:
+        """Reload every board from Firestore; returns False if skipped or failed."""
+        if not self._rebuild_lock.acquire(blocking=False):
+            return False
+        try:
+            client = self._redis_client()
+            if client is not None:
+                try:
+                    if not client.set(self._key('rebuild_lock'), '1', nx=True, ex=max(int(self.refresh_seconds), 60)):
+                        return False  # another worker is rebuilding the shared boards
+                except Exception as e:
+                    self._redis_failed(e)
+                    client = None
+
+            started = time.perf_counter()
+            try:
+                scores, names = self._load_scores()
+            except Exception as e:
+                logger.error(f"Failed to rebuild leaderboard index: {e}")
+                if client is not None:
+                    with contextlib.suppress(Exception):
+                        client.delete(self._key('rebuild_lock'))
+                return False
+
+            if client is not None:
+                try:
+                    self._store_redis(client, scores, names)
+                except Exception as e:
+                    self._redis_failed(e)
+                    client = None
+            if client is None:
+                with self._lock:
+                    self._boards = {board: MemoryBoard(scores[board]) for board in BOARDS}
+                    self._names = names
+                    self._built_at = time.time()
+
+            logger.info(
+                f"🏆 Leaderboard index rebuilt: {len(scores['streak'])} users, "
+                f"{len(scores['xp'])} with rewards in {time.perf_counter() - started:.2f}s"
+            )
+            return True
+        finally:
+            self._rebuild_lock.release()
+
+    def _load_scores(self) -> tuple[dict[str, dict[str, float]], dict[str, str]]:
+        if db is None:
+            raise RuntimeError("Firestore unavailable")
+        scores: dict[str, dict[str, float]] = {board: {} for board in BOARDS}
+        names: dict[str, str] = {}
+
+        rewards = db.collection('user_rewards').select(['xp', 'total_xp'])
+        for snap in iter_pages(rewards, REBUILD_PAGE_SIZE):
+            scores['xp'][snap.id] = xp_from_rewards(snap.to_dict() or {})
+
+        users = db.collection('users').select(['current_streak', 'mood_count', 'display_name', 'email'])
+        for snap in iter_pages(users, REBUILD_PAGE_SIZE):
+            data = snap.to_dict() or {}
+            scores['streak'][snap.id] = data.get('current_streak', 0) or 0
+            scores['moods'][snap.id] = data.get('mood_count', 0) or 0
+            names[snap.id] = display_name_from_user(data)
+        return scores, names
+
+    def _store_redis(self, client: Any, scores: dict[str, dict[str, float]], names: dict[str, str]) -> None:
+        # Build under temporary keys and swap them in with RENAME so readers never see a partial board
+        pipe = client.pipeline(transaction=False)
+        staged = []
+        for board, values in [*scores.items(), ('names', names)]:
+            tmp_key = f"{self._key(board)}:rebuild"
+            pipe.delete(tmp_key)
+            items = list(values.items())
+            for i in range(0, len(items), REBUILD_PAGE_SIZE):
+                chunk = dict(items[i:i + REBUILD_PAGE_SIZE])
+                if board == 'names':
+                    pipe.hset(tmp_key, mapping=chunk)
+                else:
+                    pipe.zadd(tmp_key, chunk)
+            if items:
+                staged.append((tmp_key, self._key(board)))
+            else:
+                pipe.delete(self._key(board))
+        pipe.execute()
+
+        pipe = client.pipeline(transaction=True)
+        for tmp_key, key in staged:
+            pipe.rename(tmp_key, key)
+        pipe.set(self._key('built_at'), str(time.time()))
+        pipe.delete(self._key('rebuild_lock'))
+        pipe.execute()
+
+
+leaderboard_index = LeaderboardIndex()
@@ -0,0 +1,301 @@
+"""
+Materialized leaderboard pages.
+
+Each board (XP, streaks, moods) is queried once per refresh interval, with
+display names anonymized at that point. Every row is stored pre-serialized
+as compact JSON in the shared two-tier cache. Serving a page is then a
+cache GET, a join of the first ``limit`` row strings and an ETag check, so
+an unchanged page costs a 304.
+
+A page older than ``LEADERBOARD_PAGE_REFRESH_SECONDS`` is still served
+while one background thread rebuilds it. ``scripts/refresh_leaderboards.py``
+rebuilds all pages from cron and closes the week.
+
+Weekly winners are frozen into ``leaderboard_snapshots/weekly-{week_start}``
+when the week closes. Snapshots never change, so their ETag is stable for
+the whole following week.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+
+from ..firebase_config import db
+from ..utils.cache import TwoTierCache, get_cache
+from .leaderboard_index import anonymize_username, xp_from_rewards
+
+logger = logging.getLogger(__name__)
+
+# Rows kept per board; the largest page a client can ask for
+LEADERBOARD_PAGE_ROWS = 100
+LEADERBOARD_PAGE_REFRESH_SECONDS = int(os.getenv('LEADERBOARD_PAGE_REFRESH_SECONDS', '60'))
+# Stale pages stay servable this long after a failed refresh
+LEADERBOARD_PAGE_CACHE_TTL = 24 * 3600
+SNAPSHOT_COLLECTION = 'leaderboard_snapshots'
+WEEKLY_WINNER_COUNT = 3
+
+_COMPACT = (',', ':')
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=_COMPACT, ensure_ascii=False, default=str)
+
+
+def week_start(day: date) -> date:
+    """Monday of the week containing ``day``."""
+    return day - timedelta(days=day.weekday())
+
+
+@dataclass
+class LeaderboardPage:
+    """A materialized board: serialized rows plus the fields shared by every response."""
+    key: str
+    rows: list[str]
+    updated_at: str
+    generated_at: float = field(default_factory=time.time)
+    extra: dict[str, Any] = field(default_factory=dict)
+    etag: str = ''
+
+    def __post_init__(self) -> None:
+        if not self.etag:
+            digest = hashlib.sha256()
+            for part in (self.key, self.updated_at, _dumps(self.extra), *self.rows):
+                digest.update(part.encode('utf-8'))
+                digest.update(b'\n')
+            self.etag = digest.hexdigest()[:20]
+
+    def as_cache_value(self) -> dict[str, Any]:
+        return {
+            'key': self.key, 'rows': self.rows, 'updatedAt': self.updated_at,
+            'generatedAt': self.generated_at, 'extra': self.extra, 'etag': self.etag,
+        }
+
+    @classmethod
+    def from_cache_value(cls, value: dict[str, Any]) -> LeaderboardPage:
+        return cls(value['key'], value['rows'], value['updatedAt'], value['generatedAt'],
+                   value.get('extra') or {}, value['etag'])
+
+    def render_leaderboard(self, limit: int, **fields: Any) -> tuple[str, str]:
+        """Standard success envelope with ``data.leaderboard``; returns (body, etag)."""
+        rows = self.rows[:limit]
+        data_fields = _dumps({**self.extra, **fields, 'updatedAt': self.updated_at})[1:-1]
+        body = (
+            f'{{"success":true,"message":{_dumps(f"Retrieved {len(rows)} users")},'
+            f'"data":{{"leaderboard":[{",".join(rows)}],{data_fields}}}}}'
+        )
+        return body, f"{self.etag}-{limit}-{_variant(fields)}"
+
+    def render_winners(self) -> tuple[str, str]:
+        """Weekly winners envelope (``data.winners.xp``); returns (body, etag)."""
+        data_fields = _dumps(self.extra)[1:-1]
+        body = (
+            '{"success":true,"message":"Weekly winners retrieved",'
+            f'"data":{{{data_fields},"winners":{{"xp":[{",".join(self.rows)}]}}}}}}'
+        )
+        return body, self.etag
+
+
+def _variant(fields: dict[str, Any]) -> str:
+    return hashlib.sha256(_dumps(fields).encode('utf-8')).hexdigest()[:8] if fields else '0'
+
+
+class LeaderboardPageService:
+    """Builds, caches and refreshes leaderboard pages and weekly snapshots."""
+
+    def __init__(
+        self,
+        cache: TwoTierCache | None = None,
+        refresh_seconds: float = LEADERBOARD_PAGE_REFRESH_SECONDS,
+    ) -> None:
+        if cache is None:
+            cache = get_cache('leaderboard_pages', default_ttl=LEADERBOARD_PAGE_CACHE_TTL, max_size=64)
+        self.cache = cache
+        self.refresh_seconds = refresh_seconds
+        self._refreshing: set[str] = set()
+        self._lock = threading.Lock()
+        self._builders: dict[str, Callable[[], LeaderboardPage]] = {
+            'xp': self._build_xp,
+            'streaks': self._build_streaks,
+            'moods': self._build_moods,
+        }
+
+    # ──────────────────────────────────────────────────────────────
+    # Reads
+    # ──────────────────────────────────────────────────────────────
+
+    def get_page(self, board: str) -> LeaderboardPage:
+        """The materialized page for ``board``; stale pages trigger a background refresh."""
+        value = self.cache.get_or_set(board, lambda: self._builders[board]().as_cache_value())
+        page = LeaderboardPage.from_cache_value(value)
+        if time.time() - page.generated_at > self.refresh_seconds:
+            self._refresh_in_background(board)
+        return page
+
+    def get_weekly_winners(self, today: date | None = None) -> LeaderboardPage:
+        """Last week's frozen winners; the snapshot is taken on first access after the week closes."""
+        start = week_start(today or datetime.now(UTC).date()) - timedelta(days=7)
+        key = f"weekly:{start.isoformat()}"
+        value = self.cache.get_or_set(key, lambda: self._load_or_freeze_week(start).as_cache_value())
+        return LeaderboardPage.from_cache_value(value)
+
+    # ──────────────────────────────────────────────────────────────
+    # Refresh
+    # ──────────────────────────────────────────────────────────────
+
+    def refresh(self, board: str) -> LeaderboardPage:
+        """Rebuild one board now and store it."""
+        page = self._builders[board]()
+        self.cache.set(board, page.as_cache_value())
+        return page
+
+    def refresh_all(self) -> dict[str, LeaderboardPage]:
+        return {board: self.refresh(board) for board in self._builders}
+
+    def close_week(self, today: date | None = None) -> LeaderboardPage:
+        """Freeze last week's winners (no-op if the snapshot already exists)."""
+        return self.get_weekly_winners(today)
+
+    def _refresh_in_background(self, board: str) -> None:
+        with self._lock:
+            if board in self._refreshing:
+                return
+            self._refreshing.add(board)
+
+        def _run() -> None:
+            try:
+                self.refresh(board)
+            except Exception as e:
+                logger.warning(f"Leaderboard page refresh failed for {board} (serving stale page): {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(board)
+
+        threading.Thread(target=_run, name=f'leaderboard-page-{board}', daemon=True).start()
+
+    # ──────────────────────────────────────────────────────────────
+    # Builders
+    # ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _db() -> Any:
+        if db is None:
+            raise RuntimeError("Firestore unavailable")
+        return db
+
+    def _display_names(self, user_ids: list[str]) -> dict[str, str]:
+        """Anonymized names for ``user_ids`` in one batched read."""
+        if not user_ids:
+            return {}
+        client = self._db()
+        names = {}
+        refs = [client.collection('users').document(uid) for uid in user_ids]
+        for snap in client.get_all(refs):
+            if snap.exists:
+                data = snap.to_dict() or {}
+                names[snap.id] = anonymize_username(data.get('display_name') or data.get('email', ''))
+        return names
+
+    def _top_xp(self, limit: int) -> list[tuple[str, dict[str, Any], int]]:
+        query = self._db().collection('user_rewards').order_by('xp', direction='DESCENDING').limit(limit)
+        top = []
+        for doc in query.stream():
+            data = doc.to_dict() or {}
+            xp = xp_from_rewards(data)
+            # Only include users with XP > 0
+            if xp > 0:
+                top.append((doc.id, data, xp))
+        return top
+
+    def _build_xp(self) -> LeaderboardPage:
+        top = self._top_xp(LEADERBOARD_PAGE_ROWS)
+        names = self._display_names([user_id for user_id, _, _ in top])
+        rows = [
+            _dumps({
+                'rank': rank,
+                'userId': user_id,
+                'displayName': names.get(user_id, 'Anonymous'),
+                'xp': xp,
+                'level': data.get('level', 1),
+                'badgeCount': len(data.get('badges', [])),
+                'avatar': '🌟',
+            })
+            for rank, (user_id, data, xp) in enumerate(top, start=1)
+        ]
+        return LeaderboardPage('xp', rows, datetime.now(UTC).isoformat())
+
+    def _build_user_board(self, key: str, field_name: str, row: Callable[[str, dict[str, Any], int], dict]) -> LeaderboardPage:
+        query = self._db().collection('users').order_by(field_name, direction='DESCENDING').limit(LEADERBOARD_PAGE_ROWS)
+        rows = []
+        for doc in query.stream():
+            data = doc.to_dict() or {}
+            value = data.get(field_name, 0)
+            if value <= 0:
+                continue
+            rows.append(_dumps({'rank': len(rows) + 1, 'userId': doc.id, **row(doc.id, data, value)}))
+        return LeaderboardPage(key, rows, datetime.now(UTC).isoformat())
+
+    def _build_streaks(self) -> LeaderboardPage:
+        return self._build_user_board('streaks', 'current_streak', lambda user_id, data, streak: {
+            'displayName': anonymize_username(data.get('display_name') or data.get('email', '')),
+            'currentStreak': streak,
+            'longestStreak': data.get('longest_streak', streak),
+            'avatar': data.get('avatar_emoji', '🔥'),
+        })
+
+    def _build_moods(self) -> LeaderboardPage:
+        return self._build_user_board('moods', 'mood_count', lambda user_id, data, mood_count: {
+            'displayName': anonymize_username(data.get('display_name') or data.get('email', '')),
+            'moodCount': mood_count,
+            'averageMood': round(data.get('average_mood', 5), 1),
+            'avatar': data.get('avatar_emoji', '📊'),
+        })
+
+    def _load_or_freeze_week(self, start: date) -> LeaderboardPage:
+        """Read the weekly snapshot, creating it from the current top XP if the week was never closed."""
+        key = f"weekly:{start.isoformat()}"
+        ref = self._db().collection(SNAPSHOT_COLLECTION).document(f"weekly-{start.isoformat()}")
+        snap = ref.get()
+        if snap.exists:
+            data = snap.to_dict() or {}
+            return LeaderboardPage(key, data.get('rows', []), data.get('frozenAt', ''), extra=data.get('extra', {}))
+
+        top = self._top_xp(WEEKLY_WINNER_COUNT)
+        names = self._display_names([user_id for user_id, _, _ in top])
+        rows = [
+            _dumps({
+                'displayName': names.get(user_id, 'Anonymous'),
+                'xp': xp,
+                'avatar': data.get('avatar_emoji', '🏆'),
+            })
+            for user_id, data, xp in top
+        ]
+        week_start_dt = datetime.combine(start, datetime.min.time(), UTC)
+        extra = {
+            'weekStart': week_start_dt.isoformat(),
+            'weekEnd': (week_start_dt + timedelta(days=6)).isoformat(),
+        }
+        frozen_at = datetime.now(UTC).isoformat()
+        try:
+            # create() fails if another worker froze the week first; theirs wins
+            ref.create({'rows': rows, 'extra': extra, 'frozenAt': frozen_at})
+            logger.info(f"🏆 Froze weekly winners for week of {start.isoformat()}")
+        except Exception as e:
+            existing = ref.get()
+            if existing.exists:
+                data = existing.to_dict() or {}
+                return LeaderboardPage(key, data.get('rows', []), data.get('frozenAt', ''),
+                                       extra=data.get('extra', {}))
+            logger.warning(f"Could not store weekly snapshot (serving unsaved copy): {e}")
+        return LeaderboardPage(key, rows, frozen_at, extra=extra)
+
+
+leaderboard_pages = LeaderboardPageService()
@@ -16,12 +16,11 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Any
 
-# AI/ML imports with graceful fallback
-try:
-    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+from ..utils.lazy_imports import is_available
+
+# AI/ML imports with graceful fallback; transformers is imported with the sentiment model
+TRANSFORMERS_AVAILABLE = is_available('transformers')
+if not TRANSFORMERS_AVAILABLE:
     logging.warning("transformers not available - memory analysis will use fallback")
 
 # Import existing services
@@ -80,6 +79,8 @@ class MemoryAnalysisService:
         self.sentiment_pipeline = None
         if TRANSFORMERS_AVAILABLE:
             try:
+                from transformers import pipeline
+
                 # Use multilingual model for Swedish support
                 self.sentiment_pipeline = pipeline(
                     "sentiment-analysis",
@@ -0,0 +1,363 @@
+"""
+Background media pipeline for multimedia memories.
+
+``create_multimedia_memory`` streams each original straight to Firebase
+Storage, saves the memory with ``media_processing.state == 'pending'`` and
+hands its ID to ``memory_media_pipeline.submit``. Off the request path, the
+job then:
+
+1. downloads each photo, decodes it once and uploads WebP thumbnails at
+   every size in THUMBNAIL_SIZES (photos of one memory concurrently),
+2. analyzes the downloaded photos in one ``analyze_photos`` batch,
+3. runs the combined text + photo analysis.
+
+The memory document is patched after every photo and at the end, so a
+client polling the memory sees ``media_processing.progress`` go from 0 to
+100. The document is the only job state: a job lost to a worker restart is
+resumed by scripts/process_pending_media.py, and photos already marked
+``ready`` are not processed again. Only storage paths are stored; URLs are
+signed when the memory is read (see signed_url_service).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import UTC, datetime, timedelta
+from io import BytesIO
+from typing import Any
+
+from firebase_admin import storage
+from google.cloud.firestore import FieldFilter
+
+from ..firebase_config import db
+from .memory_analysis_service import get_memory_analysis_service
+from .photo_analysis_service import get_photo_analysis_service
+from .signed_url_service import signed_url_service
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Longest side of each thumbnail, smallest first
+THUMBNAIL_SIZES = tuple(int(s) for s in os.getenv('MEMORY_THUMBNAIL_SIZES', '160,480,1080').split(','))
+# The size returned as a photo's plain ``thumbnail`` URL
+DEFAULT_THUMBNAIL_SIZE = 480 if 480 in THUMBNAIL_SIZES else THUMBNAIL_SIZES[0]
+THUMBNAIL_QUALITY = int(os.getenv('MEMORY_THUMBNAIL_QUALITY', '80'))
+# Memories processed concurrently per worker process
+MEDIA_PIPELINE_WORKERS = int(os.getenv('MEDIA_PIPELINE_WORKERS', '2'))
+# Photos of one memory processed concurrently
+MEDIA_PHOTO_WORKERS = int(os.getenv('MEDIA_PHOTO_WORKERS', '4'))
+# All photos of a memory must be done within this long; stragglers are marked failed
+MEDIA_PHOTO_STAGE_TIMEOUT_SECONDS = float(os.getenv('MEDIA_PHOTO_STAGE_TIMEOUT_SECONDS', '120'))
+# A pending/processing memory whose status has not moved for this long is resumed by cron
+MEDIA_STALE_SECONDS = int(os.getenv('MEDIA_STALE_SECONDS', '600'))
+
+ACTIVE_STATES = ('pending', 'processing')
+
+
+def render_thumbnails(
+    image_bytes: bytes,
+    sizes: tuple[int, ...] = THUMBNAIL_SIZES,
+    quality: int = THUMBNAIL_QUALITY,
+) -> dict[int, bytes]:
+    """
+    Encode WebP thumbnails of ``image_bytes`` at every size in ``sizes``.
+
+    The photo is decoded once (JPEGs at the largest size via draft mode,
+    rotated per EXIF) and each smaller size is reduced from the previous one.
+    """
+    image = Image.open(BytesIO(image_bytes))
+    largest = max(sizes)
+    if image.format == 'JPEG':
+        image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    thumbnails: dict[int, bytes] = {}
+    for size in sorted(sizes, reverse=True):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format='WEBP', quality=quality, method=4)
+        thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+
+def thumbnail_path(storage_path: str, size: int) -> str:
+    return f"{storage_path.rsplit('.', 1)[0]}_{size}.webp"
+
+
+def processing_status(
+    state: str,
+    steps_completed: int,
+    steps_total: int,
+    failed_photos: int = 0,
+    error: str | None = None,
+) -> dict[str, Any]:
+    """The ``media_processing`` field stored on a memory document."""
+    now = datetime.now(UTC)
+    return {
+        'state': state,  # pending, processing, ready, partial (some photos failed) or failed
+        'steps_completed': steps_completed,
+        'steps_total': steps_total,
+        'progress': 100 if state in ('ready', 'partial') else int(100 * steps_completed / max(steps_total, 1)),
+        'failed_photos': failed_photos,
+        'error': error,
+        'updated_at': now,
+        'completed_at': now if state in ('ready', 'partial', 'failed') else None,
+    }
+
+
+def media_status_response(data: dict[str, Any], bucket: Any) -> dict[str, Any]:
+    """
+    API representation of a memory's media processing state. Photo and
+    thumbnail URLs are signed from the stored paths in one batch.
+    """
+    status = data.get('media_processing') or {}
+    photos = (data.get('media') or {}).get('photo_details') or []
+    urls = signed_url_service.urls_for(bucket, [
+        path
+        for photo in photos
+        for path in (photo.get('storage_path'), *(photo.get('thumbnail_paths') or {}).values())
+    ], allow_public=True)
+
+    def iso(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def photo_response(photo: dict[str, Any]) -> dict[str, Any]:
+        url = urls.get(photo.get('storage_path'))
+        thumbnails = {size: urls.get(path) for size, path in (photo.get('thumbnail_paths') or {}).items()}
+        # Photos Pillow could not thumbnail are shown from the original once ready
+        fallback = url if photo.get('status') == 'ready' else None
+        return {
+            'url': url,
+            'thumbnail': thumbnails.get(str(DEFAULT_THUMBNAIL_SIZE), fallback),
+            'thumbnails': thumbnails,
+            'analysis': photo.get('analysis'),
+            'status': photo.get('status'),
+        }
+
+    return {
+        'state': status.get('state', 'ready'),  # memories created before the pipeline are complete
+        'progress': status.get('progress', 100),
+        'stepsCompleted': status.get('steps_completed'),
+        'stepsTotal': status.get('steps_total'),
+        'failedPhotos': status.get('failed_photos', 0),
+        'error': status.get('error'),
+        'updatedAt': iso(status.get('updated_at')),
+        'photos': [photo_response(photo) for photo in photos],
+        'aiAnalysis': data.get('ai_analysis'),
+    }
+
+
+class MemoryMediaPipeline:
+    """Queues and runs the media job of each multimedia memory."""
+
+    def __init__(self, max_workers: int = MEDIA_PIPELINE_WORKERS, photo_workers: int = MEDIA_PHOTO_WORKERS) -> None:
+        self.max_workers = max_workers
+        self.photo_workers = photo_workers
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._in_flight: set[str] = set()
+
+    def submit(self, memory_id: str) -> bool:
+        """Queue the job for ``memory_id``; False if it is already queued in this process."""
+        with self._lock:
+            if memory_id in self._in_flight:
+                return False
+            self._in_flight.add(memory_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='memory-media')
+        self._executor.submit(self._run, memory_id)
+        logger.info(f"🖼️ Queued media processing for memory {memory_id}")
+        return True
+
+    def _run(self, memory_id: str) -> None:
+        try:
+            self.process_memory(memory_id)
+        finally:
+            with self._lock:
+                self._in_flight.discard(memory_id)
+
+    def process_memory(self, memory_id: str) -> str | None:
+        """
+        Run (or resume) the media job of one memory and return its final
+        state; None if the memory no longer exists. Failures are recorded on
+        the memory, never raised.
+        """
+        doc_ref = db.collection('memories').document(memory_id)
+        snap = doc_ref.get()
+        if not snap.exists:
+            logger.warning(f"⚠️ Media job for missing memory {memory_id} skipped")
+            return None
+
+        data = snap.to_dict() or {}
+        details = [dict(photo) for photo in (data.get('media') or {}).get('photo_details') or []]
+        steps_total = len(details) + 1  # one per photo plus the combined analysis
+        started = time.perf_counter()
+        try:
+            pending = [index for index, photo in enumerate(details) if photo.get('status') != 'ready']
+            completed = len(details) - len(pending)
+            doc_ref.update({'media_processing': processing_status('processing', completed, steps_total)})
+
+            failed = self._process_photos(doc_ref, details, pending, completed, steps_total)
+
+            ai_analysis = self._analyze_multimodal(data.get('content', ''), details)
+            state = 'partial' if failed else 'ready'
+            doc_ref.update({
+                'media.photo_details': details,
+                'ai_analysis': ai_analysis,
+                'media_processing': processing_status(state, steps_total, steps_total, failed),
+            })
+            logger.info(
+                f"✅ Media for memory {memory_id} {state}: {len(details)} photos "
+                f"({failed} failed) in {time.perf_counter() - started:.1f}s"
+            )
+            return state
+        except Exception as e:
+            logger.exception(f"❌ Media processing for memory {memory_id} failed: {e}")
+            try:
+                doc_ref.update({
+                    'media_processing': processing_status('failed', 0, steps_total, error='Media processing failed'),
+                })
+            except Exception as update_err:
+                logger.warning(f"Could not record media failure for {memory_id} (non-blocking): {update_err}")
+            return 'failed'
+
+    def _process_photos(self, doc_ref, details: list[dict], pending: list[int], completed: int, steps_total: int) -> int:
+        """Thumbnail ``details[pending]`` concurrently, then analyze them as one batch; returns photos failed."""
+        if not pending:
+            return 0
+
+        bucket = storage.bucket()
+        prepared: dict[int, tuple[bytes, dict[str, str]]] = {}
+        pool = ThreadPoolExecutor(max_workers=self.photo_workers, thread_name_prefix='memory-media-photo')
+        futures = {pool.submit(self._prepare_photo, bucket, details[index]): index for index in pending}
+        try:
+            for future in as_completed(futures, timeout=MEDIA_PHOTO_STAGE_TIMEOUT_SECONDS):
+                index = futures[future]
+                try:
+                    prepared[index] = future.result()
+                except Exception as e:
+                    logger.warning(f"⚠️ Photo {details[index].get('storage_path')} failed: {e}")
+                    details[index] = {**details[index], 'status': 'failed'}
+                completed += 1
+                failed = sum(1 for photo in details if photo.get('status') == 'failed')
+                doc_ref.update({
+                    'media.photo_details': details,
+                    'media_processing': processing_status('processing', completed, steps_total, failed),
+                })
+        except FuturesTimeoutError:
+            for future, index in futures.items():
+                if not future.done():
+                    logger.warning(f"⏱️ Photo {details[index].get('storage_path')} exceeded the media stage budget")
+                    details[index] = {**details[index], 'status': 'failed'}
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        indexes = [index for index in pending if index in prepared and details[index].get('status') != 'failed']
+        analyses = get_photo_analysis_service().analyze_photos(
+            [(prepared[index][0], details[index].get('photo_id', 'photo')) for index in indexes]
+        )
+        for index, analysis in zip(indexes, analyses, strict=True):
+            details[index] = {
+                **details[index],
+                'thumbnail_paths': prepared[index][1],
+                'analysis': {
+                    'emotion': analysis.dominant_emotion,
+                    'scene': analysis.scene_type,
+                    'hasFaces': analysis.has_faces,
+                    'tags': analysis.therapeutic_tags,
+                    'caption': analysis.suggested_caption,
+                },
+                'status': 'ready',
+            }
+        return sum(1 for photo in details if photo.get('status') == 'failed')
+
+    def _prepare_photo(self, bucket, photo: dict) -> tuple[bytes, dict[str, str]]:
+        """Download one photo and upload its thumbnails; returns the original and the thumbnail paths."""
+        original = bucket.blob(photo['storage_path']).download_as_bytes()
+
+        thumbnail_paths: dict[str, str] = {}
+        if PIL_AVAILABLE:
+            try:
+                for size, encoded in render_thumbnails(original).items():
+                    path = thumbnail_path(photo['storage_path'], size)
+                    bucket.blob(path).upload_from_string(encoded, content_type='image/webp')
+                    thumbnail_paths[str(size)] = path
+            except Exception as e:
+                # e.g. HEIC without a decoder; the original is still served
+                logger.warning(f"Thumbnail generation failed for {photo['storage_path']}: {e}")
+        return original, thumbnail_paths
+
+    def _analyze_multimodal(self, content: str, photos: list[dict]) -> dict:
+        """Analyze combined content from all modalities."""
+        analysis_result = {
+            'primary_emotion': 'neutral',
+            'emotions': {},
+            'themes': [],
+            'sentiment_score': 0,
+            'significance': 0.5,
+            'photo_insights': []
+        }
+
+        try:
+            # Analyze text
+            if content:
+                memory_service = get_memory_analysis_service()
+                text_analysis = memory_service.analyze_text_memory(content)
+
+                analysis_result['emotions'].update(text_analysis.emotions)
+                analysis_result['themes'].extend(text_analysis.themes)
+                analysis_result['sentiment_score'] = text_analysis.sentiment_score
+                analysis_result['significance'] = text_analysis.significance_score
+
+            # Analyze photos
+            for photo in photos:
+                if photo.get('analysis'):
+                    analysis_result['photo_insights'].append(photo['analysis'])
+
+                    # Aggregate emotions from photos
+                    photo_emotion = photo['analysis'].get('emotion', 'neutral')
+                    if photo_emotion in analysis_result['emotions']:
+                        analysis_result['emotions'][photo_emotion] += 0.5
+                    else:
+                        analysis_result['emotions'][photo_emotion] = 0.5
+
+            # Determine primary emotion
+            if analysis_result['emotions']:
+                analysis_result['primary_emotion'] = max(
+                    analysis_result['emotions'],
+                    key=analysis_result['emotions'].get
+                )
+
+            return analysis_result
+
+        except Exception as e:
+            logger.error(f"Multimodal analysis failed: {e}")
+            return analysis_result
+
+    def find_stalled(self, limit: int = 100) -> list[str]:
+        """IDs of memories whose media job has not reported progress for MEDIA_STALE_SECONDS."""
+        cutoff = datetime.now(UTC) - timedelta(seconds=MEDIA_STALE_SECONDS)
+        query = db.collection('memories').where(
+            filter=FieldFilter('media_processing.state', 'in', list(ACTIVE_STATES))
+        ).limit(limit)
+        stalled = []
+        for snap in query.stream():
+            updated_at = ((snap.to_dict() or {}).get('media_processing') or {}).get('updated_at')
+            if updated_at is None or updated_at < cutoff:
+                stalled.append(snap.id)
+        return stalled
+
+
+memory_media_pipeline = MemoryMediaPipeline()
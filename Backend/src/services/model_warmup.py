@@ -0,0 +1,262 @@
+"""
+Model warm-up in the gunicorn master, before workers fork.
+
+With ``preload_app = True`` the master imports the app once and forks the
+workers from it. The ML models still loaded lazily inside each worker: the
+ML sentiment pipeline (trained or unpickled on first use), the Swedish BERT
+pipeline in ``SwedishMoodNLP``, the transformers pipeline behind
+``AIServices.enhanced_sentiment_analysis`` and the sentence-transformer
+embedding model. Up to 9 workers each held a private copy and loaded it
+again after every ``max_requests`` recycle.
+
+``warm_up()`` runs from the ``when_ready`` hook in ``gunicorn_config.py``:
+
+- loads the models named in ``MODEL_PRELOAD`` (comma list, ``all`` or
+  ``none``). Each model still honours its own feature flag and optional
+  dependency, so a disabled or uninstalled model is skipped, not an error.
+- calls ``gc.collect()`` and then ``gc.freeze()``. The surviving objects move
+  to the permanent generation and the workers' collector never writes to
+  their headers, so their memory pages stay shared copy-on-write.
+
+Workers forked after that, including those replacing recycled ones, start
+with the models already in memory. The master only loads weights and never
+runs inference. CUDA cannot be shared across ``fork``, so the warm-up is
+skipped when torch sees a GPU.
+
+``model_status()`` reports which models are loaded in the calling process,
+whether they were inherited from the master, their load time and RSS growth,
+and the process RSS/USS/PSS. It is served at ``/api/v1/metrics/models``.
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import psutil
+
+from src.utils.lazy_imports import is_available, load
+
+logger = logging.getLogger(__name__)
+
+# Models to load in the master before fork: comma list of names, "all" or "none"
+MODEL_PRELOAD = os.getenv('MODEL_PRELOAD', 'all')
+MODEL_PRELOAD_FREEZE_GC = os.getenv('MODEL_PRELOAD_FREEZE_GC', 'true').lower() == 'true'
+
+
+@dataclass
+class WarmupModel:
+    name: str
+    description: str
+    # Loads the model and returns it, or None when it is disabled or unavailable
+    load: Callable[[], Any]
+    # Whether the model is in memory; must not import or load anything
+    is_loaded: Callable[[], bool]
+
+
+@dataclass
+class WarmupResult:
+    name: str
+    loaded: bool
+    seconds: float
+    rss_delta_bytes: int
+    pid: int
+    error: str | None = None
+
+
+def _rss() -> int:
+    return psutil.Process().memory_info().rss
+
+
+def _process_memory() -> dict[str, int]:
+    process = psutil.Process()
+    info = process.memory_info()
+    memory = {'rss': info.rss, 'shared': getattr(info, 'shared', 0)}
+    try:
+        full = process.memory_full_info()
+        memory.update(uss=full.uss, pss=getattr(full, 'pss', 0))
+    except (psutil.AccessDenied, psutil.Error):
+        pass
+    return memory
+
+
+def _module_attr(module_name: str, *path: str) -> Any:
+    """Follow ``path`` from an already imported module; None if the module was never imported."""
+    value: Any = sys.modules.get(module_name)
+    for attr in path:
+        if value is None:
+            return None
+        value = getattr(value, attr, None)
+    return value
+
+
+class ModelWarmup:
+    """Registry of preloadable models and the results of the last warm-up in this process tree."""
+
+    def __init__(self) -> None:
+        self._models: dict[str, WarmupModel] = {}
+        self._results: dict[str, WarmupResult] = {}
+        self._lock = threading.Lock()
+        self._warmup_pid: int | None = None
+
+    def register(self, name: str, description: str, load: Callable[[], Any],
+                 is_loaded: Callable[[], bool]) -> None:
+        self._models[name] = WarmupModel(name, description, load, is_loaded)
+
+    def names(self) -> list[str]:
+        return list(self._models)
+
+    def selected(self, spec: str = MODEL_PRELOAD) -> list[str]:
+        """Registered model names selected by a ``MODEL_PRELOAD`` value."""
+        spec = spec.strip().lower()
+        if spec in ('', 'none', 'false'):
+            return []
+        if spec == 'all':
+            return self.names()
+        names = [n.strip() for n in spec.split(',') if n.strip()]
+        unknown = [n for n in names if n not in self._models]
+        if unknown:
+            logger.warning(f"⚠️ MODEL_PRELOAD names unknown models {unknown}; known: {self.names()}")
+        return [n for n in names if n in self._models]
+
+    def warm_up(self, names: list[str] | None = None, freeze: bool = MODEL_PRELOAD_FREEZE_GC) -> dict[str, WarmupResult]:
+        """Load ``names`` (default: ``MODEL_PRELOAD``) and freeze the heap for copy-on-write sharing."""
+        if names is None:
+            from src.services.inference_server import served_models
+            remote = served_models()
+            if remote:
+                logger.info(f"🧠 {sorted(remote)} run in the inference server, not preloaded here")
+            names = [name for name in self.selected() if name not in remote]
+        if not names:
+            logger.info("🧊 Model preload disabled (MODEL_PRELOAD=none)")
+            return {}
+        if _cuda_available():
+            logger.warning("⚠️ CUDA detected — models are loaded per worker, GPU state cannot be shared across fork")
+            return {}
+
+        with self._lock:
+            self._warmup_pid = os.getpid()
+            for name in names:
+                model = self._models[name]
+                before, started = _rss(), time.perf_counter()
+                error = None
+                try:
+                    loaded = model.load() is not None
+                except Exception as exc:
+                    loaded, error = False, str(exc)
+                    logger.warning(f"⚠️ Preloading model {name} failed: {exc}")
+                result = WarmupResult(name, loaded, round(time.perf_counter() - started, 3),
+                                      max(0, _rss() - before), os.getpid(), error)
+                self._results[name] = result
+                if loaded:
+                    logger.info(f"🧠 Preloaded {name} in {result.seconds:.1f}s "
+                                f"(+{result.rss_delta_bytes / 2**20:.0f} MiB RSS)")
+
+            if freeze:
+                gc.collect()
+                gc.freeze()
+                logger.info(f"🧊 Froze {gc.get_freeze_count()} objects for copy-on-write sharing with workers")
+            return dict(self._results)
+
+    def status(self) -> dict[str, Any]:
+        """Loaded models and memory of the calling process."""
+        pid = os.getpid()
+        models = []
+        for name, model in self._models.items():
+            result = self._results.get(name)
+            try:
+                loaded = bool(model.is_loaded())
+            except Exception:
+                loaded = False
+            models.append({
+                'name': name,
+                'description': model.description,
+                'loaded': loaded,
+                # Loaded in the master and inherited through fork
+                'preloaded': bool(loaded and result and result.loaded and result.pid != pid),
+                'load_seconds': result.seconds if result else None,
+                'rss_delta_bytes': result.rss_delta_bytes if result else None,
+                'error': result.error if result else None,
+            })
+        return {
+            'pid': pid,
+            'warmup_pid': self._warmup_pid,
+            'gc_frozen_objects': gc.get_freeze_count(),
+            'memory': _process_memory(),
+            'models': models,
+        }
+
+
+def _cuda_available() -> bool:
+    if not is_available('torch'):
+        return False
+    try:
+        return bool(load('torch').cuda.is_available())
+    except Exception:
+        return False
+
+
+# ──────────────────────────────────────────────────────────────
+# Built-in models
+# ──────────────────────────────────────────────────────────────
+
+def _load_ml_sentiment() -> Any:
+    from src.services.ml_sentiment_service import ml_sentiment
+    return ml_sentiment if ml_sentiment.available else None
+
+
+def _load_mood_nlp() -> Any:
+    from src.services.mood_nlp_service import get_mood_nlp
+    return get_mood_nlp().sentiment_pipeline
+
+
+def _load_transformer_sentiment() -> Any:
+    from src.services.ai_service import ai_services
+    return ai_services.transformer_sentiment_pipeline
+
+
+def _load_embeddings() -> Any:
+    from src.services.embedding_engine import CHAT_RAG_EMBEDDING_MODEL, get_embedding_engine
+    chat_model = get_embedding_engine(CHAT_RAG_EMBEDDING_MODEL).model
+    default_model = get_embedding_engine().model
+    return chat_model or default_model
+
+
+def _embeddings_loaded() -> bool:
+    engines = _module_attr('src.services.embedding_engine', '_engines') or {}
+    return any(engine._model is not None for engine in list(engines.values()))
+
+
+model_warmup = ModelWarmup()
+model_warmup.register(
+    'ml_sentiment', 'TF-IDF + logistic regression sentiment (scikit-learn)', _load_ml_sentiment,
+    lambda: bool(_module_attr('src.services.ml_sentiment_service', 'ml_sentiment', '_is_trained')),
+)
+model_warmup.register(
+    'mood_nlp', 'Swedish BERT sentiment pipeline in SwedishMoodNLP', _load_mood_nlp,
+    lambda: _module_attr('src.services.mood_nlp_service', '_mood_nlp', '_sentiment_pipeline') is not None,
+)
+model_warmup.register(
+    'transformer_sentiment', 'AIServices transformers sentiment (ENABLE_TRANSFORMER_SENTIMENT)',
+    _load_transformer_sentiment,
+    lambda: _module_attr('src.services.ai_service', 'ai_services', '_sentiment_pipeline') is not None,
+)
+model_warmup.register(
+    'embeddings', 'Sentence-transformer embedding models (chat RAG; RAG and crisis detection)', _load_embeddings,
+    _embeddings_loaded,
+)
+
+
+def warm_up(names: list[str] | None = None, freeze: bool = MODEL_PRELOAD_FREEZE_GC) -> dict[str, WarmupResult]:
+    return model_warmup.warm_up(names, freeze)
+
+
+def model_status() -> dict[str, Any]:
+    return model_warmup.status()
@@ -0,0 +1,329 @@
+"""
+Mood aggregate materialization.
+
+Keeps one ``mood_aggregates/{user_id}`` document per user in sync with the
+mood log so streak and consistency stats cost a single read instead of
+streaming every mood the user has ever logged.
+
+Logged days are stored run-length encoded: ``runs`` is a sorted list of
+``{"start": "YYYY-MM-DD", "days": n}`` maps, one map per unbroken streak.
+A user logging daily for three years therefore stores a handful of runs,
+not a thousand dates.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+from collections.abc import Callable, Iterable
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+
+from google.cloud.firestore import FieldFilter
+
+from ..firebase_config import db
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES_COLLECTION = 'mood_aggregates'
+AGGREGATE_VERSION = 1
+CONSISTENCY_WINDOW_DAYS = 30
+
+# Internal run representation: [start_ordinal, length]
+Run = list[int]
+
+
+def day_key(timestamp: Any) -> str | None:
+    """Return the YYYY-MM-DD day a mood timestamp belongs to, or None if unparseable."""
+    if not timestamp:
+        return None
+    if isinstance(timestamp, datetime | date):
+        return timestamp.strftime('%Y-%m-%d')
+    key = str(timestamp)[:10]
+    try:
+        date.fromisoformat(key)
+    except ValueError:
+        return None
+    return key
+
+
+def decode_runs(raw: Any) -> list[Run]:
+    """Decode stored runs into sorted ``[start_ordinal, length]`` pairs, skipping malformed entries."""
+    runs: list[Run] = []
+    if not isinstance(raw, list):
+        return runs
+    for item in raw:
+        if not isinstance(item, dict):
+            continue
+        try:
+            start = date.fromisoformat(str(item.get('start'))).toordinal()
+            length = int(item.get('days', 0))
+        except (TypeError, ValueError):
+            continue
+        if length > 0:
+            runs.append([start, length])
+    runs.sort(key=lambda r: r[0])
+    return runs
+
+
+def encode_runs(runs: list[Run]) -> list[dict[str, Any]]:
+    """Encode runs for Firestore (which does not support nested arrays)."""
+    return [{'start': date.fromordinal(start).isoformat(), 'days': length} for start, length in runs]
+
+
+def runs_from_days(days: Iterable[str]) -> list[Run]:
+    """Build runs from an iterable of YYYY-MM-DD strings (used for rebuilds)."""
+    runs: list[Run] = []
+    for ordinal in sorted({date.fromisoformat(d).toordinal() for d in days}):
+        if runs and runs[-1][0] + runs[-1][1] == ordinal:
+            runs[-1][1] += 1
+        else:
+            runs.append([ordinal, 1])
+    return runs
+
+
+def add_day(runs: list[Run], ordinal: int) -> bool:
+    """Mark a day as logged, merging neighbouring runs. Returns True if runs changed."""
+    i = bisect.bisect_right(runs, ordinal, key=lambda r: r[0]) - 1
+    if i >= 0 and ordinal < runs[i][0] + runs[i][1]:
+        return False
+
+    extends_prev = i >= 0 and runs[i][0] + runs[i][1] == ordinal
+    joins_next = i + 1 < len(runs) and runs[i + 1][0] == ordinal + 1
+
+    if extends_prev and joins_next:
+        runs[i][1] += 1 + runs[i + 1][1]
+        del runs[i + 1]
+    elif extends_prev:
+        runs[i][1] += 1
+    elif joins_next:
+        runs[i + 1][0] = ordinal
+        runs[i + 1][1] += 1
+    else:
+        runs.insert(i + 1, [ordinal, 1])
+    return True
+
+
+def remove_day(runs: list[Run], ordinal: int) -> bool:
+    """Unmark a logged day, splitting its run if needed. Returns True if runs changed."""
+    i = bisect.bisect_right(runs, ordinal, key=lambda r: r[0]) - 1
+    if i < 0 or ordinal >= runs[i][0] + runs[i][1]:
+        return False
+
+    start, length = runs[i]
+    before = ordinal - start
+    after = start + length - ordinal - 1
+    replacement = []
+    if before:
+        replacement.append([start, before])
+    if after:
+        replacement.append([ordinal + 1, after])
+    runs[i:i + 1] = replacement
+    return True
+
+
+def summarize(aggregate: dict[str, Any] | None, today: date | None = None) -> dict[str, Any]:
+    """
+    Turn an aggregate document into the /api/mood/streaks payload.
+
+    Only the runs touching today or the consistency window are inspected,
+    so the cost does not grow with the user's history.
+    """
+    today = today or datetime.now(UTC).date()
+    runs = decode_runs((aggregate or {}).get('runs'))
+    if not runs:
+        return {
+            'currentStreak': 0,
+            'longestStreak': 0,
+            'totalLoggedDays': 0,
+            'consistencyPercentage': 0,
+            'lastLogDate': None,
+        }
+
+    today_ord = today.toordinal()
+
+    current_streak = 0
+    i = bisect.bisect_right(runs, today_ord, key=lambda r: r[0]) - 1
+    if i >= 0 and today_ord < runs[i][0] + runs[i][1]:
+        current_streak = today_ord - runs[i][0] + 1
+
+    # Rolling window: every logged day from (today - 30) onwards, matching the
+    # original scan semantics.
+    window_start = today_ord - CONSISTENCY_WINDOW_DAYS
+    recent_days = 0
+    for start, length in reversed(runs):
+        end = start + length - 1
+        if end < window_start:
+            break
+        recent_days += end - max(start, window_start) + 1
+
+    last_start, last_length = runs[-1]
+    longest_streak = aggregate.get('longest_streak') if aggregate else None
+    total_days = aggregate.get('total_days') if aggregate else None
+    if not isinstance(longest_streak, int):
+        longest_streak = max(length for _, length in runs)
+    if not isinstance(total_days, int):
+        total_days = sum(length for _, length in runs)
+
+    return {
+        'currentStreak': current_streak,
+        'longestStreak': longest_streak,
+        'totalLoggedDays': total_days,
+        'consistencyPercentage': round(recent_days / CONSISTENCY_WINDOW_DAYS * 100, 1),
+        'lastLogDate': date.fromordinal(last_start + last_length - 1).isoformat(),
+    }
+
+
+def _build_document(user_id: str, runs: list[Run]) -> dict[str, Any]:
+    last_log_date = None
+    if runs:
+        last_log_date = date.fromordinal(runs[-1][0] + runs[-1][1] - 1).isoformat()
+    return {
+        'user_id': user_id,
+        'version': AGGREGATE_VERSION,
+        'runs': encode_runs(runs),
+        'total_days': sum(length for _, length in runs),
+        'longest_streak': max((length for _, length in runs), default=0),
+        'last_log_date': last_log_date,
+        'updated_at': datetime.now(UTC).isoformat(),
+    }
+
+
+class MoodAggregateService:
+    """Maintains the per-user ``mood_aggregates`` document."""
+
+    def _ref(self, user_id: str) -> Any:
+        if db is None:
+            raise RuntimeError("Firestore unavailable")
+        return db.collection(AGGREGATES_COLLECTION).document(user_id)
+
+    # ──────────────────────────────────────────────────────────────
+    # Reads
+    # ──────────────────────────────────────────────────────────────
+
+    def get(self, user_id: str) -> dict[str, Any] | None:
+        """Return the materialized aggregate, or None if it has not been built yet."""
+        snap = self._ref(user_id).get()
+        if not snap.exists:
+            return None
+        data = snap.to_dict()
+        if not isinstance(data, dict) or not isinstance(data.get('runs'), list):
+            return None
+        return data
+
+    def get_streaks(self, user_id: str, today: date | None = None) -> dict[str, Any] | None:
+        """Streak payload from the aggregate (one read), or None if not materialized."""
+        aggregate = self.get(user_id)
+        if aggregate is None:
+            return None
+        return summarize(aggregate, today)
+
+    # ──────────────────────────────────────────────────────────────
+    # Writes
+    # ──────────────────────────────────────────────────────────────
+
+    def record_log(self, user_id: str, timestamp: Any) -> None:
+        """Account for a newly logged mood."""
+        key = day_key(timestamp)
+        if key is None:
+            return
+        ordinal = date.fromisoformat(key).toordinal()
+        self._apply(user_id, lambda runs, _transaction: add_day(runs, ordinal))
+
+    def record_removal(self, user_id: str, timestamp: Any) -> None:
+        """Account for a deleted mood (or one moved away from ``timestamp``'s day)."""
+        key = day_key(timestamp)
+        if key is None:
+            return
+        ordinal = date.fromisoformat(key).toordinal()
+
+        def _remove(runs: list[Run], transaction: Any) -> bool:
+            # Checked in the same transaction as the write, so a mood logged
+            # for this day concurrently forces a retry instead of being lost.
+            if self._has_mood_on_day(user_id, key, transaction):
+                return False
+            return remove_day(runs, ordinal)
+
+        self._apply(user_id, _remove)
+
+    def record_move(self, user_id: str, old_timestamp: Any, new_timestamp: Any) -> None:
+        """Account for a mood whose timestamp was edited."""
+        if day_key(old_timestamp) == day_key(new_timestamp):
+            return
+        self.record_log(user_id, new_timestamp)
+        self.record_removal(user_id, old_timestamp)
+
+    def materialize(self, user_id: str, days: Iterable[str]) -> dict[str, Any]:
+        """Overwrite the aggregate from a full set of logged days and return it."""
+        document = _build_document(user_id, runs_from_days(days))
+        self._ref(user_id).set(document)
+        return document
+
+    def rebuild(self, user_id: str) -> dict[str, Any]:
+        """Backfill the aggregate from the user's complete mood history."""
+        if db is None:
+            raise RuntimeError("Firestore unavailable")
+        moods = db.collection('users').document(user_id).collection('moods')
+        days = set()
+        for doc in moods.select(['timestamp']).stream():
+            key = day_key((doc.to_dict() or {}).get('timestamp'))
+            if key:
+                days.add(key)
+        return self.materialize(user_id, days)
+
+    def _has_mood_on_day(self, user_id: str, key: str, transaction: Any = None) -> bool:
+        if db is None:
+            raise RuntimeError("Firestore unavailable")
+        next_day = (date.fromisoformat(key) + timedelta(days=1)).isoformat()
+        query = (
+            db.collection('users').document(user_id).collection('moods')
+            .where(filter=FieldFilter('timestamp', '>=', key))
+            .where(filter=FieldFilter('timestamp', '<', next_day))
+            .limit(1)
+        )
+        return any(True for _ in query.stream(transaction=transaction))
+
+    def _apply(self, user_id: str, mutate: Callable[[list[Run], Any], bool]) -> None:
+        """
+        Apply ``mutate`` to the stored runs inside a Firestore transaction.
+
+        ``mutate`` receives the runs and the active transaction (None on the
+        non-transactional fallback) so any extra reads it makes are part of
+        the same transaction.
+
+        Users without an aggregate are skipped: the next streak read (or the
+        backfill script) builds it from the full history, which already
+        includes this change.
+        """
+        ref = self._ref(user_id)
+
+        def _mutated(snapshot: Any, transaction: Any = None) -> dict[str, Any] | None:
+            data = snapshot.to_dict() if snapshot and snapshot.exists else None
+            if not isinstance(data, dict) or not isinstance(data.get('runs'), list):
+                return None
+            runs = decode_runs(data['runs'])
+            if not mutate(runs, transaction):
+                return None
+            return _build_document(user_id, runs)
+
+        from google.cloud.firestore import transactional as _transactional
+
+        @_transactional
+        def _apply_in_transaction(transaction: Any) -> None:
+            document = _mutated(ref.get(transaction=transaction), transaction)
+            if document is not None:
+                transaction.set(ref, document)
+
+        try:
+            if db is None:
+                raise RuntimeError("Firestore database client is not initialized")
+            _apply_in_transaction(db.transaction())
+        except Exception as exc:
+            logger.warning("Transaction failed for mood aggregate update: %s", exc)
+            # Fallback to non-transactional for resilience
+            document = _mutated(ref.get())
+            if document is not None:
+                ref.set(document)
+
+
+mood_aggregate_service = MoodAggregateService()
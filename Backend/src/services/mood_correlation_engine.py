@@ -12,7 +12,11 @@ from datetime import datetime
 from typing import Any
 
 import numpy as np
-from scipy import stats
+
+from ..utils.lazy_imports import lazy_module
+
+# scipy is imported on the first significance test, not when the app boots
+stats = lazy_module('scipy.stats')
 
 logger = logging.getLogger(__name__)
 
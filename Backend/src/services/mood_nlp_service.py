@@ -4,20 +4,20 @@ Replaces simplistic keyword extraction with deep semantic understanding
 """
 
 import logging
+import threading
 from dataclasses import dataclass
 
-# Transformers with graceful fallback
-try:
-    import torch
-    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
-    logger = logging.getLogger(__name__)
-    logger.warning("Transformers not available, using fallback")
+from ..utils.lazy_imports import is_available, load
+from ..utils.text_scanner import ScanResult, TextScanner
+from .inference_server import infer, use_inference_server
 
 logger = logging.getLogger(__name__)
 
+# Transformers with graceful fallback; torch and transformers are imported with the model on first use
+TRANSFORMERS_AVAILABLE = is_available('transformers') and is_available('torch')
+if not TRANSFORMERS_AVAILABLE:
+    logger.warning("Transformers not available, using fallback")
+
 
 @dataclass
 class MoodAnalysis:
@@ -54,24 +54,62 @@ class SwedishMoodNLP:
         ]
     }
 
+    # Clinical risk markers (Swedish) and the weight of each distinct term found
+    CLINICAL_MARKERS = {
+        'suicidal_ideation': (0.3, ['dö', 'suicid', 'självmord', 'inte orka', 'sluta', 'försvinna', 'död']),
+        'hopelessness': (0.25, ['hopplös', 'meningslös', 'poänglös', 'aldrig bättre', 'inget värde']),
+        'anxiety': (0.2, ['ångest', 'panik', 'hjärtat', 'svårt andas', 'orolig', 'nervös']),
+        'sleep_disturbance': (0.15, ['sova', 'sömn', 'vaken', 'trött', 'utmattad', 'orke']),
+        'social_withdrawal': (0.2, ['ensam', 'isolerad', 'dra mig undan', 'ingen förstår', 'stänga ute']),
+    }
+
+    # Linguistic markers for arousal, sense of control and intensity
+    LINGUISTIC_MARKERS = {
+        'high_arousal': ['!', 'energi', 'hyper', 'stressad', 'panik', 'ångest', 'ilska', 'jävla', 'skit'],
+        'low_arousal': ['trött', 'slut', 'tom', 'utmattad', 'tung', 'tungt', 'sömnig', 'avslappnad', 'lugn'],
+        'loss_control': ['kan inte', 'förlorar', 'kontroll', 'överväldigad', 'fångad', 'inget val'],
+        'control': ['kan', 'kontroll', 'bestämmer', 'väljer', 'styr', 'hanterar'],
+        'intensity': ['mycket', 'extremt', 'jätte', 'totalt', 'helt', 'så'],
+    }
+
+    # All lexicons above, matched in one scan per text
+    _scanner = TextScanner({
+        **EMOTION_CATEGORIES,
+        **{f'clinical:{name}': terms for name, (_, terms) in CLINICAL_MARKERS.items()},
+        **LINGUISTIC_MARKERS,
+    })
+
     def __init__(self):
         self.tokenizer = None
         self.model = None
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu') if TRANSFORMERS_AVAILABLE else None
-        self.sentiment_pipeline = None
-
-        if TRANSFORMERS_AVAILABLE:
-            self._load_model()
+        self.device = None
+        self._sentiment_pipeline = None
+        self._load_attempted = False
+        self._load_lock = threading.Lock()
+
+    @property
+    def sentiment_pipeline(self):
+        """The BERT sentiment pipeline, loading the model on first access (None if unavailable)."""
+        if not self._load_attempted and TRANSFORMERS_AVAILABLE:
+            with self._load_lock:
+                if not self._load_attempted:
+                    self._load_model()
+                    self._load_attempted = True
+        return self._sentiment_pipeline
 
     def _load_model(self):
         """Load Swedish BERT model for sentiment/emotion analysis."""
         try:
+            torch = load('torch')
+            transformers = load('transformers')
+            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
             # KB-BERT is the best Swedish BERT model available
             model_name = "KB/bert-base-swedish-cased"
 
             logger.info(f"Loading Swedish BERT model: {model_name}")
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(
+            self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+            self.model = transformers.AutoModelForSequenceClassification.from_pretrained(
                 model_name,
                 num_labels=3,  # negative, neutral, positive
                 ignore_mismatched_sizes=True
@@ -80,7 +118,7 @@ class SwedishMoodNLP:
             self.model.eval()
 
             # Load emotion classification pipeline
-            self.sentiment_pipeline = pipeline(
+            self._sentiment_pipeline = transformers.pipeline(
                 "sentiment-analysis",
                 model=self.model,
                 tokenizer=self.tokenizer,
@@ -108,8 +146,8 @@ class SwedishMoodNLP:
         if not text or not text.strip():
             return self._default_analysis()
 
-        # Try BERT-based analysis first
-        if self.sentiment_pipeline and TRANSFORMERS_AVAILABLE:
+        # Try BERT-based analysis first (in the inference server when the host runs one)
+        if TRANSFORMERS_AVAILABLE and (use_inference_server() or self.sentiment_pipeline):
             try:
                 return self._bert_analysis(text, context)
             except Exception as e:
@@ -120,8 +158,11 @@ class SwedishMoodNLP:
 
     def _bert_analysis(self, text: str, context: list[str] | None) -> MoodAnalysis:
         """BERT-based deep semantic analysis."""
-        # Get BERT sentiment
-        result = self.sentiment_pipeline(text[:512])[0]  # Truncate to max length
+        # Get BERT sentiment (truncated to max length); InferenceUnavailable falls back like any failure
+        if use_inference_server():
+            result = infer('mood_nlp', text[:512])
+        else:
+            result = self.sentiment_pipeline(text[:512])[0]
 
         label = result['label']
         confidence = result['score']
@@ -137,20 +178,22 @@ class SwedishMoodNLP:
         # Adjust by confidence
         valence = base_valence * confidence
 
+        hits = self._scanner.scan(text)
+
         # Detect clinical indicators
-        clinical_indicators = self._detect_clinical_markers(text)
+        clinical_indicators = self._detect_clinical_markers(hits)
 
         # Estimate arousal from linguistic features
-        arousal = self._estimate_arousal(text)
+        arousal = self._estimate_arousal(hits)
 
         # Estimate dominance/control
-        dominance = self._estimate_dominance(text)
+        dominance = self._estimate_dominance(hits)
 
         # Identify primary and secondary emotions
-        emotions = self._identify_emotions(text)
+        emotions = self._identify_emotions(hits)
 
         # Calculate intensity (1-10)
-        intensity = self._calculate_intensity(text, valence, arousal)
+        intensity = self._calculate_intensity(hits, valence, arousal)
 
         return MoodAnalysis(
             valence=valence,
@@ -165,12 +208,12 @@ class SwedishMoodNLP:
 
     def _semantic_analysis(self, text: str, context: list[str] | None) -> MoodAnalysis:
         """Semantic analysis using Swedish emotion vocabulary."""
-        text_lower = text.lower()
+        hits = self._scanner.scan(text)
 
         # Count emotion category occurrences
-        pos_score = sum(1 for word in self.EMOTION_CATEGORIES['positive'] if word in text_lower)
-        neg_score = sum(1 for word in self.EMOTION_CATEGORIES['negative'] if word in text_lower)
-        clinical_score = sum(1 for word in self.EMOTION_CATEGORIES['clinical'] if word in text_lower)
+        pos_score = hits.count('positive')
+        neg_score = hits.count('negative')
+        clinical_score = hits.count('clinical')
 
         # Calculate valence
         total = pos_score + neg_score + 1  # +1 to avoid division by zero
@@ -181,17 +224,17 @@ class SwedishMoodNLP:
             valence = min(valence - 0.3 * clinical_score, -0.5)
 
         # Detect clinical indicators
-        clinical_indicators = self._detect_clinical_markers(text)
+        clinical_indicators = self._detect_clinical_markers(hits)
 
         # Estimate arousal and dominance
-        arousal = self._estimate_arousal(text)
-        dominance = self._estimate_dominance(text)
+        arousal = self._estimate_arousal(hits)
+        dominance = self._estimate_dominance(hits)
 
         # Identify emotions
-        emotions = self._identify_emotions(text)
+        emotions = self._identify_emotions(hits)
 
         # Calculate intensity
-        intensity = self._calculate_intensity(text, valence, arousal)
+        intensity = self._calculate_intensity(hits, valence, arousal)
 
         return MoodAnalysis(
             valence=valence,
@@ -204,49 +247,17 @@ class SwedishMoodNLP:
             clinical_indicators=clinical_indicators
         )
 
-    def _detect_clinical_markers(self, text: str) -> dict[str, float]:
-        """Detect clinical risk markers in text."""
-        text_lower = text.lower()
-        markers = {}
-
-        # Suicidal ideation markers (Swedish)
-        suicide_terms = ['dö', 'suicid', 'självmord', 'inte orka', 'sluta', 'försvinna', 'död']
-        markers['suicidal_ideation'] = sum(0.3 for term in suicide_terms if term in text_lower)
-        markers['suicidal_ideation'] = min(markers['suicidal_ideation'], 1.0)
-
-        # Hopelessness
-        hopelessness_terms = ['hopplös', 'meningslös', 'poänglös', 'aldrig bättre', 'inget värde']
-        markers['hopelessness'] = sum(0.25 for term in hopelessness_terms if term in text_lower)
-        markers['hopelessness'] = min(markers['hopelessness'], 1.0)
-
-        # Anxiety markers
-        anxiety_terms = ['ångest', 'panik', 'hjärtat', 'svårt andas', 'orolig', 'nervös']
-        markers['anxiety'] = sum(0.2 for term in anxiety_terms if term in text_lower)
-        markers['anxiety'] = min(markers['anxiety'], 1.0)
-
-        # Sleep disturbance
-        sleep_terms = ['sova', 'sömn', 'vaken', 'trött', 'utmattad', 'orke']
-        markers['sleep_disturbance'] = sum(0.15 for term in sleep_terms if term in text_lower)
-        markers['sleep_disturbance'] = min(markers['sleep_disturbance'], 1.0)
-
-        # Social withdrawal
-        social_terms = ['ensam', 'isolerad', 'dra mig undan', 'ingen förstår', 'stänga ute']
-        markers['social_withdrawal'] = sum(0.2 for term in social_terms if term in text_lower)
-        markers['social_withdrawal'] = min(markers['social_withdrawal'], 1.0)
-
-        return markers
+    def _detect_clinical_markers(self, hits: ScanResult) -> dict[str, float]:
+        """Detect clinical risk markers from a text's scan."""
+        return {
+            name: min(sum(weight for _ in hits.get(f'clinical:{name}')), 1.0)
+            for name, (weight, _) in self.CLINICAL_MARKERS.items()
+        }
 
-    def _estimate_arousal(self, text: str) -> float:
+    def _estimate_arousal(self, hits: ScanResult) -> float:
         """Estimate arousal level from linguistic features."""
-        text_lower = text.lower()
-
-        # High arousal markers
-        high_arousal = ['!', 'energi', 'hyper', 'stressad', 'panik', 'ångest', 'ilska', 'jävla', 'skit']
-        high_count = sum(1 for marker in high_arousal if marker in text_lower)
-
-        # Low arousal markers
-        low_arousal = ['trött', 'slut', 'tom', 'utmattad', 'tung', 'tungt', 'sömnig', 'avslappnad', 'lugn']
-        low_count = sum(1 for marker in low_arousal if marker in text_lower)
+        high_count = hits.count('high_arousal')
+        low_count = hits.count('low_arousal')
 
         if high_count > low_count:
             return 0.6 + min(high_count * 0.1, 0.4)
@@ -255,30 +266,21 @@ class SwedishMoodNLP:
         else:
             return 0.5
 
-    def _estimate_dominance(self, text:str) -> float:
+    def _estimate_dominance(self, hits: ScanResult) -> float:
         """Estimate sense of control/dominance."""
-        text_lower = text.lower()
-
-        # Loss of control markers
-        loss_control = ['kan inte', 'förlorar', 'kontroll', 'överväldigad', 'fångad', 'inget val']
-        loss_count = sum(1 for marker in loss_control if marker in text_lower)
-
-        # Control markers
-        control = ['kan', 'kontroll', 'bestämmer', 'väljer', 'styr', 'hanterar']
-        control_count = sum(1 for marker in control if marker in text_lower)
+        loss_count = hits.count('loss_control')
+        control_count = hits.count('control')
 
         return max(0.0, min(1.0, 0.5 + (control_count - loss_count) * 0.15))
 
-    def _identify_emotions(self, text: str) -> dict[str, any]:
-        """Identify specific emotions from text."""
-        text_lower = text.lower()
-
+    def _identify_emotions(self, hits: ScanResult) -> dict[str, any]:
+        """Identify specific emotions from a text's scan."""
         emotion_scores = {}
 
         # Score each emotion category
-        for category, words in self.EMOTION_CATEGORIES.items():
+        for category in self.EMOTION_CATEGORIES:
             if category != 'clinical':
-                score = sum(1 for word in words if word in text_lower)
+                score = hits.count(category)
                 if score > 0:
                     emotion_scores[category] = score
 
@@ -296,7 +298,7 @@ class SwedishMoodNLP:
             'secondary': secondary
         }
 
-    def _calculate_intensity(self, text: str, valence: float, arousal: float) -> int:
+    def _calculate_intensity(self, hits: ScanResult, valence: float, arousal: float) -> int:
         """Calculate mood intensity on 1-10 scale."""
         # Base intensity from arousal
         base = int(arousal * 10)
@@ -306,9 +308,7 @@ class SwedishMoodNLP:
             base += 2
 
         # Adjust for intensity words
-        intensity_boosters = ['mycket', 'extremt', 'jätte', 'totalt', 'helt', 'så']
-        boost_count = sum(1 for word in intensity_boosters if word in text.lower())
-        base += boost_count
+        base += hits.count('intensity')
 
         # Cap at 1-10
         return max(1, min(10, base))
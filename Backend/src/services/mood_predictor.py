@@ -6,48 +6,56 @@ Replaces np.polyfit() with sophisticated ML models.
 import logging
 import os
 import pickle
+from collections.abc import Callable, Iterable
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Any
 
 import numpy as np
 
-# ML libraries with graceful fallback
-try:
-    from sklearn.ensemble import RandomForestRegressor
-    from sklearn.metrics import mean_absolute_error, mean_squared_error
-    from sklearn.model_selection import train_test_split
-    from sklearn.preprocessing import StandardScaler
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
-
-try:
-    import tensorflow as tf
-    from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
-    from tensorflow.keras.layers import LSTM, BatchNormalization, Dense, Dropout
-    from tensorflow.keras.models import Sequential, load_model
-    from tensorflow.keras.optimizers import Adam
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
-
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-
-try:
-    import shap
-    SHAP_AVAILABLE = True
-except ImportError:
-    SHAP_AVAILABLE = False
-
-from ..config.firebase_config import db
+from ..firebase_config import db
+from ..utils.cache import get_cache
+from ..utils.fanout import TaskResult, fan_out, get_executor
+from ..utils.lazy_imports import is_available, lazy_module
+
+# ML libraries with graceful fallback; imported on first use, not when the app boots
+SKLEARN_AVAILABLE = is_available('sklearn')
+TENSORFLOW_AVAILABLE = is_available('tensorflow')
+PANDAS_AVAILABLE = is_available('pandas')
+SHAP_AVAILABLE = is_available('shap')
+
+shap = lazy_module('shap')
 
 logger = logging.getLogger(__name__)
 
+# Cached data features are also invalidated by the user's next mood write
+FEATURE_CACHE_TTL_SECONDS = int(os.getenv('FEATURE_CACHE_TTL_SECONDS', '3600'))
+# Budget for each Firestore read of a feature batch
+FEATURE_SOURCE_TIMEOUT_SECONDS = float(os.getenv('FEATURE_SOURCE_TIMEOUT_SECONDS', '10'))
+# Feature reads run on their own pool, not the fan-out pool shared with request paths (chat RAG)
+FEATURE_FANOUT_MAX_WORKERS = int(os.getenv('FEATURE_FANOUT_MAX_WORKERS', '16'))
+# Firestore 'in' filters accept at most 30 values
+CRISIS_QUERY_CHUNK = 30
+
+# Per-user Firestore sources of a feature vector (crisis alerts are batched separately)
+FEATURE_SOURCES = ('moods', 'sleep', 'activity', 'sentiment', 'app_opens', 'chat_messages', 'exercises_completed')
+
+# Users whose sources (plus one crisis query) fit the pool at once, so no read spends its budget queued
+FEATURE_BATCH_USERS = min(CRISIS_QUERY_CHUNK, max(1, (FEATURE_FANOUT_MAX_WORKERS - 1) // len(FEATURE_SOURCES)))
+
+FEATURE_NAMES = [
+    'mood_mean_7d', 'mood_mean_14d', 'mood_mean_30d', 'mood_std_7d', 'mood_volatility',
+    'mood_trend', 'mood_momentum', 'mood_min_7d', 'mood_max_7d',
+    'negative_days_7d', 'negative_days_14d',
+    'sleep_mean', 'sleep_std', 'sleep_trend', 'sleep_deficit_days', 'sleep_quality_mean',
+    'steps_mean', 'steps_std', 'steps_trend', 'sedentary_days',
+    'sentiment_mean', 'sentiment_trend',
+    'app_opens_7d', 'chat_messages_7d', 'exercises_completed_7d',
+    'day_of_week', 'is_weekend', 'hour_of_day', 'month', 'days_since_start',
+    'crisis_count_30d'
+]
+
 
 @dataclass
 class MoodPrediction:
@@ -75,10 +83,19 @@ class FeatureEngineer:
     """
     Feature engineering for mood prediction.
     Creates ML features from user data including mood history, sleep, activity, etc.
+
+    The Firestore sources of a prediction (moods, sleep, steps, conversations,
+    app opens, chat messages, exercises, crisis alerts) are read concurrently
+    instead of one after another. The data-derived features are cached per
+    user and keyed on the user's ``moodsLastWrite``, which the mood routes
+    stamp on every log, edit and delete, so a mood change invalidates them
+    at once. Other sources refresh within ``FEATURE_CACHE_TTL_SECONDS``.
+    Temporal features (weekday, hour, ...) are filled in on every call.
     """
 
     def __init__(self):
         logger.info("🔧 Initializing Feature Engineer...")
+        self._cache = get_cache('mood_features', default_ttl=FEATURE_CACHE_TTL_SECONDS, max_size=5000)
 
     def engineer_features(self, user_id: str, days_history: int = 30) -> np.ndarray | None:
         """
@@ -92,237 +109,352 @@ class FeatureEngineer:
         - Temporal features (day of week, season)
         - Biometric data (if available)
         """
-        try:
-            features = {}
+        return self.engineer_features_many([user_id], days_history)[user_id]
 
-            # 1. Mood features
-            mood_data = self._get_mood_history(user_id, days=days_history)
-            if len(mood_data) < 7:
-                logger.warning(f"Insufficient mood data for user {user_id[:8]}...")
-                return None
+    def engineer_features_many(self, user_ids: Iterable[str], days_history: int = 30) -> dict[str, np.ndarray | None]:
+        """
+        Feature vectors for many users, keyed by user id (None without enough data).
 
-            # Mood statistics
-            mood_scores = np.array([m.get('score', 0) for m in mood_data])
-            features['mood_mean_7d'] = np.mean(mood_scores[-7:])
-            features['mood_mean_14d'] = np.mean(mood_scores[-14:]) if len(mood_scores) >= 14 else features['mood_mean_7d']
-            features['mood_mean_30d'] = np.mean(mood_scores)
-            features['mood_std_7d'] = np.std(mood_scores[-7:])
-            features['mood_volatility'] = np.std(mood_scores)
-
-            # Mood trend (linear regression)
-            x = np.arange(len(mood_scores))
-            features['mood_trend'] = np.polyfit(x, mood_scores, 1)[0]
-
-            # Recent momentum (last 3 days vs previous 3)
-            if len(mood_scores) >= 6:
-                recent = np.mean(mood_scores[-3:])
-                previous = np.mean(mood_scores[-6:-3])
-                features['mood_momentum'] = recent - previous
-            else:
-                features['mood_momentum'] = 0.0
-
-            # Min/max extremes
-            features['mood_min_7d'] = np.min(mood_scores[-7:])
-            features['mood_max_7d'] = np.max(mood_scores[-7:])
-
-            # Count of negative days
-            features['negative_days_7d'] = np.sum(mood_scores[-7:] < -0.3)
-            features['negative_days_14d'] = np.sum(mood_scores[-14:] < -0.3) if len(mood_scores) >= 14 else features['negative_days_7d']
-
-            # 2. Sleep features (from wearables or user input)
-            sleep_data = self._get_sleep_data(user_id, days=14)
-            if sleep_data:
-                sleep_hours = np.array([s.get('hours', 0) for s in sleep_data])
-                features['sleep_mean'] = np.mean(sleep_hours)
-                features['sleep_std'] = np.std(sleep_hours)
-                features['sleep_trend'] = np.polyfit(np.arange(len(sleep_hours)), sleep_hours, 1)[0] if len(sleep_hours) > 1 else 0
-                features['sleep_deficit_days'] = np.sum(sleep_hours < 6)
-                features['sleep_quality_mean'] = np.mean([s.get('quality', 5) for s in sleep_data])
-            else:
-                # Default values if no sleep data
-                features['sleep_mean'] = 7.0
-                features['sleep_std'] = 1.0
-                features['sleep_trend'] = 0.0
-                features['sleep_deficit_days'] = 0
-                features['sleep_quality_mean'] = 5.0
-
-            # 3. Activity features
-            activity_data = self._get_activity_data(user_id, days=14)
-            if activity_data:
-                steps = np.array([a.get('steps', 0) for a in activity_data])
-                features['steps_mean'] = np.mean(steps)
-                features['steps_std'] = np.std(steps)
-                features['steps_trend'] = np.polyfit(np.arange(len(steps)), steps, 1)[0] if len(steps) > 1 else 0
-                features['sedentary_days'] = np.sum(steps < 3000)
-            else:
-                features['steps_mean'] = 5000
-                features['steps_std'] = 2000
-                features['steps_trend'] = 0.0
-                features['sedentary_days'] = 0
-
-            # 4. Semantic sentiment features
-            sentiment_data = self._get_sentiment_history(user_id, days=7)
-            if sentiment_data:
-                sentiments = np.array([s.get('score', 0) for s in sentiment_data])
-                features['sentiment_mean'] = np.mean(sentiments)
-                features['sentiment_trend'] = np.polyfit(np.arange(len(sentiments)), sentiments, 1)[0] if len(sentiments) > 1 else 0
+        Cache versions are looked up concurrently, then the sources of every
+        cache miss are fetched ``FEATURE_BATCH_USERS`` users at a time, with
+        one crisis alert query per batch. Each batch gets its own budget. A
+        user with a source that failed or timed out gets None rather than a
+        vector built on defaults.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+
+        versions = self._latest_writes(user_ids)
+        data: dict[str, dict[str, Any] | None] = {}
+        misses = []
+        for user_id in user_ids:
+            cached = None
+            if user_id in versions:
+                cached = self._cache.get(self._cache_key(user_id, days_history, versions[user_id]))
+            if cached is None:
+                misses.append(user_id)
             else:
-                features['sentiment_mean'] = 0.0
-                features['sentiment_trend'] = 0.0
-
-            # 5. App engagement features
-            engagement = self._get_app_engagement(user_id, days=7)
-            features['app_opens_7d'] = engagement.get('opens', 0)
-            features['chat_messages_7d'] = engagement.get('chat_messages', 0)
-            features['exercises_completed_7d'] = engagement.get('exercises_completed', 0)
-
-            # 6. Temporal features
-            now = datetime.now()
-            features['day_of_week'] = now.weekday()  # 0=Monday
-            features['is_weekend'] = 1 if now.weekday() >= 5 else 0
-            features['hour_of_day'] = now.hour
-            features['month'] = now.month
-            features['days_since_start'] = (now - mood_data[0].get('timestamp', now)).days if mood_data else 0
-
-            # 7. Crisis/intervention history
-            crisis_count = self._get_crisis_count(user_id, days=30)
-            features['crisis_count_30d'] = crisis_count
-
-            # Convert to array (maintain consistent ordering)
-            feature_names = [
-                'mood_mean_7d', 'mood_mean_14d', 'mood_mean_30d', 'mood_std_7d', 'mood_volatility',
-                'mood_trend', 'mood_momentum', 'mood_min_7d', 'mood_max_7d',
-                'negative_days_7d', 'negative_days_14d',
-                'sleep_mean', 'sleep_std', 'sleep_trend', 'sleep_deficit_days', 'sleep_quality_mean',
-                'steps_mean', 'steps_std', 'steps_trend', 'sedentary_days',
-                'sentiment_mean', 'sentiment_trend',
-                'app_opens_7d', 'chat_messages_7d', 'exercises_completed_7d',
-                'day_of_week', 'is_weekend', 'hour_of_day', 'month', 'days_since_start',
-                'crisis_count_30d'
-            ]
-
-            feature_vector = np.array([features[name] for name in feature_names])
-
-            return feature_vector
+                data[user_id] = cached or None  # {} marks insufficient mood data
+
+        if misses:
+            data.update(self._compute_many(misses, days_history, versions))
+
+        now = datetime.now()
+        vectors = {}
+        for user_id in user_ids:
+            data_features = data.get(user_id)
+            vectors[user_id] = None if data_features is None else self._feature_vector(data_features, now)
+        return vectors
+
+    # ──────────────────────────────────────────────────────────────
+    # Loading
+    # ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _cache_key(user_id: str, days_history: int, version: str) -> str:
+        return f"{user_id}:{days_history}:{version}"
+
+    @staticmethod
+    def _fan_out(tasks: dict[str, Callable[[], Any]]) -> dict[str, TaskResult]:
+        return fan_out(tasks, FEATURE_SOURCE_TIMEOUT_SECONDS,
+                       executor=get_executor('mood-features', FEATURE_FANOUT_MAX_WORKERS))
+
+    def _latest_writes(self, user_ids: list[str]) -> dict[str, str]:
+        """``moodsLastWrite`` per user. Users whose lookup failed are left out."""
+        versions = {}
+        for start in range(0, len(user_ids), FEATURE_FANOUT_MAX_WORKERS):
+            chunk = user_ids[start:start + FEATURE_FANOUT_MAX_WORKERS]
+            results = self._fan_out({user_id: partial(self._get_latest_write, user_id) for user_id in chunk})
+            versions.update({user_id: result.value for user_id, result in results.items() if result.ok})
+        return versions
+
+    def _compute_many(
+        self,
+        user_ids: list[str],
+        days_history: int,
+        versions: dict[str, str],
+    ) -> dict[str, dict[str, Any] | None]:
+        """Fetch the sources of ``user_ids`` batch by batch and derive their features."""
+        computed: dict[str, dict[str, Any] | None] = {}
+        for start in range(0, len(user_ids), FEATURE_BATCH_USERS):
+            computed.update(self._compute_batch(user_ids[start:start + FEATURE_BATCH_USERS], days_history, versions))
+        return computed
+
+    def _compute_batch(
+        self,
+        user_ids: list[str],
+        days_history: int,
+        versions: dict[str, str],
+    ) -> dict[str, dict[str, Any] | None]:
+        """Fetch every source of ``user_ids`` in one fan-out; None for users with a failed source."""
+        tasks: dict[str, Callable[[], Any]] = {}
+        for user_id in user_ids:
+            for source, loader in self._user_sources(user_id, days_history).items():
+                tasks[f"{source}:{user_id}"] = loader
+        tasks['crisis'] = partial(self._get_crisis_counts, user_ids, 30)
+
+        results = self._fan_out(tasks)
+
+        crisis = results['crisis']
+        if not crisis.ok:
+            logger.warning(f"Failed to fetch crisis counts: {crisis.error or crisis.status}")
+
+        computed: dict[str, dict[str, Any] | None] = {}
+        for user_id in user_ids:
+            failed = [source for source in FEATURE_SOURCES if not results[f"{source}:{user_id}"].ok]
+            if failed or not crisis.ok:
+                # Not cached, so the next call retries the reads
+                for source in failed:
+                    result = results[f"{source}:{user_id}"]
+                    logger.warning(f"Failed to fetch {source} for user {user_id[:8]}...: {result.error or result.status}")
+                computed[user_id] = None
+                continue
+
+            sources = {source: results[f"{source}:{user_id}"].value for source in FEATURE_SOURCES}
+            sources['crisis_count'] = crisis.value.get(user_id, 0)
+            try:
+                features = self._data_features(sources)
+            except Exception as e:
+                logger.error(f"Feature engineering failed for user {user_id[:8]}...: {e}")
+                computed[user_id] = None
+                continue
+            if features is None:
+                logger.warning(f"Insufficient mood data for user {user_id[:8]}...")
+            computed[user_id] = features
+
+            if user_id in versions:
+                self._cache.set(self._cache_key(user_id, days_history, versions[user_id]), features or {})
+        return computed
+
+    def _user_sources(self, user_id: str, days_history: int) -> dict[str, Callable[[], Any]]:
+        """Per-user source loaders, keyed by the names in ``FEATURE_SOURCES``."""
+        return {
+            'moods': partial(self._get_mood_history, user_id, days_history),
+            'sleep': partial(self._get_sleep_data, user_id, 14),
+            'activity': partial(self._get_activity_data, user_id, 14),
+            'sentiment': partial(self._get_sentiment_history, user_id, 7),
+            'app_opens': partial(self._count_recent, user_id, 'analytics', 'timestamp', 7, ('event', 'app_open')),
+            'chat_messages': partial(self._count_recent, user_id, 'conversations', 'timestamp', 7),
+            'exercises_completed': partial(self._count_recent, user_id, 'completed_exercises', 'completed_at', 7),
+        }
 
-        except Exception as e:
-            logger.error(f"Feature engineering failed for user {user_id[:8]}...: {e}")
+    # ──────────────────────────────────────────────────────────────
+    # Features
+    # ──────────────────────────────────────────────────────────────
+
+    def _data_features(self, sources: dict[str, Any]) -> dict[str, Any] | None:
+        """Features derived from the fetched sources, or None with under a week of moods."""
+        features: dict[str, Any] = {}
+
+        # 1. Mood features
+        mood_data = sources['moods']
+        if len(mood_data) < 7:
             return None
 
+        # Mood statistics
+        mood_scores = np.array([m.get('score', 0) for m in mood_data])
+        features['mood_mean_7d'] = np.mean(mood_scores[-7:])
+        features['mood_mean_14d'] = np.mean(mood_scores[-14:]) if len(mood_scores) >= 14 else features['mood_mean_7d']
+        features['mood_mean_30d'] = np.mean(mood_scores)
+        features['mood_std_7d'] = np.std(mood_scores[-7:])
+        features['mood_volatility'] = np.std(mood_scores)
+
+        # Mood trend (linear regression)
+        x = np.arange(len(mood_scores))
+        features['mood_trend'] = np.polyfit(x, mood_scores, 1)[0]
+
+        # Recent momentum (last 3 days vs previous 3)
+        if len(mood_scores) >= 6:
+            recent = np.mean(mood_scores[-3:])
+            previous = np.mean(mood_scores[-6:-3])
+            features['mood_momentum'] = recent - previous
+        else:
+            features['mood_momentum'] = 0.0
+
+        # Min/max extremes
+        features['mood_min_7d'] = np.min(mood_scores[-7:])
+        features['mood_max_7d'] = np.max(mood_scores[-7:])
+
+        # Count of negative days
+        features['negative_days_7d'] = np.sum(mood_scores[-7:] < -0.3)
+        features['negative_days_14d'] = np.sum(mood_scores[-14:] < -0.3) if len(mood_scores) >= 14 else features['negative_days_7d']
+
+        # 2. Sleep features (from wearables or user input)
+        sleep_data = sources['sleep']
+        if sleep_data:
+            sleep_hours = np.array([s.get('hours', 0) for s in sleep_data])
+            features['sleep_mean'] = np.mean(sleep_hours)
+            features['sleep_std'] = np.std(sleep_hours)
+            features['sleep_trend'] = np.polyfit(np.arange(len(sleep_hours)), sleep_hours, 1)[0] if len(sleep_hours) > 1 else 0
+            features['sleep_deficit_days'] = np.sum(sleep_hours < 6)
+            features['sleep_quality_mean'] = np.mean([s.get('quality', 5) for s in sleep_data])
+        else:
+            # Default values if no sleep data
+            features['sleep_mean'] = 7.0
+            features['sleep_std'] = 1.0
+            features['sleep_trend'] = 0.0
+            features['sleep_deficit_days'] = 0
+            features['sleep_quality_mean'] = 5.0
+
+        # 3. Activity features
+        activity_data = sources['activity']
+        if activity_data:
+            steps = np.array([a.get('steps', 0) for a in activity_data])
+            features['steps_mean'] = np.mean(steps)
+            features['steps_std'] = np.std(steps)
+            features['steps_trend'] = np.polyfit(np.arange(len(steps)), steps, 1)[0] if len(steps) > 1 else 0
+            features['sedentary_days'] = np.sum(steps < 3000)
+        else:
+            features['steps_mean'] = 5000
+            features['steps_std'] = 2000
+            features['steps_trend'] = 0.0
+            features['sedentary_days'] = 0
+
+        # 4. Semantic sentiment features
+        sentiment_data = sources['sentiment']
+        if sentiment_data:
+            sentiments = np.array([s.get('score', 0) for s in sentiment_data])
+            features['sentiment_mean'] = np.mean(sentiments)
+            features['sentiment_trend'] = np.polyfit(np.arange(len(sentiments)), sentiments, 1)[0] if len(sentiments) > 1 else 0
+        else:
+            features['sentiment_mean'] = 0.0
+            features['sentiment_trend'] = 0.0
+
+        # 5. App engagement features
+        features['app_opens_7d'] = sources['app_opens']
+        features['chat_messages_7d'] = sources['chat_messages']
+        features['exercises_completed_7d'] = sources['exercises_completed']
+
+        # 7. Crisis/intervention history
+        features['crisis_count_30d'] = sources['crisis_count']
+
+        # Plain floats, so the cached entry is JSON-serializable for the Redis tier
+        features = {name: float(value) for name, value in features.items()}
+        first_mood_at = _parse_timestamp(mood_data[0].get('timestamp'))
+        features['first_mood_at'] = first_mood_at.isoformat() if first_mood_at else None
+        return features
+
+    @staticmethod
+    def _feature_vector(data: dict[str, Any], now: datetime) -> np.ndarray:
+        """Feature vector in ``FEATURE_NAMES`` order, with temporal features for ``now``."""
+        features = dict(data)
+
+        # 6. Temporal features
+        features['day_of_week'] = now.weekday()  # 0=Monday
+        features['is_weekend'] = 1 if now.weekday() >= 5 else 0
+        features['hour_of_day'] = now.hour
+        features['month'] = now.month
+        first_mood_at = datetime.fromisoformat(data['first_mood_at']) if data.get('first_mood_at') else now
+        features['days_since_start'] = (now - first_mood_at).days
+
+        # Convert to array (maintain consistent ordering)
+        return np.array([features[name] for name in FEATURE_NAMES])
+
+    # ──────────────────────────────────────────────────────────────
+    # Firestore sources (errors propagate to the fan-out)
+    # ──────────────────────────────────────────────────────────────
+
+    def _get_latest_write(self, user_id: str) -> str:
+        """The user's ``moodsLastWrite``, stamped by every mood write ('none' before the first)."""
+        user_doc = db.collection('users').document(user_id).get()
+        written_at = (user_doc.to_dict() or {}).get('moodsLastWrite') if user_doc.exists else None
+        return str(written_at) if written_at else 'none'
+
     def _get_mood_history(self, user_id: str, days: int) -> list[dict]:
         """Fetch mood history from Firestore."""
-        try:
-            start_date = datetime.now() - timedelta(days=days)
+        start_date = datetime.now() - timedelta(days=days)
 
-            mood_docs = db.collection('users').document(user_id)\
-                .collection('moods')\
-                .where('timestamp', '>=', start_date.isoformat())\
-                .order_by('timestamp')\
-                .get()
+        mood_docs = db.collection('users').document(user_id)\
+            .collection('moods')\
+            .where('timestamp', '>=', start_date.isoformat())\
+            .order_by('timestamp')\
+            .get()
 
-            return [doc.to_dict() for doc in mood_docs]
-        except Exception as e:
-            logger.warning(f"Failed to fetch mood history: {e}")
-            return []
+        return [doc.to_dict() for doc in mood_docs]
 
     def _get_sleep_data(self, user_id: str, days: int) -> list[dict]:
         """Fetch sleep data from wearables or user input."""
-        try:
-            # Try to get from biometric data first
-            sleep_docs = db.collection('users').document(user_id)\
-                .collection('biometric_data')\
-                .where('type', '==', 'sleep')\
-                .order_by('timestamp', direction='DESCENDING')\
-                .limit(days)\
-                .get()
-
-            return [doc.to_dict() for doc in sleep_docs]
-        except Exception as e:
-            logger.warning(f"Failed to fetch sleep data: {e}")
-            return []
+        sleep_docs = db.collection('users').document(user_id)\
+            .collection('biometric_data')\
+            .where('type', '==', 'sleep')\
+            .order_by('timestamp', direction='DESCENDING')\
+            .limit(days)\
+            .get()
+
+        return [doc.to_dict() for doc in sleep_docs]
 
     def _get_activity_data(self, user_id: str, days: int) -> list[dict]:
         """Fetch activity data."""
-        try:
-            activity_docs = db.collection('users').document(user_id)\
-                .collection('biometric_data')\
-                .where('type', '==', 'steps')\
-                .order_by('timestamp', direction='DESCENDING')\
-                .limit(days)\
-                .get()
-
-            return [doc.to_dict() for doc in activity_docs]
-        except Exception as e:
-            logger.warning(f"Failed to fetch activity data: {e}")
-            return []
+        activity_docs = db.collection('users').document(user_id)\
+            .collection('biometric_data')\
+            .where('type', '==', 'steps')\
+            .order_by('timestamp', direction='DESCENDING')\
+            .limit(days)\
+            .get()
+
+        return [doc.to_dict() for doc in activity_docs]
 
     def _get_sentiment_history(self, user_id: str, days: int) -> list[dict]:
         """Fetch sentiment analysis from chat messages."""
+        # Get chat sentiments from conversations
+        conv_docs = db.collection('users').document(user_id)\
+            .collection('conversations')\
+            .where('role', '==', 'user')\
+            .order_by('timestamp', direction='DESCENDING')\
+            .limit(days * 2)\
+            .get()
+
+        sentiments = []
+        for doc in conv_docs:
+            data = doc.to_dict()
+            if 'sentiment_score' in data:
+                sentiments.append({'score': data['sentiment_score']})
+
+        return sentiments
+
+    def _count_recent(
+        self,
+        user_id: str,
+        collection: str,
+        time_field: str,
+        days: int,
+        equals: tuple[str, Any] | None = None,
+    ) -> int:
+        """Count a user's documents in ``collection`` from the last ``days`` days."""
+        start_date = datetime.now() - timedelta(days=days)
+
+        query = db.collection('users').document(user_id).collection(collection)
+        if equals is not None:
+            query = query.where(equals[0], '==', equals[1])
+        return len(query.where(time_field, '>=', start_date.isoformat()).get())
+
+    def _get_crisis_counts(self, user_ids: list[str], days: int) -> dict[str, int]:
+        """Count recent crisis events for up to ``CRISIS_QUERY_CHUNK`` users in one query."""
+        start_date = datetime.now() - timedelta(days=days)
+
+        crisis_docs = db.collection('crisis_alerts')\
+            .where('user_id', 'in', user_ids)\
+            .where('created_at', '>=', start_date.isoformat())\
+            .get()
+
+        counts: dict[str, int] = {}
+        for doc in crisis_docs:
+            user_id = doc.to_dict().get('user_id')
+            counts[user_id] = counts.get(user_id, 0) + 1
+        return counts
+
+
+def _parse_timestamp(value: Any) -> datetime | None:
+    """Naive local datetime from a stored ISO string or datetime."""
+    if isinstance(value, str):
         try:
-            # Get chat sentiments from conversations
-            conv_docs = db.collection('users').document(user_id)\
-                .collection('conversations')\
-                .where('role', '==', 'user')\
-                .order_by('timestamp', direction='DESCENDING')\
-                .limit(days * 2)\
-                .get()
-
-            sentiments = []
-            for doc in conv_docs:
-                data = doc.to_dict()
-                if 'sentiment_score' in data:
-                    sentiments.append({'score': data['sentiment_score']})
-
-            return sentiments
-        except Exception as e:
-            logger.warning(f"Failed to fetch sentiment history: {e}")
-            return []
-
-    def _get_app_engagement(self, user_id: str, days: int) -> dict:
-        """Fetch app engagement metrics."""
-        try:
-            start_date = datetime.now() - timedelta(days=days)
-
-            # Count various interactions
-            opens = db.collection('users').document(user_id)\
-                .collection('analytics')\
-                .where('event', '==', 'app_open')\
-                .where('timestamp', '>=', start_date.isoformat())\
-                .get()
-
-            chats = db.collection('users').document(user_id)\
-                .collection('conversations')\
-                .where('timestamp', '>=', start_date.isoformat())\
-                .get()
-
-            exercises = db.collection('users').document(user_id)\
-                .collection('completed_exercises')\
-                .where('completed_at', '>=', start_date.isoformat())\
-                .get()
-
-            return {
-                'opens': len(opens),
-                'chat_messages': len(chats),
-                'exercises_completed': len(exercises)
-            }
-        except Exception as e:
-            logger.warning(f"Failed to fetch engagement data: {e}")
-            return {'opens': 0, 'chat_messages': 0, 'exercises_completed': 0}
-
-    def _get_crisis_count(self, user_id: str, days: int) -> int:
-        """Count recent crisis events."""
-        try:
-            start_date = datetime.now() - timedelta(days=days)
-
-            crisis_docs = db.collection('crisis_alerts')\
-                .where('user_id', '==', user_id)\
-                .where('created_at', '>=', start_date.isoformat())\
-                .get()
-
-            return len(crisis_docs)
-        except Exception as e:
-            logger.warning(f"Failed to fetch crisis count: {e}")
-            return 0
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
 
 
 class MoodPredictor:
@@ -335,10 +467,13 @@ class MoodPredictor:
         logger.info("🤖 Initializing Mood Predictor (Random Forest + LSTM)...")
 
         self.feature_engineer = FeatureEngineer()
-        self.scaler = StandardScaler() if SKLEARN_AVAILABLE else None
+        self.scaler = None
+        if SKLEARN_AVAILABLE:
+            from sklearn.preprocessing import StandardScaler
+            self.scaler = StandardScaler()
 
         # Initialize models
-        self.rf_model: RandomForestRegressor | None = None
+        self.rf_model: Any | None = None
         self.lstm_model: Any | None = None
         self.model_path = model_path or os.getenv('MODEL_PATH', './models')
 
@@ -362,6 +497,7 @@ class MoodPredictor:
             # Load LSTM
             lstm_path = os.path.join(self.model_path, 'mood_lstm_model.keras')
             if os.path.exists(lstm_path) and TENSORFLOW_AVAILABLE:
+                from tensorflow.keras.models import load_model
                 self.lstm_model = load_model(lstm_path)
                 logger.info("✅ Loaded LSTM model")
             else:
@@ -388,9 +524,20 @@ class MoodPredictor:
             logger.warning("scikit-learn not available, using heuristic prediction")
             return self._heuristic_prediction(user_id)
 
+        return self._predict_from_features(user_id, self.feature_engineer.engineer_features(user_id, days_history=30))
+
+    def predict_many(self, user_ids: list[str]) -> dict[str, MoodPrediction | None]:
+        """Predictions for many users, with their features engineered in one batch."""
+        if not SKLEARN_AVAILABLE:
+            logger.warning("scikit-learn not available, using heuristic prediction")
+            return {user_id: self._heuristic_prediction(user_id) for user_id in user_ids}
+
+        features = self.feature_engineer.engineer_features_many(user_ids, days_history=30)
+        return {user_id: self._predict_from_features(user_id, features.get(user_id)) for user_id in user_ids}
+
+    def _predict_from_features(self, user_id: str, features: np.ndarray | None) -> MoodPrediction | None:
+        """Ensemble prediction from an engineered feature vector."""
         try:
-            # Engineer features
-            features = self.feature_engineer.engineer_features(user_id, days_history=30)
             if features is None:
                 logger.warning(f"Could not engineer features for user {user_id[:8]}...")
                 return self._heuristic_prediction(user_id)
@@ -611,17 +758,7 @@ class MoodPredictor:
 
     def _get_feature_names(self) -> list[str]:
         """Get ordered list of feature names."""
-        return [
-            'mood_mean_7d', 'mood_mean_14d', 'mood_mean_30d', 'mood_std_7d', 'mood_volatility',
-            'mood_trend', 'mood_momentum', 'mood_min_7d', 'mood_max_7d',
-            'negative_days_7d', 'negative_days_14d',
-            'sleep_mean', 'sleep_std', 'sleep_trend', 'sleep_deficit_days', 'sleep_quality_mean',
-            'steps_mean', 'steps_std', 'steps_trend', 'sedentary_days',
-            'sentiment_mean', 'sentiment_trend',
-            'app_opens_7d', 'chat_messages_7d', 'exercises_completed_7d',
-            'day_of_week', 'is_weekend', 'hour_of_day', 'month', 'days_since_start',
-            'crisis_count_30d'
-        ]
+        return list(FEATURE_NAMES)
 
     def explain_prediction(self, user_id: str) -> dict[str, Any] | None:
         """
@@ -0,0 +1,481 @@
+"""
+Real-time fan-out for the anonymous peer chat.
+
+Every worker keeps a ring buffer of each room's recent messages and delivers
+room events (new messages, likes, typing, presence changes) to its own
+subscribers: Server-Sent Event streams opened through the peer chat routes,
+and Socket.IO clients in the ``/peer-chat`` namespace when a Socket.IO server
+is attached. Events are broadcast to the other workers over a Redis pub/sub
+channel. Each worker applies what it receives to its own buffers, so polling
+clients are served from memory as well.
+
+Firestore is only written to persist messages and sessions. It is read once
+per room to warm the buffer. Without Redis, buffers cannot see messages sent
+through other workers, so they are re-read after
+``PEER_CHAT_RESYNC_SECONDS``.
+
+Sessions, presence and typing indicators are short-lived TTL keys. With Redis
+they are ``SETEX`` keys plus a per-room sorted set scored by last activity.
+Without Redis they are in-process dicts with the same expiry rules.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from google.cloud.firestore import FieldFilter
+
+from ..firebase_config import db
+
+logger = logging.getLogger(__name__)
+
+# Recent messages kept per room (and served to joins and polls)
+PEER_CHAT_BUFFER_SIZE = int(os.getenv('PEER_CHAT_BUFFER_SIZE', '200'))
+# Idle time after which a session stops counting as present
+PEER_CHAT_PRESENCE_TTL_SECONDS = int(os.getenv('PEER_CHAT_PRESENCE_TTL_SECONDS', '300'))
+# Lifetime of a typing indicator unless it is refreshed
+PEER_CHAT_TYPING_TTL_SECONDS = int(os.getenv('PEER_CHAT_TYPING_TTL_SECONDS', '8'))
+# Buffer re-read interval while no pub/sub subscription is active
+PEER_CHAT_RESYNC_SECONDS = float(os.getenv('PEER_CHAT_RESYNC_SECONDS', '5'))
+# Pending events per stream before a slow subscriber is dropped
+PEER_CHAT_SUBSCRIBER_QUEUE_SIZE = 100
+PEER_CHAT_CHANNEL = 'peer_chat:events'
+SOCKETIO_NAMESPACE = '/peer-chat'
+REDIS_KEY_PREFIX = 'peer_chat'
+# Seconds before retrying Redis after a failure
+REDIS_RETRY_INTERVAL = 60.0
+
+
+def socket_room(room_id: str) -> str:
+    """Socket.IO room that receives a chat room's events."""
+    return f"{REDIS_KEY_PREFIX}:{room_id}"
+
+
+@dataclass(eq=False)
+class Subscriber:
+    """One open event stream for a room."""
+    room_id: str
+    events: queue.Queue = field(default_factory=lambda: queue.Queue(maxsize=PEER_CHAT_SUBSCRIBER_QUEUE_SIZE))
+    dropped: bool = False
+
+
+@dataclass
+class _RoomBuffer:
+    messages: deque = field(default_factory=lambda: deque(maxlen=PEER_CHAT_BUFFER_SIZE))
+    loaded_at: float | None = None
+
+
+class PeerChatHub:
+    """Per-room message buffers, TTL presence and cross-worker event fan-out."""
+
+    def __init__(
+        self,
+        use_redis: bool = True,
+        buffer_size: int = PEER_CHAT_BUFFER_SIZE,
+        presence_ttl: int = PEER_CHAT_PRESENCE_TTL_SECONDS,
+        typing_ttl: int = PEER_CHAT_TYPING_TTL_SECONDS,
+        resync_seconds: float = PEER_CHAT_RESYNC_SECONDS,
+    ) -> None:
+        self.use_redis = use_redis
+        self.buffer_size = buffer_size
+        self.presence_ttl = presence_ttl
+        self.typing_ttl = typing_ttl
+        self.resync_seconds = resync_seconds
+        self._origin = uuid.uuid4().hex
+        self._rooms: dict[str, _RoomBuffer] = {}
+        self._subscribers: dict[str, set[Subscriber]] = {}
+        self._lock = threading.RLock()
+        self._socketio: Any = None
+        # In-process presence, used while Redis is unavailable
+        self._sessions: dict[str, dict[str, Any]] = {}
+        self._last_seen: dict[str, float] = {}
+        self._typing_until: dict[str, float] = {}
+        self._redis: Any = None
+        self._redis_retry_at = 0.0
+        self._listener: threading.Thread | None = None
+        self._listening = False
+
+    def attach_socketio(self, socketio: Any) -> None:
+        """Also deliver room events to Socket.IO clients in ``/peer-chat``."""
+        self._socketio = socketio
+
+    # ──────────────────────────────────────────────────────────────
+    # Backend selection
+    # ──────────────────────────────────────────────────────────────
+
+    def _redis_client(self) -> Any:
+        if not self.use_redis:
+            return None
+        if self._redis is None:
+            now = time.time()
+            if now < self._redis_retry_at:
+                return None
+            try:
+                from ..redis_config import get_redis_client
+                self._redis = get_redis_client()
+            except Exception as e:
+                logger.debug(f"Redis unavailable for peer chat: {e}")
+                self._redis = None
+            if self._redis is None:
+                self._redis_retry_at = now + REDIS_RETRY_INTERVAL
+                return None
+        self._ensure_listener()
+        return self._redis
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(f"⚠️ Peer chat Redis error, using in-process presence and buffers: {error}")
+        self._redis = None
+        self._redis_retry_at = time.time() + REDIS_RETRY_INTERVAL
+
+    @staticmethod
+    def _key(*parts: str) -> str:
+        return ':'.join((REDIS_KEY_PREFIX, *parts))
+
+    # ──────────────────────────────────────────────────────────────
+    # Sessions and presence
+    # ──────────────────────────────────────────────────────────────
+
+    def register_session(self, session: dict[str, Any]) -> None:
+        """Store a joined session (``session_id``, ``room_id``, ``user_id``, name, avatar)."""
+        session_id, room_id = session['session_id'], session['room_id']
+        client = self._redis_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.setex(self._key('session', session_id), self.presence_ttl, json.dumps(session))
+                pipe.zadd(self._key('presence', room_id), {session_id: time.time()})
+                pipe.execute()
+                return
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            self._prune_sessions()
+            self._sessions[session_id] = dict(session)
+            self._last_seen[session_id] = time.time()
+
+    def session(self, session_id: str) -> dict[str, Any] | None:
+        """The live session, or None once it has expired or was never registered here."""
+        client = self._redis_client()
+        if client is not None:
+            try:
+                raw = client.get(self._key('session', session_id))
+                return json.loads(raw) if raw else None
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            if self._expired(session_id, time.time()):
+                return None
+            return self._sessions.get(session_id)
+
+    def touch(self, session_id: str, room_id: str) -> None:
+        """Extend a session's TTL and mark it active in its room."""
+        client = self._redis_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.expire(self._key('session', session_id), self.presence_ttl)
+                pipe.zadd(self._key('presence', room_id), {session_id: time.time()})
+                pipe.execute()
+                return
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            if session_id in self._sessions:
+                self._last_seen[session_id] = time.time()
+
+    def drop_session(self, session_id: str, room_id: str) -> None:
+        client = self._redis_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.delete(self._key('session', session_id), self._key('typing', room_id, session_id))
+                pipe.zrem(self._key('presence', room_id), session_id)
+                pipe.execute()
+                return
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            self._forget(session_id)
+
+    def set_typing(self, session_id: str, room_id: str, is_typing: bool) -> None:
+        client = self._redis_client()
+        if client is not None:
+            try:
+                key = self._key('typing', room_id, session_id)
+                if is_typing:
+                    client.setex(key, self.typing_ttl, '1')
+                else:
+                    client.delete(key)
+                return
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            if is_typing:
+                self._typing_until[session_id] = time.time() + self.typing_ttl
+            else:
+                self._typing_until.pop(session_id, None)
+
+    def presence(self, room_id: str) -> list[dict[str, Any]]:
+        """Active sessions in a room, each with an ``is_typing`` flag."""
+        now = time.time()
+        client = self._redis_client()
+        if client is not None:
+            try:
+                presence_key = self._key('presence', room_id)
+                client.zremrangebyscore(presence_key, '-inf', now - self.presence_ttl)
+                session_ids = client.zrange(presence_key, 0, -1)
+                if not session_ids:
+                    return []
+                values = client.mget(
+                    [self._key('session', sid) for sid in session_ids]
+                    + [self._key('typing', room_id, sid) for sid in session_ids]
+                )
+                sessions, typing = values[:len(session_ids)], values[len(session_ids):]
+                return [
+                    {**json.loads(raw), 'is_typing': bool(flag)}
+                    for raw, flag in zip(sessions, typing, strict=True)
+                    if raw
+                ]
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            self._prune_sessions()
+            return [
+                {**data, 'is_typing': self._typing_until.get(sid, 0) > now}
+                for sid, data in self._sessions.items()
+                if data.get('room_id') == room_id
+            ]
+
+    def member_counts(self, room_ids: list[str]) -> dict[str, int]:
+        """Active session count per room, in one round trip."""
+        since = time.time() - self.presence_ttl
+        client = self._redis_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for room_id in room_ids:
+                    pipe.zcount(self._key('presence', room_id), since, '+inf')
+                return dict(zip(room_ids, (int(c) for c in pipe.execute()), strict=True))
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            self._prune_sessions()
+            counts = dict.fromkeys(room_ids, 0)
+            for data in self._sessions.values():
+                if data.get('room_id') in counts:
+                    counts[data['room_id']] += 1
+            return counts
+
+    def _expired(self, session_id: str, now: float) -> bool:
+        return self._last_seen.get(session_id, 0) + self.presence_ttl < now
+
+    def _forget(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        self._last_seen.pop(session_id, None)
+        self._typing_until.pop(session_id, None)
+
+    def _prune_sessions(self) -> None:
+        now = time.time()
+        for session_id in [sid for sid in self._sessions if self._expired(sid, now)]:
+            self._forget(session_id)
+
+    # ──────────────────────────────────────────────────────────────
+    # Messages
+    # ──────────────────────────────────────────────────────────────
+
+    def recent(self, room_id: str, after: str | None = None, limit: int = 50) -> list[dict[str, Any]]:
+        """
+        Up to ``limit`` of the newest messages, oldest first.
+
+        With ``after`` only messages newer than that message are returned. An
+        id that is no longer buffered returns the newest ``limit`` messages.
+        """
+        messages = self._buffered(room_id)
+        if after:
+            for index in range(len(messages) - 1, -1, -1):
+                if messages[index].get('id') == after:
+                    messages = messages[index + 1:]
+                    break
+        return [dict(m) for m in messages[-limit:]] if limit > 0 else []
+
+    def _buffered(self, room_id: str) -> list[dict[str, Any]]:
+        """Snapshot of the room's buffer, (re)loaded from Firestore when cold or stale."""
+        with self._lock:
+            room = self._rooms.setdefault(room_id, _RoomBuffer(deque(maxlen=self.buffer_size)))
+            started = time.monotonic()
+            if room.loaded_at is not None and (
+                self._listening or started - room.loaded_at < self.resync_seconds
+            ):
+                return list(room.messages)
+
+        loaded = self._load_recent(room_id)
+        with self._lock:
+            if loaded is not None:
+                # Keep events delivered while the query ran
+                known = {m.get('id') for m in loaded}
+                newest = loaded[-1].get('timestamp', '') if loaded else ''
+                delivered = [m for m in room.messages
+                             if m.get('id') not in known and m.get('timestamp', '') > newest]
+                room.messages.clear()
+                room.messages.extend(loaded + delivered)
+            room.loaded_at = started
+            return list(room.messages)
+
+    def _load_recent(self, room_id: str) -> list[dict[str, Any]] | None:
+        if db is None:
+            return None
+        try:
+            docs = db.collection('peer_chat_messages').where(filter=FieldFilter(
+                'room_id', '==', room_id
+            )).order_by('timestamp', direction='DESCENDING').limit(self.buffer_size).stream()
+            messages = []
+            for doc in docs:
+                data = doc.to_dict() or {}
+                data['id'] = doc.id
+                messages.append(data)
+            messages.reverse()
+            return messages
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load peer chat history for {room_id}: {e}")
+            return None
+
+    # ──────────────────────────────────────────────────────────────
+    # Events
+    # ──────────────────────────────────────────────────────────────
+
+    def publish(self, room_id: str, event: str, data: dict[str, Any]) -> None:
+        """
+        Deliver an event in this worker and broadcast it to the others.
+
+        ``message`` events append to the room buffer. ``like`` events
+        (``message_id``, ``session_id``, ``action``, ``likes``) and ``report``
+        events (``message_id``, ``reported_at``) update it.
+        """
+        self._deliver(room_id, event, data)
+        client = self._redis_client()
+        if client is not None:
+            try:
+                client.publish(PEER_CHAT_CHANNEL, json.dumps(
+                    {'origin': self._origin, 'room_id': room_id, 'event': event, 'data': data},
+                    default=str,
+                ))
+            except Exception as e:
+                self._redis_failed(e)
+
+    def subscribe(self, room_id: str) -> Subscriber:
+        subscriber = Subscriber(room_id)
+        with self._lock:
+            self._subscribers.setdefault(room_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.room_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.room_id]
+
+    def _deliver(self, room_id: str, event: str, data: dict[str, Any]) -> None:
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is not None:
+                self._apply(room, event, data)
+            subscribers = list(self._subscribers.get(room_id, ()))
+
+        for subscriber in subscribers:
+            try:
+                subscriber.events.put_nowait((event, data))
+            except queue.Full:
+                # The client falls behind; it reconnects and catches up with ?after=
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+
+        if self._socketio is not None:
+            try:
+                self._socketio.emit(event, data, to=socket_room(room_id), namespace=SOCKETIO_NAMESPACE)
+            except Exception as e:
+                logger.warning(f"⚠️ Peer chat Socket.IO emit failed (non-blocking): {e}")
+
+    @staticmethod
+    def _apply(room: _RoomBuffer, event: str, data: dict[str, Any]) -> None:
+        if event == 'message':
+            if not any(m.get('id') == data.get('id') for m in room.messages):
+                room.messages.append(dict(data))
+        elif event == 'like':
+            for message in room.messages:
+                if message.get('id') == data.get('message_id'):
+                    liked_by = [s for s in message.get('liked_by', []) if s != data.get('session_id')]
+                    if data.get('action') == 'liked':
+                        liked_by.append(data.get('session_id'))
+                    message['liked_by'] = liked_by
+                    message['likes'] = data.get('likes', len(liked_by))
+                    break
+        elif event == 'report':
+            for message in room.messages:
+                if message.get('id') == data.get('message_id'):
+                    message['reported'] = True
+                    message['reported_at'] = data.get('reported_at')
+                    break
+
+    def _ensure_listener(self) -> None:
+        if self._listener is not None and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='peer-chat-pubsub', daemon=True)
+            self._listener.start()
+
+    def _listen(self) -> None:
+        client = self._redis
+        if client is None:
+            return
+        pubsub = None
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(PEER_CHAT_CHANNEL)
+            with self._lock:
+                # Events missed while unsubscribed are only in Firestore
+                for room in self._rooms.values():
+                    room.loaded_at = None
+                self._listening = True
+            while self._redis is client:
+                item = pubsub.get_message(timeout=1.0)
+                if item is None or item.get('type') != 'message':
+                    continue
+                try:
+                    envelope = json.loads(item['data'])
+                except (TypeError, ValueError):
+                    continue
+                if envelope.get('origin') != self._origin:
+                    self._deliver(envelope['room_id'], envelope['event'], envelope.get('data') or {})
+        except Exception as e:
+            if self._redis is client:
+                self._redis_failed(e)
+        finally:
+            self._listening = False
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+peer_chat_hub = PeerChatHub()
@@ -5,13 +5,20 @@ Extracts emotion, scene context, and meaningful elements from photos
 """
 
 import logging
+import os
+import threading
+from collections.abc import Callable, Sequence
 from dataclasses import dataclass
 from datetime import datetime
+from functools import partial
 from io import BytesIO
 from typing import Any
 
 import numpy as np
 
+from ..utils.fanout import fan_out
+from ..utils.lazy_imports import is_available, lazy_module
+
 # Image processing with graceful fallback
 try:
     from PIL import ExifTags, Image
@@ -20,21 +27,105 @@ except ImportError:
     PIL_AVAILABLE = False
     logging.warning("PIL not available - image analysis will use fallback")
 
-try:
-    import cv2
-    CV2_AVAILABLE = True
-except ImportError:
-    CV2_AVAILABLE = False
+# OpenCV and the vision transformer are imported with their models on first use
+CV2_AVAILABLE = is_available('cv2')
+TRANSFORMERS_VISION_AVAILABLE = is_available('transformers')
 
-# Vision AI
-try:
-    from transformers import AutoImageProcessor, AutoModelForImageClassification, pipeline
-    TRANSFORMERS_VISION_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_VISION_AVAILABLE = False
+cv2 = lazy_module('cv2')
+transformers = lazy_module('transformers')
 
 logger = logging.getLogger(__name__)
 
+# Longest side of the single decode every analyzer works on. JPEGs are
+# decoded straight to roughly this size by libjpeg (draft mode).
+PHOTO_ANALYSIS_MAX_SIDE = int(os.getenv('PHOTO_ANALYSIS_MAX_SIDE', '640'))
+# Per-photo deadline for batch analysis; late photos get the fallback result
+PHOTO_ANALYSIS_TIMEOUT_SECONDS = float(os.getenv('PHOTO_ANALYSIS_TIMEOUT_SECONDS', '15'))
+
+# Model objects are loaded once per worker process and shared by every
+# request and service instance. A failed load is cached as None.
+_models: dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+
+def _shared_model(name: str, loader: Callable[[], Any]) -> Any:
+    if name not in _models:
+        with _models_lock:
+            if name not in _models:
+                try:
+                    _models[name] = loader()
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not load {name}: {e}")
+                    _models[name] = None
+    return _models[name]
+
+
+def _load_face_cascade():
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    if cascade.empty():
+        raise RuntimeError('haarcascade_frontalface_default.xml not found')
+    logger.info("✅ PhotoAnalysisService: Face cascade loaded")
+    return cascade
+
+
+def _load_vision_pipeline():
+    # Use ViT-base for image classification (well-supported across transformers versions)
+    vision_pipeline = transformers.pipeline(
+        "image-classification",
+        model="google/vit-base-patch16-224",
+        device=-1  # CPU
+    )
+    logger.info("✅ PhotoAnalysisService: Vision transformer loaded (ViT-base)")
+    return vision_pipeline
+
+
+def get_face_cascade():
+    """Shared OpenCV Haar face cascade, or None without cv2."""
+    if not CV2_AVAILABLE:
+        return None
+    return _shared_model('face cascade', _load_face_cascade)
+
+
+def get_vision_pipeline():
+    """Shared ViT image-classification pipeline, or None without transformers."""
+    if not TRANSFORMERS_VISION_AVAILABLE:
+        return None
+    return _shared_model('vision model', _load_vision_pipeline)
+
+
+@dataclass
+class PreparedImage:
+    """One downscaled decode of a photo, shared by every analyzer."""
+    image: 'Image.Image'  # RGB, longest side <= PHOTO_ANALYSIS_MAX_SIDE
+    rgb: np.ndarray  # (height, width, 3) uint8
+    gray: np.ndarray  # (height, width) uint8, ITU-R 601 luma
+    original_size: tuple[int, int]
+    format: str | None
+
+
+def prepare_image(image_bytes: bytes, max_side: int = PHOTO_ANALYSIS_MAX_SIDE) -> PreparedImage:
+    """
+    Decode a photo once at analysis resolution.
+
+    Size and format are read from the header, so they describe the original.
+    For JPEG, ``draft`` makes the decoder scale by 1/2, 1/4 or 1/8 while
+    decoding, so a 12 MP photo is never expanded to full resolution.
+    """
+    image = Image.open(BytesIO(image_bytes))
+    original_size, image_format = image.size, image.format
+    if image_format == 'JPEG':
+        image.draft('RGB', (max_side, max_side))
+
+    rgb_image = image.convert('RGB')
+    rgb_image.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    return PreparedImage(
+        image=rgb_image,
+        rgb=np.asarray(rgb_image),
+        gray=np.asarray(rgb_image.convert('L')),
+        original_size=original_size,
+        format=image_format,
+    )
+
 
 @dataclass
 class PhotoAnalysisResult:
@@ -82,21 +173,9 @@ class PhotoAnalysisService:
     }
 
     def __init__(self):
-        self.vision_pipeline = None
+        self.vision_pipeline = get_vision_pipeline()
         self.image_processor = None
 
-        if TRANSFORMERS_VISION_AVAILABLE:
-            try:
-                # Use ViT-base for image classification (well-supported across transformers versions)
-                self.vision_pipeline = pipeline(
-                    "image-classification",
-                    model="google/vit-base-patch16-224",
-                    device=-1  # CPU
-                )
-                logger.info("✅ PhotoAnalysisService: Vision transformer loaded (ViT-base)")
-            except Exception as e:
-                logger.warning(f"⚠️ Could not load vision model: {e}")
-
     def analyze_photo(self, image_bytes: bytes, photo_id: str) -> PhotoAnalysisResult:
         """
         Analyze a photo and extract therapeutic insights.
@@ -112,11 +191,8 @@ class PhotoAnalysisService:
             return self._create_fallback_result(photo_id)
 
         try:
-            # Load image
-            image = Image.open(BytesIO(image_bytes))
-
-            # Extract basic metadata
-            width, height = image.size
+            # Decode once at analysis resolution
+            image = prepare_image(image_bytes)
 
             # Color analysis
             color_mood = self._analyze_color_mood(image)
@@ -161,28 +237,42 @@ class PhotoAnalysisService:
             logger.error(f"❌ Photo analysis failed: {e}")
             return self._create_fallback_result(photo_id)
 
-    def _analyze_color_mood(self, image: Image.Image) -> str:
-        """Analyze color palette and determine mood."""
-        try:
-            # Convert to RGB and resize for speed
-            rgb_image = image.convert('RGB').resize((100, 100))
+    def analyze_photos(self, photos: Sequence[tuple[bytes, str]]) -> list[PhotoAnalysisResult]:
+        """
+        Analyze several photos concurrently.
 
-            # Get color histogram
-            pixels = list(rgb_image.getdata())
+        Args:
+            photos: (image_bytes, photo_id) pairs
 
-            # Calculate warm vs cool
-            warm_score = 0
-            cool_score = 0
+        Returns:
+            One PhotoAnalysisResult per photo, in input order. Photos that miss
+            PHOTO_ANALYSIS_TIMEOUT_SECONDS get the fallback result.
+        """
+        if len(photos) <= 1:
+            return [self.analyze_photo(image_bytes, photo_id) for image_bytes, photo_id in photos]
+
+        tasks = {
+            str(index): partial(self.analyze_photo, image_bytes, photo_id)
+            for index, (image_bytes, photo_id) in enumerate(photos)
+        }
+        results = fan_out(tasks, PHOTO_ANALYSIS_TIMEOUT_SECONDS)
+        return [
+            results[str(index)].value if results[str(index)].ok else self._create_fallback_result(photo_id)
+            for index, (_, photo_id) in enumerate(photos)
+        ]
+
+    def _analyze_color_mood(self, image: PreparedImage) -> str:
+        """Analyze color palette and determine mood."""
+        try:
+            r, g, b = image.rgb[..., 0], image.rgb[..., 1], image.rgb[..., 2]
 
-            for r, g, b in pixels:
-                # Warm colors: red, orange, yellow
-                if r > 150 and g > 100 and b < 100:
-                    warm_score += 1
-                # Cool colors: blue, purple
-                elif b > 100 and r < 150:
-                    cool_score += 1
+            # Warm colors: red, orange, yellow
+            warm = (r > 150) & (g > 100) & (b < 100)
+            # Cool colors: blue, purple
+            cool = ~warm & (b > 100) & (r < 150)
 
-            total = warm_score + cool_score
+            warm_score = int(np.count_nonzero(warm))
+            total = warm_score + int(np.count_nonzero(cool))
             if total == 0:
                 return 'neutral'
 
@@ -198,12 +288,12 @@ class PhotoAnalysisService:
         except Exception:
             return 'neutral'
 
-    def _classify_scene(self, image: Image.Image) -> tuple:
+    def _classify_scene(self, image: PreparedImage) -> tuple:
         """Classify scene type using vision model or fallback."""
         if self.vision_pipeline:
             try:
-                # Use transformers pipeline
-                results = self.vision_pipeline(image)
+                # Use transformers pipeline (it resizes to 224px itself)
+                results = self.vision_pipeline(image.image)
                 top_result = max(results, key=lambda x: x['score'])
                 return top_result['label'], top_result['score']
             except Exception:
@@ -212,14 +302,9 @@ class PhotoAnalysisService:
         # Fallback: heuristic classification
         return self._heuristic_scene_classification(image)
 
-    def _heuristic_scene_classification(self, image: Image.Image) -> tuple:
+    def _heuristic_scene_classification(self, image: PreparedImage) -> tuple:
         """Fallback scene classification using image properties."""
-        # Convert to analyze properties
-        gray = image.convert('L')
-
-        # Calculate brightness distribution
-        pixels = list(gray.getdata())
-        avg_brightness = sum(pixels) / len(pixels)
+        avg_brightness = float(image.gray.mean())
 
         # Simple heuristic
         if avg_brightness > 200:
@@ -229,24 +314,15 @@ class PhotoAnalysisService:
         else:
             return 'general', 0.5
 
-    def _detect_people(self, image: Image.Image) -> tuple:
+    def _detect_people(self, image: PreparedImage) -> tuple:
         """Detect if image contains people/faces."""
         has_faces = False
         people_count = 0
 
-        if CV2_AVAILABLE:
+        face_cascade = get_face_cascade()
+        if face_cascade is not None:
             try:
-                # Convert PIL to OpenCV format
-                cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-
-                # Load face cascade
-                face_cascade = cv2.CascadeClassifier(
-                    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-                )
-
-                # Detect faces
-                gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+                faces = face_cascade.detectMultiScale(image.gray, 1.1, 4)
 
                 people_count = len(faces)
                 has_faces = people_count > 0
@@ -321,12 +397,12 @@ class PhotoAnalysisService:
 
         return "Ett värdefullt minne sparat"
 
-    def _calculate_aesthetic_score(self, image: Image.Image, color_mood: str) -> float:
+    def _calculate_aesthetic_score(self, image: PreparedImage, color_mood: str) -> float:
         """Calculate aesthetic appeal score."""
         score = 0.5  # Base score
 
         # Resolution bonus
-        width, height = image.size
+        width, height = image.original_size
         if width * height > 2000000:  # > 2MP
             score += 0.1
 
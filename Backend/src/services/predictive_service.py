@@ -3,19 +3,20 @@ Predictive Analytics Service for Lugn & Trygg
 Handles mood prediction, trend analysis, and crisis detection
 """
 
+from __future__ import annotations
+
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any
 
-import joblib
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+
+from ..utils.lazy_imports import lazy_module
+
+# pandas, scikit-learn and joblib are imported on first use, not when the app boots
+joblib = lazy_module('joblib')
+pd = lazy_module('pandas')
 
 # Import new Swedish BERT NLP service
 try:
@@ -36,26 +37,41 @@ class PredictiveAnalyticsService:
     def __init__(self):
         self.models_dir = Path(__file__).parent.parent.parent / "models"
         self.models_dir.mkdir(exist_ok=True)
-        self.scaler = StandardScaler()
-
-        # Model configurations
-        self.model_configs = {
-            'linear_regression': {
-                'model': LinearRegression(),
-                'features': ['hour', 'day_of_week', 'month', 'prev_mood', 'trend_3d', 'trend_7d']
-            },
-            'random_forest': {
-                'model': RandomForestRegressor(n_estimators=100, random_state=42),
-                'features': ['hour', 'day_of_week', 'month', 'prev_mood', 'trend_3d', 'trend_7d',
-                           'seasonal_factor', 'weekend_factor']
-            }
-        }
+        self._scaler = None
+        self._model_configs: dict[str, dict[str, Any]] | None = None
 
         self.current_model = 'random_forest'
 
         # Initialize NLP service
         self.nlp = get_mood_nlp() if NLP_AVAILABLE else None
 
+    @property
+    def scaler(self):
+        if self._scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            self._scaler = StandardScaler()
+        return self._scaler
+
+    @property
+    def model_configs(self) -> dict[str, dict[str, Any]]:
+        """Model configurations; scikit-learn is imported the first time they are needed."""
+        if self._model_configs is None:
+            from sklearn.ensemble import RandomForestRegressor
+            from sklearn.linear_model import LinearRegression
+
+            self._model_configs = {
+                'linear_regression': {
+                    'model': LinearRegression(),
+                    'features': ['hour', 'day_of_week', 'month', 'prev_mood', 'trend_3d', 'trend_7d']
+                },
+                'random_forest': {
+                    'model': RandomForestRegressor(n_estimators=100, random_state=42),
+                    'features': ['hour', 'day_of_week', 'month', 'prev_mood', 'trend_3d', 'trend_7d',
+                               'seasonal_factor', 'weekend_factor']
+                }
+            }
+        return self._model_configs
+
     def preprocess_mood_data(self, mood_entries: list[dict]) -> pd.DataFrame:
         """
         Preprocess mood data for predictive modeling using Swedish BERT NLP
@@ -135,6 +151,9 @@ class PredictiveAnalyticsService:
             X = df[available_features]
             y = df['mood_score']
 
+            from sklearn.metrics import mean_squared_error, r2_score
+            from sklearn.model_selection import train_test_split
+
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y, test_size=0.2, random_state=42, shuffle=False
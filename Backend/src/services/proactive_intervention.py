@@ -10,10 +10,10 @@ from enum import Enum
 
 import numpy as np
 
-from ..config.firebase_config import db
+from ..firebase_config import db
 
 try:
-    from ..ml.mood_predictor import MoodPrediction, get_mood_predictor
+    from .mood_predictor import MoodPrediction, get_mood_predictor
     ML_AVAILABLE = True
 except ImportError:
     ML_AVAILABLE = False
@@ -90,11 +90,19 @@ class ProactiveInterventionService:
             # Get all active users
             active_users = await self._get_active_users()
 
+            # ML predictions for every user, with features engineered in one batch
+            predictions = {}
+            if self.mood_predictor and active_users:
+                try:
+                    predictions = self.mood_predictor.predict_many(active_users)
+                except Exception as e:
+                    logger.warning(f"Batch mood prediction failed: {e}")
+
             at_risk_users = []
 
             for user_id in active_users:
                 try:
-                    risk_assessment = await self._assess_user_risk(user_id)
+                    risk_assessment = await self._assess_user_risk(user_id, predictions.get(user_id))
 
                     if risk_assessment and risk_assessment.risk_score > 0.5:
                         at_risk_users.append(risk_assessment)
@@ -142,9 +150,12 @@ class ProactiveInterventionService:
             logger.error(f"Failed to get active users: {e}")
             return []
 
-    async def _assess_user_risk(self, user_id: str) -> AtRiskUser | None:
+    async def _assess_user_risk(self, user_id: str, prediction: 'MoodPrediction | None' = None) -> AtRiskUser | None:
         """
         Assess risk level for a specific user.
+
+        ``prediction`` is a precomputed ML prediction; without one the
+        predictor is called for this user alone.
         """
         risk_factors = []
         risk_score = 0.0
@@ -185,7 +196,8 @@ class ProactiveInterventionService:
             predicted_mood = None
             if self.mood_predictor:
                 try:
-                    prediction = self.mood_predictor.predict_next_week(user_id)
+                    if prediction is None:
+                        prediction = self.mood_predictor.predict_next_week(user_id)
                     if prediction:
                         predicted_mood = prediction.predicted_mood
 
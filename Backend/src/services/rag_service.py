@@ -15,13 +15,8 @@ try:
 except ImportError:
     PINECONE_AVAILABLE = False
 
-try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
-
 from ..config.firebase_config import db
+from .embedding_engine import get_embedding_engine
 
 logger = logging.getLogger(__name__)
 
@@ -58,22 +53,14 @@ class VectorStore:
     def __init__(self, use_pinecone: bool = True):
         self.use_pinecone = use_pinecone and PINECONE_AVAILABLE
         self.index = None
-        self.embedding_model = None
 
         if self.use_pinecone:
             self._init_pinecone()
         else:
             logger.info("Using Firestore-based fallback vector storage")
 
-        # Initialize embedding model
-        if SENTENCE_TRANSFORMERS_AVAILABLE:
-            try:
-                logger.info("Loading Swedish sentence transformer for embeddings...")
-                self.embedding_model = SentenceTransformer('KBLab/sentence-bert-swedish-cased')
-                logger.info("✅ Embedding model loaded")
-            except Exception as e:
-                logger.error(f"Failed to load embedding model: {e}")
-                self.embedding_model = None
+        # Shared Swedish sentence transformer, loaded on first embed
+        self.engine = get_embedding_engine()
 
     def _init_pinecone(self):
         """Initialize Pinecone connection."""
@@ -108,16 +95,15 @@ class VectorStore:
 
     def embed_text(self, text: str) -> list[float]:
         """Generate embedding for text."""
-        if self.embedding_model is None:
-            # Return zero vector as fallback
-            return [0.0] * 768
-
-        try:
-            embedding = self.embedding_model.encode(text)
-            return embedding.tolist()
-        except Exception as e:
-            logger.error(f"Embedding failed: {e}")
-            return [0.0] * 768
+        return self.embed_texts([text])[0]
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Generate embeddings for several texts in one batched model call."""
+        embeddings = self.engine.encode_many(texts)
+        if embeddings is None:
+            # Return zero vectors as fallback
+            return [[0.0] * self.engine.dimension for _ in texts]
+        return embeddings.tolist()
 
     def upsert(self, id: str, vector: list[float], metadata: dict):
         """Store vector with metadata."""
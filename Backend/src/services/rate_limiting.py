@@ -3,10 +3,17 @@ Advanced Rate Limiting Service for Lugn & Trygg API
 Intelligent rate limiting with Redis, user-based limits, and adaptive throttling
 """
 
+from __future__ import annotations
+
 import logging
+import math
 import os
+import threading
 import time
-from functools import wraps
+from collections.abc import Mapping
+from functools import lru_cache, wraps
+from types import MappingProxyType
+from typing import NamedTuple
 
 from flask import current_app, g, jsonify, request
 from flask_limiter.util import get_remote_address
@@ -16,6 +23,140 @@ from .tamper_detection_service import tamper_detection_service
 
 logger = logging.getLogger(__name__)
 
+WINDOW_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400}
+WINDOW_UNITS = {seconds: unit for unit, seconds in WINDOW_SECONDS.items()}
+# Distinct request paths whose (category, action) resolution is memoized
+ROUTE_CACHE_SIZE = 4096
+# How long one adaptive-throttling load reading is reused
+ADAPTIVE_REFRESH_SECONDS = 30
+
+# Generic cell rate algorithm (GCRA) in one atomic round trip.
+# The key stores the bucket's "theoretical arrival time" (TAT) in ms; each
+# request pushes it one emission interval (window / limit) forward and is
+# rejected when that would put the TAT more than one window ahead of now.
+# This is a smooth sliding limit of ``limit`` requests per ``window`` with
+# O(1) state per client. Redis server time is used so that every worker
+# shares one clock.
+#   KEYS[1] = bucket key, ARGV[1] = limit, ARGV[2] = window in ms
+#   returns {allowed, remaining, retry_after_ms, reset_after_ms}
+GCRA_LUA_SCRIPT = """
+pcall(redis.replicate_commands)
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local interval = window / limit
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+  tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if allow_at > now then
+  return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {1, math.floor((now - allow_at) / interval), 0, math.ceil(new_tat - now)}
+"""
+
+
+def parse_rate_limit(limit_str: str) -> tuple[int, int]:
+    """Parse an 'X per <unit>' limit into (max_requests, window_seconds); defaults to 100 per hour."""
+    try:
+        parts = limit_str.split()
+        if len(parts) == 3:
+            return max(1, int(parts[0])), WINDOW_SECONDS.get(parts[2], 3600)
+    except (ValueError, IndexError, AttributeError):
+        pass
+    return 100, 3600
+
+
+class RateLimitRule(NamedTuple):
+    """A compiled limit: ``max_requests`` per ``window_seconds``."""
+    max_requests: int
+    window_seconds: int
+
+    def scaled(self, multiplier: float) -> RateLimitRule:
+        return RateLimitRule(max(1, int(self.max_requests * multiplier)), self.window_seconds)
+
+    def __str__(self) -> str:
+        unit = WINDOW_UNITS.get(self.window_seconds)
+        return f"{self.max_requests} per {unit}" if unit else f"{self.max_requests} per {self.window_seconds} seconds"
+
+
+DEFAULT_RULE = RateLimitRule(100, 3600)
+
+
+def compile_rule_table(
+    rate_limits: Mapping[str, Mapping[str, str]],
+    user_limits: Mapping[str, Mapping[str, float]],
+) -> Mapping[tuple[str, str | None, str], RateLimitRule]:
+    """
+    Compile limit strings into an immutable (category, action, tier) -> rule table.
+
+    Every configured action gets one entry per tier with the tier multiplier
+    already applied; ``('default', None, tier)`` holds the fallback limit.
+    """
+    table: dict[tuple[str, str | None, str], RateLimitRule] = {}
+    for tier, tier_config in user_limits.items():
+        multiplier = tier_config.get('multiplier', 1.0) if tier != 'free' else 1.0
+        table[('default', None, tier)] = DEFAULT_RULE.scaled(multiplier)
+        for category, actions in rate_limits.items():
+            for action, limit_str in actions.items():
+                table[(category, action, tier)] = RateLimitRule(*parse_rate_limit(limit_str)).scaled(multiplier)
+    return MappingProxyType(table)
+
+
+class SlidingWindowCounter:
+    """
+    Fixed-size ring of per-slot request counts approximating a sliding window.
+
+    The window is split into ``RING_SLOTS`` slots with a running total, so a
+    hit is O(1) and memory per key is constant regardless of the limit
+    (the previous fallback kept one timestamp per request).
+    """
+
+    RING_SLOTS = 12
+    __slots__ = ('window_seconds', 'slot_seconds', 'counts', 'head', 'total', 'last_seen')
+
+    def __init__(self, window_seconds: int) -> None:
+        self.window_seconds = window_seconds
+        self.slot_seconds = window_seconds / self.RING_SLOTS
+        self.counts = [0] * self.RING_SLOTS
+        self.head = 0  # absolute index of the newest slot
+        self.total = 0
+        self.last_seen = 0.0
+
+    def _advance(self, now: float) -> None:
+        slot = int(now // self.slot_seconds)
+        gap = slot - self.head
+        if gap <= 0:
+            return
+        if gap >= self.RING_SLOTS:
+            self.counts = [0] * self.RING_SLOTS
+            self.total = 0
+        else:
+            for step in range(1, gap + 1):
+                position = (self.head + step) % self.RING_SLOTS
+                self.total -= self.counts[position]
+                self.counts[position] = 0
+        self.head = slot
+
+    def hit(self, now: float, limit: int) -> tuple[bool, int, float]:
+        """Count one request if under ``limit``; returns (allowed, remaining, retry_after_seconds)."""
+        self._advance(now)
+        self.last_seen = now
+        if self.total >= limit:
+            # Wait until the oldest non-empty slot leaves the window
+            for age in range(self.RING_SLOTS - 1, -1, -1):
+                if self.counts[(self.head - age) % self.RING_SLOTS]:
+                    expires_at = (self.head - age + self.RING_SLOTS) * self.slot_seconds
+                    return False, 0, max(0.0, expires_at - now)
+            return False, 0, self.slot_seconds
+        self.counts[self.head % self.RING_SLOTS] += 1
+        self.total += 1
+        return True, limit - self.total, 0.0
+
 class AdvancedRateLimiter:
     """
     Advanced rate limiting with multiple strategies and Redis backend
@@ -31,6 +172,11 @@ class AdvancedRateLimiter:
             except Exception as e:
                 logger.warning(f"⚠️ Redis connection failed: {e}, using in-memory storage")
                 self.redis_client = None
+        self._gcra_script = None
+
+        # In-memory fallback state: one SlidingWindowCounter per endpoint/client key
+        self._memory_store: dict[str, SlidingWindowCounter] = {}
+        self._memory_lock = threading.Lock()
 
         # Rate limit configurations by endpoint type
         self.rate_limits = {
@@ -81,6 +227,11 @@ class AdvancedRateLimiter:
                 'status': '60 per hour'
             },
 
+            # Privacy endpoints - the client polls export status while the archive is built
+            'privacy': {
+                'export_status': '600 per hour'
+            },
+
             # Admin endpoints - very strict
             'admin': {
                 'all': '50 per hour'
@@ -111,6 +262,12 @@ class AdvancedRateLimiter:
         # Adaptive throttling - increase limits during low traffic
         self.adaptive_mode = True
         self.last_adjustment = time.time()
+        self._adaptive_multiplier = 1.0
+        self._adaptive_expires_at = 0.0
+
+        # Compiled once: per-request lookups never parse limit strings
+        self.rule_table = compile_rule_table(self.rate_limits, self.user_limits)
+        self._resolve_route = lru_cache(maxsize=ROUTE_CACHE_SIZE)(self._route_key)
 
     def get_user_tier(self, user_id: str | None = None) -> str:
         """Determine user tier for rate limiting"""
@@ -144,6 +301,9 @@ class AdvancedRateLimiter:
         """Categorize endpoint for rate limiting"""
         endpoint = self._normalize_endpoint(endpoint)
 
+        # Matched on the prefix: privacy paths embed user and job ids that can contain any keyword below
+        if endpoint.startswith('privacy/'):
+            return 'privacy'
         if any(keyword in endpoint for keyword in ['auth', 'login', 'register', 'password']):
             return 'auth'
         elif any(keyword in endpoint for keyword in ['mood', 'emotion', 'feeling']):
@@ -236,6 +396,10 @@ class AdvancedRateLimiter:
             if 'sync' in normalized:
                 return 'sync'
 
+        if category == 'privacy':
+            if second_last == 'status' and 'export' in segments:
+                return 'export_status'
+
         if category == 'subscription':
             if 'webhook' in normalized:
                 return 'webhook'
@@ -250,73 +414,73 @@ class AdvancedRateLimiter:
 
         return None
 
-    def get_rate_limit(self, endpoint: str, user_id: str | None = None) -> str:
-        """Get appropriate rate limit for endpoint and user"""
+    def _route_key(self, endpoint: str) -> tuple[str, str | None]:
+        """Resolve an endpoint to its (category, action) key in ``rule_table``."""
         normalized_endpoint = self._normalize_endpoint(endpoint)
         category = self.get_endpoint_category(normalized_endpoint)
-        user_tier = self.get_user_tier(user_id) if user_id else 'free'
-
-        # Get base limit for endpoint
         category_limits = self.rate_limits.get(category, {})
         endpoint_key = self._resolve_endpoint_key(category, normalized_endpoint)
 
-        base_limit = (
-            category_limits.get(endpoint_key or '')
-            or category_limits.get('all')
-            or '100 per hour'
-        )
+        if endpoint_key and endpoint_key in category_limits:
+            return category, endpoint_key
+        if 'all' in category_limits:
+            return category, 'all'
+        return 'default', None
 
-        # Apply user tier multiplier
-        if user_tier != 'free':
-            tier_config = self.user_limits.get(user_tier, self.user_limits['free'])
-            multiplier = tier_config['multiplier']
+    def get_rule(self, endpoint: str, user_id: str | None = None) -> RateLimitRule:
+        """Get the compiled (max_requests, window_seconds) rule for endpoint and user"""
+        category, action = self._resolve_route(endpoint)
+        user_tier = self.get_user_tier(user_id) if user_id else 'free'
 
-            # Parse and multiply the limit
-            try:
-                parts = base_limit.split()
-                if len(parts) == 3:  # "X per Y"
-                    count = int(parts[0])
-                    new_count = int(count * multiplier)
-                    base_limit = f"{new_count} per {parts[2]}"
-            except (ValueError, IndexError):
-                pass  # Keep original limit if parsing fails
+        rule = self.rule_table.get((category, action, user_tier)) or self.rule_table[(category, action, 'free')]
 
         # Apply adaptive throttling if enabled
-        if self.adaptive_mode:
-            base_limit = self.apply_adaptive_throttling(base_limit)
+        multiplier = self.get_adaptive_multiplier()
+        return rule.scaled(multiplier) if multiplier != 1.0 else rule
+
+    def get_rate_limit(self, endpoint: str, user_id: str | None = None) -> str:
+        """Get appropriate rate limit for endpoint and user as an 'X per <unit>' string"""
+        return str(self.get_rule(endpoint, user_id))
 
-        return base_limit
+    def get_adaptive_multiplier(self) -> float:
+        """Adaptive throttling factor based on system load, refreshed at most every ADAPTIVE_REFRESH_SECONDS"""
+        if not self.adaptive_mode or not self.redis_client:
+            return 1.0
 
-    def apply_adaptive_throttling(self, base_limit: str) -> str:
-        """Apply adaptive throttling based on system load"""
+        now = time.time()
+        if now < self._adaptive_expires_at:
+            return self._adaptive_multiplier
+
+        multiplier = 1.0
         try:
-            current_hour = time.time() // 3600
+            current_hour = now // 3600
 
             # Check system load (simplified - in production use actual metrics)
-            if self.redis_client:
-                # Count recent requests in the last hour
-                recent_requests_raw = self.redis_client.zcount('api_requests', current_hour * 3600, (current_hour + 1) * 3600)
-                recent_requests = int(recent_requests_raw) if recent_requests_raw else 0  # type: ignore[arg-type]
-
-                # If low traffic (< 1000 requests/hour), increase limits by 50%
-                if recent_requests < 1000:
-                    try:
-                        parts = base_limit.split()
-                        if len(parts) == 3:
-                            count = int(parts[0])
-                            new_count = int(count * 1.5)
-                            return f"{new_count} per {parts[2]}"
-                    except (ValueError, IndexError):
-                        pass
+            # Count recent requests in the last hour
+            recent_requests_raw = self.redis_client.zcount('api_requests', current_hour * 3600, (current_hour + 1) * 3600)
+            recent_requests = int(recent_requests_raw) if recent_requests_raw else 0  # type: ignore[arg-type]
+
+            # If low traffic (< 1000 requests/hour), increase limits by 50%
+            if recent_requests < 1000:
+                multiplier = 1.5
         except Exception as e:
             logger.debug(f"Adaptive throttling error: {e}")
 
-        return base_limit
+        self._adaptive_multiplier = multiplier
+        self._adaptive_expires_at = now + ADAPTIVE_REFRESH_SECONDS
+        self.last_adjustment = now
+        return multiplier
+
+    def apply_adaptive_throttling(self, base_limit: str) -> str:
+        """Apply adaptive throttling based on system load to an 'X per <unit>' limit string"""
+        multiplier = self.get_adaptive_multiplier()
+        if multiplier == 1.0:
+            return base_limit
+        return str(RateLimitRule(*parse_rate_limit(base_limit)).scaled(multiplier))
 
     # ------------------------------------------------------------------
     # In-memory rate limiting fallback (when Redis is unavailable)
     # ------------------------------------------------------------------
-    _memory_store: dict[str, list[float]] = {}
     _last_prune: float = 0.0
 
     def _prune_memory_store(self) -> None:
@@ -329,122 +493,94 @@ class AdvancedRateLimiter:
         self._last_prune = now
         max_age = 86400  # 24 hours
         cutoff = now - max_age
-        stale_keys = [k for k, timestamps in self._memory_store.items()
-                      if not timestamps or max(timestamps) < cutoff]
-        for k in stale_keys:
-            del self._memory_store[k]
+        with self._memory_lock:
+            stale_keys = [k for k, counter in self._memory_store.items() if counter.last_seen < cutoff]
+            for k in stale_keys:
+                del self._memory_store[k]
         if stale_keys:
             logger.debug(f"Pruned {len(stale_keys)} stale rate-limit keys from memory store")
 
     def _check_rate_limit_in_memory(self, endpoint: str, user_id: str | None = None) -> tuple[bool, dict]:
-        """Sliding-window rate limiting using an in-memory dict.
+        """Sliding-window rate limiting using fixed-size in-memory ring counters.
 
         This ensures rate limiting is still enforced in development / when
         Redis is not running.  The window size is derived from the endpoint's
-        configured limit string (e.g. '60 per minute').
+        configured limit string (e.g. '60 per minute').  Each client key holds
+        one ``SlidingWindowCounter``, so memory and work per request are
+        constant no matter how high the limit is.
         """
-        import time as _time
-
         # Periodically prune stale keys
         self._prune_memory_store()
 
         client_id = user_id or get_remote_address()
         key = f"mem:{endpoint}:{client_id}"
+        max_requests, window_seconds = self.get_rule(endpoint, user_id)
 
-        # Parse configured limit
-        limit_str = self.get_rate_limit(endpoint, user_id)
-        max_requests = 100
-        window_seconds = 3600
-        try:
-            parts = limit_str.split()
-            if len(parts) == 3:
-                max_requests = int(parts[0])
-                unit = parts[2]
-                window_seconds = {'minute': 60, 'hour': 3600, 'day': 86400}.get(unit, 3600)
-        except (ValueError, IndexError):
-            pass
-
-        now = _time.time()
-        cutoff = now - window_seconds
-
-        # Prune old entries
-        timestamps = self._memory_store.get(key, [])
-        timestamps = [ts for ts in timestamps if ts > cutoff]
-
-        if len(timestamps) >= max_requests:
-            self._memory_store[key] = timestamps
+        now = time.time()
+        with self._memory_lock:
+            counter = self._memory_store.get(key)
+            if counter is None or counter.window_seconds != window_seconds:
+                counter = self._memory_store[key] = SlidingWindowCounter(window_seconds)
+            allowed, remaining, retry_after = counter.hit(now, max_requests)
+
+        if not allowed:
             return False, {
-                'retry_after': window_seconds,
+                'retry_after': max(1, math.ceil(retry_after)),
                 'limit': max_requests,
                 'remaining': 0,
-                'reset': int(now + window_seconds),
+                'reset': int(now + retry_after),
             }
 
-        timestamps.append(now)
-        self._memory_store[key] = timestamps
-
         return True, {
             'limit': max_requests,
-            'remaining': max(0, max_requests - len(timestamps)),
+            'remaining': remaining,
             'reset': int(now + window_seconds),
         }
 
+    def _get_gcra_script(self):
+        """Register the GCRA script with the current Redis client (once per client)."""
+        client = self.redis_client
+        if self._gcra_script is None or self._gcra_script[0] is not client:
+            self._gcra_script = (client, client.register_script(GCRA_LUA_SCRIPT))
+        return self._gcra_script[1]
+
     def check_rate_limit(self, endpoint: str, user_id: str | None = None) -> tuple[bool, dict]:
-        """Check if request should be rate limited"""
+        """Check if request should be rate limited.
+
+        With Redis this is a single atomic ``EVALSHA`` of ``GCRA_LUA_SCRIPT``:
+        the check and the update happen in one round trip, so concurrent
+        workers can never both take the last slot of a window.
+        """
         if not self.redis_client:
             return self._check_rate_limit_in_memory(endpoint, user_id)
 
         try:
             # Create unique key for this endpoint and user/IP
             client_id = user_id or get_remote_address()
-            key = f"ratelimit:{endpoint}:{client_id}"
+            key = f"ratelimit:gcra:{endpoint}:{client_id}"
 
-            # Get current usage
-            current_usage_raw = self.redis_client.get(key)
-            current_usage = int(current_usage_raw) if current_usage_raw else 0  # type: ignore[arg-type]
+            max_requests, window_seconds = self.get_rule(endpoint, user_id)
 
-            # Get limit for this endpoint
-            limit_str = self.get_rate_limit(endpoint, user_id)
+            allowed, remaining, retry_after_ms, reset_after_ms = (
+                int(value) for value in self._get_gcra_script()(
+                    keys=[key], args=[max_requests, window_seconds * 1000]
+                )
+            )
+            now = time.time()
 
-            # Parse limit (simplified - assumes "X per Y" format)
-            try:
-                parts = limit_str.split()
-                if len(parts) == 3:
-                    max_requests = int(parts[0])
-                    time_window = parts[2]
-
-                    # Convert time window to seconds
-                    if time_window == 'minute':
-                        window_seconds = 60
-                    elif time_window == 'hour':
-                        window_seconds = 3600
-                    elif time_window == 'day':
-                        window_seconds = 86400
-                    else:
-                        window_seconds = 3600  # Default to hour
-
-                    # Check if limit exceeded
-                    if current_usage >= max_requests:
-                        return False, {
-                            'retry_after': window_seconds,
-                            'limit': max_requests,
-                            'remaining': 0,
-                            'reset': int(time.time() + window_seconds)
-                        }
-
-                    # Increment usage
-                    self.redis_client.incr(key)
-                    self.redis_client.expire(key, window_seconds)
-
-                    remaining = max_requests - current_usage - 1
-
-                    return True, {
-                        'limit': max_requests,
-                        'remaining': max(0, remaining),
-                        'reset': int(time.time() + window_seconds)
-                    }
-            except (ValueError, IndexError):
-                pass
+            if not allowed:
+                return False, {
+                    'retry_after': max(1, math.ceil(retry_after_ms / 1000)),
+                    'limit': max_requests,
+                    'remaining': 0,
+                    'reset': int(now + reset_after_ms / 1000),
+                }
+
+            return True, {
+                'limit': max_requests,
+                'remaining': max(0, remaining),
+                'reset': int(now + reset_after_ms / 1000),
+            }
 
         except Exception as e:
             logger.warning(f"Rate limit check error: {e}")
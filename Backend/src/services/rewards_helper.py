@@ -97,6 +97,8 @@ def award_xp(user_id: str, action: str, amount: int | None = None) -> dict:
             'level': new_level,
         }, merge=True)
 
+        update_leaderboard_xp(user_id, new_xp)
+
         if leveled_up:
             logger.info(f"🎉 User {user_id} leveled up to {new_level}!")
 
@@ -120,6 +122,15 @@ def award_xp(user_id: str, action: str, amount: int | None = None) -> dict:
         }
 
 
+def update_leaderboard_xp(user_id: str, xp: int) -> None:
+    """Keep the leaderboard rank index in step with the stored XP."""
+    try:
+        from .leaderboard_index import leaderboard_index
+        leaderboard_index.record_scores(user_id, xp=xp)
+    except Exception as e:
+        logger.warning(f"Leaderboard index update failed (non-blocking): {e}")
+
+
 def _calculate_level(total_xp: int) -> int:
     """Level formula: level = floor(sqrt(xp / 100)) + 1.
     Matches rewards_routes.py and the frontend formula exactly.
@@ -0,0 +1,145 @@
+"""
+Cached signed URLs for Firebase Storage objects.
+
+Signatures are cached in the shared two-tier cache per (bucket, path,
+expiry window). Every URL handed out during a window expires at the same
+absolute time, ``SIGNED_URL_TTL_SECONDS`` after the window ends. Repeat
+requests for a path therefore get the same URL (which browsers can cache)
+without signing again, and each URL is valid for at least
+``SIGNED_URL_TTL_SECONDS``.
+
+Callers sign stored storage paths at read time instead of persisting URLs
+that later go stale. They do not check ``blob.exists()`` first: the stored
+metadata is trusted, and a missing object is reported by Storage when the
+URL is fetched. ``urls_for`` signs a whole page in one call. Cache hits
+cost nothing, and misses are signed concurrently.
+
+When signing fails, objects stay private by default and the caller gets the
+(unusable, uncached) ``gs://`` path. Only callers that pass
+``allow_public=True`` fall back to making the object public.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from functools import partial
+from typing import Any
+
+from ..utils.cache import get_cache
+from ..utils.fanout import fan_out
+
+logger = logging.getLogger(__name__)
+
+_IS_PRODUCTION = os.getenv('FLASK_ENV', 'development').lower() == 'production'
+
+# Minimum remaining validity of a URL when it is handed out
+SIGNED_URL_TTL_SECONDS = int(os.getenv('SIGNED_URL_TTL_SECONDS', '3600'))
+# Length of an expiry window; URLs live at most TTL + window
+SIGNED_URL_WINDOW_SECONDS = int(os.getenv('SIGNED_URL_WINDOW_SECONDS', '3600'))
+# Budget for signing the cache misses of one batch
+SIGNED_URL_BATCH_TIMEOUT_SECONDS = float(os.getenv('SIGNED_URL_BATCH_TIMEOUT_SECONDS', '5'))
+
+
+class SignedUrlService:
+    """Signs Storage paths with cached, window-aligned expiries."""
+
+    def __init__(
+        self,
+        ttl_seconds: int = SIGNED_URL_TTL_SECONDS,
+        window_seconds: int = SIGNED_URL_WINDOW_SECONDS,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.window_seconds = window_seconds
+        self._cache = get_cache('signed_urls', default_ttl=window_seconds, max_size=5000)
+
+    def url_for(self, bucket: Any, path: str, *, allow_public: bool = False) -> str:
+        """Signed URL for one object path in ``bucket``."""
+        return self.urls_for(bucket, [path], allow_public=allow_public)[path]
+
+    def urls_for(self, bucket: Any, paths: Iterable[str], *, allow_public: bool = False) -> dict[str, str]:
+        """
+        Signed URLs for every path (empty paths are skipped), keyed by path.
+
+        Cached signatures are reused. The rest are signed concurrently. With
+        ``allow_public`` an object that cannot be signed is made public instead.
+        """
+        window = int(time.time() // self.window_seconds)
+        window_end = (window + 1) * self.window_seconds
+        expiration = datetime.fromtimestamp(window_end + self.ttl_seconds, UTC)
+
+        urls: dict[str, str] = {}
+        misses: list[str] = []
+        for path in dict.fromkeys(p for p in paths if p):
+            url = self._cache.get(self._key(bucket, window, path, allow_public))
+            if url is None:
+                misses.append(path)
+            else:
+                urls[path] = url
+
+        if len(misses) == 1:
+            urls[misses[0]] = self._sign(bucket, misses[0], expiration, allow_public)
+        elif misses:
+            results = fan_out(
+                {path: partial(self._sign, bucket, path, expiration, allow_public) for path in misses},
+                SIGNED_URL_BATCH_TIMEOUT_SECONDS,
+            )
+            for path in misses:
+                result = results[path]
+                urls[path] = result.value if result.ok else self._gs_path(bucket, path)
+
+        ttl = max(window_end - time.time(), 1)
+        for path in misses:
+            if not urls[path].startswith('gs://'):
+                self._cache.set(self._key(bucket, window, path, allow_public), urls[path], ttl=ttl)
+        return urls
+
+    def _key(self, bucket: Any, window: int, path: str, allow_public: bool) -> str:
+        # Public URLs must never be served to a sign-only caller
+        return f"{bucket.name}:{window}:{'public' if allow_public else 'signed'}:{path}"
+
+    @staticmethod
+    def _gs_path(bucket: Any, path: str) -> str:
+        return f"gs://{bucket.name}/{path}"
+
+    def _sign(self, bucket: Any, path: str, expiration: datetime, allow_public: bool) -> str:
+        """
+        Strategy:
+        1. generate_signed_url() — works when the service account has
+           roles/iam.serviceAccountTokenCreator (or a private key).
+        2. Only with ``allow_public``: fall back to make_public() + blob.public_url —
+           works when the Storage bucket/object allows public access (e.g. allUsers
+           has Storage Object Viewer).
+        3. Last resort: the gs:// path so callers know where the file is (not cached).
+        """
+        blob = bucket.blob(path)
+        try:
+            return blob.generate_signed_url(expiration=expiration, method='GET')
+        except Exception as sign_err:
+            if not allow_public:
+                logger.warning(f"Signed URL failed ({sign_err}) for private object, returning gs:// path")
+                return self._gs_path(bucket, path)
+            logger.warning(f"Signed URL failed ({sign_err}), trying make_public fallback")
+            try:
+                blob.make_public()
+                return blob.public_url
+            except Exception as pub_err:
+                if _IS_PRODUCTION:
+                    logger.warning(
+                        f"[F2] Firebase Storage URL generation failed — neither signed URL "
+                        f"nor public URL could be created for {path}. "
+                        f"The gs:// path is NOT usable by frontend clients. "
+                        f"Fix: grant the backend service account ONE of: "
+                        f"(a) roles/iam.serviceAccountTokenCreator for signed URLs, OR "
+                        f"(b) roles/storage.objectCreator + allUsers Storage Object Viewer "
+                        f"for public URLs. Signed URL error: {sign_err}. Public error: {pub_err}"
+                    )
+                else:
+                    logger.warning(f"make_public failed ({pub_err}), returning gs:// path")
+                return self._gs_path(bucket, path)
+
+
+signed_url_service = SignedUrlService()
@@ -0,0 +1,600 @@
+"""
+Persistent per-user vector index for chat RAG retrieval.
+
+Embeddings are computed once, when a mood, journal entry or chat message is
+saved, and stored in ``users/{uid}/rag_embeddings/{source}:{doc_id}`` together
+with the prompt snippet they stand for. Each worker keeps a per-user matrix of
+those embeddings (L2-normalised, float16 by default) memory-mapped from
+``VECTOR_INDEX_DIR``. A query is then one matrix-vector product plus
+``argpartition`` instead of re-embedding every Firestore document.
+
+Indexes are kept in sync incrementally: each holds the ``updated_at``
+high-water mark of the entries it has seen, and only newer entries (including
+tombstones for deleted documents) are pulled from Firestore. Users idle for
+``VECTOR_INDEX_IDLE_SECONDS`` are flushed to disk and dropped from memory.
+
+The entries hold plaintext snippets of the user's moods, journal and chats.
+``delete_user`` erases all of them on account deletion: the Firestore
+entries, the index files and this worker's resident copy. Another worker's
+resident copy is not written back to disk once its files have been erased.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+
+import numpy as np
+from google.cloud.firestore import FieldFilter
+
+from ..firebase_config import db
+from .embedding_engine import CHAT_RAG_EMBEDDING_MODEL, EmbeddingEngine, get_embedding_engine
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_SUBCOLLECTION = 'rag_embeddings'
+BOOTSTRAP_MARKER = '_bootstrap'
+INDEX_FORMAT_VERSION = 1
+# Must match RetrievedContext.source values used by the chat RAG service
+SOURCES = ('mood_logs', 'journal', 'goals', 'coping_strategies', 'conversations')
+
+VECTOR_INDEX_DIR = os.getenv('VECTOR_INDEX_DIR', os.path.join(tempfile.gettempdir(), 'lugn_trygg_vector_index'))
+VECTOR_INDEX_DTYPE = np.dtype(os.getenv('VECTOR_INDEX_DTYPE', 'float16'))
+VECTOR_INDEX_MAX_RESIDENT = int(os.getenv('VECTOR_INDEX_MAX_RESIDENT', '256'))
+VECTOR_INDEX_IDLE_SECONDS = float(os.getenv('VECTOR_INDEX_IDLE_SECONDS', '900'))
+# How often a resident index checks Firestore for entries written by other workers
+VECTOR_INDEX_SYNC_SECONDS = float(os.getenv('VECTOR_INDEX_SYNC_SECONDS', '30'))
+# Firestore batched writes are capped at 500 operations
+_WRITE_BATCH_SIZE = 400
+
+_SOURCE_CODES = {source: code for code, source in enumerate(SOURCES)}
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(UTC).isoformat()
+
+
+def _epoch(timestamp: Any) -> float:
+    """Seconds since epoch for an ISO string or datetime (0.0 if unparseable)."""
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    try:
+        return datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def entry_key(source: str, doc_id: str) -> str:
+    """Document ID of an embedding entry."""
+    return f"{source}:{doc_id}"
+
+
+@dataclass(frozen=True)
+class SourceFilter:
+    """Per-source constraints applied inside the vectorized search."""
+    since: float | None = None  # epoch seconds; older entries are skipped
+    min_score: float = -1.0
+
+
+@dataclass
+class IndexEntry:
+    """A document to embed and index."""
+    source: str
+    doc_id: str
+    text: str
+    content: str
+    timestamp: Any
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return entry_key(self.source, self.doc_id)
+
+
+@dataclass
+class IndexHit:
+    key: str
+    source: str
+    score: float
+
+
+class UserVectorIndex:
+    """
+    Row-per-document embedding matrix for one user.
+
+    Rows are L2-normalised on insert so cosine similarity is a plain dot
+    product. Deletes swap the last row into the hole, keeping the matrix
+    dense; growth doubles capacity.
+    """
+
+    def __init__(self, user_id: str, dimension: int, model_name: str, dtype: np.dtype = VECTOR_INDEX_DTYPE):
+        self.user_id = user_id
+        self.dimension = dimension
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.matrix = np.empty((0, dimension), dtype=self.dtype)
+        self.source_codes = np.empty(0, dtype=np.int8)
+        self.timestamps = np.empty(0, dtype=np.float64)
+        self.keys: list[str] = []
+        self._row_of: dict[str, int] = {}
+        self.watermark = ''
+        self.bootstrapped = False
+        self.dirty = False
+        # Saved to or loaded from disk; missing files then mean the user was erased
+        self.persisted = False
+        self.last_used = time.time()
+        self.last_synced = 0.0
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    # ──────────────────────────────────────────────────────────────
+    # Mutation
+    # ──────────────────────────────────────────────────────────────
+
+    def upsert(self, key: str, source: str, timestamp: float, vector: Any) -> bool:
+        """Insert or replace one row. Returns False if the vector is unusable."""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if vector.shape != (self.dimension,) or norm == 0.0 or source not in _SOURCE_CODES:
+            return False
+
+        with self.lock:
+            row = self._row_of.get(key)
+            if row is None:
+                row = len(self.keys)
+                self._ensure_capacity(row + 1)
+                self.keys.append(key)
+                self._row_of[key] = row
+            self.matrix[row] = vector / norm
+            self.source_codes[row] = _SOURCE_CODES[source]
+            self.timestamps[row] = timestamp
+            self.dirty = True
+        return True
+
+    def remove(self, key: str) -> bool:
+        with self.lock:
+            row = self._row_of.pop(key, None)
+            if row is None:
+                return False
+            last = len(self.keys) - 1
+            if row != last:
+                moved = self.keys[last]
+                self.matrix[row] = self.matrix[last]
+                self.source_codes[row] = self.source_codes[last]
+                self.timestamps[row] = self.timestamps[last]
+                self.keys[row] = moved
+                self._row_of[moved] = row
+            self.keys.pop()
+            self.dirty = True
+            return True
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = self.matrix.shape[0]
+        if rows <= capacity and self.matrix.flags.writeable:
+            return
+        new_capacity = max(rows, capacity * 2, 16)
+        n = len(self.keys)
+        matrix = np.zeros((new_capacity, self.dimension), dtype=self.dtype)
+        matrix[:n] = self.matrix[:n]
+        codes = np.zeros(new_capacity, dtype=np.int8)
+        codes[:n] = self.source_codes[:n]
+        stamps = np.zeros(new_capacity, dtype=np.float64)
+        stamps[:n] = self.timestamps[:n]
+        self.matrix, self.source_codes, self.timestamps = matrix, codes, stamps
+
+    # ──────────────────────────────────────────────────────────────
+    # Query
+    # ──────────────────────────────────────────────────────────────
+
+    def search(self, query: Any, k: int, filters: dict[str, SourceFilter] | None = None) -> list[IndexHit]:
+        """Top-``k`` rows by cosine similarity, restricted to ``filters`` sources if given."""
+        query = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if k <= 0 or norm == 0.0 or query.shape != (self.dimension,):
+            return []
+
+        with self.lock:
+            n = len(self.keys)
+            if n == 0:
+                return []
+            scores = self.matrix[:n].astype(np.float32, copy=False) @ (query / norm)
+
+            if filters is not None:
+                allowed = np.zeros(n, dtype=bool)
+                codes = self.source_codes[:n]
+                for source, source_filter in filters.items():
+                    code = _SOURCE_CODES.get(source)
+                    if code is None:
+                        continue
+                    mask = (codes == code) & (scores >= source_filter.min_score)
+                    if source_filter.since is not None:
+                        mask &= self.timestamps[:n] >= source_filter.since
+                    allowed |= mask
+                scores = np.where(allowed, scores, -np.inf)
+
+            valid = int(np.count_nonzero(np.isfinite(scores)))
+            k = min(k, valid)
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                IndexHit(key=self.keys[row], source=SOURCES[self.source_codes[row]], score=float(scores[row]))
+                for row in top
+            ]
+
+    # ──────────────────────────────────────────────────────────────
+    # Persistence
+    # ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _base_path(directory: str, user_id: str) -> str:
+        return os.path.join(directory, hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:32])
+
+    def save(self, directory: str) -> None:
+        """Atomically write the matrix (``.npy``) and manifest (``.json``)."""
+        with self.lock:
+            n = len(self.keys)
+            manifest = {
+                'version': INDEX_FORMAT_VERSION,
+                'model': self.model_name,
+                'dimension': self.dimension,
+                'dtype': self.dtype.name,
+                'watermark': self.watermark,
+                'bootstrapped': self.bootstrapped,
+                'keys': list(self.keys),
+                'sources': self.source_codes[:n].tolist(),
+                'timestamps': self.timestamps[:n].tolist(),
+            }
+            matrix = np.ascontiguousarray(self.matrix[:n])
+            self.dirty = False
+            self.persisted = True
+
+        os.makedirs(directory, exist_ok=True)
+        base = self._base_path(directory, self.user_id)
+        for suffix, write in (
+            ('.npy', lambda f: np.save(f, matrix)),
+            ('.json', lambda f: f.write(json.dumps(manifest).encode('utf-8'))),
+        ):
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=suffix + '.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    write(f)
+                os.replace(tmp_path, base + suffix)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+    @classmethod
+    def load(
+        cls, directory: str, user_id: str, dimension: int, model_name: str, dtype: np.dtype = VECTOR_INDEX_DTYPE
+    ) -> UserVectorIndex:
+        """Open a saved index (memory-mapped, copy-on-write), or return an empty one."""
+        index = cls(user_id, dimension, model_name, dtype)
+        base = cls._base_path(directory, user_id)
+        try:
+            with open(base + '.json', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if (
+                manifest.get('version') != INDEX_FORMAT_VERSION
+                or manifest.get('model') != model_name
+                or manifest.get('dimension') != dimension
+                or manifest.get('dtype') != index.dtype.name
+            ):
+                return index
+            matrix = np.load(base + '.npy', mmap_mode='c')
+            keys = list(manifest['keys'])
+            if matrix.shape != (len(keys), dimension):
+                return index
+        except FileNotFoundError:
+            return index
+        except Exception as e:
+            logger.warning(f"Discarding unreadable vector index for user {user_id[:8]}: {e}")
+            return index
+
+        index.matrix = matrix
+        index.keys = keys
+        index._row_of = {key: row for row, key in enumerate(keys)}
+        index.source_codes = np.asarray(manifest['sources'], dtype=np.int8)
+        index.timestamps = np.asarray(manifest['timestamps'], dtype=np.float64)
+        index.watermark = manifest.get('watermark', '')
+        index.bootstrapped = bool(manifest.get('bootstrapped'))
+        index.persisted = True
+        return index
+
+    @classmethod
+    def delete_files(cls, directory: str, user_id: str) -> None:
+        base = cls._base_path(directory, user_id)
+        for suffix in ('.npy', '.json'):
+            try:
+                os.unlink(base + suffix)
+            except FileNotFoundError:
+                pass
+
+
+class VectorIndexService:
+    """Writes embedding entries to Firestore and serves per-user top-k searches."""
+
+    def __init__(
+        self,
+        index_dir: str = VECTOR_INDEX_DIR,
+        engine: EmbeddingEngine | None = None,
+        max_resident: int = VECTOR_INDEX_MAX_RESIDENT,
+        idle_seconds: float = VECTOR_INDEX_IDLE_SECONDS,
+        sync_seconds: float = VECTOR_INDEX_SYNC_SECONDS,
+    ) -> None:
+        self.index_dir = index_dir
+        self._engine = engine
+        self.max_resident = max_resident
+        self.idle_seconds = idle_seconds
+        self.sync_seconds = sync_seconds
+        self._indexes: OrderedDict[str, UserVectorIndex] = OrderedDict()
+        self._lock = threading.RLock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def engine(self) -> EmbeddingEngine:
+        if self._engine is None:
+            # Same model as chat RAG queries; the manifest check rebuilds indexes of any other model
+            self._engine = get_embedding_engine(CHAT_RAG_EMBEDDING_MODEL)
+        return self._engine
+
+    def _collection(self, user_id: str) -> Any:
+        if db is None:
+            raise RuntimeError("Firestore unavailable")
+        return db.collection('users').document(user_id).collection(EMBEDDINGS_SUBCOLLECTION)
+
+    # ──────────────────────────────────────────────────────────────
+    # Writes
+    # ──────────────────────────────────────────────────────────────
+
+    def index_documents(
+        self, user_id: str, entries: Iterable[IndexEntry], embeddings: np.ndarray | None = None
+    ) -> int:
+        """
+        Embed (unless ``embeddings`` is given, row-aligned) and store ``entries``.
+        Returns the number written; 0 when no embedding model is available.
+        """
+        entries = [e for e in entries if e.text and e.text.strip()]
+        if not entries:
+            return 0
+        if embeddings is None:
+            embeddings = self.engine.encode_many([e.text for e in entries])
+            if embeddings is None:
+                return 0
+
+        collection = self._collection(user_id)
+        updated_at = _utc_now_iso()
+        records = [
+            (entry, {
+                'source': entry.source,
+                'doc_id': entry.doc_id,
+                'embedding': [float(x) for x in vector],
+                'model': self.engine.model_name,
+                'content': entry.content,
+                'metadata': entry.metadata,
+                'timestamp': entry.timestamp.isoformat() if isinstance(entry.timestamp, datetime) else entry.timestamp,
+                'updated_at': updated_at,
+                'deleted': False,
+            })
+            for entry, vector in zip(entries, embeddings, strict=True)
+        ]
+        for start in range(0, len(records), _WRITE_BATCH_SIZE):
+            batch = db.batch()
+            for entry, record in records[start:start + _WRITE_BATCH_SIZE]:
+                batch.set(collection.document(entry.key), record)
+            batch.commit()
+
+        index = self._resident(user_id)
+        if index is not None:
+            for entry, vector in zip(entries, embeddings, strict=True):
+                index.upsert(entry.key, entry.source, _epoch(entry.timestamp), vector)
+        return len(records)
+
+    def index_document(self, user_id: str, entry: IndexEntry) -> bool:
+        return self.index_documents(user_id, [entry]) == 1
+
+    def remove_document(self, user_id: str, source: str, doc_id: str) -> None:
+        """Tombstone an entry so every worker drops it on its next sync."""
+        key = entry_key(source, doc_id)
+        self._collection(user_id).document(key).set(
+            {'source': source, 'doc_id': doc_id, 'deleted': True, 'updated_at': _utc_now_iso()}
+        )
+        index = self._resident(user_id)
+        if index is not None:
+            index.remove(key)
+
+    def bootstrap(self, user_id: str, entries: list[IndexEntry], embeddings: np.ndarray) -> None:
+        """Seed a user's index from a full scan and mark it as complete."""
+        self.index_documents(user_id, entries, embeddings)
+        self._collection(user_id).document(BOOTSTRAP_MARKER).set(
+            {'bootstrapped': True, 'updated_at': _utc_now_iso()}
+        )
+        index = self._resident(user_id)
+        if index is not None:
+            index.bootstrapped = True
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Erase everything indexed for ``user_id`` (account deletion).
+
+        Drops the resident index without flushing it, deletes the index files
+        and every ``rag_embeddings`` document. Returns the documents deleted.
+        """
+        with self._lock:
+            self._indexes.pop(user_id, None)
+        UserVectorIndex.delete_files(self.index_dir, user_id)
+
+        collection = self._collection(user_id)
+        deleted = 0
+        while True:
+            snaps = list(collection.limit(_WRITE_BATCH_SIZE).stream())
+            if not snaps:
+                return deleted
+            batch = db.batch()
+            for snap in snaps:
+                batch.delete(snap.reference)
+            batch.commit()
+            deleted += len(snaps)
+
+    def submit(self, fn: Any, *args: Any) -> None:
+        """Run an indexing call off the request path; failures are logged, never raised."""
+        if self.engine.disabled:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vector-index')
+
+        def _run() -> None:
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.warning(f"Vector index update failed (non-blocking): {e}")
+
+        self._executor.submit(_run)
+
+    # ──────────────────────────────────────────────────────────────
+    # Reads
+    # ──────────────────────────────────────────────────────────────
+
+    def is_ready(self, user_id: str) -> bool:
+        """True once the user's index has been bootstrapped and can replace a full scan."""
+        index = self.get_index(user_id)
+        return index is not None and index.bootstrapped
+
+    def search(
+        self, user_id: str, query: Any, k: int, filters: dict[str, SourceFilter] | None = None
+    ) -> list[IndexHit]:
+        index = self.get_index(user_id)
+        if index is None:
+            return []
+        return index.search(query, k, filters)
+
+    def fetch_entries(self, user_id: str, keys: list[str]) -> dict[str, dict[str, Any]]:
+        """Stored records (content, metadata, timestamp) for ``keys`` in one round trip."""
+        if not keys:
+            return {}
+        collection = self._collection(user_id)
+        records = {}
+        for snap in db.get_all([collection.document(key) for key in keys]):
+            if snap.exists:
+                records[snap.id] = snap.to_dict() or {}
+        return records
+
+    def get_index(self, user_id: str) -> UserVectorIndex | None:
+        """Resident (loaded and recently synced) index for ``user_id``; None without a model."""
+        if not self.engine.available:
+            return None
+        self.evict_idle()
+
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = UserVectorIndex.load(
+                    self.index_dir, user_id, self.engine.dimension, self.engine.model_name
+                )
+                self._indexes[user_id] = index
+                while len(self._indexes) > self.max_resident:
+                    _, cold = self._indexes.popitem(last=False)
+                    self._flush(cold)
+            self._indexes.move_to_end(user_id)
+            index.last_used = time.time()
+
+        if time.time() - index.last_synced >= self.sync_seconds:
+            try:
+                self._sync(index)
+            except Exception as e:
+                logger.warning(f"Vector index sync failed for user {user_id[:8]}: {e}")
+        return index
+
+    def _resident(self, user_id: str) -> UserVectorIndex | None:
+        with self._lock:
+            return self._indexes.get(user_id)
+
+    def _sync(self, index: UserVectorIndex) -> None:
+        """Apply entries written since the index's high-water mark."""
+        with index.lock:
+            query = self._collection(index.user_id).select(
+                ['source', 'doc_id', 'embedding', 'model', 'timestamp', 'updated_at', 'deleted', 'bootstrapped']
+            )
+            if index.watermark:
+                # >= so writes sharing the watermark's timestamp are not missed; upserts are idempotent
+                query = query.where(filter=FieldFilter('updated_at', '>=', index.watermark))
+            changed = 0
+            for snap in query.order_by('updated_at').stream():
+                data = snap.to_dict() or {}
+                changed += 1
+                if snap.id == BOOTSTRAP_MARKER:
+                    index.bootstrapped = index.bootstrapped or bool(data.get('bootstrapped'))
+                elif data.get('deleted'):
+                    index.remove(snap.id)
+                elif data.get('model') == index.model_name:
+                    index.upsert(snap.id, data.get('source', ''), _epoch(data.get('timestamp')), data.get('embedding') or [])
+                updated_at = str(data.get('updated_at') or '')
+                if updated_at > index.watermark:
+                    index.watermark = updated_at
+            index.last_synced = time.time()
+            if changed:
+                index.dirty = True
+
+    # ──────────────────────────────────────────────────────────────
+    # Eviction
+    # ──────────────────────────────────────────────────────────────
+
+    def evict_idle(self) -> int:
+        """Flush and drop indexes unused for ``idle_seconds``. Returns the number evicted."""
+        cutoff = time.time() - self.idle_seconds
+        evicted = []
+        with self._lock:
+            for user_id, index in list(self._indexes.items()):
+                if index.last_used > cutoff:
+                    break  # OrderedDict is in LRU order
+                evicted.append(self._indexes.pop(user_id))
+        for index in evicted:
+            self._flush(index)
+        return len(evicted)
+
+    def flush_all(self) -> None:
+        """Persist every dirty resident index (e.g. on worker shutdown)."""
+        with self._lock:
+            indexes = list(self._indexes.values())
+        for index in indexes:
+            self._flush(index)
+
+    def _flush(self, index: UserVectorIndex) -> None:
+        if not index.dirty:
+            return
+        base = UserVectorIndex._base_path(self.index_dir, index.user_id)
+        if index.persisted and not os.path.exists(base + '.json'):
+            return  # erased by delete_user in another worker
+        try:
+            index.save(self.index_dir)
+        except Exception as e:
+            logger.warning(f"Failed to persist vector index for user {index.user_id[:8]}: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            indexes = list(self._indexes.values())
+        return {
+            'resident_users': len(indexes),
+            'resident_rows': sum(len(index) for index in indexes),
+            'resident_bytes': sum(index.matrix.nbytes for index in indexes),
+            'dtype': VECTOR_INDEX_DTYPE.name,
+        }
+
+
+vector_index_service = VectorIndexService()
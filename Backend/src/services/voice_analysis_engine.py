@@ -0,0 +1,702 @@
+"""
+Voice analysis execution engine.
+
+The pieces shared by every voice analyzer (``ProfessionalVoiceEmotionAnalyzer``,
+its fallback, ``voice_routes.analyze_audio_features`` and
+``AIServices._analyze_audio_features``):
+
+- ``decode_audio`` turns an upload into mono float32 samples entirely in
+  memory. RIFF/WAVE is read with the stdlib ``wave`` module and headerless
+  uploads are treated as 16-bit PCM. Compressed containers (Ogg, FLAC,
+  WebM, MP3, MP4) are handed to librosa on a ``BytesIO`` when librosa is
+  installed. No temp files are written.
+- ``yin_pitch`` and ``autocorr_pitch`` are vectorized numpy pitch trackers
+  that return the same ``(f0, voiced)`` pair as ``librosa.pyin``, at a small
+  fraction of its cost. ``select_pitch_mode`` picks the most accurate mode
+  whose estimated cost fits the latency budget.
+- ``load_frames`` / ``analyze_frames`` frame a clip once and compute its
+  magnitude spectrogram and RMS envelope. ``FrameAnalysis`` derives the mel
+  spectrogram, MFCCs, onsets, spectral shape, silence splits, HPSS energies
+  and pitch from them, each at most once per clip.
+- ``VoiceAnalysisPool`` runs feature extraction in a bounded process pool so
+  CPU-heavy DSP never blocks the gevent loop of a request worker. Calls
+  that do not finish inside the budget raise ``TimeoutError``. Callers then
+  serve the cheap fallback analysis.
+
+``scripts/benchmark_voice_analysis.py`` measures the pitch modes on fixed
+5s/30s/120s clips; its real-time factors are what ``PITCH_COST`` is based on.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import wave
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from math import gcd
+from typing import Any
+
+import numpy as np
+
+from ..utils.lazy_imports import is_available, lazy_module
+
+# scipy is imported on first use (in the analysis pool workers), not when the app boots
+SCIPY_AVAILABLE = is_available('scipy')
+scipy_ndimage = lazy_module('scipy.ndimage')
+scipy_signal = lazy_module('scipy.signal')
+
+# Checked without importing: librosa (and numba) are only loaded for pyin
+PYIN_AVAILABLE = importlib.util.find_spec('librosa') is not None
+
+logger = logging.getLogger(__name__)
+
+PITCH_MODES = ('pyin', 'yin', 'autocorr')
+VOICE_PITCH_MODE = os.getenv('VOICE_PITCH_MODE', 'yin')
+VOICE_ANALYSIS_WORKERS = int(os.getenv('VOICE_ANALYSIS_WORKERS', '2'))
+# Latency budget for one analysis; also the pool timeout
+VOICE_ANALYSIS_BUDGET_SECONDS = float(os.getenv('VOICE_ANALYSIS_BUDGET_SECONDS', '10'))
+# Clips this short are analyzed in-process; the pool round trip costs more
+VOICE_ANALYSIS_INLINE_SECONDS = float(os.getenv('VOICE_ANALYSIS_INLINE_SECONDS', '1.0'))
+# 'spawn' keeps the gevent hub and Firebase clients out of the children
+VOICE_ANALYSIS_START_METHOD = os.getenv('VOICE_ANALYSIS_START_METHOD', 'spawn')
+VOICE_ANALYSIS_MAX_TASKS_PER_CHILD = int(os.getenv('VOICE_ANALYSIS_MAX_TASKS_PER_CHILD', '200'))
+
+# Seconds of CPU per second of 16 kHz audio (see scripts/benchmark_voice_analysis.py).
+# BASE covers the rest of the feature extraction (mostly the HPSS median filters).
+PITCH_COST = {'pyin': 0.15, 'yin': 0.005, 'autocorr': 0.003}
+BASE_COST = 0.05
+
+# C2..C7, the range the analyzer has always tracked
+PITCH_FMIN = 65.41
+PITCH_FMAX = 2093.0
+
+_CONTAINER_MAGIC = (
+    (0, b'OggS'),
+    (0, b'fLaC'),
+    (0, b'\x1a\x45\xdf\xa3'),  # EBML (WebM/Matroska)
+    (0, b'ID3'),
+    (4, b'ftyp'),  # MP4/M4A
+)
+
+
+class AudioDecodeError(ValueError):
+    """The upload could not be decoded into samples."""
+
+
+class VoiceAnalysisUnavailable(RuntimeError):
+    """The process pool is saturated or broken; serve the fallback analysis."""
+
+
+# ============================================================================
+# Decoding
+# ============================================================================
+
+def is_wav(audio_bytes: bytes) -> bool:
+    return audio_bytes[:4] == b'RIFF' and audio_bytes[8:12] == b'WAVE'
+
+
+def is_compressed(audio_bytes: bytes) -> bool:
+    """True for containers that need a real decoder (not WAV, not raw PCM)."""
+    if any(audio_bytes[offset:offset + len(magic)] == magic for offset, magic in _CONTAINER_MAGIC):
+        return True
+    # MPEG audio frame sync without an ID3 tag
+    return len(audio_bytes) > 1 and audio_bytes[0] == 0xFF and (audio_bytes[1] & 0xE0) == 0xE0
+
+
+def estimate_duration(audio_bytes: bytes, sample_rate: int = 16000) -> float | None:
+    """Clip length in seconds from the header alone (None for compressed containers)."""
+    if is_wav(audio_bytes):
+        try:
+            with wave.open(io.BytesIO(audio_bytes), 'rb') as wav:
+                return wav.getnframes() / float(wav.getframerate())
+        except (wave.Error, EOFError):
+            return None
+    if is_compressed(audio_bytes):
+        return None
+    return (len(audio_bytes) // 2) / float(sample_rate)
+
+
+def decode_audio(audio_bytes: bytes, sample_rate: int = 16000) -> np.ndarray:
+    """
+    Decode an upload into mono float32 samples in [-1, 1] at ``sample_rate``.
+
+    Raises:
+        AudioDecodeError: empty input, or a format nothing installed can read
+    """
+    if not audio_bytes:
+        raise AudioDecodeError("Empty audio")
+
+    if is_wav(audio_bytes):
+        try:
+            samples, source_rate = _decode_wav(audio_bytes)
+        except (wave.Error, EOFError) as e:
+            # Float or extensible WAV; the stdlib reader only handles integer PCM
+            samples, source_rate = _decode_with_librosa(audio_bytes, sample_rate, e)
+    elif is_compressed(audio_bytes):
+        samples, source_rate = _decode_with_librosa(audio_bytes, sample_rate, None)
+    else:
+        # Headerless uploads are 16-bit little-endian PCM at the analysis rate
+        usable = len(audio_bytes) - len(audio_bytes) % 2
+        samples = np.frombuffer(audio_bytes[:usable], dtype='<i2').astype(np.float32) / 32768.0
+        source_rate = sample_rate
+
+    if samples.size == 0:
+        raise AudioDecodeError("Audio contains no samples")
+    return resample(samples, source_rate, sample_rate)
+
+
+def _decode_wav(audio_bytes: bytes) -> tuple[np.ndarray, int]:
+    with wave.open(io.BytesIO(audio_bytes), 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        source_rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    usable = len(raw) - len(raw) % (width * channels)
+    raw = raw[:usable]
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 3:
+        # Sign-extend 24-bit little-endian triplets into int32
+        triplets = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = triplets[:, 0] | (triplets[:, 1] << 8) | (triplets[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        samples = values.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise AudioDecodeError(f"Unsupported WAV sample width: {width} bytes")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, source_rate
+
+
+def _decode_with_librosa(audio_bytes: bytes, sample_rate: int, cause: Exception | None) -> tuple[np.ndarray, int]:
+    try:
+        import librosa
+    except ImportError as e:
+        raise AudioDecodeError("Compressed audio needs librosa to decode") from (cause or e)
+    try:
+        samples, source_rate = librosa.load(io.BytesIO(audio_bytes), sr=sample_rate, mono=True)
+    except Exception as e:
+        raise AudioDecodeError(f"Could not decode audio: {e}") from e
+    return samples.astype(np.float32, copy=False), int(source_rate)
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Polyphase resampling (linear interpolation when scipy is missing)."""
+    if source_rate == target_rate:
+        return samples.astype(np.float32, copy=False)
+    if SCIPY_AVAILABLE:
+        factor = gcd(source_rate, target_rate)
+        out = scipy_signal.resample_poly(samples, target_rate // factor, source_rate // factor)
+        return out.astype(np.float32, copy=False)
+    target_len = int(round(len(samples) * target_rate / source_rate))
+    positions = np.linspace(0, len(samples) - 1, target_len)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+# ============================================================================
+# Pitch tracking
+# ============================================================================
+
+def frame_signal(y: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """(n_frames, frame_length) view of ``y``; short clips are zero-padded to one frame."""
+    if len(y) < frame_length:
+        y = np.pad(y, (0, frame_length - len(y)))
+    return np.lib.stride_tricks.sliding_window_view(y, frame_length)[::hop_length]
+
+
+def _energy_gate(frames: np.ndarray, top_db: float = 40.0) -> np.ndarray:
+    """Frames loud enough to carry pitch: within ``top_db`` of the loudest frame."""
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    peak = float(rms.max()) if rms.size else 0.0
+    return (rms > 1e-5) & (rms >= peak * 10 ** (-top_db / 20))
+
+
+def _parabolic_shift(left: np.ndarray, center: np.ndarray, right: np.ndarray) -> np.ndarray:
+    denom = left - 2 * center + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / denom, 0.0)
+    return np.clip(shift, -1.0, 1.0)
+
+
+def yin_pitch(
+    y: np.ndarray,
+    sr: int,
+    fmin: float = PITCH_FMIN,
+    fmax: float = PITCH_FMAX,
+    frame_length: int = 2048,
+    hop_length: int = 512,
+    threshold: float = 0.1,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    YIN fundamental frequency (de Cheveigné & Kawahara, 2002), all frames at once.
+
+    The difference function is computed from one FFT cross-correlation per
+    frame plus cumulative energy sums. Returns ``(f0, voiced)`` where ``f0`` is
+    NaN for unvoiced frames, matching ``librosa.pyin``.
+    """
+    return yin_from_frames(frame_signal(y, frame_length, hop_length), sr, fmin, fmax, threshold)
+
+
+def yin_from_frames(
+    frames: np.ndarray,
+    sr: int,
+    fmin: float = PITCH_FMIN,
+    fmax: float = PITCH_FMAX,
+    threshold: float = 0.1,
+) -> tuple[np.ndarray, np.ndarray]:
+    """``yin_pitch`` over already framed samples (``FrameAnalysis.frames``)."""
+    frames = np.asarray(frames, dtype=np.float64)
+    frame_length = frames.shape[1]
+    tau_min = max(1, int(sr // fmax))
+    tau_max = min(int(sr // fmin), frame_length // 2)
+    window = frame_length - tau_max
+    n_fft = 1 << int(np.ceil(np.log2(frame_length + window)))
+
+    # r[tau] = sum_{j < window} x[j] * x[j + tau]
+    spectrum = np.fft.rfft(frames, n_fft, axis=1)
+    head = np.fft.rfft(frames[:, :window], n_fft, axis=1)
+    corr = np.fft.irfft(spectrum * np.conj(head), n_fft, axis=1)[:, :tau_max + 1]
+
+    energy = np.cumsum(np.pad(frames ** 2, ((0, 0), (1, 0))), axis=1)
+    taus = np.arange(tau_max + 1)
+    diff = energy[:, [window]] + energy[:, taus + window] - energy[:, taus] - 2 * corr
+    diff = np.maximum(diff, 0.0)
+
+    # Cumulative mean normalized difference
+    cmnd = np.ones_like(diff)
+    running = np.cumsum(diff[:, 1:], axis=1)
+    cmnd[:, 1:] = diff[:, 1:] * taus[1:] / np.maximum(running, 1e-12)
+
+    # First dip below the threshold, followed down to its local minimum
+    region = cmnd[:, tau_min:tau_max]
+    trough = (region < threshold) & (region <= cmnd[:, tau_min + 1:tau_max + 1])
+    voiced = trough.any(axis=1) & _energy_gate(frames)
+    best = np.argmax(trough, axis=1) + tau_min
+
+    rows = np.arange(len(best))
+    period = best + _parabolic_shift(cmnd[rows, best - 1], cmnd[rows, best], cmnd[rows, best + 1])
+    f0 = np.where(voiced, sr / period, np.nan)
+    return f0, voiced
+
+
+def autocorr_pitch(
+    y: np.ndarray,
+    sr: int,
+    fmin: float = PITCH_FMIN,
+    fmax: float = PITCH_FMAX,
+    frame_length: int = 2048,
+    hop_length: int = 512,
+    threshold: float = 0.5,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Normalized-autocorrelation pitch, the cheapest tracker.
+
+    The strongest autocorrelation peak after the first zero crossing is the
+    period. Frames whose peak is below ``threshold`` (relative to lag 0) are
+    unvoiced. Less robust than YIN on breathy or noisy speech.
+    """
+    return autocorr_from_frames(frame_signal(y, frame_length, hop_length), sr, fmin, fmax, threshold)
+
+
+def autocorr_from_frames(
+    frames: np.ndarray,
+    sr: int,
+    fmin: float = PITCH_FMIN,
+    fmax: float = PITCH_FMAX,
+    threshold: float = 0.5,
+) -> tuple[np.ndarray, np.ndarray]:
+    """``autocorr_pitch`` over already framed samples (``FrameAnalysis.frames``)."""
+    frames = np.asarray(frames, dtype=np.float64)
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    frame_length = frames.shape[1]
+    tau_min = max(1, int(sr // fmax))
+    tau_max = min(int(sr // fmin), frame_length // 2)
+    n_fft = 1 << int(np.ceil(np.log2(2 * frame_length)))
+
+    spectrum = np.fft.rfft(frames, n_fft, axis=1)
+    acf = np.fft.irfft(np.abs(spectrum) ** 2, n_fft, axis=1)[:, :tau_max + 2]
+    acf = acf / np.maximum(acf[:, [0]], 1e-12)
+
+    # Ignore the main lobe around lag 0
+    past_dip = np.cumsum(acf < 0, axis=1) > 0
+    candidates = np.where(past_dip, acf, -np.inf)[:, tau_min:tau_max + 1]
+    best = np.argmax(candidates, axis=1) + tau_min
+
+    rows = np.arange(len(best))
+    peak = acf[rows, best]
+    voiced = (peak >= threshold) & past_dip[rows, best] & _energy_gate(frames)
+    period = best + _parabolic_shift(acf[rows, best - 1], peak, acf[rows, best + 1])
+    f0 = np.where(voiced, sr / period, np.nan)
+    return f0, voiced
+
+
+def select_pitch_mode(
+    duration: float | None,
+    requested: str | None = None,
+    budget: float = VOICE_ANALYSIS_BUDGET_SECONDS,
+    pyin_available: bool = PYIN_AVAILABLE,
+) -> str:
+    """
+    The most accurate pitch mode, starting at ``requested``, whose estimated
+    cost for ``duration`` seconds fits in ``budget``.
+
+    Modes are tried in ``PITCH_MODES`` order; ``autocorr`` is returned when
+    nothing fits. Unknown durations (compressed uploads) keep the requested
+    mode.
+    """
+    mode = requested if requested in PITCH_MODES else VOICE_PITCH_MODE
+    if mode not in PITCH_MODES:
+        mode = 'yin'
+    candidates = PITCH_MODES[PITCH_MODES.index(mode):]
+    if not pyin_available:
+        candidates = tuple(m for m in candidates if m != 'pyin') or ('yin',)
+    if duration is None:
+        return candidates[0]
+    for candidate in candidates:
+        if duration * (PITCH_COST[candidate] + BASE_COST) <= budget:
+            return candidate
+    return candidates[-1]
+
+
+# ============================================================================
+# Frame analysis
+# ============================================================================
+
+@lru_cache(maxsize=8)
+def mel_filterbank(sr: int, n_fft: int, n_mels: int = 128) -> np.ndarray:
+    """Slaney-style mel filterbank, (n_mels, 1 + n_fft // 2); librosa's default."""
+    def hz_to_mel(hz: np.ndarray) -> np.ndarray:
+        mel = hz / (200.0 / 3)
+        log_region = hz >= 1000.0
+        return np.where(log_region, 15.0 + np.log(np.maximum(hz, 1e-10) / 1000.0) / (np.log(6.4) / 27), mel)
+
+    def mel_to_hz(mel: np.ndarray) -> np.ndarray:
+        hz = mel * (200.0 / 3)
+        return np.where(mel >= 15.0, 1000.0 * np.exp((np.log(6.4) / 27) * (mel - 15.0)), hz)
+
+    fft_freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
+    mel_freqs = mel_to_hz(np.linspace(hz_to_mel(np.array(0.0)), hz_to_mel(np.array(sr / 2.0)), n_mels + 2))
+    spacing = np.diff(mel_freqs)
+    ramps = mel_freqs[:, None] - fft_freqs[None, :]
+    lower = -ramps[:-2] / spacing[:-1, None]
+    upper = ramps[2:] / spacing[1:, None]
+    weights = np.maximum(0.0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_freqs[2:] - mel_freqs[:-2]))[:, None]
+    return weights.astype(np.float32)
+
+
+@lru_cache(maxsize=4)
+def _dct_basis(n_coefficients: int, n_inputs: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, (n_coefficients, n_inputs)."""
+    k = np.arange(n_coefficients)[:, None]
+    n = np.arange(n_inputs)[None, :]
+    basis = np.cos(np.pi / n_inputs * (n + 0.5) * k) * np.sqrt(2.0 / n_inputs)
+    basis[0] /= np.sqrt(2.0)
+    return basis
+
+
+def power_to_db(power: np.ndarray, amin: float = 1e-10, top_db: float | None = 80.0) -> np.ndarray:
+    db = 10.0 * np.log10(np.maximum(power, amin))
+    if top_db is not None and db.size:
+        db = np.maximum(db, db.max() - top_db)
+    return db
+
+
+def peak_pick(
+    x: np.ndarray,
+    pre_max: int,
+    post_max: int,
+    pre_avg: int,
+    post_avg: int,
+    delta: float,
+    wait: int,
+) -> np.ndarray:
+    """
+    Indices of peaks in ``x``, with the same rules as ``librosa.util.peak_pick``.
+
+    A peak is the maximum of ``x[n - pre_max:n + post_max]``, exceeds the mean
+    of ``x[n - pre_avg:n + post_avg]`` by ``delta`` and comes more than
+    ``wait`` samples after the previous peak.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if x.size == 0:
+        return np.array([], dtype=int)
+    n = np.arange(len(x))
+    padded_max = np.pad(x, (pre_max, post_max), constant_values=-np.inf)
+    local_max = np.lib.stride_tricks.sliding_window_view(padded_max, pre_max + post_max)[:len(x)].max(axis=1)
+    sums = np.concatenate([[0.0], np.cumsum(x)])
+    lo = np.maximum(n - pre_avg, 0)
+    hi = np.minimum(n + post_avg, len(x))
+    local_avg = (sums[hi] - sums[lo]) / (hi - lo)
+    candidates = np.flatnonzero((x == local_max) & (x >= local_avg + delta))
+
+    peaks: list[int] = []
+    for index in candidates:
+        if not peaks or index - peaks[-1] > wait:
+            peaks.append(int(index))
+    return np.array(peaks, dtype=int)
+
+
+@dataclass
+class FrameAnalysis:
+    """
+    One framing pass over a clip, shared by every voice feature.
+
+    ``analyze_frames`` computes the centered frames, the Hann-windowed
+    magnitude spectrogram and the RMS envelope once. Everything else (mel
+    spectrogram, MFCCs, onsets, spectral shape, silence splits, HPSS
+    energies and pitch) is derived from those on first access and cached on
+    the instance. Frame parameters match librosa's defaults
+    (``center=True``, constant padding), so the values line up with the
+    librosa feature functions they replace.
+    """
+    y: np.ndarray
+    sr: int
+    frame_length: int
+    hop_length: int
+    frames: np.ndarray      # (n_frames, frame_length) time-domain frames
+    magnitude: np.ndarray   # (1 + frame_length // 2, n_frames) |STFT|
+    rms: np.ndarray         # (n_frames,)
+    _pitch: dict[str, tuple[np.ndarray, np.ndarray]] = field(default_factory=dict, repr=False)
+
+    @property
+    def duration(self) -> float:
+        return len(self.y) / float(self.sr)
+
+    @property
+    def n_frames(self) -> int:
+        return self.magnitude.shape[1]
+
+    @cached_property
+    def frequencies(self) -> np.ndarray:
+        return np.fft.rfftfreq(self.frame_length, 1.0 / self.sr)
+
+    @cached_property
+    def mel_db(self) -> np.ndarray:
+        """Log-power mel spectrogram (128 bands), shared by MFCCs and onsets."""
+        mel = mel_filterbank(self.sr, self.frame_length) @ (self.magnitude ** 2)
+        return power_to_db(mel)
+
+    def mfcc(self, n_mfcc: int = 13) -> np.ndarray:
+        return _dct_basis(n_mfcc, self.mel_db.shape[0]) @ self.mel_db
+
+    @cached_property
+    def onset_envelope(self) -> np.ndarray:
+        """Spectral flux of the log-mel spectrogram (``librosa.onset.onset_strength``)."""
+        flux = np.maximum(0.0, np.diff(self.mel_db, axis=1)).mean(axis=0)
+        lag_pad = 1 + self.frame_length // (2 * self.hop_length)
+        return np.concatenate([np.zeros(lag_pad), flux])[:self.n_frames]
+
+    def onset_frames(self) -> np.ndarray:
+        """Onset frame indices with ``librosa.onset.onset_detect``'s default picking."""
+        envelope = self.onset_envelope
+        if envelope.size == 0 or envelope.max() <= envelope.min():
+            return np.array([], dtype=int)
+        envelope = (envelope - envelope.min()) / (envelope.max() - envelope.min())
+        frames_per = self.sr / self.hop_length
+        return peak_pick(
+            envelope,
+            pre_max=int(0.03 * frames_per) or 1,
+            post_max=int(0.0 * frames_per) + 1,
+            pre_avg=int(0.10 * frames_per),
+            post_avg=int(0.10 * frames_per) + 1,
+            delta=0.07,
+            wait=int(0.03 * frames_per),
+        )
+
+    @cached_property
+    def _normalized_magnitude(self) -> np.ndarray:
+        total = self.magnitude.sum(axis=0, keepdims=True)
+        return np.divide(self.magnitude, total, out=np.zeros_like(self.magnitude), where=total > 0)
+
+    @cached_property
+    def spectral_centroid(self) -> np.ndarray:
+        return self.frequencies @ self._normalized_magnitude
+
+    @cached_property
+    def spectral_bandwidth(self) -> np.ndarray:
+        deviation = (self.frequencies[:, None] - self.spectral_centroid[None, :]) ** 2
+        return np.sqrt(np.sum(self._normalized_magnitude * deviation, axis=0))
+
+    def spectral_rolloff(self, roll_percent: float = 0.85) -> np.ndarray:
+        cumulative = np.cumsum(self.magnitude, axis=0)
+        reached = cumulative >= roll_percent * cumulative[-1:, :]
+        return self.frequencies[np.argmax(reached, axis=0)]
+
+    @cached_property
+    def spectral_flatness(self) -> np.ndarray:
+        power = np.maximum(self.magnitude ** 2, 1e-10)
+        return np.exp(np.mean(np.log(power), axis=0)) / np.mean(power, axis=0)
+
+    @cached_property
+    def zero_crossing_rate(self) -> np.ndarray:
+        positive = self.frames > 0
+        return np.mean(positive[:, 1:] != positive[:, :-1], axis=1)
+
+    def nonsilent_intervals(self, top_db: float = 20.0) -> np.ndarray:
+        """(start, end) sample pairs louder than ``top_db`` below the peak (``librosa.effects.split``)."""
+        power = self.rms ** 2
+        db = 10.0 * np.log10(np.maximum(power, 1e-10) / max(float(power.max(initial=0.0)), 1e-10))
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], (db > -top_db).astype(np.int8), [0]])))
+        bounds = np.minimum(edges * self.hop_length, len(self.y))
+        return bounds.reshape(-1, 2)
+
+    def harmonic_percussive_energy(self, kernel_size: int = 31) -> tuple[float, float]:
+        """
+        Energy of the harmonic and percussive parts (median-filter HPSS with
+        soft masks, as ``librosa.decompose.hpss``), measured on the spectrogram
+        instead of resynthesizing both signals.
+        """
+        harmonic = scipy_ndimage.median_filter(self.magnitude, size=(1, kernel_size), mode='reflect')
+        percussive = scipy_ndimage.median_filter(self.magnitude, size=(kernel_size, 1), mode='reflect')
+        h2, p2 = harmonic ** 2, percussive ** 2
+        total = h2 + p2
+        mask = np.divide(h2, total, out=np.full_like(total, 0.5), where=total > 0)
+        power = self.magnitude ** 2
+        return float(np.sum(power * mask ** 2)), float(np.sum(power * (1 - mask) ** 2))
+
+    def pitch(self, mode: str = 'yin') -> tuple[np.ndarray, np.ndarray]:
+        """(f0, voiced) for ``mode``; the fast trackers reuse ``frames``."""
+        if mode not in self._pitch:
+            if mode == 'pyin':
+                import librosa
+
+                f0, voiced, _ = librosa.pyin(
+                    self.y, fmin=PITCH_FMIN, fmax=PITCH_FMAX, sr=self.sr,
+                    frame_length=self.frame_length, hop_length=self.hop_length,
+                )
+                self._pitch[mode] = (f0, voiced)
+            elif mode == 'autocorr':
+                self._pitch[mode] = autocorr_from_frames(self.frames, self.sr)
+            else:
+                self._pitch[mode] = yin_from_frames(self.frames, self.sr)
+        return self._pitch[mode]
+
+
+def analyze_frames(y: np.ndarray, sr: int, frame_length: int = 2048, hop_length: int = 512) -> FrameAnalysis:
+    """Frame ``y`` once and compute the magnitude spectrogram and RMS envelope."""
+    y = np.asarray(y, dtype=np.float32)
+    padded = np.pad(y, frame_length // 2)
+    frames = frame_signal(padded, frame_length, hop_length)
+    window = np.hanning(frame_length + 1)[:-1].astype(np.float32)  # periodic Hann
+    magnitude = np.abs(np.fft.rfft(frames * window, axis=1)).astype(np.float32).T
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return FrameAnalysis(y, sr, frame_length, hop_length, frames, magnitude, rms)
+
+
+def load_frames(
+    audio_bytes: bytes,
+    sample_rate: int = 16000,
+    max_seconds: float | None = None,
+    frame_length: int = 2048,
+    hop_length: int = 512,
+) -> FrameAnalysis:
+    """
+    Decode an upload and run the frame analysis stage; the entry point for
+    every voice analyzer.
+
+    Raises:
+        AudioDecodeError: see ``decode_audio``
+    """
+    y = decode_audio(audio_bytes, sample_rate)
+    if max_seconds is not None:
+        y = y[:int(max_seconds * sample_rate)]
+    return analyze_frames(y, sample_rate, frame_length, hop_length)
+
+
+# ============================================================================
+# Process pool
+# ============================================================================
+
+class VoiceAnalysisPool:
+    """
+    Bounded process pool for CPU-bound analysis.
+
+    At most ``max_pending`` calls are queued or running; further calls fail
+    fast with ``VoiceAnalysisUnavailable`` instead of piling up behind the
+    workers. A call that times out keeps its slot until its worker finishes,
+    so abandoned work still counts against the bound. ``max_workers=0`` runs
+    everything inline (local development, tests).
+    """
+
+    def __init__(
+        self,
+        max_workers: int = VOICE_ANALYSIS_WORKERS,
+        max_pending: int | None = None,
+        start_method: str = VOICE_ANALYSIS_START_METHOD,
+        max_tasks_per_child: int | None = VOICE_ANALYSIS_MAX_TASKS_PER_CHILD,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max(1, max_workers * 2)
+        self.start_method = start_method
+        self.max_tasks_per_child = max_tasks_per_child or None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    max_tasks_per_child=self.max_tasks_per_child,
+                )
+                logger.info(f"🎙️ Voice analysis pool started ({self.max_workers} workers, {self.start_method})")
+            return self._executor
+
+    def _reset(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn: Callable[..., Any], *args: Any, timeout: float = VOICE_ANALYSIS_BUDGET_SECONDS) -> Any:
+        """
+        ``fn(*args)`` in a worker process; ``fn`` must be a picklable module-level callable.
+
+        Raises:
+            TimeoutError: no result within ``timeout`` seconds
+            VoiceAnalysisUnavailable: the pool is full or its workers died
+        """
+        if self.max_workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise VoiceAnalysisUnavailable(f"Voice analysis pool is full ({self.max_pending} pending)")
+
+        try:
+            future: Future = self._get_executor().submit(fn, *args)
+        except Exception as e:
+            self._slots.release()
+            self._reset()
+            raise VoiceAnalysisUnavailable(f"Voice analysis pool unavailable: {e}") from e
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()  # only succeeds if it never started
+            raise TimeoutError(f"Voice analysis exceeded its {timeout:.1f}s budget") from None
+        except BrokenProcessPool as e:
+            self._reset()
+            raise VoiceAnalysisUnavailable(f"Voice analysis worker died: {e}") from e
+
+    def shutdown(self) -> None:
+        self._reset()
+
+
+voice_analysis_pool = VoiceAnalysisPool()
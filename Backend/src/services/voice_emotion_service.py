@@ -11,37 +11,42 @@ Features:
 """
 
 import logging
-import tempfile
 from dataclasses import dataclass
 from enum import Enum
 
 import numpy as np
 
-# Professional audio analysis with graceful fallback
-try:
-    import librosa
-    import librosa.feature
-    LIBROSA_AVAILABLE = True
-except ImportError:
-    LIBROSA_AVAILABLE = False
-    logging.warning("librosa not available - voice emotion analysis will use fallback")
+from ..utils.lazy_imports import is_available, lazy_module
 
-try:
-    import scipy.signal
-    import scipy.stats
-    SCIPY_AVAILABLE = True
-except ImportError:
-    SCIPY_AVAILABLE = False
+# Professional audio analysis with graceful fallback; librosa and scipy are imported on first use
+LIBROSA_AVAILABLE = is_available('librosa')
+if not LIBROSA_AVAILABLE:
+    logging.warning("librosa not available - voice emotion analysis will use fallback")
+SCIPY_AVAILABLE = is_available('scipy')
 
 # Optional OpenAI integration for advanced multimodal analysis
-try:
-    import openai  # noqa: F401
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+OPENAI_AVAILABLE = is_available('openai')
+
+librosa_feature = lazy_module('librosa.feature')
+scipy_stats = lazy_module('scipy.stats')
+
+from .voice_analysis_engine import (
+    VOICE_ANALYSIS_INLINE_SECONDS,
+    AudioDecodeError,
+    FrameAnalysis,
+    VoiceAnalysisUnavailable,
+    estimate_duration,
+    load_frames,
+    peak_pick,
+    select_pitch_mode,
+    voice_analysis_pool,
+)
 
 logger = logging.getLogger(__name__)
 
+# The fallback runs inline in the request worker; only the start of long clips is measured
+FALLBACK_MAX_SECONDS = 30.0
+
 
 class EmotionCategory(Enum):
     """Evidence-based emotion categories from voice research"""
@@ -187,99 +192,78 @@ class ProfessionalVoiceEmotionAnalyzer:
             }
         }
 
-    def analyze_audio(self, audio_bytes: bytes) -> VoiceEmotionResult:
+    def analyze_audio(self, audio_bytes: bytes, pitch_mode: str | None = None) -> VoiceEmotionResult:
         """
         Analyze emotion from audio bytes
 
-        Returns professional emotion analysis with acoustic features
+        Returns professional emotion analysis with acoustic features.
+        Clips longer than ``VOICE_ANALYSIS_INLINE_SECONDS`` are analyzed in the
+        voice analysis process pool; if the pool is full, broken or over its
+        latency budget the naive fallback is returned instead.
         """
-        if LIBROSA_AVAILABLE:
-            try:
-                return self._analyze_with_librosa(audio_bytes)
-            except Exception as e:
-                logger.warning(f"Librosa analysis failed: {e}, using fallback")
+        if not LIBROSA_AVAILABLE:
+            return self._analyze_fallback(audio_bytes)
 
+        duration = estimate_duration(audio_bytes, self.sample_rate)
+        mode = select_pitch_mode(duration, pitch_mode, pyin_available=LIBROSA_AVAILABLE)
+        if duration is not None and duration <= VOICE_ANALYSIS_INLINE_SECONDS:
+            return self._analyze_safely(audio_bytes, mode)
+
+        try:
+            return voice_analysis_pool.run(_analyze_in_worker, audio_bytes, mode)
+        except (TimeoutError, VoiceAnalysisUnavailable) as e:
+            logger.warning(f"Voice analysis pool: {e}, using fallback")
+        except Exception as e:
+            logger.warning(f"Librosa analysis failed: {e}, using fallback")
         return self._analyze_fallback(audio_bytes)
 
-    def _analyze_with_librosa(self, audio_bytes: bytes) -> VoiceEmotionResult:
-        """Professional analysis using librosa"""
-        import os
+    def _analyze_safely(self, audio_bytes: bytes, pitch_mode: str) -> VoiceEmotionResult:
+        try:
+            return self._analyze_with_librosa(audio_bytes, pitch_mode)
+        except Exception as e:
+            logger.warning(f"Librosa analysis failed: {e}, using fallback")
+            return self._analyze_fallback(audio_bytes)
 
-        # Check if audio_bytes is raw PCM or already a WAV file
-        is_wav = audio_bytes[:4] == b'RIFF' and audio_bytes[8:12] == b'WAVE'
+    def _analyze_with_librosa(self, audio_bytes: bytes, pitch_mode: str = 'pyin') -> VoiceEmotionResult:
+        """Professional analysis using librosa (audio is decoded in memory)"""
+        frames = load_frames(audio_bytes, self.sample_rate,
+                             frame_length=self.frame_size, hop_length=self.hop_length)
 
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
-            if is_wav:
-                # Already a WAV file
-                tmp.write(audio_bytes)
-            else:
-                # Raw PCM - need to add WAV header using soundfile
-                try:
-                    import soundfile as sf
-                    # Convert bytes to numpy array (assuming 16-bit PCM)
-                    audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
-                    # Normalize to float [-1, 1]
-                    audio_float = audio_array.astype(np.float32) / 32768.0
-                    # Write as WAV
-                    sf.write(tmp.name, audio_float, self.sample_rate, format='WAV')
-                except Exception as e:
-                    logger.warning(f"soundfile write failed: {e}, trying raw fallback")
-                    # Fallback: just write raw bytes and hope librosa can handle it
-                    tmp.write(audio_bytes)
-
-            tmp_path = tmp.name
+        # Extract prosodic features
+        prosody = self._extract_prosodic_features(frames, pitch_mode)
 
-        try:
-            # Load audio
-            y, sr = librosa.load(tmp_path, sr=self.sample_rate, mono=True)
-            duration = len(y) / sr
-
-            # Extract prosodic features
-            prosody = self._extract_prosodic_features(y, sr)
-
-            # Extract spectral features
-            spectral = self._extract_spectral_features(y, sr)
-
-            # Map to emotions
-            emotion_scores = self._map_acoustics_to_emotions(prosody, spectral)
-
-            # Calculate VAD (Valence-Arousal-Dominance)
-            valence, arousal, dominance = self._calculate_vad(prosody, spectral)
-
-            # Determine primary emotion
-            primary_emotion = max(emotion_scores, key=emotion_scores.get)
-            confidence = emotion_scores[primary_emotion]
-
-            return VoiceEmotionResult(
-                primary_emotion=primary_emotion,
-                emotion_confidences=emotion_scores,
-                valence=valence,
-                arousal=arousal,
-                dominance=dominance,
-                prosody=prosody,
-                spectral=spectral,
-                analysis_method='librosa_professional',
-                confidence=confidence,
-                sample_rate=sr,
-                duration_seconds=duration
-            )
-
-        finally:
-            import os
-            os.unlink(tmp_path)
-
-    def _extract_prosodic_features(self, y: np.ndarray, sr: int) -> ProsodicFeatures:
-        """Extract prosodic (pitch, intensity, timing) features"""
-        # Pitch (F0) using pip algorithm (state-of-the-art)
-        f0, voiced_flag, _ = librosa.pyin(
-            y,
-            fmin=librosa.note_to_hz('C2'),
-            fmax=librosa.note_to_hz('C7'),
-            sr=sr,
-            frame_length=self.frame_size,
-            hop_length=self.hop_length
+        # Extract spectral features
+        spectral = self._extract_spectral_features(frames)
+
+        # Map to emotions
+        emotion_scores = self._map_acoustics_to_emotions(prosody, spectral)
+
+        # Calculate VAD (Valence-Arousal-Dominance)
+        valence, arousal, dominance = self._calculate_vad(prosody, spectral)
+
+        # Determine primary emotion
+        primary_emotion = max(emotion_scores, key=emotion_scores.get)
+        confidence = emotion_scores[primary_emotion]
+
+        return VoiceEmotionResult(
+            primary_emotion=primary_emotion,
+            emotion_confidences=emotion_scores,
+            valence=valence,
+            arousal=arousal,
+            dominance=dominance,
+            prosody=prosody,
+            spectral=spectral,
+            analysis_method='librosa_professional',
+            confidence=confidence,
+            sample_rate=frames.sr,
+            duration_seconds=frames.duration
         )
 
+    def _extract_prosodic_features(self, frames: FrameAnalysis, pitch_mode: str = 'pyin') -> ProsodicFeatures:
+        """Extract prosodic (pitch, intensity, timing) features"""
+        # Pitch (F0) between C2 and C7
+        f0, voiced_flag = frames.pitch(pitch_mode)
+
         # Filter out unvoiced frames
         f0_voiced = f0[voiced_flag]
 
@@ -291,7 +275,7 @@ class ProfessionalVoiceEmotionAnalyzer:
             # Pitch slope (trend)
             if len(f0_voiced) > 1:
                 x = np.arange(len(f0_voiced))
-                slope, _, _, _, _ = scipy.stats.linregress(x, f0_voiced)
+                slope, _, _, _, _ = scipy_stats.linregress(x, f0_voiced)
                 pitch_slope = float(slope)
             else:
                 pitch_slope = 0.0
@@ -302,16 +286,12 @@ class ProfessionalVoiceEmotionAnalyzer:
             pitch_slope = 0.0
 
         # Intensity (RMS energy)
-        rms = librosa.feature.rms(y=y, frame_length=self.frame_size, hop_length=self.hop_length)[0]
-        intensity_mean = float(np.mean(rms))
-        intensity_std = float(np.std(rms))
-        intensity_range = float(np.max(rms) - np.min(rms))
+        rms = frames.rms
+        intensity_mean, intensity_std, intensity_range = self._intensity_stats(frames)
 
         # Speaking rate estimation (syllable detection via onset strength)
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-        # Use keyword arguments for peak_pick (librosa 0.11+ API)
-        peaks = librosa.util.peak_pick(
-            x=onset_env,
+        peaks = peak_pick(
+            frames.onset_envelope,
             pre_max=3,
             post_max=3,
             pre_avg=3,
@@ -320,17 +300,10 @@ class ProfessionalVoiceEmotionAnalyzer:
             wait=10
         )
         syllable_count = len(peaks)
-        duration = len(y) / sr
-        syllables_per_second = syllable_count / duration if duration > 0 else 0.0
+        syllables_per_second = syllable_count / frames.duration if frames.duration > 0 else 0.0
 
         # Pauses (silence detection)
-        intervals = librosa.effects.split(y, top_db=20)
-        total_speech = sum(end - start for start, end in intervals)
-        pause_ratio = 1.0 - (total_speech / len(y))
-        pause_count = len(intervals) - 1 if len(intervals) > 0 else 0
-
-        # Voice quality (using harmonic-percussive separation)
-        y_harmonic, y_percussive = librosa.effects.hpss(y)
+        pause_ratio, pause_count = self._pause_stats(frames)
 
         # Estimate jitter (pitch perturbation)
         if len(f0_voiced) > 1:
@@ -347,9 +320,8 @@ class ProfessionalVoiceEmotionAnalyzer:
         else:
             shimmer = 0.0
 
-        # HNR (Harmonics-to-Noise Ratio) estimate
-        harmonic_energy = np.sum(y_harmonic ** 2)
-        noise_energy = np.sum(y_percussive ** 2)
+        # HNR (Harmonics-to-Noise Ratio) estimate from harmonic-percussive separation
+        harmonic_energy, noise_energy = frames.harmonic_percussive_energy()
         hnr = 10 * np.log10(harmonic_energy / (noise_energy + 1e-10)) if noise_energy > 0 else 20.0
 
         return ProsodicFeatures(
@@ -368,42 +340,41 @@ class ProfessionalVoiceEmotionAnalyzer:
             hnr=float(hnr)
         )
 
-    def _extract_spectral_features(self, y: np.ndarray, sr: int) -> SpectralFeatures:
+    @staticmethod
+    def _intensity_stats(frames: FrameAnalysis) -> tuple[float, float, float]:
+        """Mean, std and range of the RMS envelope"""
+        rms = frames.rms
+        return float(np.mean(rms)), float(np.std(rms)), float(np.max(rms) - np.min(rms))
+
+    @staticmethod
+    def _pause_stats(frames: FrameAnalysis) -> tuple[float, int]:
+        """Share of the clip that is silent, and the number of pauses between speech"""
+        intervals = frames.nonsilent_intervals(top_db=20)
+        total_speech = int(np.sum(intervals[:, 1] - intervals[:, 0]))
+        pause_ratio = 1.0 - (total_speech / len(frames.y)) if len(frames.y) else 0.0
+        pause_count = len(intervals) - 1 if len(intervals) > 0 else 0
+        return float(pause_ratio), pause_count
+
+    def _extract_spectral_features(self, frames: FrameAnalysis, with_contrast: bool = True) -> SpectralFeatures:
         """Extract spectral (timbre) features"""
         # MFCCs (Mel-frequency cepstral coefficients)
-        mfccs = librosa.feature.mfcc(
-            y=y,
-            sr=sr,
-            n_mfcc=13,
-            hop_length=self.hop_length
-        )
+        mfccs = frames.mfcc(13)
         mfcc_means = np.mean(mfccs, axis=1)
         mfcc_vars = np.var(mfccs, axis=1)
 
-        # Spectral centroid (brightness)
-        spectral_centroid = librosa.feature.spectral_centroid(
-            y=y, sr=sr, hop_length=self.hop_length
-        )[0]
-
-        # Spectral rolloff
-        spectral_rolloff = librosa.feature.spectral_rolloff(
-            y=y, sr=sr, hop_length=self.hop_length
-        )[0]
-
-        # Spectral bandwidth
-        spectral_bandwidth = librosa.feature.spectral_bandwidth(
-            y=y, sr=sr, hop_length=self.hop_length
-        )[0]
-
-        # Spectral contrast
-        spectral_contrast = librosa.feature.spectral_contrast(
-            y=y, sr=sr, hop_length=self.hop_length
-        )
-
-        # Spectral flatness
-        spectral_flatness = librosa.feature.spectral_flatness(
-            y=y, hop_length=self.hop_length
-        )[0]
+        # Spectral centroid (brightness), rolloff, bandwidth and flatness
+        spectral_centroid = frames.spectral_centroid
+        spectral_rolloff = frames.spectral_rolloff()
+        spectral_bandwidth = frames.spectral_bandwidth
+        spectral_flatness = frames.spectral_flatness
+
+        # Spectral contrast (librosa, on the shared magnitude spectrogram)
+        if with_contrast and LIBROSA_AVAILABLE:
+            spectral_contrast = np.mean(librosa_feature.spectral_contrast(
+                S=frames.magnitude, sr=frames.sr, hop_length=frames.hop_length
+            ), axis=1)
+        else:
+            spectral_contrast = np.zeros(7)
 
         # Estimate formants using LPC (simplified)
         # In production, use dedicated formant tracking
@@ -417,7 +388,7 @@ class ProfessionalVoiceEmotionAnalyzer:
             spectral_centroid=float(np.mean(spectral_centroid)),
             spectral_rolloff=float(np.mean(spectral_rolloff)),
             spectral_bandwidth=float(np.mean(spectral_bandwidth)),
-            spectral_contrast=np.mean(spectral_contrast, axis=1),
+            spectral_contrast=spectral_contrast,
             spectral_flatness=float(np.mean(spectral_flatness)),
             formant_1_mean=formant_1_mean,
             formant_2_mean=formant_2_mean,
@@ -503,20 +474,20 @@ class ProfessionalVoiceEmotionAnalyzer:
     def _analyze_fallback(self, audio_bytes: bytes) -> VoiceEmotionResult:
         """
         Fallback analysis when librosa is not available
-        Uses naive byte-level statistics (limited accuracy)
+        Measures intensity, pauses and spectral shape from the shared frame
+        analysis; pitch, rate and voice quality are typical values (limited accuracy)
         """
         logger.warning("Using fallback audio analysis - install librosa for professional results")
 
-        # Basic byte-level analysis (limited)
-        amplitudes = np.array([int.from_bytes(audio_bytes[i:i+2], 'little', signed=True)
-                               for i in range(0, min(len(audio_bytes), 100000), 2)])
-
-        if len(amplitudes) == 0:
+        try:
+            frames = load_frames(audio_bytes, self.sample_rate, FALLBACK_MAX_SECONDS,
+                                 self.frame_size, self.hop_length)
+        except AudioDecodeError as e:
+            logger.warning(f"Fallback analysis could not decode audio: {e}")
             return self._create_neutral_result()
 
-        # Basic statistics
-        rms = np.sqrt(np.mean(amplitudes ** 2))
-        peak = np.max(np.abs(amplitudes))
+        intensity_mean, intensity_std, intensity_range = self._intensity_stats(frames)
+        pause_ratio, pause_count = self._pause_stats(frames)
 
         # Create minimal prosody features
         prosody = ProsodicFeatures(
@@ -524,29 +495,18 @@ class ProfessionalVoiceEmotionAnalyzer:
             pitch_std=20.0,
             pitch_range=50.0,
             pitch_slope=0.0,
-            intensity_mean=float(rms / 32768),  # Normalize to 0-1
-            intensity_std=0.1,
-            intensity_range=float(peak / 32768),
+            intensity_mean=intensity_mean,
+            intensity_std=intensity_std,
+            intensity_range=intensity_range,
             syllables_per_second=4.5,
-            pause_ratio=0.2,
-            pause_count=3,
+            pause_ratio=pause_ratio,
+            pause_count=pause_count,
             jitter=1.0,
             shimmer=0.5,
             hnr=15.0
         )
 
-        spectral = SpectralFeatures(
-            mfcc_means=np.zeros(13),
-            mfcc_vars=np.zeros(13),
-            spectral_centroid=2000.0,
-            spectral_rolloff=4000.0,
-            spectral_bandwidth=1500.0,
-            spectral_contrast=np.zeros(7),
-            spectral_flatness=0.3,
-            formant_1_mean=500.0,
-            formant_2_mean=1500.0,
-            formant_dispersion=200.0
-        )
+        spectral = self._extract_spectral_features(frames, with_contrast=False)
 
         # Low confidence fallback
         return VoiceEmotionResult(
@@ -559,8 +519,8 @@ class ProfessionalVoiceEmotionAnalyzer:
             spectral=spectral,
             analysis_method='fallback_naive',
             confidence=0.3,
-            sample_rate=16000,
-            duration_seconds=len(audio_bytes) / 32000  # Rough estimate
+            sample_rate=frames.sr,
+            duration_seconds=estimate_duration(audio_bytes, self.sample_rate) or frames.duration
         )
 
     def _create_neutral_result(self) -> VoiceEmotionResult:
@@ -590,7 +550,8 @@ class ProfessionalVoiceEmotionAnalyzer:
         try:
             # This would use OpenAI's audio models (if available)
             # For now, fallback to librosa analysis
-            return self._analyze_with_librosa(audio_bytes)
+            return self._analyze_with_librosa(audio_bytes, select_pitch_mode(
+                estimate_duration(audio_bytes, self.sample_rate)))
         except Exception as e:
             logger.error(f"OpenAI analysis failed: {e}")
             return None
@@ -600,6 +561,11 @@ class ProfessionalVoiceEmotionAnalyzer:
 _voice_emotion_analyzer: ProfessionalVoiceEmotionAnalyzer | None = None
 
 
+def _analyze_in_worker(audio_bytes: bytes, pitch_mode: str) -> VoiceEmotionResult:
+    """Entry point in the voice analysis pool (module-level so it pickles)"""
+    return get_voice_emotion_analyzer()._analyze_with_librosa(audio_bytes, pitch_mode)
+
+
 def get_voice_emotion_analyzer() -> ProfessionalVoiceEmotionAnalyzer:
     """Get singleton instance of voice emotion analyzer"""
     global _voice_emotion_analyzer
@@ -0,0 +1,413 @@
+"""
+Shared two-tier cache for Lugn & Trygg.
+
+L1 is a bounded in-process LRU with per-entry TTL (O(1) get/set/evict).
+L2 is optional Redis on the shared ``redis_config`` pool, so workers can
+share warm entries.
+
+Invalidation is tag based. Every entry may carry tags (typically
+``user:{uid}``). Invalidating a tag drops the matching L1 entries through
+a reverse index, and bumps a per-tag generation counter in Redis. L2
+entries remember the generations they were written under and are
+ignored once a generation moves on. No key scans are needed in either tier.
+
+Other workers only learn about an invalidation through L2, so with Redis
+enabled a tagged entry stays in L1 for at most ``CACHE_TAGGED_L1_TTL_SECONDS``
+before it is re-read (and generation-checked) from L2. Untagged entries are
+never invalidated and keep their full TTL in L1.
+
+``get_or_set`` is single-flight: concurrent misses for the same key wait
+for one loader call instead of stampeding the backing store.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Seconds to wait before retrying Redis after a connection failure
+REDIS_RETRY_INTERVAL = 60.0
+# Tag generation counters must outlive every entry written under them
+TAG_GENERATION_TTL = 7 * 24 * 3600
+# Max seconds a single-flight follower waits for the leader's loader
+SINGLE_FLIGHT_TIMEOUT = 30.0
+# L1 lifetime of tagged entries when Redis is enabled: bounds how long another
+# worker's invalidate_tag() can go unnoticed here
+TAGGED_L1_TTL = float(os.getenv('CACHE_TAGGED_L1_TTL_SECONDS', '5'))
+
+
+@dataclass
+class _Entry:
+    value: Any
+    stored_at: float
+    expires_at: float
+    tags: tuple[str, ...] = ()
+
+
+@dataclass
+class _Flight:
+    event: threading.Event = field(default_factory=threading.Event)
+    value: Any = _MISSING
+
+
+class _RedisBackend:
+    """Lazy accessor for the shared Redis client with failure back-off."""
+
+    def __init__(self) -> None:
+        self._client: Any = None
+        self._retry_at = 0.0
+
+    def client(self) -> Any:
+        if self._client is not None:
+            return self._client
+        now = time.time()
+        if now < self._retry_at:
+            return None
+        try:
+            from ..redis_config import get_redis_client
+            self._client = get_redis_client()
+        except Exception as e:
+            logger.debug(f"Redis unavailable for cache L2: {e}")
+            self._client = None
+        if self._client is None:
+            self._retry_at = now + REDIS_RETRY_INTERVAL
+        return self._client
+
+    def mark_failed(self) -> None:
+        self._client = None
+        self._retry_at = time.time() + REDIS_RETRY_INTERVAL
+
+
+_redis_backend = _RedisBackend()
+
+
+class TwoTierCache:
+    """Bounded LRU/TTL cache with optional Redis L2 and tag invalidation."""
+
+    def __init__(
+        self,
+        namespace: str,
+        default_ttl: float = 300,
+        max_size: int = 1000,
+        use_redis: bool = True,
+    ) -> None:
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.use_redis = use_redis
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._tag_index: dict[str, set[str]] = {}
+        self._flights: dict[str, _Flight] = {}
+        self._lock = threading.RLock()
+        self._stats = {
+            'l1_hits': 0,
+            'l2_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'loads': 0,
+            'coalesced': 0,
+            'l2_errors': 0,
+        }
+        _register(self)
+
+    # ──────────────────────────────────────────────────────────────
+    # Public API
+    # ──────────────────────────────────────────────────────────────
+
+    def get(self, key: str, default: Any = None, tags: Iterable[str] = ()) -> Any:
+        """Return the cached value for ``key`` (L1, then L2), or ``default``."""
+        value = self._get_l1(key)
+        if value is not _MISSING:
+            return value
+
+        value, ttl_left = self._get_l2(key, tuple(tags))
+        if value is not _MISSING:
+            self._set_l1(key, value, ttl_left, tuple(tags))
+            return value
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return default
+
+    def set(self, key: str, value: Any, ttl: float | None = None, tags: Iterable[str] = ()) -> None:
+        """Store ``value`` in both tiers under ``key``."""
+        ttl = self.default_ttl if ttl is None else ttl
+        tags = tuple(tags)
+        self._set_l1(key, value, ttl, tags)
+        self._set_l2(key, value, ttl, tags)
+        with self._lock:
+            self._stats['sets'] += 1
+
+    def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        ttl: float | None = None,
+        tags: Iterable[str] = (),
+    ) -> Any:
+        """
+        Return the cached value, or call ``loader`` once and cache its result.
+
+        Concurrent callers missing on the same key share one loader call. If
+        the loader raises, the exception propagates to the caller that ran it
+        and waiting callers run the loader themselves.
+        """
+        tags = tuple(tags)
+        value = self.get(key, _MISSING, tags)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.event.wait(SINGLE_FLIGHT_TIMEOUT)
+            if flight.value is not _MISSING:
+                return flight.value
+            return loader()
+
+        try:
+            with self._lock:
+                self._stats['loads'] += 1
+            value = loader()
+            self.set(key, value, ttl, tags)
+            flight.value = value
+            return value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def delete(self, key: str) -> None:
+        """Remove a single key from both tiers."""
+        with self._lock:
+            self._drop_l1(key)
+        client = self._redis()
+        if client is not None:
+            try:
+                client.delete(self._redis_key(key))
+            except Exception:
+                self._l2_failed()
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry carrying ``tag``. Returns the number of L1 entries removed."""
+        with self._lock:
+            keys = self._tag_index.pop(tag, set())
+            for key in keys:
+                self._drop_l1(key)
+            self._stats['invalidations'] += 1
+
+        client = self._redis()
+        if client is not None:
+            try:
+                gen_key = self._tag_key(tag)
+                pipe = client.pipeline()
+                pipe.incr(gen_key)
+                pipe.expire(gen_key, TAG_GENERATION_TTL)
+                pipe.execute()
+            except Exception:
+                self._l2_failed()
+        return len(keys)
+
+    def clear(self) -> None:
+        """Clear L1 (L2 entries expire on their own TTL)."""
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self._get_l1(key, count=False) is not _MISSING
+
+    def items(self) -> list[tuple[str, Any, float]]:
+        """Snapshot of live L1 entries as ``(key, value, stored_at)``."""
+        now = time.time()
+        with self._lock:
+            return [(k, e.value, e.stored_at) for k, e in self._entries.items() if e.expires_at > now]
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss/eviction counters plus current size."""
+        with self._lock:
+            lookups = self._stats['l1_hits'] + self._stats['l2_hits'] + self._stats['misses']
+            hits = self._stats['l1_hits'] + self._stats['l2_hits']
+            return {
+                'namespace': self.namespace,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                **self._stats,
+            }
+
+    # ──────────────────────────────────────────────────────────────
+    # L1
+    # ──────────────────────────────────────────────────────────────
+
+    def _get_l1(self, key: str, count: bool = True) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry.expires_at <= time.time():
+                self._drop_l1(key)
+                if count:
+                    self._stats['expirations'] += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            if count:
+                self._stats['l1_hits'] += 1
+            return entry.value
+
+    def _set_l1(self, key: str, value: Any, ttl: float, tags: tuple[str, ...]) -> None:
+        now = time.time()
+        if tags and self.use_redis:
+            ttl = min(ttl, TAGGED_L1_TTL)
+        with self._lock:
+            self._drop_l1(key)
+            self._entries[key] = _Entry(value, now, now + ttl, tags)
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._drop_l1(oldest_key)
+                self._stats['evictions'] += 1
+
+    def _drop_l1(self, key: str) -> None:
+        # Caller holds self._lock
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    # ──────────────────────────────────────────────────────────────
+    # L2 (Redis)
+    # ──────────────────────────────────────────────────────────────
+
+    def _redis(self) -> Any:
+        if not self.use_redis:
+            return None
+        return _redis_backend.client()
+
+    def _l2_failed(self) -> None:
+        with self._lock:
+            self._stats['l2_errors'] += 1
+        logger.warning(f"[cache:{self.namespace}] Redis L2 operation failed — serving from L1 only", exc_info=True)
+        _redis_backend.mark_failed()
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"cache:{self.namespace}:tag:{tag}"
+
+    def _get_l2(self, key: str, tags: tuple[str, ...]) -> tuple[Any, float]:
+        client = self._redis()
+        if client is None:
+            return _MISSING, 0
+
+        try:
+            # One round trip when the caller knows the tags; otherwise read the
+            # entry first and then the generations it recorded.
+            if tags:
+                raw, *generations = client.mget([self._redis_key(key), *(self._tag_key(t) for t in tags)])
+                current = dict(zip(tags, generations, strict=True))
+            else:
+                raw = client.get(self._redis_key(key))
+                current = None
+            if not raw:
+                return _MISSING, 0
+
+            payload = json.loads(raw)
+            stored_tags: dict[str, int] = payload.get('g', {})
+            if stored_tags:
+                if current is None or set(current) != set(stored_tags):
+                    names = list(stored_tags)
+                    current = dict(zip(names, client.mget([self._tag_key(t) for t in names]), strict=True))
+                for tag, gen in stored_tags.items():
+                    if int(current.get(tag) or 0) != gen:
+                        return _MISSING, 0
+
+            ttl_left = float(payload.get('e', 0)) - time.time()
+            if ttl_left <= 0:
+                return _MISSING, 0
+
+            with self._lock:
+                self._stats['l2_hits'] += 1
+            return payload.get('v'), ttl_left
+        except Exception:
+            self._l2_failed()
+            return _MISSING, 0
+
+    def _set_l2(self, key: str, value: Any, ttl: float, tags: tuple[str, ...]) -> None:
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            generations = client.mget([self._tag_key(t) for t in tags]) if tags else []
+            payload = {
+                'v': value,
+                'e': time.time() + ttl,
+                'g': {t: int(g or 0) for t, g in zip(tags, generations, strict=True)},
+            }
+            client.setex(self._redis_key(key), max(1, int(ttl)), json.dumps(payload, default=str))
+        except Exception:
+            self._l2_failed()
+
+
+# ──────────────────────────────────────────────────────────────
+# Registry
+# ──────────────────────────────────────────────────────────────
+
+_caches: dict[str, TwoTierCache] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(cache: TwoTierCache) -> None:
+    with _registry_lock:
+        _caches[cache.namespace] = cache
+
+
+def get_cache(namespace: str, **kwargs: Any) -> TwoTierCache:
+    """Return the cache registered under ``namespace``, creating it on first use."""
+    with _registry_lock:
+        cache = _caches.get(namespace)
+    if cache is None:
+        cache = TwoTierCache(namespace, **kwargs)
+    return cache
+
+
+def user_tag(user_id: str) -> str:
+    """Standard per-user invalidation tag."""
+    return f"user:{user_id}"
+
+
+def get_all_cache_stats() -> dict[str, dict[str, Any]]:
+    """Counters for every registered cache, keyed by namespace."""
+    with _registry_lock:
+        caches = list(_caches.values())
+    return {cache.namespace: cache.stats() for cache in caches}
@@ -0,0 +1,126 @@
+"""
+Concurrent fan-out with per-task deadlines.
+
+``fan_out`` runs independent blocking calls (typically Firestore reads) on a
+bounded pool and returns as soon as every task has finished or
+passed its own deadline. Late tasks are abandoned: their results are
+discarded and the caller gets a ``timeout`` status instead of waiting.
+
+Request paths share one bounded pool. Batch jobs that submit many tasks at
+once pass a pool of their own (``get_executor(name)``), so their backlog
+never queues ahead of a request's reads and eats its deadlines.
+
+Each pool is a plain ``ThreadPoolExecutor``. Under the gevent workers used
+in production, ``threading`` is monkey-patched, so tasks run as greenlets
+and waiting yields to the hub. Under the threaded dev server they run as
+OS threads. The same code works in both.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+FANOUT_MAX_WORKERS = int(os.getenv('FANOUT_MAX_WORKERS', '16'))
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_executor_lock = threading.Lock()
+
+
+@dataclass
+class TaskResult:
+    """Outcome of one fan-out task."""
+    status: str  # 'ok', 'timeout' or 'error'
+    value: Any = None
+    elapsed_ms: float = 0.0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'ok'
+
+    def as_metadata(self) -> dict[str, Any]:
+        meta: dict[str, Any] = {'status': self.status, 'elapsed_ms': round(self.elapsed_ms, 1)}
+        if self.error:
+            meta['error'] = self.error
+        return meta
+
+
+def get_executor(name: str = 'fanout', max_workers: int = FANOUT_MAX_WORKERS) -> ThreadPoolExecutor:
+    """The pool called ``name``, created with ``max_workers`` threads on first use; ``fanout`` is the shared one."""
+    with _executor_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        return _executors[name]
+
+
+def _timed(task: Callable[[], Any]) -> tuple[Any, float]:
+    started = time.perf_counter()
+    value = task()
+    return value, (time.perf_counter() - started) * 1000
+
+
+def fan_out(
+    tasks: Mapping[str, Callable[[], Any]],
+    timeout: float,
+    timeouts: Mapping[str, float] | None = None,
+    executor: ThreadPoolExecutor | None = None,
+) -> dict[str, TaskResult]:
+    """
+    Run ``tasks`` concurrently and collect their results by name.
+
+    Each task gets ``timeouts[name]`` seconds (default ``timeout``), measured
+    from submission. Exceptions are captured as ``error`` results, never
+    raised. A task that is still running at its deadline is reported as
+    ``timeout`` and left to finish in the background. Tasks run on
+    ``executor``, by default the shared pool.
+    """
+    if not tasks:
+        return {}
+
+    executor = executor or get_executor()
+    started = time.perf_counter()
+    timeouts = timeouts or {}
+    deadlines: dict[Future, float] = {}
+    names: dict[Future, str] = {}
+    for name, task in tasks.items():
+        future = executor.submit(_timed, task)
+        names[future] = name
+        deadlines[future] = started + timeouts.get(name, timeout)
+
+    results: dict[str, TaskResult] = {}
+    pending = set(names)
+    while pending:
+        now = time.perf_counter()
+        for future in [f for f in pending if deadlines[f] <= now and not f.done()]:
+            pending.discard(future)
+            future.cancel()  # only succeeds if it never started
+            results[names[future]] = TaskResult('timeout', elapsed_ms=(now - started) * 1000)
+        if not pending:
+            break
+
+        done, pending = wait(
+            pending,
+            timeout=max(0.0, min(deadlines[f] for f in pending) - time.perf_counter()),
+            return_when=FIRST_COMPLETED,
+        )
+        for future in done:
+            try:
+                value, elapsed_ms = future.result()
+                results[names[future]] = TaskResult('ok', value, elapsed_ms)
+            except Exception as e:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                results[names[future]] = TaskResult('error', elapsed_ms=elapsed_ms, error=str(e))
+
+    for name, result in results.items():
+        if result.status == 'timeout':
+            logger.warning(f"⏱️ Fan-out task '{name}' exceeded its {timeouts.get(name, timeout):.2f}s budget")
+    return results
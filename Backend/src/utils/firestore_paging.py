@@ -0,0 +1,29 @@
+"""
+Cursor paging over Firestore queries.
+
+Large collections are read in ``start_after`` pages ordered by document ID so
+that no single query streams an unbounded result set.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import Any
+
+DEFAULT_PAGE_SIZE = 500
+
+
+def iter_pages(query: Any, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Any]:
+    """Yield every snapshot of ``query`` using ``start_after`` cursor pages of ``page_size``."""
+    base = query.order_by('__name__')
+    page_query = base.limit(page_size)
+    while True:
+        count = 0
+        last = None
+        for snap in page_query.stream():
+            yield snap
+            last = snap
+            count += 1
+        if count < page_size or last is None:
+            return
+        page_query = base.start_after(last).limit(page_size)
@@ -12,8 +12,12 @@ from urllib.parse import quote, unquote
 import bleach
 from flask import g, request
 
+from .text_scanner import TextScanner
+
 logger = logging.getLogger(__name__)
 
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+
 class InputSanitizer:
     """Comprehensive input sanitization and validation"""
 
@@ -51,6 +55,12 @@ class InputSanitizer:
             r'%2e%2e%5c',
         ]
 
+        # Each pattern set compiled once; XSS patterns are removed one by one, SQL and
+        # path patterns only need a yes/no search over their combined alternation
+        self._xss_scanner = TextScanner(patterns={'xss': self.xss_patterns}, flags=re.IGNORECASE | re.DOTALL)
+        self._sql_injection_regex = TextScanner(patterns={'sql': self.sql_injection_patterns}).pattern_regex
+        self._path_traversal_regex = TextScanner(patterns={'path': self.path_traversal_patterns}).pattern_regex
+
         # Bleach configuration for HTML sanitization
         self.bleach_config = {
             'tags': ['p', 'br', 'strong', 'em', 'u', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
@@ -180,11 +190,10 @@ class InputSanitizer:
         text = text.replace('\x00', '')
 
         # Remove XSS patterns (script tags, event handlers, etc.)
-        for pattern in self.xss_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
+        text = self._xss_scanner.remove_matches(text)
 
         # Remove control characters except newlines and tabs
-        text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', text)
+        text = _CONTROL_CHARS.sub('', text)
 
         return text.strip()
 
@@ -204,8 +213,7 @@ class InputSanitizer:
             )
 
             # Additional XSS pattern removal
-            for pattern in self.xss_patterns:
-                sanitized = re.sub(pattern, '', sanitized, flags=re.IGNORECASE | re.DOTALL)
+            sanitized = self._xss_scanner.remove_matches(sanitized)
 
             return sanitized
 
@@ -241,10 +249,9 @@ class InputSanitizer:
         decoded = unquote(url)
 
         # Check for path traversal
-        for pattern in self.path_traversal_patterns:
-            if re.search(pattern, decoded, re.IGNORECASE):
-                logger.warning(f"Path traversal attempt detected: {url}")
-                return ""  # Reject suspicious URLs
+        if self._path_traversal_regex.search(decoded):
+            logger.warning(f"Path traversal attempt detected: {url}")
+            return ""  # Reject suspicious URLs
 
         # URL encode dangerous characters
         url = quote(url, safe=':/?#[]@!$&\'()*+,;=-._~')
@@ -308,10 +315,9 @@ class InputSanitizer:
             return ""
 
         # Check for SQL injection patterns
-        for pattern in self.sql_injection_patterns:
-            if re.search(pattern, identifier, re.IGNORECASE):
-                logger.warning(f"SQL injection pattern detected in identifier: {identifier}")
-                return ""
+        if self._sql_injection_regex.search(identifier):
+            logger.warning(f"SQL injection pattern detected in identifier: {identifier}")
+            return ""
 
         return identifier
 
@@ -0,0 +1,133 @@
+"""
+Lazy loading of heavy optional dependencies.
+
+Importing pandas, scikit-learn, TensorFlow, PyTorch, transformers,
+sentence-transformers, librosa or the Stripe/OpenAI SDKs costs from a few
+hundred milliseconds to tens of seconds each. Route modules used to pull
+them in at import time, so every gunicorn worker (and every restart after
+``max_requests``) paid for all of them before serving its first request.
+
+Modules listed in ``HEAVY_MODULES`` are imported on first use instead:
+
+- ``is_available(name)`` answers "is it installed?" with
+  ``importlib.util.find_spec`` and never imports the package. Use it for the
+  ``*_AVAILABLE`` flags that used to be set by a module-level ``try: import``.
+- ``load(name)`` imports the module when a code path actually needs it,
+  records how long that took and logs it once.
+- ``lazy_module(name)`` returns a stand-in whose first attribute access calls
+  ``load``, so ``pd = lazy_module('pandas')`` keeps ``pd.DataFrame(...)`` call
+  sites unchanged.
+
+``scripts/check_import_time.py`` fails when app startup imports any of
+these modules or exceeds the startup budget.
+"""
+
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import logging
+import sys
+import threading
+import time
+from collections.abc import Callable
+from types import ModuleType
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Top-level packages that must never be imported while the app boots
+HEAVY_MODULES = frozenset({
+    'cv2',
+    'joblib',
+    'librosa',
+    'openai',
+    'pandas',
+    'scipy',
+    'sentence_transformers',
+    'shap',
+    'sklearn',
+    'soundfile',
+    'stripe',
+    'tensorflow',
+    'torch',
+    'transformers',
+})
+
+_lock = threading.Lock()
+_available: dict[str, bool] = {}
+_load_times: dict[str, float] = {}
+
+
+def is_available(name: str) -> bool:
+    """True if ``name`` is installed. Checks the top-level package without importing it."""
+    top_level = name.partition('.')[0]
+    if top_level not in _available:
+        try:
+            _available[top_level] = importlib.util.find_spec(top_level) is not None
+        except (ImportError, ValueError):
+            _available[top_level] = False
+    return _available[top_level]
+
+
+def load(name: str) -> ModuleType:
+    """Import ``name`` on first use. Raises ImportError like a plain import."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        if name not in _load_times:
+            _load_times[name] = time.perf_counter() - started
+            logger.info(f"📦 Loaded {name} on first use in {_load_times[name] * 1000:.0f}ms")
+    return module
+
+
+def load_times() -> dict[str, float]:
+    """Seconds spent importing each module loaded through ``load`` in this process."""
+    return dict(_load_times)
+
+
+def loaded_heavy_modules() -> list[str]:
+    """Heavy modules already imported in this process, by whatever route."""
+    return sorted(name for name in HEAVY_MODULES if name in sys.modules)
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name: str, on_load: Callable[[ModuleType], None] | None = None) -> None:
+        self.__dict__.update(_name=name, _on_load=on_load, _module=None, _resolve_lock=threading.Lock())
+
+    def _resolve(self) -> ModuleType:
+        module = self.__dict__['_module']
+        if module is None:
+            with self._resolve_lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = load(self._name)
+                    if self._on_load is not None:
+                        self._on_load(module)
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._resolve(), attr, value)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name: str, on_load: Callable[[ModuleType], None] | None = None) -> LazyModule:
+    """
+    A stand-in for ``import name`` that defers the import until first use.
+
+    ``on_load(module)`` runs once right after the import, e.g. to set an API
+    key that used to be configured at module import time.
+    """
+    return LazyModule(name, on_load)
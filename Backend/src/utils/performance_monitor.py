@@ -7,6 +7,8 @@ import time
 from datetime import UTC, datetime
 from typing import Any
 
+from .cache import TwoTierCache
+
 logger = logging.getLogger(__name__)
 
 class PerformanceMonitor:
@@ -116,49 +118,42 @@ def monitor_function(func):
     return wrapper
 
 class CacheService:
-    """Simple in-memory cache for performance optimization"""
+    """Simple in-memory cache for performance optimization (backed by the shared TwoTierCache)"""
 
-    def __init__(self):
-        self.cache: dict[str, dict[str, Any]] = {}
+    def __init__(self, ttl: int = 300, max_size: int = 1000):
+        # L1 only: values here are arbitrary Python objects, not JSON
+        self._store = TwoTierCache('performance', default_ttl=ttl, max_size=max_size, use_redis=False)
+
+    @property
+    def cache(self) -> dict[str, dict[str, Any]]:
+        """Snapshot of live entries as {key: {"value", "timestamp"}}"""
+        return {key: {"value": value, "timestamp": stored_at} for key, value, stored_at in self._store.items()}
 
     def get(self, key: str) -> Any:
         """Get cached value"""
-        if key in self.cache:
-            cache_entry = self.cache[key]
-            # Check if expired (simple 5-minute TTL)
-            age = time.time() - cache_entry["timestamp"]
-            if age < 300:  # 5 minutes
-                logger.debug(f"Cache hit: {key}")
-                return cache_entry["value"]
-            else:
-                logger.debug(f"Cache expired: {key}")
-                del self.cache[key]
-
-        logger.debug(f"Cache miss: {key}")
-        return None
+        value = self._store.get(key)
+        logger.debug(f"Cache {'hit' if value is not None else 'miss'}: {key}")
+        return value
 
     def set(self, key: str, value: Any):
         """Set cached value"""
-        self.cache[key] = {
-            "value": value,
-            "timestamp": time.time()
-        }
+        self._store.set(key, value)
         logger.debug(f"Cache set: {key}")
 
     def clear(self):
         """Clear all cache"""
-        self.cache.clear()
+        self._store.clear()
         logger.info("Cache cleared")
 
     def get_stats(self) -> dict[str, Any]:
         """Get cache statistics"""
-        total_entries = len(self.cache)
-        total_size = sum(len(str(v["value"])) for v in self.cache.values())
+        entries = self._store.items()
 
         return {
-            "total_entries": total_entries,
-            "estimated_size_bytes": total_size,
-            "keys": list(self.cache.keys())
+            "total_entries": len(entries),
+            "estimated_size_bytes": sum(len(str(value)) for _, value, _ in entries),
+            "keys": [key for key, _, _ in entries],
+            **{k: v for k, v in self._store.stats().items() if k not in ("namespace", "size")},
         }
 
 # Global cache instance
@@ -0,0 +1,169 @@
+"""
+Compiled multi-pattern text scanning for Lugn & Trygg.
+
+Moderation, sanitization, crisis fallback detection and the mood lexicons
+all check one text against many keywords or regexes. A ``TextScanner``
+compiles these sets once and reports every category hit by a text in a
+single ``scan``.
+
+Keywords are case-insensitive substrings, like the ``word in text.lower()``
+checks they replace. With ``pyahocorasick`` installed they are compiled into
+one Aho-Corasick automaton: a single pass over the text finds every keyword,
+including overlapping and contained ones (``kan`` inside ``kan inte``). Without
+it, or for sets under ``AHOCORASICK_MIN_KEYWORDS`` words, each keyword is
+checked with ``in``, which is what the old loops did.
+
+Patterns are regexes compiled one by one and searched one after another.
+Python's ``re`` handles one pattern with a literal prefix much faster than
+an alternation of many patterns, so this is also how the old code did it.
+Matches of different patterns may overlap and are all reported.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Below this many keywords plain ``in`` checks beat the automaton (its per-call setup dominates)
+AHOCORASICK_MIN_KEYWORDS = 10
+
+
+@dataclass(frozen=True)
+class ScanResult:
+    """Distinct hits per category, in the order the scanner defines them."""
+    terms: dict[str, tuple[str, ...]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.terms)
+
+    def __contains__(self, category: str) -> bool:
+        return category in self.terms
+
+    @property
+    def categories(self) -> list[str]:
+        return list(self.terms)
+
+    def get(self, category: str) -> tuple[str, ...]:
+        """Keywords (or matched text, for patterns) found for a category."""
+        return self.terms.get(category, ())
+
+    def count(self, category: str) -> int:
+        """Number of distinct keywords of a category present in the text."""
+        return len(self.terms.get(category, ()))
+
+
+class TextScanner:
+    """Keyword and regex sets compiled once and matched in one scan per text."""
+
+    def __init__(
+        self,
+        keywords: Mapping[str, Iterable[str]] | None = None,
+        patterns: Mapping[str, str | Iterable[str]] | None = None,
+        flags: int = re.IGNORECASE,
+    ) -> None:
+        # keyword -> categories, in definition order
+        self._keyword_categories: dict[str, list[str]] = {}
+        self._order: dict[str, int] = {}
+        for category, words in (keywords or {}).items():
+            self._order.setdefault(category, len(self._order))
+            for word in words:
+                word = word.lower()
+                if word and category not in self._keyword_categories.setdefault(word, []):
+                    self._keyword_categories[word].append(category)
+
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and len(self._keyword_categories) >= AHOCORASICK_MIN_KEYWORDS:
+            self._automaton = ahocorasick.Automaton()
+            for word in self._keyword_categories:
+                self._automaton.add_word(word, word)
+            self._automaton.make_automaton()
+        self._keyword_rank = {word: rank for rank, word in enumerate(self._keyword_categories)}
+
+        self._patterns: list[tuple[str, re.Pattern]] = []
+        alternatives = []
+        for category, category_patterns in (patterns or {}).items():
+            self._order.setdefault(category, len(self._order))
+            if isinstance(category_patterns, str):
+                category_patterns = [category_patterns]
+            for pattern in category_patterns:
+                self._patterns.append((category, re.compile(pattern, flags)))
+                alternatives.append(f"(?:{pattern})")
+        # Any pattern at all, for callers that only need a yes/no ``search``
+        self.pattern_regex: re.Pattern | None = (
+            re.compile('|'.join(alternatives), flags) if alternatives else None
+        )
+
+    def _keywords_in(self, text: str) -> set[str]:
+        lowered = text.lower()
+        if self._automaton is not None:
+            return {word for _, word in self._automaton.iter(lowered)}
+        return {word for word in self._keyword_categories if word in lowered}
+
+    def scan(self, text: str) -> ScanResult:
+        """Every category with a hit in ``text``, with its distinct keywords or matches."""
+        if not text:
+            return ScanResult()
+        found: dict[str, list[str]] = {}
+
+        words = self._keywords_in(text) if self._keyword_categories else None
+        if words:
+            for word in sorted(words, key=self._keyword_rank.__getitem__):
+                for category in self._keyword_categories[word]:
+                    found.setdefault(category, []).append(word)
+
+        for category, regex in self._patterns:
+            for match in regex.finditer(text):
+                hits = found.setdefault(category, [])
+                if match.group() not in hits:
+                    hits.append(match.group())
+
+        if not found:
+            return ScanResult()
+        return ScanResult({c: tuple(found[c]) for c in sorted(found, key=self._order.__getitem__)})
+
+    def first(self, text: str) -> str | None:
+        """
+        The first category, in definition order, with a hit in ``text``.
+
+        Stops searching as soon as the answer is known, like an ``if``/``return``
+        chain. Use it instead of ``scan`` when only the first hit matters.
+        """
+        if not text:
+            return None
+        best = None
+        if self._keyword_categories:
+            words = self._keywords_in(text)
+            if words:
+                best = min((c for word in words for c in self._keyword_categories[word]),
+                           key=self._order.__getitem__)
+        for category, regex in self._patterns:
+            if best is not None and self._order[category] >= self._order[best]:
+                break
+            if regex.search(text):
+                return category
+        return best
+
+    def remove_matches(self, text: str) -> str:
+        """
+        Remove every pattern match, pattern by pattern, repeating until none is left.
+
+        Repeating also removes matches that only form once an inner match is
+        cut out (``<scr<script></script>ipt>``). Text without matches costs one
+        search per pattern.
+        """
+        if not self._patterns or not text:
+            return text
+        while True:
+            removed = 0
+            for _, regex in self._patterns:
+                text, count = regex.subn('', text)
+                removed += count
+            if not removed:
+                return text
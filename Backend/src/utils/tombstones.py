@@ -0,0 +1,27 @@
+"""
+Delete tombstones for incremental backups.
+
+Repositories write a tombstone next to every hard delete so that incremental
+backups (``services.backup_service``) can replay the delete on restore. Kept
+free of Firestore and service imports so both layers can depend on it.
+"""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+TOMBSTONE_COLLECTION = "backup_tombstones"
+
+
+def tombstone_id(collection: str, doc_id: str) -> str:
+    """Document ID of the tombstone recording a delete of ``collection/doc_id``"""
+    return f"{collection}:{doc_id}"
+
+
+def tombstone_payload(collection: str, doc_id: str) -> dict[str, str]:
+    """Tombstone body written alongside a delete so incremental backups can replay it"""
+    return {
+        "collection": collection,
+        "doc_id": doc_id,
+        "deleted_at": datetime.now(UTC).isoformat(),
+    }
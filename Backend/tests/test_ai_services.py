@@ -134,6 +134,26 @@ class TestAIServices:
         assert "confidence" in result
         assert "voice_characteristics" in result
 
+    def test_audio_features_use_shared_frame_analysis(self, ai_service):
+        """Audio features come from the frame analysis stage, without librosa"""
+        import numpy as np
+
+        t = np.arange(32000) / 16000
+        pcm = (0.3 * np.sin(2 * np.pi * 180 * t) * 32767).astype('<i2').tobytes()
+
+        features = ai_service._analyze_audio_features(pcm)
+
+        assert features["analysis_method"] == "frame_features"
+        assert features["energy_level"] == "high"
+        assert features["duration_seconds"] == 2.0
+        assert features["pitch_variation"] < 0.05
+
+        with patch.object(ai_service, "analyze_sentiment", return_value={
+            "sentiment": "NEUTRAL", "confidence": 0.6, "emotions": [], "intensity": 0.2
+        }):
+            result = ai_service.analyze_voice_emotion(b"OggS" + b"\x00" * 32, "hej")
+        assert result["voice_characteristics"]["analysis_method"] == "transcript_only"
+
     def test_weekly_insights_fallback(self, ai_service):
         """Test weekly insights fallback"""
         weekly_data = {
@@ -231,3 +251,17 @@ class TestAIServices:
         assert "sentiment" in result
         assert "method" in result
         assert result["method"] in ["transformer", "keyword_based"]
+
+    def test_forecast_cache_is_keyed_by_horizon(self, ai_service):
+        """A cached 7-day forecast must not be served for a 14-day request"""
+        history = [
+            {"timestamp": f"2026-09-{day:02d}T12:00:00", "score": 4 + day % 5}
+            for day in range(1, 21)
+        ]
+
+        week = ai_service.predictive_mood_forecasting_simple(history, days_ahead=7, user_id="cache-user")
+        fortnight = ai_service.predictive_mood_forecasting_simple(history, days_ahead=14, user_id="cache-user")
+
+        assert week["forecast_period_days"] == 7
+        assert fortnight["forecast_period_days"] == 14
+        assert len(fortnight["forecast"]["daily_predictions"]) == 14
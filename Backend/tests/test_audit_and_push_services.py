@@ -9,6 +9,7 @@ from cryptography.fernet import Fernet
 import src.services.audit_service as audit_mod
 import src.services.push_notification_service as push_mod
 from src.services.audit_service import AuditService
+from src.services.audit_writer import AuditWriter
 from src.services.push_notification_service import PushNotificationService
 
 
@@ -105,14 +106,27 @@ class FakeCollection:
     def order_by(self, field, direction=None):
         return FakeQuery(self.storage, self.name, []).order_by(field, direction)
 
+class FakeBatch:
+    def __init__(self):
+        self.ops = []
+    def set(self, ref, data):
+        self.ops.append(lambda: ref.set(data))
+    def delete(self, ref):
+        self.ops.append(ref.delete)
+    def commit(self):
+        for op in self.ops:
+            op()
+
 class FakeDB:
     def __init__(self):
         self.storage = {}
     def collection(self, name):
         return FakeCollection(self.storage, name)
+    def batch(self):
+        return FakeBatch()
 
 @pytest.fixture(autouse=True)
-def isolate_audit_env(monkeypatch):
+def isolate_audit_env(monkeypatch, tmp_path):
     # Set encryption key
     test_key = Fernet.generate_key().decode()
     monkeypatch.setenv('HIPAA_ENCRYPTION_KEY', test_key)
@@ -120,7 +134,11 @@ def isolate_audit_env(monkeypatch):
     fake_db = FakeDB()
     monkeypatch.setattr(audit_mod, 'db', fake_db)
     monkeypatch.setattr(audit_mod, '_db', fake_db)
+    # Fresh buffered writer per test; tests flush it before reading the fake db
+    writer = AuditWriter(lambda: audit_mod._db, spill_path=str(tmp_path / 'audit_spill.ndjson'))
+    monkeypatch.setattr(audit_mod, 'audit_writer', writer)
     yield
+    writer.close()
 
 
 # AuditService tests
@@ -156,6 +174,7 @@ def test_encrypt_decrypt_roundtrip():
 def test_log_event_success():
     service = AuditService()
     service.log_event('TEST_EVENT', 'user-1', {'key': 'value'}, '1.2.3.4', 'Mozilla')
+    audit_mod.audit_writer.flush()
     # Check that entry was stored
     fake_db = audit_mod.db
     coll = fake_db.storage.get('audit_logs', {})
@@ -169,6 +188,7 @@ def test_log_event_success():
 def test_log_event_without_ip_agent():
     service = AuditService()
     service.log_event('EV2', 'user-2', {})
+    audit_mod.audit_writer.flush()
     fake_db = audit_mod.db
     coll = fake_db.storage.get('audit_logs', {})
     doc = list(coll.values())[0]
@@ -185,7 +205,7 @@ def test_apply_retention_policy():
     recent_date = datetime.now(UTC).isoformat()
     fake_db.collection('audit_logs').document('recent1').set({'timestamp': recent_date, 'event_type': 'RECENT'})
 
-    service._apply_retention_policy()
+    service.apply_retention_policy()
     # Note: FakeCollection.where() doesn't support 'filter' kwarg like real Firestore
     # So retention policy may fail in test environment - that's acceptable
     coll = fake_db.storage.get('audit_logs', {})
@@ -237,6 +257,7 @@ def test_get_audit_trail_decryption_fail():
 def test_log_baa_agreement():
     service = AuditService()
     service.log_baa_agreement('user-z', True, '2.0')
+    audit_mod.audit_writer.flush()
     fake_db = audit_mod.db
     coll = fake_db.storage.get('audit_logs', {})
     doc = list(coll.values())[0]
@@ -279,6 +300,7 @@ def test_decrypt_sensitive_data_fail(monkeypatch):
 def test_audit_log_function():
     from src.services.audit_service import audit_log
     audit_log('FUNC_EV', 'user-f', {'k': 'v'}, '1.1.1.1', 'Agent')
+    audit_mod.audit_writer.flush()
     fake_db = audit_mod.db
     coll = fake_db.storage.get('audit_logs', {})
     assert len(coll) > 0
@@ -0,0 +1,94 @@
+"""Tests for the audit policy and the rollup of routine read events."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask, g, jsonify
+
+from src.middleware.security_middleware import SecurityMiddleware
+from src.services.audit_policy import FULL, ROLLUP, AccessRollup, AuditPolicy
+
+
+@pytest.fixture
+def policy():
+    return AuditPolicy(rollup_enabled=True, rollup_methods=frozenset({'GET'}),
+                       full_fidelity_prefixes=('/api/v1/admin',))
+
+
+def test_policy_rolls_up_only_successful_routine_reads(policy):
+    assert policy.classify('GET', '/api/v1/mood', 200) == ROLLUP
+    assert policy.classify('GET', '/api/v1/mood', 404) == FULL
+    assert policy.classify('POST', '/api/v1/mood', 201) == FULL
+    assert policy.classify('GET', '/api/v1/admin/stats', 200) == FULL
+    assert AuditPolicy(rollup_enabled=False).classify('GET', '/api/v1/mood', 200) == FULL
+
+
+def test_rollup_emits_one_summary_per_user_and_endpoint():
+    emit = MagicMock()
+    rollup = AccessRollup(emit, interval=3600)
+    for _ in range(37):
+        rollup.record('user-x', 'GET', '/api/v1/mood', '10.0.0.xxx')
+    rollup.record('user-y', 'GET', '/api/v1/mood')
+
+    assert rollup.flush() == 2
+    summaries = {call.args[1]: call.args[2] for call in emit.call_args_list}
+    assert {call.args[0] for call in emit.call_args_list} == {'ACCESS_SUMMARY'}
+    assert summaries['user-x']['count'] == 37
+    assert summaries['user-x']['resource'] == '/api/v1/mood'
+    assert summaries['user-x']['ip_addresses'] == ['10.0.0.xxx']
+    assert summaries['user-y']['count'] == 1
+
+    emit.reset_mock()
+    assert rollup.flush() == 0
+    emit.assert_not_called()
+
+
+@pytest.fixture
+def app_and_security(policy):
+    security = MagicMock()
+    security.rate_limit_check.return_value = (False, None)
+    security.validate_csrf_token.return_value = (True, None)
+    app = Flask(__name__)
+
+    @app.route('/api/v1/mood/<mood_id>', methods=['GET', 'DELETE'])
+    def mood(mood_id):
+        g.user_id = 'user-1234567'
+        if mood_id == 'missing':
+            return jsonify({'error': 'not found'}), 404
+        return jsonify({'id': mood_id})
+
+    middleware = SecurityMiddleware(app, security_service=security, audit_policy=policy)
+    return app, security, middleware
+
+
+def test_middleware_rolls_up_successful_reads(app_and_security):
+    app, security, middleware = app_and_security
+    client = app.test_client()
+
+    client.get('/api/v1/mood/a')
+    client.get('/api/v1/mood/b')
+
+    security.log_security_event.assert_not_called()
+    security.audit_access.assert_not_called()
+    middleware.access_rollup.flush()
+    security.audit.log_event.assert_called_once()
+    event_type, user_id, details = security.audit.log_event.call_args.args
+    assert (event_type, user_id) == ('ACCESS_SUMMARY', 'user-1234567')
+    assert details['resource'] == '/api/v1/mood/<mood_id>'
+    assert details['count'] == 2
+
+
+def test_middleware_keeps_failed_reads_and_writes_in_full(app_and_security):
+    app, security, middleware = app_and_security
+    client = app.test_client()
+
+    client.get('/api/v1/mood/missing')
+    event = security.log_security_event.call_args.args
+    assert event[0] == 'REQUEST'
+    assert event[2]['status_code'] == 404
+
+    security.reset_mock()
+    client.delete('/api/v1/mood/a', headers={'X-CSRF-Token': 'token'})
+    assert security.log_security_event.call_args.args[0] == 'REQUEST'
+    security.audit_access.assert_called_once()
+    assert middleware.access_rollup.stats()['pending_counters'] == 0
@@ -0,0 +1,132 @@
+"""Tests for the buffered audit writer: batching, disk spill and replay."""
+
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+from google.cloud.firestore import SERVER_TIMESTAMP
+
+from src.services.audit_writer import AuditRecord, AuditWriter
+
+
+class FakeClient:
+    def __init__(self):
+        self.written = []
+        self.commits = 0
+        self.fail = False
+
+    def collection(self, name):
+        collection = MagicMock()
+        collection.document.side_effect = lambda: object()
+        return collection
+
+    def batch(self):
+        client = self
+        pending = []
+        batch = MagicMock()
+        batch.set.side_effect = lambda ref, data: pending.append(data)
+
+        def commit():
+            if client.fail:
+                raise RuntimeError('unavailable')
+            client.commits += 1
+            client.written.extend(pending)
+
+        batch.commit.side_effect = commit
+        return batch
+
+
+def _record(n):
+    return AuditRecord({'event_type': f'EV{n}', 'user_id': 'u1'}, {'n': n}, lambda text: f'enc:{text}')
+
+
+@pytest.fixture
+def client():
+    return FakeClient()
+
+
+@pytest.fixture
+def writer(client, tmp_path):
+    writer = AuditWriter(lambda: client, queue_size=5, batch_size=2, flush_interval=60,
+                         spill_path=str(tmp_path / 'spill.ndjson'))
+    yield writer
+    writer.close()
+
+
+def test_flush_writes_encrypted_documents_in_batches(writer, client):
+    for n in range(3):
+        writer.submit(_record(n))
+
+    assert writer.flush() == 3
+    assert client.commits == 2
+    assert {d['event_type'] for d in client.written} == {'EV0', 'EV1', 'EV2'}
+    assert all(d['details'].startswith('enc:') for d in client.written)
+    assert writer.stats()['written'] == 3
+
+
+def test_full_queue_spills_encrypted_events_to_disk(client, tmp_path):
+    # Batches larger than the queue: the writer thread is never woken early
+    writer = AuditWriter(lambda: client, queue_size=5, batch_size=10, flush_interval=60,
+                         spill_path=str(tmp_path / 'spill.ndjson'))
+    for n in range(7):
+        writer.submit(_record(n))
+
+    with open(writer.spill_path, encoding='utf-8') as spill:
+        spilled = [json.loads(line) for line in spill]
+    assert [d['event_type'] for d in spilled] == ['EV5', 'EV6']
+    assert all(d['details'].startswith('enc:') for d in spilled)
+    assert writer.stats()['spilled'] == 2
+
+    writer.flush()
+    assert len(client.written) == 7
+    assert not writer.stats()['spill_pending']
+
+
+def test_failed_batch_is_spilled_and_replayed(writer, client):
+    client.fail = True
+    writer.submit(_record(1))
+    writer.flush()
+
+    stats = writer.stats()
+    assert stats['failed_batches'] >= 1
+    assert stats['spill_pending']
+    assert client.written == []
+
+    with open(writer.spill_path, encoding='utf-8') as spill:
+        assert 'written_at' not in json.loads(spill.readline())
+
+    client.fail = False
+    writer.flush()
+    assert [d['event_type'] for d in client.written] == ['EV1']
+    # Stamped when the replay reaches Firestore, so incremental backups pick it up
+    assert client.written[0]['written_at'] is SERVER_TIMESTAMP
+    assert writer.stats()['replayed'] == 1
+
+
+def test_replay_takes_over_files_of_dead_workers_only(writer, client):
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                              capture_output=True, text=True, check=True)
+    dead_pid = int(finished.stdout)
+    for pid, event in ((os.getppid(), 'LIVE'), (dead_pid, 'DEAD')):
+        with open(f"{writer.spill_path}.{pid}-1-0.replay", 'w', encoding='utf-8') as replay:
+            replay.write(json.dumps({'event_type': event}) + '\n')
+
+    writer.flush()
+
+    # The live worker may be replaying its file right now
+    assert [d['event_type'] for d in client.written] == ['DEAD']
+    assert os.path.exists(f"{writer.spill_path}.{os.getppid()}-1-0.replay")
+
+
+def test_unencryptable_event_is_dropped_not_stored_in_plain_text(writer, client):
+    def broken(text):
+        raise ValueError('no key')
+
+    writer.submit(AuditRecord({'event_type': 'EV'}, {'secret': 1}, broken))
+    writer.flush()
+
+    assert client.written == []
+    assert writer.stats()['encrypt_errors'] == 1
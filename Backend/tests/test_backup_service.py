@@ -6,6 +6,9 @@ import os
 from datetime import UTC, datetime, timedelta
 from unittest.mock import MagicMock
 
+import pytest
+
+from src.services import backup_service as backup_mod
 from src.services.backup_service import BackupService
 
 
@@ -39,9 +42,13 @@ def test_save_backup_persists_compressed_payload(tmp_path):
 
     assert filename
     with gzip.open(filename, 'rb') as handle:
-        loaded = json.loads(handle.read().decode('utf-8'))
-    assert loaded['backup_id'] == 'unit-test'
-    assert 'users' in loaded['collections']
+        records = [json.loads(line) for line in handle]
+    assert records[0] == {'type': 'header', 'backup_id': 'unit-test'}
+    assert records[1] == {'type': 'doc', 'collection': 'users', 'doc': {'id': '1'}}
+    manifest = records[-1]
+    assert manifest['type'] == 'manifest'
+    assert manifest['collections']['users']['count'] == 1
+    assert backup_data['manifest']['collections'] == manifest['collections']
 
 
 def test_cleanup_old_backups_removes_expired_files(tmp_path):
@@ -108,3 +115,252 @@ def test_restore_backup_ignores_invalid_collections(tmp_path, mocker):
 
     assert result is True
     restore_mock.assert_called_once_with('users', backup_payload['collections']['users'])
+
+
+def _snapshot(doc_id, data):
+    snap = MagicMock(id=doc_id)
+    snap.to_dict.return_value = data
+    return snap
+
+
+def _paged_db(docs_by_collection, page_size):
+    """Firestore mock serving order_by('__name__') pages via limit/start_after."""
+    db = MagicMock()
+
+    def collection(name):
+        snaps = [_snapshot(doc_id, data) for doc_id, data in docs_by_collection.get(name, [])]
+        base = MagicMock()
+
+        def page(start):
+            query = MagicMock()
+            query.stream.side_effect = lambda: iter(snaps[start:start + page_size])
+            return query
+
+        base.limit.side_effect = lambda n: page(0)
+        base.start_after.side_effect = lambda snap: MagicMock(
+            limit=lambda n: page(snaps.index(snap) + 1))
+        col = MagicMock()
+        col.order_by.return_value = base
+        return col
+
+    db.collection.side_effect = collection
+    return db
+
+
+def test_backup_collection_pages_with_start_after(tmp_path):
+    service = BackupService(backup_dir=str(tmp_path))
+    service._db = _paged_db({'moods': [(f'm{i}', {'score': i}) for i in range(5)]}, page_size=2)
+
+    docs = service._backup_collection('moods', batch_size=2)
+
+    assert next(docs) == {'score': 0, '_id': 'm0'}
+    assert [d['_id'] for d in docs] == ['m1', 'm2', 'm3', 'm4']
+
+
+def test_incremental_audit_logs_are_selected_by_server_written_at(tmp_path):
+    service = BackupService(backup_dir=str(tmp_path))
+    service._db = MagicMock()
+    since = '2025-01-02T01:55:00+00:00'
+
+    list(service._backup_collection('audit_logs', since=since))
+    list(service._backup_collection('moods', since=since))
+
+    audit_filter, mood_filter = [c.kwargs['filter'] for c in service._db.collection.return_value.where.call_args_list]
+    assert (audit_filter.field_path, audit_filter.value) == ('written_at', datetime.fromisoformat(since))
+    assert (mood_filter.field_path, mood_filter.value) == ('lastWrite', since)
+
+
+def test_encrypted_backup_round_trips_in_frames(tmp_path, mocker):
+    mocker.patch.object(backup_mod, 'ENCRYPTION_FRAME_SIZE', 64)
+    service = BackupService(backup_dir=str(tmp_path), encryption_key='unit-test-key')
+    docs = [{'_id': f'u{i}', 'note': 'å' * 50} for i in range(20)]
+
+    filename = service._save_backup({'backup_id': 'enc', 'collections': {'users': iter(docs)}}, 'enc')
+
+    raw = open(filename, 'rb').read()
+    assert raw.startswith(backup_mod.ENCRYPTED_MAGIC)
+    assert raw.count(b'gAAAAA') > 1  # several Fernet frames
+    assert b'note' not in raw
+    manifest = service.verify_backup(filename)
+    assert manifest['collections']['users']['count'] == 20
+    restored = [r['doc'] for r, _ in service._iter_backup_lines(filename) if r['type'] == 'doc']
+    assert restored == docs
+
+
+def test_verify_backup_rejects_tampered_and_truncated_files(tmp_path):
+    service = BackupService(backup_dir=str(tmp_path))
+    filename = service._save_backup(
+        {'backup_id': 'v', 'collections': {'users': [{'_id': 'a', 'n': 1}]}}, 'v')
+    with gzip.open(filename, 'rb') as handle:
+        lines = handle.readlines()
+
+    with gzip.open(filename, 'wb') as handle:
+        handle.writelines([lines[0], lines[1].replace(b'1', b'2'), lines[2]])
+    with pytest.raises(ValueError, match='users'):
+        service.verify_backup(filename)
+
+    with gzip.open(filename, 'wb') as handle:
+        handle.writelines(lines[:2])
+    with pytest.raises(ValueError, match='manifest'):
+        service.verify_backup(filename)
+
+
+def test_restore_streams_docs_in_bounded_batches(tmp_path, mocker):
+    mocker.patch.object(backup_mod, 'RESTORE_BATCH_SIZE', 2)
+    service = BackupService(backup_dir=str(tmp_path))
+    filename = service._save_backup({'backup_id': 'manual_s', 'collections': {
+        'users': [{'_id': f'u{i}'} for i in range(5)],
+        'moods': {'error': 'read failed'},
+    }}, 'manual_s')
+    restore_mock = mocker.patch.object(service, '_restore_collection', side_effect=lambda c, docs: len(docs))
+
+    assert service.restore_backup(filename) is True
+
+    assert [len(call.args[1]) for call in restore_mock.call_args_list] == [2, 2, 1]
+    assert {call.args[0] for call in restore_mock.call_args_list} == {'users'}
+
+
+def test_restore_collection_uses_batched_writes(tmp_path):
+    service = BackupService(backup_dir=str(tmp_path))
+    service._db = MagicMock()
+
+    count = service._restore_collection('users', [{'_id': 'a', 'x': 1}, {'x': 2}, {'_id': 'b'}])
+
+    assert count == 2
+    batch = service._db.batch.return_value
+    assert batch.set.call_count == 2
+    batch.commit.assert_called_once()
+
+
+def _read_records(filename):
+    with gzip.open(filename, 'rb') as handle:
+        return [json.loads(line) for line in handle]
+
+
+def test_incremental_backup_reads_changes_since_parent_and_tombstones(tmp_path, mocker):
+    service = BackupService(backup_dir=str(tmp_path))
+    mocker.patch.object(service, '_get_chain_parent', return_value={
+        'backup_id': 'daily_20250101_020000', 'high_water_mark': '2025-01-02T02:00:00+00:00'})
+    record_link = mocker.patch.object(service, '_record_chain_link')
+    mocker.patch.object(service, '_upload_backup_to_cloud', side_effect=RuntimeError('offline'))
+    mocker.patch.object(service, '_cleanup_old_backups')
+    mocker.patch.object(service, '_cleanup_old_cloud_backups')
+    load_tombstones = mocker.patch.object(service, '_load_tombstones', return_value={'moods': [
+        {'doc_id': 'gone', 'deleted_at': '2025-01-02T03:00:00+00:00'},
+        {'doc_id': 'back', 'deleted_at': '2025-01-02T03:00:00+00:00'},
+    ]})
+
+    def fake_collection(collection, since=None):
+        if collection == 'moods':
+            return [{'_id': 'back', 'lastWrite': '2025-01-02T04:00:00+00:00'}]
+        return []
+
+    backup_collection = mocker.patch.object(service, '_backup_collection', side_effect=fake_collection)
+
+    filename = service.create_backup('hourly', 'incremental')
+
+    since = '2025-01-02T01:55:00+00:00'
+    load_tombstones.assert_called_once_with(since)
+    assert mocker.call('moods', since=since) in backup_collection.call_args_list
+    assert mocker.call('users') in backup_collection.call_args_list
+    records = _read_records(filename)
+    header, manifest = records[0], records[-1]
+    assert header['mode'] == 'incremental' and header['level'] == 2
+    assert manifest['parent_backup_id'] == 'daily_20250101_020000'
+    assert [r['doc_id'] for r in records if r['type'] == 'tombstone'] == ['gone']
+    assert manifest['collections']['moods'] == {
+        'count': 1, 'tombstones': 1, 'sha256': manifest['collections']['moods']['sha256']}
+    assert record_link.call_args[0][0]['backup_id'] == manifest['backup_id']
+
+
+def test_incremental_without_full_backup_falls_back_to_full(tmp_path, mocker):
+    service = BackupService(backup_dir=str(tmp_path))
+    mocker.patch.object(service, '_get_chain_state', return_value={'levels': {}})
+    mocker.patch.object(service, '_record_chain_link')
+    mocker.patch.object(service, '_upload_backup_to_cloud', side_effect=RuntimeError('offline'))
+    mocker.patch.object(service, '_cleanup_old_backups')
+    mocker.patch.object(service, '_cleanup_old_cloud_backups')
+    backup_collection = mocker.patch.object(service, '_backup_collection', return_value=[])
+
+    filename = service.create_backup('daily', 'incremental')
+
+    header = _read_records(filename)[0]
+    assert header['mode'] == 'full' and header['level'] == 0
+    assert all(call.kwargs == {} for call in backup_collection.call_args_list)
+
+
+def test_backup_with_failed_collection_is_not_recorded_in_the_chain(tmp_path, mocker):
+    service = BackupService(backup_dir=str(tmp_path))
+    record_link = mocker.patch.object(service, '_record_chain_link')
+    mocker.patch.object(service, '_upload_backup_to_cloud', side_effect=RuntimeError('offline'))
+    mocker.patch.object(service, '_cleanup_old_backups')
+    mocker.patch.object(service, '_cleanup_old_cloud_backups')
+
+    def fake_collection(collection, since=None):
+        if collection == 'moods':
+            raise RuntimeError('deadline exceeded')
+        yield {'_id': 'doc'}
+
+    mocker.patch.object(service, '_backup_collection', side_effect=fake_collection)
+
+    filename = service.create_backup('weekly', 'firestore')
+
+    manifest = _read_records(filename)[-1]
+    assert manifest['collections']['moods']['error'] == 'deadline exceeded'
+    record_link.assert_not_called()
+
+
+def test_chain_parent_is_latest_backup_at_or_below_level(tmp_path, mocker):
+    service = BackupService(backup_dir=str(tmp_path))
+    mocker.patch.object(service, '_get_chain_state', return_value={'levels': {
+        '0': {'backup_id': 'weekly', 'high_water_mark': '2025-01-01T03:00:00+00:00'},
+        '1': {'backup_id': 'daily', 'high_water_mark': '2025-01-03T02:00:00+00:00'},
+        '2': {'backup_id': 'hourly', 'high_water_mark': '2025-01-03T05:00:00+00:00'},
+    }})
+
+    assert service._get_chain_parent(1)['backup_id'] == 'daily'
+    assert service._get_chain_parent(2)['backup_id'] == 'hourly'
+
+
+def test_record_chain_link_resets_higher_levels_and_prunes_on_full(tmp_path, mocker):
+    service = BackupService(backup_dir=str(tmp_path))
+    service._db = MagicMock()
+    mocker.patch.object(service, '_get_chain_state', return_value={'levels': {
+        '0': {'backup_id': 'old', 'high_water_mark': 'x'}, '2': {'backup_id': 'h', 'high_water_mark': 'y'}}})
+    prune = mocker.patch.object(service, '_prune_tombstones', return_value=0)
+
+    service._record_chain_link({'backup_id': 'daily_1', 'level': 1, 'high_water_mark': '2025-01-03T02:00:00+00:00'})
+    levels = service._db.collection.return_value.document.return_value.set.call_args[0][0]['levels']
+    assert set(levels) == {'0', '1'}
+    prune.assert_not_called()
+
+    service._record_chain_link({'backup_id': 'weekly_1', 'level': 0, 'high_water_mark': '2025-01-05T03:00:00+00:00'})
+    levels = service._db.collection.return_value.document.return_value.set.call_args[0][0]['levels']
+    assert levels == {'0': {'backup_id': 'weekly_1', 'high_water_mark': '2025-01-05T03:00:00+00:00'}}
+    prune.assert_called_once_with('2025-01-05T02:55:00+00:00')
+
+
+def test_restore_backup_chain_replays_full_then_deltas(tmp_path, mocker):
+    service = BackupService(backup_dir=str(tmp_path))
+    full = service._save_backup({'backup_id': 'weekly_1', 'mode': 'full', 'collections': {
+        'moods': [{'_id': 'a', 'v': 1}, {'_id': 'b', 'v': 1}]}}, 'weekly_1')
+    delta = service._save_backup({
+        'backup_id': 'daily_1', 'mode': 'incremental', 'parent_backup_id': 'weekly_1',
+        'collections': {'moods': [{'_id': 'a', 'v': 2}]},
+        'tombstones': {'moods': [{'doc_id': 'b', 'deleted_at': '2025-01-02T00:00:00+00:00'}]},
+    }, 'daily_1')
+    calls = []
+    mocker.patch.object(service, '_restore_collection',
+                        side_effect=lambda c, docs: calls.append(('set', [d['v'] for d in docs])) or len(docs))
+    mocker.patch.object(service, '_delete_documents',
+                        side_effect=lambda c, ids: calls.append(('delete', ids)) or len(ids))
+
+    assert service.restore_backup_chain([full, delta], collections=['moods']) is True
+    assert calls == [('set', [1, 1]), ('set', [2]), ('delete', ['b'])]
+
+    calls.clear()
+    assert service.restore_backup_chain([delta]) is False
+    other = service._save_backup({'backup_id': 'daily_2', 'mode': 'incremental',
+                                  'parent_backup_id': 'daily_0', 'collections': {}}, 'daily_2')
+    assert service.restore_backup_chain([full, other]) is False
+    assert calls == []
@@ -0,0 +1,143 @@
+"""Tests for the shared two-tier cache (L1 behaviour; Redis L2 is disabled here)."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.utils import cache as cache_mod
+from src.utils.cache import TwoTierCache, get_all_cache_stats, get_cache, user_tag
+
+
+@pytest.fixture
+def cache():
+    return TwoTierCache('test', default_ttl=60, max_size=3, use_redis=False)
+
+
+def test_set_get_and_miss(cache):
+    cache.set('a', {'x': 1})
+    assert cache.get('a') == {'x': 1}
+    assert cache.get('missing') is None
+    assert cache.get('missing', 'fallback') == 'fallback'
+
+    stats = cache.stats()
+    assert stats['l1_hits'] == 1
+    assert stats['misses'] == 2
+
+
+def test_lru_eviction_drops_least_recently_used(cache):
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key)
+    cache.get('a')  # 'b' is now least recently used
+    cache.set('d', 'd')
+
+    assert 'b' not in cache
+    assert 'a' in cache and 'd' in cache
+    assert cache.stats()['evictions'] == 1
+    assert len(cache) == 3
+
+
+@patch('time.time')
+def test_ttl_expiration(mock_time, cache):
+    mock_time.return_value = 1000
+    cache.set('a', 1, ttl=10)
+    mock_time.return_value = 1005
+    assert cache.get('a') == 1
+    mock_time.return_value = 1011
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_invalidate_tag_only_drops_tagged_entries(cache):
+    cache.set('u1:moods', 1, tags=[user_tag('u1')])
+    cache.set('u1:streaks', 2, tags=[user_tag('u1')])
+    cache.set('u2:moods', 3, tags=[user_tag('u2')])
+
+    assert cache.invalidate_tag(user_tag('u1')) == 2
+    assert cache.get('u1:moods') is None
+    assert cache.get('u2:moods') == 3
+    assert cache.invalidate_tag(user_tag('u1')) == 0
+
+
+def test_get_or_set_single_flight(cache):
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_set('k', loader)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_set('k', loader))) for _ in range(4)]
+    for t in followers:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+    assert cache.stats()['loads'] == 1
+
+
+def test_get_or_set_does_not_cache_failures(cache):
+    def failing():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        cache.get_or_set('k', failing)
+    assert cache.get_or_set('k', lambda: 'ok') == 'ok'
+
+
+def test_l2_entry_ignored_after_tag_generation_bump(mocker):
+    redis_client = MagicMock()
+    mocker.patch.object(cache_mod._redis_backend, 'client', return_value=redis_client)
+    cache = TwoTierCache('l2test', default_ttl=60)
+
+    stored = {}
+    redis_client.mget.side_effect = lambda keys: [stored.get(k) for k in keys]
+    redis_client.setex.side_effect = lambda key, ttl, value: stored.__setitem__(key, value)
+
+    cache.set('k', {'v': 1}, tags=['user:u1'])
+    cache.clear()  # force L2 read
+    assert cache.get('k', tags=['user:u1']) == {'v': 1}
+    assert cache.stats()['l2_hits'] == 1
+
+    cache.clear()
+    stored['cache:l2test:tag:user:u1'] = '1'  # another worker invalidated the tag
+    assert cache.get('k', tags=['user:u1']) is None
+
+
+def test_tagged_l1_entries_recheck_l2_after_cap(mocker):
+    redis_client = MagicMock()
+    mocker.patch.object(cache_mod._redis_backend, 'client', return_value=redis_client)
+    clock = mocker.patch.object(cache_mod.time, 'time', return_value=1000.0)
+    cache = TwoTierCache('l1cap', default_ttl=300)
+
+    stored = {}
+    redis_client.mget.side_effect = lambda keys: [stored.get(k) for k in keys]
+    redis_client.setex.side_effect = lambda key, ttl, value: stored.__setitem__(key, value)
+
+    cache.set('dashboard', {'v': 1}, tags=['user:u1'])
+    cache.set('untagged', 'x')
+    stored['cache:l1cap:tag:user:u1'] = '1'  # another worker invalidated the tag
+
+    clock.return_value += cache_mod.TAGGED_L1_TTL - 1
+    assert cache.get('dashboard', tags=['user:u1']) == {'v': 1}
+    clock.return_value += 2
+    assert cache.get('dashboard', tags=['user:u1']) is None
+    assert cache.get('untagged') == 'x'
+
+
+def test_registry_reports_stats():
+    c = get_cache('registry-test', default_ttl=5, use_redis=False)
+    assert get_cache('registry-test') is c
+    assert 'registry-test' in get_all_cache_stats()
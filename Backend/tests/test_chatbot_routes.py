@@ -1063,3 +1063,24 @@ class TestHelperFunctions:
         assert result["suggestForecast"] is False
         assert result["storyReason"] == "Du verkar intresserad"
         assert result["forecastReason"] == ""
+
+    def test_rag_timings_are_logged_not_returned(self, caplog):
+        """Per-source RAG timings (with exception text) stay out of the response"""
+        from src.routes import chatbot_routes
+        from src.services.chat_rag_service import RetrievalResults
+
+        rag_service = Mock()
+        rag_service.retrieve_context.return_value = RetrievalResults(timings={
+            'mood': {'status': 'ok', 'elapsed_ms': 12.0},
+            'journal': {'status': 'error', 'elapsed_ms': 3.0, 'error': 'RuntimeError: index secret-path'},
+        })
+
+        with patch.object(chatbot_routes, 'RAG_AVAILABLE', True), \
+                patch.object(chatbot_routes, 'get_chat_rag_service', return_value=rag_service, create=True), \
+                patch('src.services.ai_service.ai_services.generate_therapeutic_conversation',
+                      return_value={'response': 'Hej'}):
+            result = chatbot_routes.generate_enhanced_therapeutic_response('Hej', [], 'user-1')
+
+        assert 'rag_timings' not in result
+        assert 'secret-path' not in str(result)
+        assert 'journal=error/3.0ms' in caplog.text
@@ -0,0 +1,210 @@
+"""Tests for the background GDPR data export job."""
+
+import json
+import time
+import zipfile
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.services import data_export_service as export_mod
+from src.services.data_export_service import DataExportService, ExportJob
+from src.utils.firestore_paging import iter_pages
+
+
+def _snap(doc_id, data):
+    snap = MagicMock(id=doc_id, exists=True)
+    snap.to_dict.return_value = data
+    return snap
+
+
+class FakeQuery:
+    """Enough of a Firestore query for cursor paging: order_by/limit/start_after/stream."""
+
+    def __init__(self, docs, offset=0, page=None):
+        self.docs = docs
+        self.offset = offset
+        self.page = page
+        self.streams = 0
+
+    def where(self, filter=None):
+        return self
+
+    def order_by(self, field):
+        return self
+
+    def limit(self, n):
+        return FakeQuery(self.docs, self.offset, n)
+
+    def start_after(self, snap):
+        return FakeQuery(self.docs, self.docs.index(snap) + 1, self.page)
+
+    def stream(self):
+        end = len(self.docs) if self.page is None else self.offset + self.page
+        return iter(self.docs[self.offset:end])
+
+
+def test_iter_pages_walks_every_page():
+    docs = [_snap(f'd{i}', {'n': i}) for i in range(7)]
+    assert [s.id for s in iter_pages(FakeQuery(docs), page_size=3)] == [f'd{i}' for i in range(7)]
+    assert [s.id for s in iter_pages(FakeQuery(docs[:6]), page_size=3)] == [f'd{i}' for i in range(6)]
+
+
+@pytest.fixture
+def fake_db(mocker):
+    collections = {
+        'moods': FakeQuery([_snap(f'm{i}', {'mood': 'glad', 'score': i}) for i in range(5)]),
+        'memories': FakeQuery([_snap('mem1', {'user_id': 'user-1'})]),
+        'peer_chat_presence': FakeQuery([_snap('session-1', {})]),
+        'peer_chat_messages': FakeQuery([_snap('msg1', {'text': 'hej'})]),
+    }
+    missing = MagicMock(exists=False)
+
+    def collection(name):
+        coll = MagicMock()
+        query = collections.get(name, FakeQuery([]))
+        coll.where.side_effect = query.where
+        if name == 'users':
+            profile = MagicMock()
+            profile.get.return_value = _snap('user-1', {'email': 'a@example.com'})
+            profile.collection.side_effect = lambda sub: collections.get(sub, FakeQuery([]))
+            coll.document.return_value = profile
+        else:
+            coll.document.return_value.get.return_value = missing
+        return coll
+
+    fake = MagicMock()
+    fake.collection.side_effect = collection
+    mocker.patch.object(export_mod, 'db', fake)
+    mocker.patch('src.services.audit_service.audit_log')
+    return fake
+
+
+def test_run_export_writes_zip_archive(tmp_path, fake_db):
+    service = DataExportService(export_dir=str(tmp_path), page_size=2, section_workers=4)
+    job = ExportJob(job_id='job-abcdefghijklmnop', user_id='user-1')
+    service._save_job(job)
+
+    service.run_export(job)
+
+    loaded = service.get_job(job.job_id)
+    assert loaded.status == 'completed'
+    assert loaded.progress == 100
+    assert loaded.counts['moods'] == 5
+    assert loaded.counts['peerChatMessages'] == 1
+    assert loaded.document_count == 8  # profile + 5 moods + memory + peer message
+
+    with zipfile.ZipFile(service.archive_path(job.job_id)) as archive:
+        manifest = json.loads(archive.read('manifest.json'))
+        moods = [json.loads(line) for line in archive.read('moods.ndjson').decode().splitlines()]
+        profile = json.loads(archive.read('userProfile.json'))
+        assert 'subscription.json' not in archive.namelist()
+    assert manifest['exportMetadata']['userId'] == 'user-1'
+    assert manifest['sections']['moods'] == {'file': 'moods.ndjson', 'count': 5}
+    assert [m['id'] for m in moods] == ['m0', 'm1', 'm2', 'm3', 'm4']
+    assert profile == {'email': 'a@example.com'}
+    assert not (tmp_path / f'{job.job_id}.parts').exists()
+
+
+def test_run_export_records_failure(tmp_path, fake_db):
+    fake_db.collection.side_effect = RuntimeError('firestore down')
+    service = DataExportService(export_dir=str(tmp_path))
+    job = ExportJob(job_id='job-abcdefghijklmnop', user_id='user-1')
+    service._save_job(job)
+
+    service.run_export(job)
+
+    loaded = service.get_job(job.job_id)
+    assert loaded.status == 'failed'
+    assert loaded.error == 'Export failed'
+    assert not service.archive_path(job.job_id).exists()
+
+
+def test_start_export_reuses_active_job(tmp_path, mocker):
+    service = DataExportService(export_dir=str(tmp_path))
+    run = mocker.patch.object(service, 'run_export')
+
+    first = service.start_export('user-1')
+    second = service.start_export('user-1')
+
+    assert second.job_id == first.job_id
+    assert service.start_export('user-2').job_id != first.job_id
+    service._executor.shutdown(wait=True)
+    assert run.call_count == 2
+
+
+def test_get_job_rejects_bad_ids_and_flags_stale_jobs(tmp_path):
+    service = DataExportService(export_dir=str(tmp_path))
+    assert service.get_job('../../etc/passwd') is None
+    assert service.get_job('job-doesnotexist1234') is None
+
+    job = ExportJob(job_id='job-abcdefghijklmnop', user_id='user-1', status='running')
+    service._save_job(job)
+    data = json.loads((tmp_path / f'{job.job_id}.json').read_text())
+    data['updated_at'] = time.time() - export_mod.EXPORT_STALE_SECONDS - 1
+    (tmp_path / f'{job.job_id}.json').write_text(json.dumps(data))
+
+    assert service.get_job(job.job_id).status == 'failed'
+
+
+def test_cleanup_expired_removes_old_archives(tmp_path):
+    service = DataExportService(export_dir=str(tmp_path))
+    job = ExportJob(job_id='job-abcdefghijklmnop', user_id='user-1', status='completed',
+                    completed_at=time.time() - export_mod.EXPORT_TTL_SECONDS - 1)
+    service._save_job(job)
+    service.archive_path(job.job_id).write_bytes(b'zip')
+
+    assert service.get_job(job.job_id) is None
+    assert service.cleanup_expired() == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stream_archive_deletes_archive_once_sent(tmp_path, fake_db):
+    service = DataExportService(export_dir=str(tmp_path))
+    job = ExportJob(job_id='job-abcdefghijklmnop', user_id='user-1')
+    service._save_job(job)
+    service.run_export(job)
+
+    streamed = b''.join(service.stream_archive(job.job_id))
+    assert streamed.startswith(b'PK')
+
+    assert not service.archive_path(job.job_id).exists()
+    assert service.get_job(job.job_id).status == 'downloaded'
+    # A downloaded export does not block a new request
+    fresh = service.start_export('user-1')
+    assert fresh.job_id != job.job_id
+    service._executor.shutdown(wait=True)
+
+
+def test_purge_user_removes_jobs_archives_and_pointer(tmp_path, fake_db):
+    service = DataExportService(export_dir=str(tmp_path))
+    job = ExportJob(job_id='job-abcdefghijklmnop', user_id='user-1')
+    service._save_job(job)
+    service.run_export(job)
+    other = ExportJob(job_id='job-qrstuvwxyz012345', user_id='user-2')
+    service._save_job(other)
+    service._user_pointer('user-1').write_text(json.dumps({'job_id': job.job_id}))
+
+    assert service.purge_user('user-1') == 1
+
+    assert not service.archive_path(job.job_id).exists()
+    assert service.get_job(job.job_id) is None
+    assert not service._user_pointer('user-1').exists()
+    assert service.get_job(other.job_id) is not None
+
+
+def test_export_purged_while_running_leaves_nothing_behind(tmp_path, fake_db, mocker):
+    service = DataExportService(export_dir=str(tmp_path))
+    job = ExportJob(job_id='job-abcdefghijklmnop', user_id='user-1')
+    service._save_job(job)
+    write_archive = service._write_archive
+
+    def purge_then_write(*args):
+        service.purge_user('user-1')
+        write_archive(*args)
+
+    mocker.patch.object(service, '_write_archive', side_effect=purge_then_write)
+
+    service.run_export(job)
+
+    assert list(tmp_path.iterdir()) == []
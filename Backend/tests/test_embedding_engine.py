@@ -0,0 +1,131 @@
+"""Tests for the shared embedding engine and the batched chat RAG ranking built on it."""
+
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from src.services import embedding_engine as engine_mod
+from src.services.chat_rag_service import ChatRAGService
+from src.services.embedding_engine import EmbeddingEngine, cosine_similarities, get_embedding_engine
+
+
+class _FakeModel:
+    """Deterministic 4-d 'model' that records every encode call."""
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.array([[t.count(c) for c in 'aezy'] for t in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+
+@pytest.fixture
+def fake_model():
+    return _FakeModel()
+
+
+@pytest.fixture
+def engine(mocker, fake_model):
+    eng = EmbeddingEngine('fake-model', cache_size=16)
+    mocker.patch.object(eng, '_load', side_effect=lambda: setattr(eng, '_model', fake_model))
+    return eng
+
+
+def test_encode_many_batches_and_dedupes(engine, fake_model):
+    matrix = engine.encode_many(['aa', 'bee', 'aa'])
+
+    assert matrix.shape == (3, 4)
+    assert np.array_equal(matrix[0], matrix[2])
+    assert fake_model.calls == [['aa', 'bee']]
+
+
+def test_encode_many_only_sends_cache_misses(engine, fake_model):
+    engine.encode_many(['aa', 'bee'])
+    engine.encode_many(['bee', 'cat'])
+
+    assert fake_model.calls == [['aa', 'bee'], ['cat']]
+    stats = engine.stats()
+    assert stats['batches'] == 2
+    assert stats['encoded_texts'] == 3
+    assert stats['cache_hits'] == 1
+
+
+def test_encode_single_text_and_dimension(engine):
+    vector = engine.encode('tea')
+    assert vector.tolist() == [1.0, 1.0, 0.0, 0.0]
+    assert engine.dimension == 4
+
+
+def test_unavailable_model_returns_none(mocker):
+    eng = EmbeddingEngine('missing-model')
+    mocker.patch.object(engine_mod, 'SENTENCE_TRANSFORMERS_AVAILABLE', False)
+
+    assert eng.encode_many(['x']) is None
+    assert eng.available is False
+    assert eng.dimension == engine_mod.DEFAULT_EMBEDDING_DIMENSION
+
+
+def test_encode_failure_returns_none(engine, fake_model, mocker):
+    mocker.patch.object(fake_model, 'encode', side_effect=RuntimeError('oom'))
+    assert engine.encode_many(['x']) is None
+    assert engine.stats()['errors'] == 1
+
+
+def test_registry_returns_one_engine_per_model():
+    assert get_embedding_engine('registry-model') is get_embedding_engine('registry-model')
+    assert get_embedding_engine('registry-model') is not get_embedding_engine('other-model')
+
+
+def test_cosine_similarities_handles_zero_rows():
+    matrix = np.array([[1.0, 0.0], [0.0, 0.0], [1.0, 1.0]], dtype=np.float32)
+    scores = cosine_similarities(np.array([1.0, 0.0], dtype=np.float32), matrix)
+    assert scores[0] == pytest.approx(1.0)
+    assert scores[1] == 0.0
+    assert scores[2] == pytest.approx(1 / np.sqrt(2))
+
+
+def test_chat_rag_ranks_all_sources_with_one_batch(engine, fake_model, mocker):
+    mocker.patch('src.services.chat_rag_service.PINECONE_AVAILABLE', False)
+    service = ChatRAGService('user-1', engine=engine)
+
+    now = datetime.now().isoformat()
+    mood_doc = MagicMock()
+    mood_doc.to_dict.return_value = {'mood_label': 'glad', 'note': 'a sunny day', 'timestamp': now}
+    journal_doc = MagicMock()
+    journal_doc.to_dict.return_value = {'title': 'Tankar', 'content': 'zzz', 'timestamp': now}
+
+    docs = {'moods': [mood_doc], 'journal_entries': [journal_doc]}
+
+    def subcollection(name):
+        query = MagicMock()
+        query.where.return_value.order_by.return_value.limit.return_value.get.return_value = docs[name]
+        return query
+
+    fake_db = MagicMock()
+    fake_db.collection.return_value.document.return_value.collection.side_effect = subcollection
+    mocker.patch('src.firebase_config.db', fake_db)
+
+    contexts = service.retrieve_context('a sunny day', context_types=['mood', 'journal'], max_results=3)
+
+    # Query embedding runs alongside the fetches; candidates follow in a single batch
+    assert sorted(map(len, fake_model.calls)) == [1, 2]
+    assert [c.source for c in contexts] == ['mood_logs']
+    assert contexts.timings['mood']['status'] == 'ok'
+    assert contexts[0].similarity > 0.6
+
+
+def test_chat_rag_uses_the_model_its_thresholds_were_calibrated_on(mocker):
+    mocker.patch('src.services.chat_rag_service.PINECONE_AVAILABLE', False)
+    from src.services import chat_rag_service
+
+    service = ChatRAGService('user-1')
+
+    assert service.engine.model_name == chat_rag_service.SOURCE_THRESHOLDS_MODEL
+    # Known width before the model is loaded, so a new index is sized right
+    assert EmbeddingEngine(chat_rag_service.SOURCE_THRESHOLDS_MODEL).dimension == 384
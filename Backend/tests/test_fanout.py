@@ -0,0 +1,99 @@
+"""Tests for the concurrent fan-out helper used by multi-source RAG retrieval."""
+
+import threading
+import time
+
+from src.utils.fanout import fan_out
+
+
+def test_tasks_run_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def task(value):
+        def run():
+            barrier.wait()  # deadlocks unless all three run at once
+            return value
+        return run
+
+    results = fan_out({'a': task(1), 'b': task(2), 'c': task(3)}, timeout=2)
+
+    assert {name: r.value for name, r in results.items()} == {'a': 1, 'b': 2, 'c': 3}
+    assert all(r.ok for r in results.values())
+
+
+def test_slow_task_is_dropped_at_its_deadline():
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 'late'
+
+    started = time.perf_counter()
+    results = fan_out({'fast': lambda: 'ok', 'slow': slow}, timeout=5, timeouts={'slow': 0.1})
+    elapsed = time.perf_counter() - started
+    release.set()
+
+    assert results['fast'].value == 'ok'
+    assert results['slow'].status == 'timeout'
+    assert results['slow'].value is None
+    assert elapsed < 2
+
+
+def test_errors_are_captured_with_timing():
+    def boom():
+        raise RuntimeError('firestore down')
+
+    results = fan_out({'bad': boom, 'good': lambda: 1}, timeout=1)
+
+    assert results['bad'].status == 'error'
+    assert results['bad'].as_metadata()['error'] == 'firestore down'
+    assert results['good'].as_metadata()['status'] == 'ok'
+    assert results['good'].elapsed_ms >= 0
+
+
+def test_empty_task_set():
+    assert fan_out({}, timeout=1) == {}
+
+
+def test_chat_rag_drops_slow_source_and_reports_timings(mocker):
+    from datetime import datetime
+
+    from src.services import chat_rag_service as rag_mod
+
+    mocker.patch.object(rag_mod, 'PINECONE_AVAILABLE', False)
+    service = rag_mod.ChatRAGService('user-1', engine=mocker.MagicMock())
+    release = threading.Event()
+
+    def slow_goals(db):
+        release.wait(5)
+        return []
+
+    mood = rag_mod.mood_entry('m1', {'mood_text': 'glad', 'note': '', 'timestamp': datetime.now().isoformat()})
+    mocker.patch.object(service, '_collect_mood_candidates', return_value=[mood])
+    mocker.patch.object(service, '_collect_goal_candidates', side_effect=slow_goals)
+
+    timings = {}
+    candidates = service._collect_candidates(None, ['mood', 'goals'], datetime.now(), timings, timeout=0.1)
+    release.set()
+
+    assert candidates == [mood]
+    assert timings['mood']['status'] == 'ok'
+    assert timings['goals']['status'] == 'timeout'
+
+
+def test_chat_rag_bootstrap_is_retried_when_a_source_query_fails(mocker):
+    from src.services import chat_rag_service as rag_mod
+
+    mocker.patch.object(rag_mod, 'PINECONE_AVAILABLE', False)
+    db = mocker.MagicMock()
+    db.collection.return_value.document.return_value.collection.side_effect = RuntimeError('firestore down')
+    mocker.patch('src.firebase_config.db', db)
+    index_service = mocker.MagicMock()
+    mocker.patch.object(rag_mod, 'vector_index_service', index_service)
+    service = rag_mod.ChatRAGService('user-1', engine=mocker.MagicMock())
+    service._bootstrap_submitted = True
+
+    service._bootstrap_index()
+
+    index_service.bootstrap.assert_not_called()
+    assert service._bootstrap_submitted is False
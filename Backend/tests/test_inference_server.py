@@ -0,0 +1,199 @@
+"""Tests for the host-wide inference server: batching, concurrency limits and the fallback contract."""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.services import embedding_engine as embedding_module
+from src.services import inference_server, model_warmup
+from src.services.embedding_engine import EmbeddingEngine
+from src.services.inference_server import (
+    InferenceServer,
+    InferenceTask,
+    InferenceUnavailable,
+    infer,
+    inference_stats,
+    run_inference,
+)
+
+
+@pytest.fixture
+def socket_dir():
+    # Unix socket paths are limited to ~100 bytes; pytest's tmp_path can be longer
+    directory = tempfile.mkdtemp(prefix='inf-', dir='/tmp')
+    yield Path(directory)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def start_server(socket_dir):
+    servers = []
+
+    def start(tasks, **kwargs):
+        server = InferenceServer(str(socket_dir / f'{len(servers)}.sock'), tasks, **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _concurrently(count, call):
+    results, errors = [None] * count, []
+
+    def run(index):
+        try:
+            results[index] = call(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_requests_arriving_together_run_as_one_batch(start_server):
+    batches = []
+
+    def double(payloads):
+        batches.append(len(payloads))
+        return [p * 2 for p in payloads]
+
+    server = start_server({'double': InferenceTask('double', double)}, batch_window_ms=100)
+
+    results, errors = _concurrently(6, lambda n: infer('double', n, timeout=5, socket_path=server.socket_path))
+
+    assert errors == []
+    assert results == [0, 2, 4, 6, 8, 10]
+    assert max(batches) > 1
+    stats = inference_stats(server.socket_path)['tasks']['double']
+    assert stats['batched_items'] == 6 and stats['batches'] == len(batches)
+
+
+def test_concurrency_limit_bounds_parallel_batches(start_server):
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def slow(payloads):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return payloads
+
+    server = start_server({'slow': InferenceTask('slow', slow, max_batch_size=1, concurrency=2)}, batch_window_ms=0)
+
+    results, errors = _concurrently(6, lambda n: infer('slow', n, timeout=5, socket_path=server.socket_path))
+
+    assert errors == [] and sorted(results) == list(range(6))
+    assert peak[0] == 2
+
+
+def test_timeout_overload_and_errors_raise_inference_unavailable(start_server):
+    release = threading.Event()
+
+    def blocked(payloads):
+        release.wait(5)
+        return payloads
+
+    def broken(payloads):
+        raise ValueError('model exploded')
+
+    server = start_server({
+        'blocked': InferenceTask('blocked', blocked, max_batch_size=1),
+        'broken': InferenceTask('broken', broken),
+    }, batch_window_ms=0, max_queue=1)
+    path = server.socket_path
+
+    with pytest.raises(InferenceUnavailable, match='timed out|timeout'):
+        infer('blocked', 1, timeout=0.2, socket_path=path)
+    # The runner is still busy with the timed-out call; one request fits the queue, the next is rejected
+    _, errors = _concurrently(3, lambda n: infer('blocked', n, timeout=0.5, socket_path=path))
+    release.set()
+    assert any('overloaded' in str(e) for e in errors)
+    assert inference_stats(path)['tasks']['blocked']['rejected'] >= 1
+
+    with pytest.raises(InferenceUnavailable, match='model exploded'):
+        infer('broken', 1, socket_path=path)
+    with pytest.raises(InferenceUnavailable, match='unknown task'):
+        infer('missing', 1, socket_path=path)
+
+
+def test_unreachable_server_raises_inference_unavailable(socket_dir):
+    with pytest.raises(InferenceUnavailable, match='unreachable'):
+        infer('embeddings', {}, timeout=0.5, socket_path=str(socket_dir / 'none.sock'))
+
+
+def test_run_inference_runs_inline_without_a_server(monkeypatch):
+    monkeypatch.setitem(inference_server._tasks, 'double', InferenceTask('double', lambda ps: [p * 2 for p in ps]))
+
+    assert not inference_server.use_inference_server()
+    assert run_inference('double', 21) == 42
+
+
+def test_started_server_is_used_even_before_its_socket_exists(monkeypatch, socket_dir):
+    # Workers forked while the server is still warming up must fall back, not load models
+    monkeypatch.setitem(inference_server._tasks, 'double', InferenceTask('double', lambda ps: [p * 2 for p in ps]))
+    monkeypatch.setattr(inference_server, 'INFERENCE_SERVER_ENABLED', True)
+    monkeypatch.setattr(inference_server, 'INFERENCE_SOCKET_PATH', str(socket_dir / 'warming.sock'))
+    monkeypatch.setattr(inference_server, '_started', True)
+
+    assert inference_server.use_inference_server()
+    with pytest.raises(InferenceUnavailable, match='unreachable'):
+        run_inference('double', 21, timeout=0.5)
+
+    engine = EmbeddingEngine('warming-test-model')
+    assert engine.model is None
+    assert engine.encode_many(['text']) is None
+    assert engine._load_attempted is False
+
+
+def test_embedding_engine_encodes_through_the_server_without_loading_a_model(monkeypatch):
+    calls = []
+
+    def fake_infer(task, payload):
+        calls.append((task, payload['texts']))
+        return np.ones((len(payload['texts']), 4), dtype=np.float32)
+
+    monkeypatch.setattr(embedding_module, 'use_inference_server', lambda: True)
+    monkeypatch.setattr(embedding_module, 'infer', fake_infer)
+    engine = EmbeddingEngine('remote-test-model')
+
+    matrix = engine.encode_many(['a', 'b', 'a'])
+    engine.encode_many(['b'])
+
+    assert matrix.shape == (3, 4)
+    # Duplicates and repeats are served from the worker's LRU
+    assert calls == [('embeddings', ['a', 'b'])]
+    assert engine.dimension == 4
+    assert engine._load_attempted is False
+
+    def unavailable(task, payload):
+        raise InferenceUnavailable('overloaded')
+
+    monkeypatch.setattr(embedding_module, 'infer', unavailable)
+    assert engine.encode_many(['new text']) is None
+
+
+def test_serve_listens_only_after_the_models_are_loaded(monkeypatch, socket_dir):
+    path = str(socket_dir / 'serve.sock')
+    socket_existed_during_warm_up = []
+    monkeypatch.setattr(inference_server, '_serving', False)
+    monkeypatch.setattr(model_warmup, 'warm_up',
+                        lambda names, freeze: socket_existed_during_warm_up.append(os.path.exists(path)))
+    monkeypatch.setattr(InferenceServer, 'wait', InferenceServer.shutdown)
+
+    inference_server.serve(path)
+
+    assert socket_existed_during_warm_up == [False]
@@ -0,0 +1,73 @@
+"""Tests for lazy loading of heavy dependencies and the startup import-time check."""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.utils.lazy_imports import is_available, lazy_module, load_times
+
+SCRIPT_PATH = Path(__file__).resolve().parents[1] / "scripts" / "check_import_time.py"
+SPEC = importlib.util.spec_from_file_location("check_import_time_script", SCRIPT_PATH)
+assert SPEC and SPEC.loader
+check_import_time = importlib.util.module_from_spec(SPEC)
+sys.modules[SPEC.name] = check_import_time  # dataclasses resolve annotations through sys.modules
+SPEC.loader.exec_module(check_import_time)
+
+
+@pytest.fixture
+def fake_package(tmp_path, monkeypatch):
+    """A throwaway package that records every time it is imported."""
+    name = f"lazy_fake_{tmp_path.name.replace('-', '_')}"
+    (tmp_path / f"{name}.py").write_text("import builtins\nbuiltins._lazy_fake_imports += 1\nVALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr('builtins._lazy_fake_imports', 0, raising=False)
+    yield name
+    sys.modules.pop(name, None)
+
+
+def test_is_available_does_not_import(fake_package):
+    assert is_available(fake_package)
+    assert fake_package not in sys.modules
+    assert not is_available('no_such_package_for_lugn_trygg')
+
+
+def test_lazy_module_imports_on_first_use_and_configures_once(fake_package):
+    import builtins
+
+    configured = []
+    module = lazy_module(fake_package, on_load=configured.append)
+    assert fake_package not in sys.modules
+
+    assert module.VALUE == 42
+    module.VALUE = 7
+    assert module.VALUE == 7
+    assert builtins._lazy_fake_imports == 1
+    assert [m.__name__ for m in configured] == [fake_package]
+    assert fake_package in load_times()
+
+
+def test_parse_importtime_links_modules_to_their_importer():
+    output = "\n".join([
+        "import time:       100 |        100 |   site",
+        check_import_time.START_MARKER,
+        "import time:       500 |        500 |     sklearn.utils",
+        "import time:       300 |        800 |   sklearn",
+        "import time:       200 |       1000 | src.services.predictive_service",
+        "import time:        50 |         50 | src.routes.health_routes",
+    ])
+
+    records = {r.name: r for r in check_import_time.parse_importtime(output)}
+
+    assert 'site' not in records
+    assert records['sklearn.utils'].parent.name == 'sklearn'
+    assert records['sklearn'].parent.name == 'src.services.predictive_service'
+    assert records['src.routes.health_routes'].parent is None
+
+
+def test_blueprint_modules_do_not_import_heavy_dependencies():
+    report = check_import_time.measure(check_import_time.blueprint_modules(), offline=True)
+
+    assert report.heavy == {}
+    assert {r.name for r in report.records if r.depth == 0} >= {'src.routes.mood_routes', 'src.routes.predictive_routes'}
@@ -0,0 +1,198 @@
+"""Tests for the leaderboard rank index (in-process boards and the Redis sorted-set path)."""
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.services import leaderboard_index as index_mod
+from src.services.leaderboard_index import LeaderboardIndex, MemoryBoard
+
+
+def test_memory_board_competition_ranks_and_updates():
+    board = MemoryBoard({'a': 10, 'b': 30, 'c': 10, 'd': 5})
+
+    assert board.rank_of(30) == 1
+    assert board.rank_of(10) == 2  # a and c tie
+    assert board.rank_of(5) == 4
+    assert board.rank_of(7) == 4  # unseen score ranks after everyone above it
+
+    board.set('d', 40)
+    board.set('b', 30)  # unchanged score is a no-op
+    assert board.rank_of(40) == 1
+    assert board.entries(0, 10) == [('d', 40), ('b', 30), ('a', 10), ('c', 10)]
+    assert board.position_of('c') == 3
+    assert board.position_of('zz') is None
+    assert len(board) == 4
+
+
+class FakeRedis:
+    """The sorted-set, hash and string commands the index uses, held in dicts."""
+
+    def __init__(self):
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.strings: dict[str, str] = {}
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    def _ordered(self, key):
+        return sorted(self.zsets.get(key, {}).items(), key=lambda item: (-item[1], item[0]))
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update({k: float(v) for k, v in mapping.items()})
+
+    def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    def zrevrank(self, key, member):
+        members = [m for m, _ in self._ordered(key)]
+        return members.index(member) if member in members else None
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def zcount(self, key, low, high):
+        threshold = float(low.lstrip('('))
+        return sum(1 for v in self.zsets.get(key, {}).values() if v > threshold)
+
+    def zrevrange(self, key, start, stop, withscores=False):
+        return self._ordered(key)[start:stop + 1]
+
+    def echo(self, value):
+        return value
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        self.hashes.setdefault(key, {}).update(mapping or {field: value})
+
+    def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(f) for f in fields]
+
+    def get(self, key):
+        return self.strings.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.strings:
+            return False
+        self.strings[key] = value
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.zsets.pop(key, None)
+            self.hashes.pop(key, None)
+            self.strings.pop(key, None)
+
+    def rename(self, src, dst):
+        for store in (self.zsets, self.hashes, self.strings):
+            if src in store:
+                store[dst] = store.pop(src)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+@pytest.fixture
+def fake_db(mocker):
+    def snap(doc_id, data):
+        s = MagicMock(id=doc_id)
+        s.to_dict.return_value = data
+        return s
+
+    pages = {
+        'user_rewards': [snap('u1', {'xp': 500}), snap('u2', {'total_xp': 900}), snap('u3', {'xp': 500})],
+        'users': [
+            snap('u1', {'current_streak': 3, 'mood_count': 40, 'email': 'anna@example.com'}),
+            snap('u2', {'current_streak': 9, 'mood_count': 10, 'display_name': 'Bo'}),
+            snap('u3', {'mood_count': 40}),
+            snap('u4', {'current_streak': 1}),
+        ],
+    }
+
+    def collection(name):
+        coll = MagicMock()
+        coll.select.return_value.order_by.return_value.limit.return_value.stream.return_value = pages[name]
+        return coll
+
+    fake = MagicMock()
+    fake.collection.side_effect = collection
+    mocker.patch.object(index_mod, 'db', fake)
+    return fake
+
+
+@pytest.mark.parametrize('use_redis', [False, True])
+def test_positions_after_rebuild(fake_db, use_redis):
+    index = LeaderboardIndex(use_redis=use_redis)
+    if use_redis:
+        index._redis = FakeRedis()
+
+    assert index.rebuild()
+    positions = index.positions('u3', radius=1)
+
+    assert fake_db.collection.call_count == 2
+    assert positions['xp'].rank == 2 and positions['xp'].score == 500
+    assert positions['xp'].total == 4
+    assert positions['moods'].rank == 1  # tied with u1
+    assert positions['streak'].rank == 4 and positions['streak'].score == 0
+    assert positions['moods'].percentile == 75.0
+    assert [(e.user_id, e.rank) for e in positions['xp'].neighbors] == [('u1', 2), ('u3', 2)]
+    assert index.display_names(['u1', 'u2', 'u9']) == {'u1': 'an***a', 'u2': 'B***'}
+    assert index.positions('nobody') is None
+
+    index.record_scores('u3', xp=1000)
+    assert index.positions('u3')['xp'].rank == 1
+    assert fake_db.collection.call_count == 2  # no further Firestore reads
+
+
+def _wait_for_rebuild(index):
+    deadline = time.time() + 5
+    while not index._built_at and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_cold_index_is_built_in_the_background(fake_db, mocker):
+    index = LeaderboardIndex(use_redis=False)
+    started = threading.Event()
+    release = threading.Event()
+    load_scores = index._load_scores
+
+    def slow_load():
+        started.set()
+        release.wait(5)
+        return load_scores()
+
+    mocker.patch.object(index, '_load_scores', side_effect=slow_load)
+
+    # The first request does not wait for the paged rebuild
+    assert index.ensure_ready() is False
+    assert index.positions('u2') is None
+    assert started.wait(5)
+    release.set()
+    _wait_for_rebuild(index)
+
+    assert index.ensure_ready() is True
+    assert index.positions('u2')['xp'].rank == 1
+
+
+def test_redis_error_falls_back_to_memory_boards(fake_db):
+    index = LeaderboardIndex(use_redis=True)
+    broken = MagicMock()
+    broken.get.side_effect = ConnectionError('redis down')
+    index._redis = broken
+
+    assert index.positions('u2') is None  # in-process boards are cold, built in the background
+    assert index._redis is None
+    _wait_for_rebuild(index)
+
+    assert index.positions('u2')['xp'].rank == 1
@@ -0,0 +1,98 @@
+"""Tests for materialized leaderboard pages and weekly winner snapshots."""
+
+import json
+import time
+from datetime import date
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.services import leaderboard_pages as pages_mod
+from src.services.leaderboard_pages import LeaderboardPage, LeaderboardPageService
+from src.utils.cache import TwoTierCache
+
+
+def _snap(doc_id, data, exists=True):
+    snap = MagicMock(id=doc_id, exists=exists)
+    snap.to_dict.return_value = data
+    return snap
+
+
+@pytest.fixture
+def fake_db(mocker):
+    fake = MagicMock()
+    rewards = fake.collection.return_value.order_by.return_value.limit.return_value
+    rewards.stream.side_effect = lambda: iter([
+        _snap('u1', {'xp': 900, 'level': 4, 'badges': ['a']}),
+        _snap('u2', {'total_xp': 300}),
+        _snap('u3', {'xp': 0}),
+    ])
+    fake.get_all.side_effect = lambda refs: iter([
+        _snap('u1', {'email': 'anna@example.com'}),
+        _snap('u2', {}, exists=False),
+    ])
+    mocker.patch.object(pages_mod, 'db', fake)
+    return fake
+
+
+@pytest.fixture
+def service():
+    return LeaderboardPageService(cache=TwoTierCache('test_pages', use_redis=False))
+
+
+def test_page_renders_valid_envelope_and_limits_rows(service, fake_db):
+    page = service.get_page('xp')
+
+    body, etag = page.render_leaderboard(1, timeframe='all')
+    payload = json.loads(body)
+
+    assert payload['success'] is True
+    assert payload['message'] == 'Retrieved 1 users'
+    assert payload['data']['timeframe'] == 'all'
+    assert payload['data']['leaderboard'] == [{
+        'rank': 1, 'userId': 'u1', 'displayName': 'an***a', 'xp': 900,
+        'level': 4, 'badgeCount': 1, 'avatar': '🌟',
+    }]
+    assert etag != page.render_leaderboard(2, timeframe='all')[1]
+    assert len(json.loads(page.render_leaderboard(100)[0])['data']['leaderboard']) == 2
+    fake_db.get_all.assert_called_once()  # names resolved in one batch
+
+
+def test_page_is_materialized_once_and_refreshed_when_stale(service, fake_db, mocker):
+    first = service.get_page('xp')
+    assert service.get_page('xp').etag == first.etag
+    assert fake_db.collection.return_value.order_by.call_count == 1
+
+    refresh = mocker.patch.object(service, '_refresh_in_background')
+    service.refresh_seconds = 0
+    time.sleep(0.01)
+    service.get_page('xp')
+    refresh.assert_called_once_with('xp')
+
+
+def test_cache_round_trip_keeps_etag():
+    page = LeaderboardPage('moods', ['{"rank":1}'], '2026-01-01T00:00:00+00:00')
+    assert LeaderboardPage.from_cache_value(page.as_cache_value()) == page
+
+
+def test_weekly_winners_are_frozen_once(service, fake_db):
+    snapshot_ref = fake_db.collection.return_value.document.return_value
+    snapshot_ref.get.return_value = _snap('weekly-2026-10-05', {}, exists=False)
+
+    page = service.get_weekly_winners(today=date(2026, 10, 14))
+
+    stored = snapshot_ref.create.call_args[0][0]
+    fake_db.collection.return_value.document.assert_any_call('weekly-2026-10-05')
+    assert stored['extra']['weekStart'].startswith('2026-10-05')
+    assert [json.loads(row)['xp'] for row in stored['rows']] == [900, 300]
+
+    payload = json.loads(page.render_winners()[0])
+    assert payload['data']['weekEnd'].startswith('2026-10-11')
+    assert payload['data']['winners']['xp'][0] == {'displayName': 'an***a', 'xp': 900, 'avatar': '🏆'}
+
+    # Served from the cache afterwards, and an existing snapshot is reused as-is
+    assert service.get_weekly_winners(today=date(2026, 10, 16)).etag == page.etag
+    other = LeaderboardPageService(cache=TwoTierCache('test_pages_2', use_redis=False))
+    snapshot_ref.get.return_value = _snap('weekly-2026-10-05', stored)
+    assert other.get_weekly_winners(today=date(2026, 10, 12)).etag == page.etag
+    assert snapshot_ref.create.call_count == 1
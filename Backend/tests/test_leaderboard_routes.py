@@ -2,17 +2,26 @@
 Tests for leaderboard_routes.py
 Covers: XP, streaks, moods, user rank, weekly winners.
 """
+import time
 from unittest.mock import MagicMock
 
 import pytest
 
+from src.services.leaderboard_index import LeaderboardIndex
+from src.services.leaderboard_pages import LeaderboardPageService
+from src.utils.cache import TwoTierCache
+
 BASE = "/api/v1/leaderboard"
 USER_ID = "testuser1234567890ab"
 
 
 @pytest.fixture
-def mock_leaderboard_db(mock_db):
+def mock_leaderboard_db(mock_db, mocker):
     """Set up mock Firestore for leaderboard queries."""
+    mocker.patch("src.routes.leaderboard_routes.leaderboard_index", LeaderboardIndex(use_redis=False))
+    mocker.patch("src.routes.leaderboard_routes.leaderboard_pages",
+                 LeaderboardPageService(cache=TwoTierCache("test_leaderboard_pages", use_redis=False)))
+
     # Mock user_rewards docs
     reward_doc = MagicMock()
     reward_doc.id = USER_ID
@@ -102,6 +111,51 @@ class TestUserRank:
         assert "rankings" in body["data"]
         assert "xp" in body["data"]["rankings"]
 
+    def test_user_rank_reads_index(self, client, auth_headers, mock_leaderboard_db, mocker):
+        index = LeaderboardIndex(use_redis=False)
+        index._built_at = time.time()
+        for i, (xp, streak) in enumerate([(3000, 20), (1500, 14), (200, 3)]):
+            index.record_scores(f"user{i}abcdefghijklmnopq", xp=xp, streak=streak, moods=i,
+                                display_name=f"us***{i}")
+        index.record_scores(USER_ID, xp=1500, streak=14, moods=150, display_name="Te***r")
+        mocker.patch("src.routes.leaderboard_routes.leaderboard_index", index)
+        mock_leaderboard_db.collection.reset_mock()
+
+        resp = client.get(f"{BASE}/user/{USER_ID}/rank", headers=auth_headers)
+
+        data = resp.get_json()["data"]
+        assert data["totalUsers"] == 4
+        assert data["rankings"]["xp"]["rank"] == 2
+        assert data["rankings"]["moods"] == {
+            "rank": 1, "value": 150, "percentile": 75.0,
+            "neighbors": [
+                {"rank": 1, "displayName": "Te***r", "value": 150, "isCurrentUser": True},
+                {"rank": 2, "displayName": "us***2", "value": 2, "isCurrentUser": False},
+                {"rank": 3, "displayName": "us***1", "value": 1, "isCurrentUser": False},
+            ],
+        }
+        mock_leaderboard_db.collection.assert_not_called()
+
+    def test_user_rank_counts_in_firestore_while_index_is_cold(self, client, auth_headers, mock_leaderboard_db, mocker):
+        index = LeaderboardIndex(use_redis=False)
+        rebuild = mocker.patch.object(index, "_rebuild_in_background")
+        mocker.patch("src.routes.leaderboard_routes.leaderboard_index", index)
+        counts = {"users": 4, "user_rewards": 3}
+        for name, count in counts.items():
+            collection = mock_leaderboard_db.collection(name)
+            collection.count.return_value.get.return_value = [[MagicMock(value=count)]]
+            ahead = MagicMock()
+            ahead.count.return_value.get.return_value = [[MagicMock(value=1)]]
+            collection.where = MagicMock(return_value=ahead)
+
+        resp = client.get(f"{BASE}/user/{USER_ID}/rank", headers=auth_headers)
+
+        data = resp.get_json()["data"]
+        rebuild.assert_called_once()
+        assert data["totalUsers"] == 4
+        assert data["rankings"]["xp"] == {"rank": 2, "value": 1500, "percentile": 50.0, "neighbors": []}
+        assert data["rankings"]["streak"]["value"] == 14
+
     def test_user_rank_alt(self, client, auth_headers, mock_leaderboard_db):
         resp = client.get(f"{BASE}/user/{USER_ID}", headers=auth_headers)
         assert resp.status_code == 200
@@ -113,3 +167,22 @@ class TestWeeklyWinners:
     def test_weekly_winners(self, client, auth_headers, mock_leaderboard_db):
         resp = client.get(f"{BASE}/weekly-winners", headers=auth_headers)
         assert resp.status_code == 200
+
+
+class TestLeaderboardCaching:
+    """Materialized pages are served with ETags and revalidate to 304."""
+
+    def test_etag_round_trip(self, client, auth_headers, mock_leaderboard_db):
+        first = client.get(f"{BASE}/xp?limit=5", headers=auth_headers)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        assert first.get_json()["data"]["leaderboard"][0]["xp"] == 1500
+
+        again = client.get(f"{BASE}/xp?limit=5", headers={**auth_headers, "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.data == b""
+
+        other_limit = client.get(f"{BASE}/xp?limit=6", headers={**auth_headers, "If-None-Match": etag})
+        assert other_limit.status_code == 200
+        # The page was materialized once: one ordered query for both requests
+        assert mock_leaderboard_db.collection("user_rewards").order_by.call_count == 1
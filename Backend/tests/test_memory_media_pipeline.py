@@ -0,0 +1,166 @@
+"""Tests for the background memory media pipeline (thumbnails, analysis, progress patches)."""
+
+import io
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from src.services import memory_media_pipeline as pipeline_module
+from src.services.memory_media_pipeline import (
+    MemoryMediaPipeline,
+    media_status_response,
+    processing_status,
+    render_thumbnails,
+    thumbnail_path,
+)
+
+
+def _jpeg(size=(1600, 1200), color=(220, 140, 40)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def _memory(photo_statuses):
+    return {
+        'user_id': 'user1',
+        'content': '',
+        'media': {'photo_details': [
+            {'photo_id': f'p{i}', 'storage_path': f'memories/user1/p{i}.jpg', 'status': status}
+            for i, status in enumerate(photo_statuses)
+        ]},
+        'media_processing': processing_status('pending', 0, len(photo_statuses) + 1),
+    }
+
+
+@pytest.fixture
+def memory_doc(mocker):
+    doc_ref = MagicMock()
+    mock_db = MagicMock()
+    mock_db.collection.return_value.document.return_value = doc_ref
+    mocker.patch.object(pipeline_module, 'db', mock_db)
+    return doc_ref
+
+
+@pytest.fixture
+def bucket(mocker):
+    bucket = MagicMock()
+    blobs = {}
+
+    def blob(path):
+        if path not in blobs:
+            blobs[path] = MagicMock(name=path)
+            blobs[path].download_as_bytes.return_value = _jpeg()
+            blobs[path].generate_signed_url.return_value = f'https://signed/{path}'
+        return blobs[path]
+
+    bucket.blob.side_effect = blob
+    bucket.blobs = blobs
+    mocker.patch.object(pipeline_module, 'storage', MagicMock(bucket=MagicMock(return_value=bucket)))
+    return bucket
+
+
+def test_render_thumbnails_encodes_webp_at_each_size():
+    thumbnails = render_thumbnails(_jpeg((4000, 3000)), sizes=(160, 480))
+
+    assert sorted(thumbnails) == [160, 480]
+    for size, data in thumbnails.items():
+        image = Image.open(io.BytesIO(data))
+        assert image.format == 'WEBP'
+        assert max(image.size) == size
+    assert thumbnail_path('memories/u/photo_1.jpg', 160) == 'memories/u/photo_1_160.webp'
+
+
+def test_process_memory_thumbnails_analyzes_and_reports_progress(memory_doc, bucket):
+    memory_doc.get.return_value = MagicMock(exists=True, to_dict=lambda: _memory(['pending', 'pending']))
+
+    state = MemoryMediaPipeline(photo_workers=2).process_memory('mem1')
+
+    assert state == 'ready'
+    patches = [call.args[0] for call in memory_doc.update.call_args_list]
+    assert [p['media_processing']['state'] for p in patches] == ['processing', 'processing', 'processing', 'ready']
+    assert [p['media_processing']['progress'] for p in patches] == [0, 33, 66, 100]
+
+    final = patches[-1]
+    photos = final['media.photo_details']
+    assert all(p['status'] == 'ready' for p in photos)
+    assert photos[0]['thumbnail_paths'] == {
+        str(size): f'memories/user1/p0_{size}.webp' for size in (160, 480, 1080)
+    }
+    assert photos[0]['analysis']['emotion']
+    assert final['ai_analysis']['photo_insights'] == [photos[0]['analysis'], photos[1]['analysis']]
+    bucket.blobs['memories/user1/p0_1080.webp'].upload_from_string.assert_called_once()
+
+
+def test_process_memory_analyzes_photos_in_one_batch(memory_doc, bucket, mocker):
+    memory_doc.get.return_value = MagicMock(exists=True, to_dict=lambda: _memory(['pending', 'ready', 'pending']))
+    service = pipeline_module.get_photo_analysis_service()
+    analyze_photos = mocker.patch.object(service, 'analyze_photos', wraps=service.analyze_photos)
+
+    assert MemoryMediaPipeline(photo_workers=2).process_memory('mem1') == 'ready'
+
+    analyze_photos.assert_called_once()
+    assert [photo_id for _, photo_id in analyze_photos.call_args.args[0]] == ['p0', 'p2']
+
+
+def test_process_memory_skips_ready_photos_and_marks_failures_partial(memory_doc, bucket):
+    memory_doc.get.return_value = MagicMock(exists=True, to_dict=lambda: _memory(['ready', 'pending']))
+    bucket.blob('memories/user1/p1.jpg').download_as_bytes.side_effect = OSError('gone')
+
+    state = MemoryMediaPipeline().process_memory('mem1')
+
+    assert state == 'partial'
+    assert 'memories/user1/p0.jpg' not in bucket.blobs
+    final = memory_doc.update.call_args.args[0]
+    assert [p['status'] for p in final['media.photo_details']] == ['ready', 'failed']
+    assert final['media_processing']['failed_photos'] == 1
+
+
+def test_process_memory_records_failure(memory_doc, mocker):
+    memory_doc.get.return_value = MagicMock(exists=True, to_dict=lambda: _memory([]))
+    mocker.patch.object(MemoryMediaPipeline, '_analyze_multimodal', side_effect=RuntimeError('boom'))
+
+    assert MemoryMediaPipeline().process_memory('mem1') == 'failed'
+    assert memory_doc.update.call_args.args[0]['media_processing']['state'] == 'failed'
+
+
+def test_submit_deduplicates_queued_memories(mocker):
+    pipeline = MemoryMediaPipeline(max_workers=1)
+    process = mocker.patch.object(pipeline, 'process_memory')
+    pipeline._in_flight.add('mem1')
+
+    assert pipeline.submit('mem1') is False
+    process.assert_not_called()
+
+
+def test_status_response_signs_stored_paths(bucket):
+    memory = _memory(['ready', 'pending'])
+    memory['media']['photo_details'][0]['thumbnail_paths'] = {'160': 'memories/user1/p0_160.webp',
+                                                              '480': 'memories/user1/p0_480.webp'}
+
+    status = media_status_response(memory, bucket)
+
+    first, second = status['photos']
+    assert first['url'] == 'https://signed/memories/user1/p0.jpg'
+    assert first['thumbnail'] == 'https://signed/memories/user1/p0_480.webp'
+    assert first['thumbnails']['160'] == 'https://signed/memories/user1/p0_160.webp'
+    assert second['thumbnail'] is None and second['status'] == 'pending'
+    assert media_status_response({}, bucket)['state'] == 'ready'  # memories from before the pipeline
+
+
+def test_stalled_lookup(mocker):
+    old = {'media_processing': {**processing_status('processing', 1, 3),
+                                'updated_at': datetime.now(UTC) - timedelta(hours=1)}}
+    fresh = {'media_processing': processing_status('processing', 1, 3)}
+    query = MagicMock()
+    query.stream.return_value = [
+        MagicMock(id='old', to_dict=lambda: old),
+        MagicMock(id='fresh', to_dict=lambda: fresh),
+    ]
+    mock_db = MagicMock()
+    mock_db.collection.return_value.where.return_value.limit.return_value = query
+    mocker.patch.object(pipeline_module, 'db', mock_db)
+
+    assert MemoryMediaPipeline().find_stalled() == ['old']
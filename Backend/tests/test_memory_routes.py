@@ -459,8 +459,8 @@ class TestMemoryGet:
         body = response.get_json()
         assert 'Invalid file path' in body['message']
 
-    def test_get_file_not_in_storage(self, client, mock_db, mocker):
-        """File not found in Firebase Storage → 404."""
+    def test_get_signs_stored_path_without_exists_check(self, client, mock_db, mocker):
+        """The stored file_path is signed directly; no blob.exists() round trip."""
         mocker.patch(
             'src.routes.memory_routes.input_sanitizer.sanitize',
             side_effect=lambda val, *a, **kw: val,
@@ -477,13 +477,13 @@ class TestMemoryGet:
         mock_db.collection('memories').document.return_value.get.return_value = doc_snap
 
         mock_stor, mock_bucket, mock_blob = _mock_storage()
-        mock_blob.exists.return_value = False
         mocker.patch('src.routes.memory_routes.storage', mock_stor)
 
         response = client.get(f'{BASE}/get/{VALID_MEMORY_ID}')
-        assert response.status_code == 404
-        body = response.get_json()
-        assert 'File not found in storage' in body['message']
+        assert response.status_code == 200
+        assert response.get_json()['data']['url'] == 'https://signed-url.example.com/file'
+        mock_blob.exists.assert_not_called()
+        mock_bucket.blob.assert_called_once_with(file_path)
 
     def test_get_success(self, client, mock_db, mocker):
         """Successful retrieval → 200 with signed URL."""
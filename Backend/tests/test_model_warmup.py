@@ -0,0 +1,75 @@
+"""Tests for preloading ML models in the gunicorn master before fork."""
+
+import gc
+import os
+
+import pytest
+
+from src.services import model_warmup as warmup_module
+from src.services.model_warmup import ModelWarmup, model_warmup
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(warmup_module, '_cuda_available', lambda: False)
+    registry = ModelWarmup()
+    models = {}
+
+    def loader(name):
+        def load():
+            models[name] = bytearray(1024)
+            return models[name]
+        return load
+
+    registry.register('small', 'test model', loader('small'), lambda: 'small' in models)
+    registry.register('disabled', 'feature flag off', lambda: None, lambda: False)
+    registry.register('broken', 'fails to load', lambda: 1 / 0, lambda: False)
+    return registry
+
+
+def test_selected_parses_model_preload(registry):
+    assert registry.selected('all') == ['small', 'disabled', 'broken']
+    assert registry.selected('none') == []
+    assert registry.selected('') == []
+    assert registry.selected('small, unknown') == ['small']
+
+
+def test_warm_up_loads_models_and_records_failures(registry):
+    results = registry.warm_up(['small', 'disabled', 'broken'], freeze=False)
+
+    assert results['small'].loaded
+    assert results['small'].pid == os.getpid()
+    assert not results['disabled'].loaded and results['disabled'].error is None
+    assert not results['broken'].loaded and 'division' in results['broken'].error
+
+    models = {m['name']: m for m in registry.status()['models']}
+    assert models['small']['loaded']
+    # Loaded in this process, not inherited from a master
+    assert not models['small']['preloaded']
+    assert models['small']['load_seconds'] is not None
+
+
+def test_status_marks_models_inherited_through_fork(registry):
+    results = registry.warm_up(['small'], freeze=False)
+    # As seen from a worker: the warm-up ran in the master
+    results['small'].pid = os.getppid()
+
+    status = registry.status()
+
+    assert {m['name']: m['preloaded'] for m in status['models']} == {
+        'small': True, 'disabled': False, 'broken': False,
+    }
+    assert status['memory']['rss'] > 0
+
+
+def test_warm_up_freezes_the_heap(registry):
+    try:
+        registry.warm_up(['small'], freeze=True)
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+
+def test_builtin_models_are_registered_without_loading_them():
+    assert model_warmup.names() == ['ml_sentiment', 'mood_nlp', 'transformer_sentiment', 'embeddings']
+    assert model_warmup.warm_up([], freeze=True) == {}
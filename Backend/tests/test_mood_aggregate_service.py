@@ -0,0 +1,149 @@
+"""Tests for the run-length encoded mood aggregate used by /api/mood/streaks."""
+
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+
+from src.services import mood_aggregate_service as agg_mod
+from src.services.mood_aggregate_service import (
+    add_day,
+    day_key,
+    decode_runs,
+    encode_runs,
+    remove_day,
+    runs_from_days,
+    summarize,
+)
+
+
+def _ord(value: str) -> int:
+    return date.fromisoformat(value).toordinal()
+
+
+def test_day_key_handles_strings_dates_and_garbage():
+    assert day_key('2025-03-04T10:00:00Z') == '2025-03-04'
+    assert day_key(date(2025, 3, 4)) == '2025-03-04'
+    assert day_key('not-a-date') is None
+    assert day_key(None) is None
+
+
+def test_add_day_extends_and_merges_runs():
+    runs = runs_from_days(['2025-01-01', '2025-01-03'])
+    assert len(runs) == 2
+
+    assert add_day(runs, _ord('2025-01-02')) is True
+    assert runs == [[_ord('2025-01-01'), 3]]
+
+    # Already logged day is a no-op
+    assert add_day(runs, _ord('2025-01-02')) is False
+
+    assert add_day(runs, _ord('2024-12-31')) is True
+    assert add_day(runs, _ord('2025-01-10')) is True
+    assert runs == [[_ord('2024-12-31'), 4], [_ord('2025-01-10'), 1]]
+
+
+def test_remove_day_splits_runs():
+    runs = runs_from_days(['2025-01-01', '2025-01-02', '2025-01-03'])
+
+    assert remove_day(runs, _ord('2025-01-05')) is False
+    assert remove_day(runs, _ord('2025-01-02')) is True
+    assert runs == [[_ord('2025-01-01'), 1], [_ord('2025-01-03'), 1]]
+
+    assert remove_day(runs, _ord('2025-01-01')) is True
+    assert runs == [[_ord('2025-01-03'), 1]]
+
+
+def test_encode_decode_roundtrip():
+    runs = runs_from_days(['2025-01-01', '2025-01-02', '2025-02-01'])
+    encoded = encode_runs(runs)
+    assert encoded == [{'start': '2025-01-01', 'days': 2}, {'start': '2025-02-01', 'days': 1}]
+    assert decode_runs(encoded) == runs
+    assert decode_runs([{'start': 'bad', 'days': 1}, 'junk']) == []
+
+
+def test_summarize_matches_streak_semantics():
+    today = date(2025, 6, 30)
+    days = [(today - timedelta(days=offset)).isoformat() for offset in (0, 1, 3, 4, 5, 40)]
+    aggregate = {'runs': encode_runs(runs_from_days(days))}
+
+    result = summarize(aggregate, today)
+
+    assert result['currentStreak'] == 2
+    assert result['longestStreak'] == 3
+    assert result['totalLoggedDays'] == 6
+    assert result['consistencyPercentage'] == round(5 / 30 * 100, 1)
+    assert result['lastLogDate'] == '2025-06-30'
+
+
+def test_summarize_no_current_streak_when_today_missing():
+    today = date(2025, 6, 30)
+    aggregate = {'runs': encode_runs(runs_from_days(['2025-06-28', '2025-06-29']))}
+    assert summarize(aggregate, today)['currentStreak'] == 0
+
+
+def test_summarize_empty_aggregate():
+    result = summarize(None)
+    assert result['totalLoggedDays'] == 0
+    assert result['lastLogDate'] is None
+
+
+def test_record_log_skips_users_without_aggregate(mocker):
+    fake_db = MagicMock()
+    missing = MagicMock(exists=False)
+    fake_db.collection.return_value.document.return_value.get.return_value = missing
+    fake_db.transaction.side_effect = RuntimeError('no transactions in tests')
+    mocker.patch.object(agg_mod, 'db', fake_db)
+
+    agg_mod.MoodAggregateService().record_log('user-1', '2025-01-01T08:00:00Z')
+
+    fake_db.collection.return_value.document.return_value.set.assert_not_called()
+
+
+def test_record_log_updates_existing_aggregate(mocker):
+    fake_db = MagicMock()
+    existing = MagicMock(exists=True)
+    existing.to_dict.return_value = {'runs': [{'start': '2025-01-01', 'days': 1}]}
+    doc_ref = fake_db.collection.return_value.document.return_value
+    doc_ref.get.return_value = existing
+    fake_db.transaction.side_effect = RuntimeError('no transactions in tests')
+    mocker.patch.object(agg_mod, 'db', fake_db)
+
+    agg_mod.MoodAggregateService().record_log('user-1', '2025-01-02T08:00:00Z')
+
+    written = doc_ref.set.call_args[0][0]
+    assert written['runs'] == [{'start': '2025-01-01', 'days': 2}]
+    assert written['longest_streak'] == 2
+    assert written['last_log_date'] == '2025-01-02'
+
+
+def test_record_removal_keeps_day_with_other_moods(mocker):
+    fake_db = MagicMock()
+    existing = MagicMock(exists=True)
+    existing.to_dict.return_value = {'runs': [{'start': '2025-01-01', 'days': 3}]}
+    doc_ref = fake_db.collection.return_value.document.return_value
+    doc_ref.get.return_value = existing
+    stream = doc_ref.collection.return_value.where.return_value.where.return_value.limit.return_value.stream
+    stream.return_value = [MagicMock()]
+    fake_db.transaction.side_effect = RuntimeError('no transactions in tests')
+    mocker.patch.object(agg_mod, 'db', fake_db)
+
+    agg_mod.MoodAggregateService().record_removal('user-1', '2025-01-02T08:00:00Z')
+
+    doc_ref.set.assert_not_called()
+
+
+def test_record_removal_checks_day_inside_transaction(mocker):
+    service = agg_mod.MoodAggregateService()
+    has_mood = mocker.patch.object(service, '_has_mood_on_day', return_value=False)
+    applied = {}
+
+    def fake_apply(user_id, mutate):
+        runs = [[date(2025, 1, 1).toordinal(), 3]]
+        applied['changed'] = mutate(runs, 'txn')
+        applied['runs'] = runs
+
+    mocker.patch.object(service, '_apply', side_effect=fake_apply)
+    service.record_removal('user-1', '2025-01-02T08:00:00Z')
+
+    has_mood.assert_called_once_with('user-1', '2025-01-02', 'txn')
+    assert applied['changed'] is True
+    assert len(applied['runs']) == 2
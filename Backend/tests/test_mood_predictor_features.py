@@ -0,0 +1,97 @@
+"""Tests for concurrent feature loading and the lastWrite-keyed feature cache."""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.services import mood_predictor
+from src.services.mood_predictor import FEATURE_NAMES, FeatureEngineer
+
+
+def _moods(count, score=0.2):
+    start = datetime.now() - timedelta(days=count)
+    return [{'score': score, 'timestamp': (start + timedelta(days=i)).isoformat()} for i in range(count)]
+
+
+@pytest.fixture
+def engineer(mocker):
+    engineer = FeatureEngineer()
+    engineer._cache.clear()
+    engineer.versions = {'u1': 'v1', 'u2': 'v1'}
+    engineer.moods = {'u1': _moods(10), 'u2': _moods(3)}
+    mocker.patch.object(engineer, '_get_latest_write', side_effect=lambda uid: engineer.versions[uid])
+    mocker.patch.object(engineer, '_get_mood_history', side_effect=lambda uid, days: engineer.moods[uid])
+    mocker.patch.object(engineer, '_get_sleep_data', return_value=[{'hours': 5, 'quality': 4}] * 3)
+    mocker.patch.object(engineer, '_get_activity_data', return_value=[])
+    mocker.patch.object(engineer, '_get_sentiment_history', return_value=[])
+    mocker.patch.object(engineer, '_count_recent', return_value=2)
+    mocker.patch.object(engineer, '_get_crisis_counts', return_value={'u1': 1})
+    return engineer
+
+
+def test_engineer_features_many_builds_vectors_in_one_batch(engineer):
+    vectors = engineer.engineer_features_many(['u1', 'u2'])
+
+    assert vectors['u2'] is None  # fewer than 7 moods
+    features = dict(zip(FEATURE_NAMES, vectors['u1'], strict=True))
+    assert features['mood_mean_7d'] == pytest.approx(0.2)
+    assert features['sleep_mean'] == 5
+    assert features['steps_mean'] == 5000
+    assert features['app_opens_7d'] == 2
+    assert features['crisis_count_30d'] == 1
+    assert features['days_since_start'] == 10
+    engineer._get_crisis_counts.assert_called_once_with(['u1', 'u2'], 30)
+
+
+def test_features_are_cached_until_the_next_mood_write(engineer):
+    first = engineer.engineer_features('u1')
+    engineer.moods['u1'] = _moods(10, score=-0.8)
+
+    cached = engineer.engineer_features('u1')
+    assert engineer._get_mood_history.call_count == 1
+    assert cached[0] == first[0]
+
+    engineer.versions['u1'] = 'v2'
+    refreshed = engineer.engineer_features('u1')
+    assert engineer._get_mood_history.call_count == 2
+    assert refreshed[0] == pytest.approx(-0.8)
+
+
+def test_insufficient_data_is_cached_too(engineer):
+    assert engineer.engineer_features('u2') is None
+    assert engineer.engineer_features('u2') is None
+    assert engineer._get_mood_history.call_count == 1
+
+
+def test_failed_source_gives_no_vector_and_is_not_cached(engineer):
+    engineer._get_sleep_data.side_effect = RuntimeError('unavailable')
+
+    assert engineer.engineer_features('u1') is None  # no vector built on default sleep features
+    engineer._get_sleep_data.side_effect = None
+
+    assert engineer.engineer_features('u1') is not None
+    assert engineer._get_mood_history.call_count == 2
+
+
+def test_failed_crisis_count_gives_no_vector(engineer):
+    engineer._get_crisis_counts.side_effect = RuntimeError('unavailable')
+
+    assert engineer.engineer_features('u1') is None
+
+
+def test_users_are_fetched_in_batches_on_the_feature_pool(engineer, monkeypatch):
+    monkeypatch.setattr(mood_predictor, 'FEATURE_BATCH_USERS', 1)
+    threads = []
+
+    def moods(user_id, days):
+        threads.append(threading.current_thread().name)
+        return engineer.moods[user_id]
+
+    engineer._get_mood_history.side_effect = moods
+
+    vectors = engineer.engineer_features_many(['u1', 'u2'])
+
+    assert vectors['u1'] is not None and vectors['u2'] is None
+    assert [c.args for c in engineer._get_crisis_counts.call_args_list] == [(['u1'], 30), (['u2'], 30)]
+    assert all(name.startswith('mood-features') for name in threads)
@@ -460,3 +460,49 @@ def test_mood_streaks_reports_consecutive_days(client, mocker, auth_csrf_headers
     assert data['data']['currentStreak'] >= 2
     assert data['data']['longestStreak'] >= 2
     assert data['data']['totalLoggedDays'] == 3
+
+
+def _users_with_stamps(user_fields):
+    """users/{uid} mock whose set(merge=True) and get() go through ``user_fields``."""
+    moods_collection = MagicMock()
+    moods_collection.add.return_value = (None, SimpleNamespace(id='mock-mood-id'))
+    user_doc_ref = MagicMock()
+    user_doc_ref.collection.return_value = moods_collection
+    user_doc_ref.set.side_effect = lambda data, merge=False: user_fields.update(data)
+    user_doc_ref.get.side_effect = lambda: SimpleNamespace(exists=True, to_dict=lambda: dict(user_fields))
+    users_collection = MagicMock()
+    users_collection.document.return_value = user_doc_ref
+    mock_db = MagicMock()
+    mock_db.collection.side_effect = lambda name: users_collection if name == 'users' else MagicMock()
+    return mock_db, moods_collection
+
+
+def test_logging_a_mood_changes_the_feature_cache_version(client, mocker, auth_csrf_headers, mock_auth_service):
+    """Cached mood-prediction features are keyed on moodsLastWrite, which every mood write must bump"""
+    from src.services.mood_predictor import FeatureEngineer
+
+    mock_db, moods_collection = _users_with_stamps({})
+    mocker.patch('src.routes.mood_routes.db', mock_db)
+    mocker.patch('src.services.mood_predictor.db', mock_db)
+    engineer = FeatureEngineer()
+    user_id = mock_auth_service['user_id']
+    before = engineer._get_latest_write(user_id)
+
+    response = client.post('/api/mood/log', json={'mood_text': 'Jag känner mig glad idag!', 'score': 7},
+                           headers=auth_csrf_headers)
+
+    assert response.status_code == 201
+    after = engineer._get_latest_write(user_id)
+    assert before == 'none' and after != before
+    assert moods_collection.add.call_args[0][0]['lastWrite'] == after
+
+
+def test_mood_writes_invalidate_the_dashboard_cache():
+    from src.routes import dashboard_routes, mood_routes
+
+    dashboard_routes._set_cached_data('user-dash', {'totalMoods': 1})
+    assert dashboard_routes._get_cached_data('user-dash') == {'totalMoods': 1}
+
+    mood_routes.invalidate_mood_cache('user-dash')
+
+    assert dashboard_routes._get_cached_data('user-dash') is None
@@ -0,0 +1,85 @@
+"""Tests for unified multimedia memory routes (create returns pending, media status polling).
+
+Route: /api/v1/memory-unified
+Store: from firebase_admin import storage  (patch src.routes.multimedia_memory_routes.storage)
+"""
+import io
+from unittest.mock import MagicMock
+
+from src.services.memory_media_pipeline import processing_status
+
+TEST_USER_ID = 'testuser1234567890ab'
+BASE = '/api/v1/memory-unified'
+
+
+def _mock_storage():
+    mock_stor = MagicMock()
+    mock_bucket = MagicMock()
+    mock_blob = MagicMock()
+    mock_bucket.blob.return_value = mock_blob
+    mock_blob.generate_signed_url.return_value = 'https://signed-url.example.com/file'
+    mock_stor.bucket.return_value = mock_bucket
+    return mock_stor, mock_bucket, mock_blob
+
+
+def test_create_streams_originals_and_queues_media(client, auth_csrf_headers, mock_db, mocker):
+    mock_stor, mock_bucket, mock_blob = _mock_storage()
+    mocker.patch('src.routes.multimedia_memory_routes.storage', mock_stor)
+    mocker.patch('src.routes.multimedia_memory_routes.audit_log')
+    pipeline = mocker.patch('src.routes.multimedia_memory_routes.memory_media_pipeline')
+
+    response = client.post(f'{BASE}/create', data={
+        'content': 'En fin dag vid havet',
+        'photos[]': [(io.BytesIO(b'jpeg-1'), 'a.jpg'), (io.BytesIO(b'jpeg-2'), 'b.png'), (io.BytesIO(b'x'), 'c.exe')],
+    }, headers=auth_csrf_headers, content_type='multipart/form-data')
+
+    assert response.status_code == 202
+    data = response.get_json()['data']
+    memory_id = data['memoryId']
+    assert data['mediaStatus']['state'] == 'pending'
+    assert data['statusUrl'] == f'{BASE}/{memory_id}/status'
+    assert [p['url'] for p in data['media']['photos']] == ['https://signed-url.example.com/file'] * 2
+    assert data['errors'] == ['Photo c.exe: Invalid image format']
+    assert mock_blob.upload_from_file.call_count == 2
+    pipeline.submit.assert_called_once_with(memory_id)
+
+    saved = mock_db.collection('memories').document.return_value.set.call_args.args[0]
+    assert saved['ai_analysis'] is None
+    assert saved['media_processing']['steps_total'] == 3
+    assert [p['status'] for p in saved['media']['photo_details']] == ['pending', 'pending']
+    assert len(saved['media']['photos']) == 2
+
+
+def test_create_requires_some_content(client, auth_csrf_headers, mock_db, mocker):
+    pipeline = mocker.patch('src.routes.multimedia_memory_routes.memory_media_pipeline')
+
+    response = client.post(f'{BASE}/create', data={'content': ''}, headers=auth_csrf_headers,
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    pipeline.submit.assert_not_called()
+
+
+def test_media_status_reports_progress_for_owner_only(client, mock_db, mocker):
+    mock_stor, _, _ = _mock_storage()
+    mocker.patch('src.routes.multimedia_memory_routes.storage', mock_stor)
+    memory = {
+        'user_id': TEST_USER_ID,
+        'media': {'photo_details': [
+            {'storage_path': 'memories/u/p.jpg', 'thumbnail_paths': {'160': 'memories/u/p_160.webp'}, 'status': 'ready'}
+        ]},
+        'media_processing': processing_status('processing', 1, 2),
+        'ai_analysis': None,
+    }
+    doc = mock_db.collection('memories').document.return_value
+    doc.get.return_value = MagicMock(exists=True, to_dict=lambda: memory)
+
+    response = client.get(f'{BASE}/mem_123/status')
+
+    assert response.status_code == 200
+    status = response.get_json()['data']
+    assert status['state'] == 'processing' and status['progress'] == 50
+    assert status['photos'][0]['thumbnails'] == {'160': 'https://signed-url.example.com/file'}
+
+    memory['user_id'] = 'someoneelse1234567890'
+    assert client.get(f'{BASE}/mem_123/status').status_code == 403
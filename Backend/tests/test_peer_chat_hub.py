@@ -0,0 +1,243 @@
+"""Tests for the peer chat hub (room buffers, TTL presence, fan-out and the Redis pub/sub path)."""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.services import peer_chat_hub as hub_module
+from src.services.peer_chat_hub import PEER_CHAT_CHANNEL, PeerChatHub
+
+
+def _message(i, room_id='anxiety'):
+    return {'id': f'm{i}', 'room_id': room_id, 'message': f'hej {i}', 'timestamp': f'2025-01-01T00:00:{i:02d}',
+            'likes': 0, 'liked_by': []}
+
+
+@pytest.fixture
+def firestore(mocker):
+    """Firestore holding the room history the buffer is warmed from (newest first)."""
+    history = []
+    query = MagicMock()
+    query.where.return_value = query
+    query.order_by.return_value = query
+    query.limit.return_value = query
+    query.stream.side_effect = lambda: [
+        MagicMock(id=m['id'], to_dict=lambda m=m: dict(m)) for m in reversed(history)
+    ]
+    mock_db = MagicMock()
+    mock_db.collection.return_value = query
+    mocker.patch.object(hub_module, 'db', mock_db)
+    return history, query
+
+
+def test_buffer_is_warmed_once_and_capped(firestore):
+    history, query = firestore
+    history.extend(_message(i) for i in range(3))
+    hub = PeerChatHub(use_redis=False, buffer_size=4, resync_seconds=60)
+
+    assert [m['id'] for m in hub.recent('anxiety')] == ['m0', 'm1', 'm2']
+    for i in range(3, 6):
+        hub.publish('anxiety', 'message', _message(i))
+
+    assert [m['id'] for m in hub.recent('anxiety')] == ['m2', 'm3', 'm4', 'm5']
+    assert [m['id'] for m in hub.recent('anxiety', after='m3')] == ['m4', 'm5']
+    assert [m['id'] for m in hub.recent('anxiety', after='gone', limit=2)] == ['m4', 'm5']
+    assert query.stream.call_count == 1
+
+
+def test_buffer_resyncs_without_pubsub_and_keeps_delivered_messages(firestore):
+    history, query = firestore
+    history.append(_message(0))
+    hub = PeerChatHub(use_redis=False, resync_seconds=0)
+    hub.recent('anxiety')
+
+    history.append(_message(1))  # sent through another worker
+    hub.publish('anxiety', 'message', _message(2))  # delivered here, not yet visible to the query
+
+    assert [m['id'] for m in hub.recent('anxiety')] == ['m0', 'm1', 'm2']
+    assert query.stream.call_count == 2
+
+
+def test_like_events_update_buffered_messages(firestore):
+    firestore[0].append(_message(0))
+    hub = PeerChatHub(use_redis=False)
+    hub.recent('anxiety')
+
+    hub.publish('anxiety', 'like', {'message_id': 'm0', 'session_id': 's1', 'action': 'liked', 'likes': 1})
+    assert hub.recent('anxiety')[0]['liked_by'] == ['s1']
+
+    hub.publish('anxiety', 'like', {'message_id': 'm0', 'session_id': 's1', 'action': 'unliked', 'likes': 0})
+    assert hub.recent('anxiety')[0]['likes'] == 0 and hub.recent('anxiety')[0]['liked_by'] == []
+
+
+def test_report_events_flag_buffered_messages(firestore):
+    firestore[0].append(_message(0))
+    hub = PeerChatHub(use_redis=False)
+    hub.recent('anxiety')
+
+    hub._deliver('anxiety', 'report', {'message_id': 'm0', 'reported': True, 'reported_at': '2025-01-02'})
+
+    assert hub.recent('anxiety')[0]['reported'] is True
+    assert hub.recent('anxiety')[0]['reported_at'] == '2025-01-02'
+
+
+def test_in_process_presence_and_typing_expire(mocker):
+    clock = mocker.patch.object(hub_module.time, 'time', return_value=1000.0)
+    hub = PeerChatHub(use_redis=False, presence_ttl=300, typing_ttl=8)
+    hub.register_session({'session_id': 's1', 'room_id': 'anxiety', 'user_id': 'u1', 'anonymous_name': 'A'})
+    hub.register_session({'session_id': 's2', 'room_id': 'sleep', 'user_id': 'u2', 'anonymous_name': 'B'})
+    hub.set_typing('s1', 'anxiety', True)
+
+    assert [(p['anonymous_name'], p['is_typing']) for p in hub.presence('anxiety')] == [('A', True)]
+    assert hub.member_counts(['anxiety', 'sleep', 'stress']) == {'anxiety': 1, 'sleep': 1, 'stress': 0}
+
+    clock.return_value = 1010.0
+    hub.touch('s1', 'anxiety')
+    assert hub.presence('anxiety')[0]['is_typing'] is False
+
+    clock.return_value = 1305.0
+    assert hub.session('s1') is not None
+    assert hub.session('s2') is None
+    assert hub.member_counts(['anxiety', 'sleep']) == {'anxiety': 1, 'sleep': 0}
+
+
+def test_subscribers_receive_events_and_slow_ones_are_dropped(mocker):
+    mocker.patch.object(hub_module, 'PEER_CHAT_SUBSCRIBER_QUEUE_SIZE', 1)
+    hub = PeerChatHub(use_redis=False)
+    socketio = MagicMock()
+    hub.attach_socketio(socketio)
+    subscriber = hub.subscribe('anxiety')
+
+    hub.publish('anxiety', 'typing', {'anonymousName': 'A', 'isTyping': True})
+    assert subscriber.events.get_nowait() == ('typing', {'anonymousName': 'A', 'isTyping': True})
+    socketio.emit.assert_called_once_with('typing', {'anonymousName': 'A', 'isTyping': True},
+                                          to='peer_chat:anxiety', namespace='/peer-chat')
+
+    hub.publish('anxiety', 'typing', {})
+    hub.publish('anxiety', 'typing', {})
+    assert subscriber.dropped is True
+    assert not hub._subscribers
+
+
+class FakeRedis:
+    """The string, sorted-set and pub/sub commands the hub uses, held in dicts."""
+
+    def __init__(self):
+        self.strings: dict[str, str] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.published: list[tuple[str, str]] = []
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    def setex(self, key, ttl, value):
+        self.strings[key] = value
+
+    def get(self, key):
+        return self.strings.get(key)
+
+    def mget(self, keys):
+        return [self.strings.get(k) for k in keys]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.strings.pop(key, None)
+
+    def expire(self, key, ttl):
+        pass
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        self.zsets[key] = {m: s for m, s in self.zsets.get(key, {}).items() if s > high}
+
+    def zrange(self, key, start, stop):
+        return list(self.zsets.get(key, {}))
+
+    def zcount(self, key, low, high):
+        return sum(1 for s in self.zsets.get(key, {}).values() if s >= low)
+
+    def publish(self, channel, payload):
+        self.published.append((channel, payload))
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.results.append(getattr(self.redis, name)(*args, **kwargs))
+            return self
+        return command
+
+    def execute(self):
+        return self.results
+
+
+@pytest.fixture
+def redis_hub(mocker):
+    hub = PeerChatHub()
+    fake = FakeRedis()
+    hub._redis = fake
+    mocker.patch.object(hub, '_ensure_listener')
+    return hub, fake
+
+
+def test_sessions_presence_and_typing_live_in_redis(redis_hub):
+    hub, fake = redis_hub
+    hub.register_session({'session_id': 's1', 'room_id': 'anxiety', 'user_id': 'u1', 'anonymous_name': 'A'})
+    hub.set_typing('s1', 'anxiety', True)
+
+    assert hub.session('s1')['anonymous_name'] == 'A'
+    assert hub.presence('anxiety') == [
+        {'session_id': 's1', 'room_id': 'anxiety', 'user_id': 'u1', 'anonymous_name': 'A', 'is_typing': True}
+    ]
+    assert hub.member_counts(['anxiety', 'sleep']) == {'anxiety': 1, 'sleep': 0}
+    assert 'peer_chat:typing:anxiety:s1' in fake.strings
+    assert not hub._sessions  # nothing kept in process
+
+    hub.drop_session('s1', 'anxiety')
+    assert hub.session('s1') is None and hub.presence('anxiety') == []
+
+
+def test_events_are_broadcast_and_remote_events_delivered(redis_hub, mocker):
+    hub, fake = redis_hub
+    subscriber = hub.subscribe('anxiety')
+
+    hub.publish('anxiety', 'message', _message(1))
+    channel, payload = fake.published[0]
+    envelope = json.loads(payload)
+    assert channel == PEER_CHAT_CHANNEL
+    assert envelope['origin'] == hub._origin and envelope['data']['id'] == 'm1'
+    assert subscriber.events.get_nowait()[0] == 'message'
+
+    remote = {'origin': 'other-worker', 'room_id': 'anxiety', 'event': 'message', 'data': _message(2)}
+    items = iter([
+        {'type': 'message', 'data': payload},  # our own broadcast echoed back
+        {'type': 'message', 'data': json.dumps(remote)},
+        None,
+    ])
+    pubsub = MagicMock()
+
+    def get_message(timeout):
+        item = next(items)
+        if item is None:
+            hub._redis = None  # stop listening
+        return item
+
+    pubsub.get_message.side_effect = get_message
+    fake.pubsub = MagicMock(return_value=pubsub)
+
+    hub._listen()
+
+    pubsub.subscribe.assert_called_once_with(PEER_CHAT_CHANNEL)
+    assert subscriber.events.get_nowait() == ('message', _message(2))
+    assert subscriber.events.empty()
+    assert hub._listening is False
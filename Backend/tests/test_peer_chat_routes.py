@@ -1,7 +1,20 @@
-"""Peer chat blueprint coverage for rooms, joining, and messaging."""
+"""Peer chat blueprint coverage for rooms, joining, messaging and live delivery."""
 
+import json
 from unittest.mock import MagicMock
 
+import pytest
+
+from src.services.peer_chat_hub import PeerChatHub
+
+
+@pytest.fixture(autouse=True)
+def hub(mocker):
+    """A fresh in-process hub per test so sessions and buffers do not leak."""
+    hub = PeerChatHub(use_redis=False)
+    mocker.patch('src.routes.peer_chat_routes.peer_chat_hub', hub)
+    return hub
+
 
 def test_get_rooms_includes_member_counts(client, mocker, mock_db):
     mocker.patch('src.routes.peer_chat_routes.db', mock_db)
@@ -202,3 +215,93 @@ def test_like_rejects_session_not_owned(client, mocker, mock_db):
 
     assert response.status_code == 403
     assert response.get_json()['message'] == 'Session does not belong to you'
+
+
+def _live_session(hub, session_id='session-1', room_id='anxiety'):
+    hub.register_session({
+        'session_id': session_id,
+        'user_id': 'testuser1234567890ab',
+        'room_id': room_id,
+        'anonymous_name': 'Anon',
+        'avatar': '🌟',
+    })
+
+
+def test_get_messages_is_served_from_the_room_buffer(client, mocker, mock_db, hub):
+    mocker.patch('src.services.peer_chat_hub.db', None)
+    _live_session(hub)
+    hub.recent('anxiety')  # warmed on join
+    for i in range(3):
+        hub.publish('anxiety', 'message', {'id': f'm{i}', 'message': f'hej {i}', 'timestamp': f'2025-01-0{i + 1}'})
+    mock_db.reset_mock()
+
+    response = client.get('/api/peer-chat/room/anxiety/messages?session_id=session-1&after=m0')
+
+    assert response.status_code == 200
+    assert [m['id'] for m in response.get_json()['data']['messages']] == ['m1', 'm2']
+    mock_db.collection.assert_not_called()
+
+
+def test_report_flags_the_buffered_message(client, mocker, mock_db, hub):
+    mocker.patch('src.routes.peer_chat_routes.db', mock_db)
+    mocker.patch('src.services.peer_chat_hub.db', None)
+    _live_session(hub)
+    hub.recent('anxiety')
+    hub._listening = True  # pub/sub active: the buffer is never re-read from Firestore
+    hub.publish('anxiety', 'message', {'id': 'm1', 'message': 'hej', 'timestamp': '2025-01-01', 'reported': False})
+    message_ref = MagicMock()
+    message_ref.get.return_value = MagicMock(exists=True, to_dict=lambda: {'room_id': 'anxiety'})
+    mock_db.collection('peer_chat_messages').document.return_value = message_ref
+
+    response = client.post('/api/peer-chat/message/m1/report', json={'session_id': 'session-1', 'reason': 'spam'})
+
+    assert response.status_code == 200
+    messages = client.get('/api/peer-chat/room/anxiety/messages?session_id=session-1').get_json()['data']['messages']
+    assert messages[0]['reported'] is True
+    assert 'reported_by' not in messages[0]
+
+
+def test_typing_and_presence_use_ttl_keys_not_firestore(client, mock_db, hub):
+    _live_session(hub)
+    mock_db.reset_mock()
+
+    assert client.post('/api/peer-chat/room/anxiety/typing',
+                       json={'session_id': 'session-1', 'is_typing': True}).status_code == 200
+    presence = client.get('/api/peer-chat/room/anxiety/presence?session_id=session-1').get_json()['data']
+
+    assert presence['activeCount'] == 1
+    assert presence['typingUsers'] == ['Anon']
+    mock_db.collection.assert_not_called()
+
+
+def test_expired_session_is_restored_from_firestore(client, mocker, mock_db, hub):
+    mocker.patch('src.routes.peer_chat_routes.db', mock_db)
+    presence_doc_ref = MagicMock()
+    presence_doc_ref.get.return_value = MagicMock(exists=True, to_dict=lambda: {
+        'user_id': 'testuser1234567890ab', 'room_id': 'anxiety', 'anonymous_name': 'Anon', 'avatar': '🌟',
+    })
+    mock_db.collection('peer_chat_presence').document.return_value = presence_doc_ref
+
+    response = client.post('/api/peer-chat/room/anxiety/typing', json={'session_id': 'session-1'})
+
+    assert response.status_code == 200
+    assert hub.session('session-1')['anonymous_name'] == 'Anon'
+
+
+def test_stream_delivers_sent_messages(client, mocker, mock_db, hub):
+    mocker.patch('src.routes.peer_chat_routes.db', mock_db)
+    _live_session(hub)
+
+    response = client.get('/api/peer-chat/room/anxiety/stream?session_id=session-1')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = (chunk.decode() for chunk in response.response)
+    assert next(chunks).startswith('retry: 3000\nevent: presence')
+
+    client.post('/api/peer-chat/room/anxiety/send', json={'session_id': 'session-1', 'message': 'Hej där'})
+
+    event = next(chunks)
+    assert event.startswith('event: message\n')
+    assert json.loads(event.split('data: ', 1)[1])['message'] == 'Hej där'
+    response.close()
+    assert not hub._subscribers
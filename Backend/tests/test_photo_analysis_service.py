@@ -0,0 +1,131 @@
+"""Tests for the shared-decode photo analysis, shared model loading and batch analysis."""
+
+import io
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image, JpegImagePlugin
+
+from src.services import photo_analysis_service
+from src.services.photo_analysis_service import PhotoAnalysisService, prepare_image
+
+
+def _photo_bytes(color, size=(320, 240), image_format='JPEG') -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(photo_analysis_service, '_models', {})
+    monkeypatch.setattr(photo_analysis_service, 'TRANSFORMERS_VISION_AVAILABLE', False)
+    return PhotoAnalysisService()
+
+
+def test_prepare_image_decodes_large_jpeg_once_at_analysis_size():
+    prepared = prepare_image(_photo_bytes((200, 120, 40), size=(4000, 3000)), max_side=640)
+
+    assert prepared.original_size == (4000, 3000)
+    assert prepared.format == 'JPEG'
+    assert max(prepared.image.size) <= 640
+    assert prepared.rgb.shape == (prepared.image.size[1], prepared.image.size[0], 3)
+    assert prepared.gray.shape == prepared.rgb.shape[:2]
+
+
+def test_prepare_image_uses_jpeg_draft_mode(mocker):
+    draft = mocker.spy(JpegImagePlugin.JpegImageFile, 'draft')
+
+    prepare_image(_photo_bytes((10, 10, 10), size=(2000, 2000)), max_side=500)
+    assert draft.call_args.args[1:] == ('RGB', (500, 500))
+    assert draft.spy_return[1][2:] == (500, 500)  # libjpeg decoded at 1/4 scale
+
+    draft.reset_mock()
+    prepare_image(_photo_bytes((10, 10, 10), size=(2000, 2000), image_format='PNG'), max_side=500)
+    draft.assert_not_called()
+
+
+@pytest.mark.parametrize('color, mood', [
+    ((220, 140, 40), 'warm'),
+    ((40, 90, 200), 'cool'),
+    ((120, 120, 60), 'neutral'),
+])
+def test_color_mood_is_vectorized_over_the_prepared_pixels(service, color, mood):
+    prepared = prepare_image(_photo_bytes(color, image_format='PNG'))
+
+    assert service._analyze_color_mood(prepared) == mood
+
+
+def test_color_mood_balanced_for_half_warm_half_cool(service):
+    pixels = np.zeros((100, 100, 3), dtype=np.uint8)
+    pixels[:, :50] = (220, 140, 40)
+    pixels[:, 50:] = (40, 90, 200)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+
+    assert service._analyze_color_mood(prepare_image(buffer.getvalue())) == 'balanced'
+
+
+def test_analyze_photo_uses_original_size_and_brightness(service):
+    result = service.analyze_photo(_photo_bytes((250, 250, 250), size=(2000, 1500)), 'p1')
+
+    assert result.photo_id == 'p1'
+    assert result.scene_type == 'bright_outdoor'
+    assert result.aesthetic_score == pytest.approx(0.7)  # > 2MP and JPEG
+    assert result.analysis_method == 'fallback'
+
+
+def test_face_cascade_is_loaded_once_and_shared(monkeypatch):
+    monkeypatch.setattr(photo_analysis_service, '_models', {})
+    monkeypatch.setattr(photo_analysis_service, 'TRANSFORMERS_VISION_AVAILABLE', False)
+    cascade = SimpleNamespace(empty=lambda: False, detectMultiScale=lambda gray, *args: [(1, 2, 3, 4)] * 2)
+    fake_cv2 = SimpleNamespace(CascadeClassifier=lambda path: cascade, data=SimpleNamespace(haarcascades=''))
+    loads = []
+    monkeypatch.setattr(photo_analysis_service, 'CV2_AVAILABLE', True)
+    monkeypatch.setattr(photo_analysis_service, 'cv2', fake_cv2, raising=False)
+    monkeypatch.setattr(fake_cv2, 'CascadeClassifier', lambda path: loads.append(path) or cascade)
+
+    results = [PhotoAnalysisService().analyze_photo(_photo_bytes((90, 90, 90)), str(i)) for i in range(3)]
+
+    assert len(loads) == 1
+    assert all(r.people_count == 2 and r.has_faces for r in results)
+
+
+def test_failed_model_load_is_cached(monkeypatch):
+    monkeypatch.setattr(photo_analysis_service, '_models', {})
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise OSError('missing')
+
+    assert photo_analysis_service._shared_model('broken', broken) is None
+    assert photo_analysis_service._shared_model('broken', broken) is None
+    assert len(calls) == 1
+
+
+def test_analyze_photos_keeps_input_order(service):
+    photos = [
+        (_photo_bytes((220, 140, 40)), 'warm'),
+        (b'not an image', 'broken'),
+        (_photo_bytes((40, 90, 200)), 'cool'),
+    ]
+
+    results = service.analyze_photos(photos)
+
+    assert [r.photo_id for r in results] == ['warm', 'broken', 'cool']
+    assert [r.color_mood for r in results] == ['warm', 'neutral', 'cool']
+    assert results[1].analysis_method == 'fallback'
+
+
+def test_analyze_photos_falls_back_for_photos_past_the_deadline(service, mocker):
+    mocker.patch.object(photo_analysis_service, 'fan_out', return_value={
+        '0': SimpleNamespace(ok=True, value='analysis'),
+        '1': SimpleNamespace(ok=False, value=None),
+    })
+
+    results = service.analyze_photos([(b'a', 'fast'), (b'b', 'slow')])
+
+    assert results[0] == 'analysis'
+    assert results[1].photo_id == 'slow' and results[1].analysis_method == 'fallback'
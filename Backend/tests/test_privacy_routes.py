@@ -1,8 +1,9 @@
 """Privacy routes tests covering settings, exports, and deletion flows."""
 
-import json
 from unittest.mock import MagicMock
 
+from src.services.data_export_service import EXPORT_SECTIONS, ExportJob
+
 TEST_USER_ID = 'testuser1234567890ab'
 
 
@@ -42,17 +43,55 @@ def test_update_privacy_settings_filters_allowed_keys(client, auth_csrf_headers,
     assert update_payload['privacy_settings.shareAnonymizedData'] is True
 
 
-def test_export_user_data_streams_json_file(client, auth_csrf_headers, mock_auth_service, mock_db, mocker):
-    user_doc = mock_db.collection('users').document(TEST_USER_ID)
-    user_doc.get.return_value = MagicMock(exists=True, to_dict=lambda: {'privacy_settings': {}})
-    mocker.patch('google.cloud.firestore.FieldFilter', side_effect=lambda *args, **kwargs: MagicMock())
+def test_export_user_data_starts_background_job(client, auth_csrf_headers, mock_auth_service, mock_db, mocker):
+    job = ExportJob(job_id='job-abcdefghijklmnop', user_id=TEST_USER_ID)
+    service = mocker.patch('src.routes.privacy_routes.data_export_service')
+    service.start_export.return_value = job
 
     response = client.post(f'/api/privacy/export/{TEST_USER_ID}', headers=auth_csrf_headers)
 
+    assert response.status_code == 202
+    data = response.get_json()['data']
+    assert data['jobId'] == job.job_id
+    assert data['status'] == 'queued'
+    assert data['statusUrl'] == f'/api/privacy/export/{TEST_USER_ID}/status/{job.job_id}'
+    service.start_export.assert_called_once_with(TEST_USER_ID)
+
+
+def test_export_status_and_download(client, auth_csrf_headers, mock_auth_service, mocker, tmp_path):
+    job = ExportJob(job_id='job-abcdefghijklmnop', user_id=TEST_USER_ID, status='running', sections_completed=5)
+    service = mocker.patch('src.routes.privacy_routes.data_export_service')
+    service.get_job.return_value = job
+    archive = tmp_path / f'{job.job_id}.zip'
+    archive.write_bytes(b'PK\x05\x06' + b'\x00' * 18)
+    service.archive_path.return_value = archive
+    service.stream_archive.return_value = iter([archive.read_bytes()])
+
+    status = client.get(f'/api/privacy/export/{TEST_USER_ID}/status/{job.job_id}', headers=auth_csrf_headers)
+    assert status.status_code == 200
+    assert status.get_json()['data']['progress'] == 95 * 5 // len(EXPORT_SECTIONS)
+
+    not_ready = client.get(f'/api/privacy/export/{TEST_USER_ID}/download/{job.job_id}', headers=auth_csrf_headers)
+    assert not_ready.status_code == 409
+
+    job.status = 'completed'
+    job.completed_at = job.created_at
+    response = client.get(f'/api/privacy/export/{TEST_USER_ID}/download/{job.job_id}', headers=auth_csrf_headers)
     assert response.status_code == 200
-    assert response.mimetype == 'application/json'
-    export_payload = json.loads(response.data.decode('utf-8'))
-    assert export_payload['exportMetadata']['userId'] == TEST_USER_ID
+    assert response.mimetype == 'application/zip'
+    assert response.data.startswith(b'PK')
+    service.stream_archive.assert_called_once_with(job.job_id)
+
+
+def test_export_status_hides_other_users_jobs(client, auth_csrf_headers, mock_auth_service, mocker):
+    service = mocker.patch('src.routes.privacy_routes.data_export_service')
+    service.get_job.return_value = ExportJob(job_id='job-abcdefghijklmnop', user_id='someone-else')
+
+    response = client.get(
+        f'/api/privacy/export/{TEST_USER_ID}/status/job-abcdefghijklmnop', headers=auth_csrf_headers
+    )
+
+    assert response.status_code == 404
 
 
 def test_delete_user_data_requires_confirmation(client, auth_csrf_headers, mock_auth_service):
@@ -65,7 +104,13 @@ def test_delete_user_data_requires_confirmation(client, auth_csrf_headers, mock_
 def test_delete_user_data_executes_full_cleanup(client, auth_csrf_headers, mock_auth_service, mock_db, mocker):
     mocker.patch('src.routes.privacy_routes._delete_collection', return_value=0)
     mocker.patch('src.services.audit_service.audit_log')
+    delete_embeddings = mocker.patch(
+        'src.services.vector_index_service.vector_index_service.delete_user', return_value=3
+    )
+    purge_exports = mocker.patch('src.routes.privacy_routes.data_export_service.purge_user', return_value=2)
     mock_db.collection('users').document(TEST_USER_ID).get.return_value = MagicMock(exists=True, to_dict=lambda: {})
+    aggregate_doc = mock_db.collection('mood_aggregates').document(TEST_USER_ID)
+    aggregate_doc.get.return_value = MagicMock(exists=True, to_dict=lambda: {'runs': []})
 
     response = client.delete(
         f'/api/privacy/delete/{TEST_USER_ID}?confirm=delete%20my%20data',
@@ -77,3 +122,9 @@ def test_delete_user_data_executes_full_cleanup(client, auth_csrf_headers, mock_
     assert payload['data']['summary']['userId'] == TEST_USER_ID
     assert payload['message'].startswith('All your data')
     mock_db.collection('users').document(TEST_USER_ID).delete.assert_called_once()
+    delete_embeddings.assert_called_once_with(TEST_USER_ID)
+    assert {'collection': 'rag_embeddings', 'count': 3} in payload['data']['summary']['deletedCollections']
+    aggregate_doc.delete.assert_called_once()
+    purge_exports.assert_called_once_with(TEST_USER_ID)
+    assert {'collection': 'data_exports', 'count': 2} in payload['data']['summary']['deletedCollections']
+    assert {'collection': 'mood_aggregates', 'count': 1} in payload['data']['summary']['deletedCollections']
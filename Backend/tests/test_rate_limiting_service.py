@@ -2,7 +2,15 @@
 
 from unittest.mock import MagicMock
 
-from src.services.rate_limiting import AdvancedRateLimiter
+import pytest
+
+from src.services import rate_limiting as rl_mod
+from src.services.rate_limiting import (
+    AdvancedRateLimiter,
+    RateLimitRule,
+    SlidingWindowCounter,
+    parse_rate_limit,
+)
 
 
 def test_get_rate_limit_applies_premium_multiplier(mocker):
@@ -19,17 +27,80 @@ def test_get_rate_limit_applies_premium_multiplier(mocker):
 def test_check_rate_limit_blocks_when_limit_reached(mocker):
     limiter = AdvancedRateLimiter()
     redis_mock = MagicMock()
-    redis_mock.get.return_value = '5'
-    redis_mock.incr.return_value = None
-    redis_mock.expire.return_value = None
+    script = redis_mock.register_script.return_value
+    script.return_value = [0, 0, 1500, 3600000]
     limiter.redis_client = redis_mock
-    mocker.patch.object(limiter, 'get_rate_limit', return_value='5 per hour')
+    mocker.patch.object(limiter, 'get_rule', return_value=RateLimitRule(5, 3600))
 
     allowed, info = limiter.check_rate_limit('auth/login', user_id='user-1')
 
     assert allowed is False
     assert info['limit'] == 5
     assert info['remaining'] == 0
+    assert info['retry_after'] == 2
+    script.assert_called_once_with(keys=['ratelimit:gcra:auth/login:user-1'], args=[5, 3600000])
+    redis_mock.get.assert_not_called()
+    redis_mock.incr.assert_not_called()
+
+
+def test_check_rate_limit_uses_one_script_call_per_request(mocker):
+    limiter = AdvancedRateLimiter()
+    redis_mock = MagicMock()
+    script = redis_mock.register_script.return_value
+    script.return_value = [1, 4, 0, 720000]
+    limiter.redis_client = redis_mock
+    mocker.patch.object(limiter, 'get_rule', return_value=RateLimitRule(5, 3600))
+
+    for _ in range(3):
+        allowed, info = limiter.check_rate_limit('auth/login', user_id='user-1')
+
+    assert allowed is True
+    assert info['remaining'] == 4
+    assert script.call_count == 3
+    redis_mock.register_script.assert_called_once_with(rl_mod.GCRA_LUA_SCRIPT)
+
+
+def test_rule_table_is_compiled_per_tier_and_immutable():
+    limiter = AdvancedRateLimiter()
+
+    assert limiter.rule_table[('auth', 'login', 'free')] == RateLimitRule(5, 60)
+    assert limiter.rule_table[('auth', 'login', 'enterprise')] == RateLimitRule(15, 60)
+    assert limiter.rule_table[('default', None, 'premium')] == RateLimitRule(200, 3600)
+    with pytest.raises(TypeError):
+        limiter.rule_table[('auth', 'login', 'free')] = RateLimitRule(1, 60)
+
+
+def test_get_rule_resolves_each_route_once(mocker):
+    limiter = AdvancedRateLimiter()
+    resolve = mocker.spy(limiter, '_resolve_endpoint_key')
+
+    rules = [limiter.get_rule('/api/v1/mood/weekly-analysis') for _ in range(3)]
+
+    assert rules == [RateLimitRule(200, 3600)] * 3
+    assert limiter.get_rate_limit('/api/v1/mood/weekly-analysis') == '200 per hour'
+    assert resolve.call_count == 1
+    assert limiter.get_rule('/api/admin/users') == RateLimitRule(50, 3600)  # category 'all'
+    assert limiter.get_rule('/api/auth/logout') == RateLimitRule(100, 3600)  # default
+
+
+def test_export_status_polling_has_its_own_rule():
+    limiter = AdvancedRateLimiter()
+
+    # User and job ids may contain other categories' keywords ('ai', 'auth', ...)
+    assert limiter.get_rule('/api/v1/privacy/export/aiUser1/status/job-auth') == RateLimitRule(600, 3600)
+    assert limiter.get_rule('/api/v1/privacy/export/aiUser1') == RateLimitRule(100, 3600)
+    assert limiter.get_rule('/api/v1/privacy/export/aiUser1/download/job-1') == RateLimitRule(100, 3600)
+
+
+def test_adaptive_multiplier_scales_rule_and_is_reused(mocker):
+    limiter = AdvancedRateLimiter()
+    redis_mock = MagicMock()
+    redis_mock.zcount.return_value = 10
+    limiter.redis_client = redis_mock
+
+    assert limiter.get_rule('auth/login') == RateLimitRule(7, 60)
+    assert limiter.get_rule('auth/register') == RateLimitRule(4, 3600)
+    redis_mock.zcount.assert_called_once()
 
 
 def test_record_request_tracks_usage():
@@ -72,11 +143,53 @@ def test_get_user_tier_reads_subscription(mock_db):
 def test_check_rate_limit_allows_when_redis_errors(mocker):
     limiter = AdvancedRateLimiter()
     redis_mock = MagicMock()
-    redis_mock.get.side_effect = RuntimeError('redis down')
+    redis_mock.register_script.return_value.side_effect = RuntimeError('redis down')
     limiter.redis_client = redis_mock
-    mocker.patch.object(limiter, 'get_rate_limit', return_value='5 per minute')
+    mocker.patch.object(limiter, 'get_rule', return_value=RateLimitRule(5, 60))
 
     allowed, info = limiter.check_rate_limit('auth/login', user_id='any')
 
     assert allowed is True
     assert info == {}
+
+
+@pytest.mark.parametrize('limit_str, expected', [
+    ('5 per minute', (5, 60)),
+    ('300 per day', (300, 86400)),
+    ('7 per fortnight', (7, 3600)),
+    ('garbage', (100, 3600)),
+])
+def test_parse_rate_limit(limit_str, expected):
+    assert parse_rate_limit(limit_str) == expected
+
+
+def test_sliding_window_counter_blocks_then_recovers_slot_by_slot():
+    counter = SlidingWindowCounter(window_seconds=60)  # 5s slots
+
+    assert counter.hit(0.0, 3) == (True, 2, 0.0)
+    assert counter.hit(6.0, 3) == (True, 1, 0.0)
+    assert counter.hit(7.0, 3) == (True, 0, 0.0)
+
+    allowed, remaining, retry_after = counter.hit(30.0, 3)
+    assert (allowed, remaining) == (False, 0)
+    assert retry_after == pytest.approx(30.0)  # slot [0, 5) leaves the window at 60s
+
+    assert counter.hit(60.0, 3) == (True, 0, 0.0)
+    assert counter.hit(61.0, 3)[0] is False
+    assert counter.hit(200.0, 3) == (True, 2, 0.0)  # whole ring expired
+
+
+def test_in_memory_fallback_keeps_constant_state_per_key(mocker):
+    limiter = AdvancedRateLimiter()
+    mocker.patch.object(limiter, 'get_rule', return_value=RateLimitRule(1000, 3600))
+    mocker.patch.object(rl_mod.time, 'time', return_value=1_000_000.0)
+
+    results = [limiter.check_rate_limit('mood/log', user_id='user-1') for _ in range(1001)]
+
+    assert all(allowed for allowed, _ in results[:1000])
+    assert results[999][1]['remaining'] == 0
+    allowed, info = results[1000]
+    # All hits share the slot starting at 999_900s, which leaves the window an hour later
+    assert allowed is False and info['retry_after'] == 3500
+    counter = limiter._memory_store['mem:mood/log:user-1']
+    assert len(counter.counts) == SlidingWindowCounter.RING_SLOTS
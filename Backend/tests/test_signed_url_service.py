@@ -0,0 +1,96 @@
+"""Tests for cached, window-aligned signed Storage URLs and batch signing."""
+
+from datetime import UTC, datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.services import signed_url_service as signed_module
+from src.services.signed_url_service import SignedUrlService
+
+
+@pytest.fixture
+def bucket():
+    bucket = MagicMock()
+    bucket.name = 'test-bucket'
+    blobs = {}
+
+    def blob(path):
+        if path not in blobs:
+            blobs[path] = MagicMock(name=path)
+            blobs[path].generate_signed_url.side_effect = lambda **kw: f"https://signed/{path}?exp={kw['expiration']:%s}"
+        return blobs[path]
+
+    bucket.blob.side_effect = blob
+    bucket.blobs = blobs
+    return bucket
+
+
+@pytest.fixture
+def service():
+    service = SignedUrlService(ttl_seconds=3600, window_seconds=3600)
+    service._cache.clear()
+    return service
+
+
+def test_signatures_are_cached_per_window(service, bucket, mocker):
+    clock = mocker.patch.object(signed_module.time, 'time', return_value=7200 * 1000 + 10)
+
+    first = service.url_for(bucket, 'memories/u/a.jpg')
+    clock.return_value += 1800
+    assert service.url_for(bucket, 'memories/u/a.jpg') == first
+    assert bucket.blobs['memories/u/a.jpg'].generate_signed_url.call_count == 1
+    bucket.blobs['memories/u/a.jpg'].exists.assert_not_called()
+
+    # Expiry is aligned to the window end plus the TTL
+    expiration = bucket.blobs['memories/u/a.jpg'].generate_signed_url.call_args.kwargs['expiration']
+    assert expiration == datetime.fromtimestamp(7200 * 1000 + 3600 + 3600, UTC)
+
+    clock.return_value += 3600  # next window signs again
+    assert service.url_for(bucket, 'memories/u/a.jpg') != first
+
+
+def test_batch_signs_only_misses_in_one_call(service, bucket, mocker):
+    service.url_for(bucket, 'memories/u/a.jpg')
+    fan_out = mocker.spy(signed_module, 'fan_out')
+
+    urls = service.urls_for(bucket, ['memories/u/a.jpg', 'memories/u/b.jpg', 'memories/u/c.jpg', '', None])
+
+    assert sorted(urls) == ['memories/u/a.jpg', 'memories/u/b.jpg', 'memories/u/c.jpg']
+    assert fan_out.call_count == 1
+    assert sorted(fan_out.call_args.args[0]) == ['memories/u/b.jpg', 'memories/u/c.jpg']
+    assert bucket.blobs['memories/u/a.jpg'].generate_signed_url.call_count == 1
+
+
+def test_falls_back_to_public_url_then_gs_path(service, bucket):
+    public = bucket.blob('memories/u/public.jpg')
+    public.generate_signed_url.side_effect = RuntimeError('no signer')
+    public.public_url = 'https://storage.googleapis.com/test-bucket/memories/u/public.jpg'
+    broken = bucket.blob('memories/u/broken.jpg')
+    broken.generate_signed_url.side_effect = RuntimeError('no signer')
+    broken.make_public.side_effect = RuntimeError('forbidden')
+
+    assert service.url_for(bucket, 'memories/u/public.jpg', allow_public=True) == public.public_url
+    assert service.url_for(bucket, 'memories/u/broken.jpg', allow_public=True) == 'gs://test-bucket/memories/u/broken.jpg'
+    service.url_for(bucket, 'memories/u/broken.jpg', allow_public=True)
+    assert broken.make_public.call_count == 2  # gs:// fallbacks are not cached
+
+
+def test_signing_failure_keeps_objects_private_by_default(service, bucket):
+    private = bucket.blob('memories/u/private.jpg')
+    private.generate_signed_url.side_effect = RuntimeError('no signer')
+    private.public_url = 'https://storage.googleapis.com/test-bucket/memories/u/private.jpg'
+
+    assert service.url_for(bucket, 'memories/u/private.jpg') == 'gs://test-bucket/memories/u/private.jpg'
+    urls = service.urls_for(bucket, ['memories/u/private.jpg', 'memories/u/other.jpg'])
+    assert urls['memories/u/private.jpg'] == 'gs://test-bucket/memories/u/private.jpg'
+    private.make_public.assert_not_called()
+
+
+def test_public_urls_are_not_shared_with_sign_only_callers(service, bucket):
+    blob = bucket.blob('memories/u/a.jpg')
+    blob.generate_signed_url.side_effect = RuntimeError('no signer')
+    blob.public_url = 'https://storage.googleapis.com/test-bucket/memories/u/a.jpg'
+
+    assert service.url_for(bucket, 'memories/u/a.jpg', allow_public=True) == blob.public_url
+    assert service.url_for(bucket, 'memories/u/a.jpg') == 'gs://test-bucket/memories/u/a.jpg'
@@ -0,0 +1,92 @@
+"""Tests for the compiled multi-pattern text scanner."""
+
+import re
+
+import pytest
+
+from src.utils import text_scanner
+from src.utils.text_scanner import ScanResult, TextScanner
+
+
+@pytest.fixture(params=['automaton', 'loops'])
+def keyword_matching(request, monkeypatch):
+    """Run a test with the Aho-Corasick automaton and with the plain ``in`` fallback."""
+    if request.param == 'automaton':
+        if not text_scanner.AHOCORASICK_AVAILABLE:
+            pytest.skip('pyahocorasick not installed')
+        monkeypatch.setattr(text_scanner, 'AHOCORASICK_MIN_KEYWORDS', 1)
+    else:
+        monkeypatch.setattr(text_scanner, 'AHOCORASICK_AVAILABLE', False)
+    return request.param
+
+
+def test_keywords_match_case_insensitive_substrings(keyword_matching):
+    scanner = TextScanner({'crisis': ['vill dö', 'hopplöst'], 'calm': ['lugn']})
+
+    hits = scanner.scan('Allt känns HOPPLÖST, jag vill dö')
+
+    assert hits.categories == ['crisis']
+    assert hits.get('crisis') == ('vill dö', 'hopplöst')
+    assert hits.count('calm') == 0
+
+
+def test_overlapping_and_contained_keywords_are_all_found(keyword_matching):
+    scanner = TextScanner({'control': ['kan'], 'loss_control': ['kan inte'], 'death': ['dö', 'död']})
+
+    hits = scanner.scan('jag kan inte sluta tänka på döden')
+
+    assert hits.get('control') == ('kan',)
+    assert hits.get('loss_control') == ('kan inte',)
+    assert hits.get('death') == ('dö', 'död')
+
+
+def test_keyword_in_several_categories_counts_once_per_category(keyword_matching):
+    scanner = TextScanner({'high_arousal': ['panik', '!'], 'anxiety': ['panik', 'orolig']})
+
+    hits = scanner.scan('Panik! Panik!')
+
+    assert hits.get('high_arousal') == ('panik', '!')
+    assert hits.get('anxiety') == ('panik',)
+
+
+def test_patterns_report_distinct_matches_per_category():
+    scanner = TextScanner(
+        keywords={'banned': ['idiot']},
+        patterns={'email': r'\b\S+@\S+\.se\b', 'url': [r'https?://\S+', r'www\.\S+']},
+    )
+
+    hits = scanner.scan('Mejla a@b.se eller a@b.se, se www.exempel.se')
+
+    assert hits.categories == ['email', 'url']
+    assert hits.get('email') == ('a@b.se',)
+    assert hits.get('url') == ('www.exempel.se',)
+
+
+def test_first_returns_the_earliest_category_with_a_hit():
+    scanner = TextScanner(
+        keywords={'banned': ['idiot']},
+        patterns={'email': r'\b\S+@\S+\.se\b', 'url': r'www\.\S+'},
+    )
+
+    assert scanner.first('IDIOT, mejla a@b.se') == 'banned'
+    assert scanner.first('se www.exempel.se eller a@b.se') == 'email'
+    assert scanner.first('se www.exempel.se') == 'url'
+    assert scanner.first('inga träffar här') is None
+    assert scanner.first('') is None
+
+
+def test_empty_text_and_no_hits_are_falsy():
+    scanner = TextScanner({'a': ['x']}, patterns={'b': r'\d+'})
+
+    assert not scanner.scan('')
+    assert not scanner.scan('inga träffar här')
+    assert scanner.scan('3') == ScanResult({'b': ('3',)})
+
+
+def test_remove_matches_removes_nested_matches():
+    scanner = TextScanner(patterns={'xss': [r'<script[^>]*>.*?</script>', r'on\w+\s*=']},
+                          flags=re.IGNORECASE | re.DOTALL)
+
+    assert scanner.remove_matches('a<scr<script></script>ipt>alert(1)</SCRIPT>b') == 'ab'
+    assert scanner.remove_matches('<img onerror=x>') == '<img x>'
+    assert scanner.remove_matches('vanlig text') == 'vanlig text'
@@ -0,0 +1,262 @@
+"""Tests for the persistent per-user vector index behind chat RAG retrieval."""
+
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from src.services import chat_rag_service as rag_mod
+from src.services import vector_index_service as vis_mod
+from src.services.vector_index_service import (
+    IndexEntry,
+    IndexHit,
+    SourceFilter,
+    UserVectorIndex,
+    VectorIndexService,
+)
+
+
+def _index(dtype=np.float32):
+    return UserVectorIndex('user-1', dimension=3, model_name='fake-model', dtype=dtype)
+
+
+def test_search_returns_top_k_by_cosine():
+    index = _index()
+    index.upsert('mood_logs:a', 'mood_logs', 0.0, [1, 0, 0])
+    index.upsert('mood_logs:b', 'mood_logs', 0.0, [1, 1, 0])
+    index.upsert('journal:c', 'journal', 0.0, [0, 0, 1])
+
+    hits = index.search([1, 0, 0], k=2)
+
+    assert [h.key for h in hits] == ['mood_logs:a', 'mood_logs:b']
+    assert hits[0].score == pytest.approx(1.0)
+    assert hits[1].score == pytest.approx(1 / np.sqrt(2))
+
+
+def test_search_applies_source_threshold_and_recency_filters():
+    index = _index()
+    index.upsert('mood_logs:old', 'mood_logs', 100.0, [1, 0, 0])
+    index.upsert('mood_logs:new', 'mood_logs', 300.0, [1, 0.1, 0])
+    index.upsert('goals:g', 'goals', 0.0, [1, 1, 1])
+    index.upsert('journal:j', 'journal', 300.0, [1, 0, 0])
+
+    hits = index.search([1, 0, 0], k=5, filters={
+        'mood_logs': SourceFilter(since=200.0),
+        'goals': SourceFilter(min_score=0.9),
+    })
+
+    assert [h.key for h in hits] == ['mood_logs:new']
+
+
+def test_upsert_replaces_and_remove_keeps_matrix_dense():
+    index = _index()
+    for i, vector in enumerate(([1, 0, 0], [0, 1, 0], [0, 0, 1])):
+        index.upsert(f'goals:{i}', 'goals', 0.0, vector)
+
+    index.upsert('goals:0', 'goals', 0.0, [0, 0, 5])
+    assert len(index) == 3
+    assert index.remove('goals:0') is True
+    assert index.remove('goals:0') is False
+    assert len(index) == 2
+
+    hits = index.search([0, 0, 1], k=1)
+    assert hits == [IndexHit(key='goals:2', source='goals', score=pytest.approx(1.0))]
+
+
+def test_upsert_rejects_bad_vectors():
+    index = _index()
+    assert index.upsert('goals:x', 'goals', 0.0, [0, 0, 0]) is False
+    assert index.upsert('goals:x', 'goals', 0.0, [1, 2]) is False
+    assert index.upsert('goals:x', 'unknown', 0.0, [1, 0, 0]) is False
+    assert len(index) == 0
+
+
+def test_save_and_load_memory_maps_float16(tmp_path):
+    index = _index(np.float16)
+    index.upsert('mood_logs:a', 'mood_logs', 10.0, [1, 0, 0])
+    index.upsert('journal:b', 'journal', 20.0, [0, 1, 0])
+    index.watermark = '2025-01-01T00:00:00+00:00'
+    index.bootstrapped = True
+    index.save(str(tmp_path))
+
+    loaded = UserVectorIndex.load(str(tmp_path), 'user-1', 3, 'fake-model', np.float16)
+
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.bootstrapped is True
+    assert loaded.watermark == '2025-01-01T00:00:00+00:00'
+    assert [h.key for h in loaded.search([0, 1, 0], k=1)] == ['journal:b']
+
+    # Appending to a loaded index grows into memory without touching the file
+    loaded.upsert('goals:c', 'goals', 0.0, [0, 0, 1])
+    assert len(loaded) == 3
+    assert len(UserVectorIndex.load(str(tmp_path), 'user-1', 3, 'fake-model', np.float16)) == 2
+
+
+def test_load_discards_index_built_with_other_model(tmp_path):
+    index = _index()
+    index.upsert('goals:a', 'goals', 0.0, [1, 0, 0])
+    index.save(str(tmp_path))
+
+    assert len(UserVectorIndex.load(str(tmp_path), 'user-1', 3, 'other-model', np.float32)) == 0
+
+
+@pytest.fixture
+def fake_engine():
+    engine = MagicMock()
+    engine.available = True
+    engine.disabled = False
+    engine.dimension = 3
+    engine.model_name = 'fake-model'
+    engine.encode_many.side_effect = lambda texts: np.array([[len(t), 1, 0] for t in texts], dtype=np.float32)
+    return engine
+
+
+@pytest.fixture
+def fake_db(mocker):
+    fake = MagicMock()
+    collection = fake.collection.return_value.document.return_value.collection.return_value
+    collection.select.return_value.order_by.return_value.stream.return_value = []
+    collection.select.return_value.where.return_value.order_by.return_value.stream.return_value = []
+    mocker.patch.object(vis_mod, 'db', fake)
+    return fake
+
+
+def test_sync_applies_entries_tombstones_and_bootstrap_marker(tmp_path, fake_engine, fake_db):
+    def snap(doc_id, data):
+        s = MagicMock(id=doc_id)
+        s.to_dict.return_value = data
+        return s
+
+    collection = fake_db.collection.return_value.document.return_value.collection.return_value
+    collection.select.return_value.order_by.return_value.stream.return_value = [
+        snap('mood_logs:a', {'source': 'mood_logs', 'embedding': [1, 0, 0], 'model': 'fake-model',
+                             'timestamp': '2025-01-01T00:00:00', 'updated_at': '2025-01-01T00:00:01'}),
+        snap('mood_logs:b', {'source': 'mood_logs', 'embedding': [0, 1, 0], 'model': 'fake-model',
+                             'timestamp': '2025-01-01T00:00:00', 'updated_at': '2025-01-01T00:00:02'}),
+        snap('mood_logs:b', {'deleted': True, 'updated_at': '2025-01-01T00:00:03'}),
+        snap('journal:c', {'source': 'journal', 'embedding': [0, 0, 1], 'model': 'old-model',
+                           'updated_at': '2025-01-01T00:00:04'}),
+        snap('_bootstrap', {'bootstrapped': True, 'updated_at': '2025-01-01T00:00:05'}),
+    ]
+    service = VectorIndexService(index_dir=str(tmp_path), engine=fake_engine)
+
+    index = service.get_index('user-1')
+
+    assert index.keys == ['mood_logs:a']
+    assert index.watermark == '2025-01-01T00:00:05'
+    assert service.is_ready('user-1') is True
+
+
+def test_index_documents_writes_firestore_and_resident_index(tmp_path, fake_engine, fake_db):
+    service = VectorIndexService(index_dir=str(tmp_path), engine=fake_engine)
+    service.get_index('user-1')
+
+    written = service.index_documents('user-1', [
+        IndexEntry('mood_logs', 'm1', 'glad', 'Mood: glad - ', '2025-01-01T00:00:00'),
+        IndexEntry('mood_logs', 'm2', '   ', 'Mood: - ', '2025-01-01T00:00:00'),
+    ])
+
+    assert written == 1
+    record = fake_db.batch.return_value.set.call_args[0][1]
+    assert record['model'] == 'fake-model'
+    assert record['content'] == 'Mood: glad - '
+    assert service.get_index('user-1').keys == ['mood_logs:m1']
+
+
+def test_idle_indexes_are_flushed_and_evicted(tmp_path, fake_engine, fake_db):
+    service = VectorIndexService(index_dir=str(tmp_path), engine=fake_engine, idle_seconds=60)
+    index = service.get_index('user-1')
+    index.upsert('goals:g', 'goals', 0.0, [1, 0, 0])
+    index.last_used = time.time() - 120
+
+    assert service.evict_idle() == 1
+    assert service.stats()['resident_users'] == 0
+    assert len(UserVectorIndex.load(str(tmp_path), 'user-1', 3, 'fake-model')) == 1
+
+
+def test_delete_user_erases_entries_files_and_resident_index(tmp_path, fake_engine, fake_db):
+    service = VectorIndexService(index_dir=str(tmp_path), engine=fake_engine)
+    service.get_index('user-1').upsert('goals:g', 'goals', 0.0, [1, 0, 0])
+    service.flush_all()
+    # Another worker holding the same user's index
+    other = VectorIndexService(index_dir=str(tmp_path), engine=fake_engine)
+    other.get_index('user-1').upsert('goals:h', 'goals', 0.0, [0, 1, 0])
+    collection = fake_db.collection.return_value.document.return_value.collection.return_value
+    collection.limit.return_value.stream.side_effect = [[MagicMock(), MagicMock()], []]
+
+    assert service.delete_user('user-1') == 2
+
+    assert fake_db.batch.return_value.delete.call_count == 2
+    assert service.stats()['resident_users'] == 0
+    assert list(tmp_path.iterdir()) == []
+    other.flush_all()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_max_resident_evicts_least_recently_used(tmp_path, fake_engine, fake_db):
+    service = VectorIndexService(index_dir=str(tmp_path), engine=fake_engine, max_resident=2)
+    for user_id in ('u1', 'u2', 'u1', 'u3'):
+        service.get_index(user_id)
+
+    assert list(service._indexes) == ['u1', 'u3']
+
+
+def test_chat_rag_uses_index_when_ready(mocker, fake_engine):
+    mocker.patch.object(rag_mod, 'PINECONE_AVAILABLE', False)
+    fake_engine.encode.return_value = np.array([1, 0, 0], dtype=np.float32)
+    index_service = MagicMock()
+    index_service.is_ready.return_value = True
+    index_service.search.return_value = [IndexHit('journal:j1', 'journal', 0.9)]
+    index_service.fetch_entries.return_value = {
+        'journal:j1': {'content': 'Journal: Untitled - idag...', 'timestamp': '2025-01-01T08:00:00',
+                       'metadata': {'tags': ['jobb']}},
+    }
+    mocker.patch.object(rag_mod, 'vector_index_service', index_service)
+
+    service = rag_mod.ChatRAGService('user-1', engine=fake_engine)
+    # Goals have no write-time hook; they are scanned live and ranked next to the index hits
+    goal = rag_mod.goal_entry('g1', {'title': 'idag', 'description': '', 'created_at': '2025-01-01T08:00:00'})
+    mocker.patch.object(service, '_collect_goal_candidates', return_value=[goal])
+    contexts = service.retrieve_context('idag', context_types=['journal', 'goals'], max_results=3)
+
+    filters = index_service.search.call_args[0][3]
+    assert set(filters) == {'journal'}
+    assert filters['journal'].min_score == rag_mod.SOURCE_THRESHOLDS['journal']
+    assert filters['journal'].since is not None
+    assert [(c.source, c.content) for c in contexts] == [
+        ('goals', 'Goal: idag - '), ('journal', 'Journal: Untitled - idag...'),
+    ]
+    assert contexts.timings['goals']['status'] == 'ok'
+
+
+def test_bootstrap_skips_live_scanned_sources_and_keys_exchanges_like_the_chat_hook(mocker, fake_engine):
+    def snap(doc_id, data):
+        s = MagicMock(id=doc_id)
+        s.to_dict.return_value = data
+        return s
+
+    mocker.patch.object(rag_mod, 'PINECONE_AVAILABLE', False)
+    db = MagicMock()
+    conversations = db.collection.return_value.document.return_value.collection.return_value
+    conversations.where.return_value.order_by.return_value.limit.return_value.get.return_value = [
+        snap('ai_2025-01-02', {'role': 'assistant', 'content': 'Bra jobbat', 'timestamp': '2025-01-02'}),
+        snap('user_2025-01-02', {'role': 'user', 'content': 'Jag sprang', 'timestamp': '2025-01-02'}),
+        snap('user_2025-01-01', {'role': 'user', 'content': 'Hej', 'timestamp': '2025-01-01'}),
+    ]
+    mocker.patch('src.firebase_config.db', db)
+    index_service = MagicMock()
+    mocker.patch.object(rag_mod, 'vector_index_service', index_service)
+    service = rag_mod.ChatRAGService('user-1', engine=fake_engine)
+    for collector in ('_collect_mood_candidates', '_collect_journal_candidates',
+                      '_collect_goal_candidates', '_collect_coping_strategy_candidates'):
+        mocker.patch.object(service, collector, return_value=[])
+
+    service._bootstrap_index()
+
+    service._collect_goal_candidates.assert_not_called()
+    service._collect_coping_strategy_candidates.assert_not_called()
+    entries = index_service.bootstrap.call_args[0][1]
+    assert {e.doc_id: e.text for e in entries} == {
+        'user_2025-01-01': 'Hej', 'user_2025-01-02': 'Jag sprang Bra jobbat',
+    }
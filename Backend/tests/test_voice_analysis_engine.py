@@ -0,0 +1,178 @@
+"""Tests for in-memory audio decoding, frame analysis, the numpy pitch trackers and the voice analysis pool."""
+
+import io
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from src.services import voice_emotion_service
+from src.services.voice_analysis_engine import (
+    AudioDecodeError,
+    VoiceAnalysisPool,
+    VoiceAnalysisUnavailable,
+    analyze_frames,
+    autocorr_pitch,
+    decode_audio,
+    estimate_duration,
+    peak_pick,
+    select_pitch_mode,
+    yin_pitch,
+)
+
+SR = 16000
+
+
+def _voiced(f0_hz: float, seconds: float = 1.0) -> np.ndarray:
+    t = np.arange(int(SR * seconds)) / SR
+    return (0.5 * np.sin(2 * np.pi * f0_hz * t) + 0.2 * np.sin(2 * np.pi * 2 * f0_hz * t)).astype(np.float32)
+
+
+def _wav_bytes(samples: np.ndarray, rate: int, channels: int = 1) -> bytes:
+    pcm = (np.clip(samples, -1, 1) * 32767).astype('<i2')
+    if channels > 1:
+        pcm = np.repeat(pcm, channels)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def test_decode_stereo_wav_resamples_to_mono():
+    audio = _wav_bytes(_voiced(220, 0.5)[::2], rate=8000, channels=2)
+
+    samples = decode_audio(audio, SR)
+
+    assert samples.dtype == np.float32
+    assert len(samples) == 8000
+    assert estimate_duration(audio, SR) == pytest.approx(0.5)
+
+
+def test_decode_raw_pcm_and_rejects_undecodable_input():
+    pcm = np.array([0, 16384, -32768], dtype='<i2').tobytes() + b'\x01'  # odd trailing byte dropped
+
+    assert decode_audio(pcm, SR).tolist() == [0.0, 0.5, -1.0]
+    assert estimate_duration(pcm, SR) == pytest.approx(3 / SR)
+    with pytest.raises(AudioDecodeError):
+        decode_audio(b'', SR)
+    if not voice_emotion_service.LIBROSA_AVAILABLE:
+        with pytest.raises(AudioDecodeError):
+            decode_audio(b'OggS' + b'\x00' * 64, SR)
+    assert estimate_duration(b'OggS' + b'\x00' * 64, SR) is None
+
+
+@pytest.mark.parametrize('tracker', [yin_pitch, autocorr_pitch])
+@pytest.mark.parametrize('f0_hz', [110.0, 220.0, 440.0])
+def test_fast_pitch_trackers_find_the_fundamental(tracker, f0_hz):
+    f0, voiced = tracker(_voiced(f0_hz), SR)
+
+    assert voiced.mean() > 0.9
+    assert np.nanmedian(f0) == pytest.approx(f0_hz, rel=0.01)
+
+
+@pytest.mark.parametrize('tracker', [yin_pitch, autocorr_pitch])
+def test_fast_pitch_trackers_leave_silence_unvoiced(tracker):
+    y = np.concatenate([np.zeros(SR, dtype=np.float32), _voiced(200)])
+
+    f0, voiced = tracker(y, SR)
+
+    assert not voiced[:20].any()
+    assert np.isnan(f0[:20]).all()
+    assert voiced[-10:].all()
+
+
+def test_frame_analysis_features_from_one_spectrogram():
+    y = np.concatenate([np.zeros(SR // 2, dtype=np.float32), _voiced(300, 1.0), np.zeros(SR // 2, dtype=np.float32)])
+
+    frames = analyze_frames(y, SR)
+
+    assert frames.magnitude.shape == (1025, len(y) // 512 + 1)
+    assert frames.rms.shape == (frames.n_frames,)
+    assert frames.mfcc(13).shape == (13, frames.n_frames)
+    loud = frames.rms > 0.1
+    # Energy sits at 300 Hz and 600 Hz
+    assert 300 < np.median(frames.spectral_centroid[loud]) < 600
+    assert np.median(frames.spectral_rolloff()[loud]) == pytest.approx(600, abs=20)
+    assert np.median(frames.spectral_flatness[loud]) < 0.01
+    (start, end), = frames.nonsilent_intervals(top_db=20)
+    assert abs(start - SR // 2) <= 2048 and abs(end - 3 * SR // 2) <= 2048  # within one frame
+    assert frames.mel_db is frames.mel_db  # computed once per clip
+    assert frames.pitch('yin') is frames.pitch('yin')
+    harmonic, percussive = frames.harmonic_percussive_energy()
+    assert harmonic > 10 * percussive
+
+
+def test_frame_analysis_detects_onsets():
+    y = np.zeros(SR * 2, dtype=np.float32)
+    bursts = (4000, 12000, 20000, 28000)
+    for start in bursts:
+        y[start:start + 3200] = _voiced(250, 0.2) * np.hanning(3200)
+
+    onsets = analyze_frames(y, SR).onset_frames()
+
+    # Envelope frames lag the spectrogram by 3 (librosa's centering compensation)
+    samples = (onsets - 3) * 512
+    assert {int(s // 8000) for s in samples} == {0, 1, 2, 3}  # every burst is found
+    assert all(2000 <= s % 8000 <= 6000 for s in samples)  # and nothing in the silence
+
+
+def test_peak_pick_matches_librosa_rules():
+    x = np.array([0, 1, 0, 0, 5, 0, 0, 4, 0, 0, 0, 6, 0], dtype=float)
+
+    assert peak_pick(x, pre_max=1, post_max=1, pre_avg=1, post_avg=1, delta=0.5, wait=0).tolist() == [1, 4, 7, 11]
+    assert peak_pick(x, pre_max=1, post_max=1, pre_avg=1, post_avg=1, delta=0.5, wait=3).tolist() == [1, 7, 11]
+    assert peak_pick(np.array([]), 1, 1, 1, 1, 0.0, 0).size == 0
+
+
+def test_select_pitch_mode_downgrades_to_fit_the_budget():
+    assert select_pitch_mode(5, 'pyin', budget=10, pyin_available=True) == 'pyin'
+    assert select_pitch_mode(120, 'pyin', budget=10, pyin_available=True) == 'yin'
+    assert select_pitch_mode(600, 'yin', budget=10) == 'autocorr'
+    assert select_pitch_mode(5, 'pyin', budget=10, pyin_available=False) == 'yin'
+    # Unknown length keeps the request
+    assert select_pitch_mode(None, 'pyin', budget=0.1, pyin_available=True) == 'pyin'
+
+
+def test_pool_runs_in_worker_process_and_enforces_budget():
+    pool = VoiceAnalysisPool(max_workers=1, max_pending=1)
+    try:
+        assert pool.run(pow, 2, 10, timeout=60) == 1024
+
+        with pytest.raises(TimeoutError):
+            pool.run(time.sleep, 1.0, timeout=0.05)
+        # The abandoned call still holds the only slot until it finishes
+        with pytest.raises(VoiceAnalysisUnavailable):
+            pool.run(pow, 2, 2, timeout=1)
+    finally:
+        pool.shutdown()
+
+
+def test_inline_pool_runs_in_process():
+    assert VoiceAnalysisPool(max_workers=0).run(pow, 3, 2) == 9
+
+
+def test_analyzer_falls_back_when_pool_is_over_budget(mocker):
+    analyzer = voice_emotion_service.ProfessionalVoiceEmotionAnalyzer()
+    mocker.patch.object(voice_emotion_service, 'LIBROSA_AVAILABLE', True)
+    run = mocker.patch.object(voice_emotion_service.voice_analysis_pool, 'run', side_effect=TimeoutError('slow'))
+    audio = (_voiced(200, 3.0) * 32767).astype('<i2').tobytes()
+
+    result = analyzer.analyze_audio(audio, pitch_mode='pyin')
+
+    assert run.call_args.args[1:] == (audio, 'pyin')
+    assert result.analysis_method == 'fallback_naive'
+    assert result.prosody.intensity_mean > 0
+    assert result.duration_seconds == pytest.approx(3.0)
+    assert result.spectral.spectral_centroid > 0  # measured from the frame analysis
+
+
+def test_fallback_returns_neutral_result_for_undecodable_audio(mocker):
+    mocker.patch.object(voice_emotion_service, 'LIBROSA_AVAILABLE', False)
+
+    result = voice_emotion_service.ProfessionalVoiceEmotionAnalyzer().analyze_audio(b'OggS' + b'\x00' * 64)
+
+    assert result.analysis_method == 'neutral_default'
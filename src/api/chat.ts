@@ -1,6 +1,7 @@
-import { api } from "./client";
+import { api, API_BASE_URL } from "./client";
 import { ApiError } from "./errors";
 import { API_ENDPOINTS } from "./constants";
+import { tokenStorage } from "../utils/secureStorage";
 
 export interface ChatRoom {
   id: string;
@@ -37,6 +38,26 @@ export interface ChatSession {
   messages: ChatMessage[];
 }
 
+export interface ChatPresence {
+  activeCount: number;
+  activeUsers?: { anonymousName: string; avatar: string }[];
+  typingUsers: string[];
+}
+
+export interface ChatLikeEvent {
+  message_id: string;
+  session_id: string;
+  action: 'liked' | 'unliked';
+  likes: number;
+}
+
+export interface ChatStreamHandlers {
+  onMessage: (message: ChatMessage) => void;
+  onLike?: (like: ChatLikeEvent) => void;
+  onPresence?: (presence: ChatPresence) => void;
+  onTyping?: (typing: { anonymousName: string; isTyping: boolean }) => void;
+}
+
 /**
  * Get available chat rooms
  * @returns Promise resolving to chat rooms
@@ -235,4 +256,68 @@ export const getRoomPresence = async (roomId: string, sessionId: string) => {
     }
     throw ApiError.fromAxiosError(error);
   }
-};
\ No newline at end of file
+};
+
+/**
+ * Stream live room events (Server-Sent Events over fetch, so the bearer token can be sent)
+ * @param roomId - Room ID
+ * @param sessionId - Session ID
+ * @param handlers - Callbacks per event type
+ * @param signal - Abort signal that closes the stream
+ * @returns Promise that resolves when the server ends the stream (reconnect and catch up with getChatMessages)
+ */
+export const streamChatRoom = async (
+  roomId: string,
+  sessionId: string,
+  handlers: ChatStreamHandlers,
+  signal: AbortSignal
+): Promise<void> => {
+  const token = await tokenStorage.getAccessToken();
+  const params = new URLSearchParams({ session_id: sessionId });
+  const response = await fetch(`${API_BASE_URL}${API_ENDPOINTS.PEER_CHAT.CHAT_STREAM}/${roomId}/stream?${params.toString()}`, {
+    headers: {
+      Accept: 'text/event-stream',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    credentials: 'include',
+    signal,
+  });
+
+  const reader = response.body?.getReader();
+  if (!response.ok || !reader) {
+    throw new ApiError(`Chat stream failed (${response.status})`, { status: response.status });
+  }
+
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) return;
+
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop() ?? '';
+
+    for (const rawEvent of events) {
+      let eventName = 'message';
+      let data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event: ')) eventName = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      if (!data) continue;
+
+      try {
+        const payload = JSON.parse(data);
+        if (eventName === 'message') handlers.onMessage(payload);
+        else if (eventName === 'like') handlers.onLike?.(payload);
+        else if (eventName === 'presence') handlers.onPresence?.(payload);
+        else if (eventName === 'typing') handlers.onTyping?.(payload);
+        else if (eventName === 'resync') return;
+      } catch {
+        // Ignore malformed events; the next poll catches up
+      }
+    }
+  }
+};
@@ -287,6 +287,7 @@ export const API_ENDPOINTS = {
     CHAT_REPORT: '/api/v1/peer-chat/message',
     CHAT_TYPING: '/api/v1/peer-chat/room',
     CHAT_PRESENCE: '/api/v1/peer-chat/room',
+    CHAT_STREAM: '/api/v1/peer-chat/room',
   } as const,
 
   /** Leaderboard endpoints */
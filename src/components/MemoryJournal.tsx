@@ -42,8 +42,18 @@ interface AiAnalysis {
   photo_insights: { emotion: string; caption: string }[];
 }
 
+interface MediaStatus {
+  state: 'pending' | 'processing' | 'ready' | 'partial' | 'failed';
+  progress: number;
+  aiAnalysis: AiAnalysis | null;
+}
+
 // ─── Constants ──────────────────────────────────────────────────────────────
 
+// Thumbnails and AI analysis run in the background after the memory is saved
+const MEDIA_POLL_INTERVAL_MS = 1500;
+const MEDIA_POLL_TIMEOUT_MS = 2 * 60 * 1000;
+
 const EMOTION_META: Record<string, { emoji: string; label: string; bg: string; text: string }> = {
   joy: { emoji: '😊', label: 'Glädje', bg: 'bg-yellow-50 dark:bg-yellow-900/20', text: 'text-yellow-700 dark:text-yellow-300' },
   sadness: { emoji: '😢', label: 'Sorg', bg: 'bg-blue-50 dark:bg-blue-900/20', text: 'text-blue-700 dark:text-blue-300' },
@@ -130,6 +140,30 @@ const MemoryJournal: React.FC = () => {
   const timerRef = useRef<ReturnType<typeof setInterval> | null>(null);
   const photoInputRef = useRef<HTMLInputElement>(null);
 
+  // ── Poll background media processing of a saved memory ─────────────────────
+
+  const pollMediaStatus = useCallback(async (memoryId: string) => {
+    const deadline = Date.now() + MEDIA_POLL_TIMEOUT_MS;
+    try {
+      while (Date.now() < deadline) {
+        await new Promise((resolve) => setTimeout(resolve, MEDIA_POLL_INTERVAL_MS));
+        const res = await api.get(`${API_ENDPOINTS.MEMORY_UNIFIED.DETAIL}/${memoryId}/status`);
+        const status: MediaStatus | undefined = res.data?.data;
+        if (status?.state === 'ready' || status?.state === 'partial') {
+          setLastResult(status.aiAnalysis);
+          return;
+        }
+        if (status?.state === 'failed') {
+          logger.warn('Memory media processing failed', { memoryId });
+          return;
+        }
+      }
+      logger.warn('Memory media processing timed out', { memoryId });
+    } catch (err: unknown) {
+      logger.error('Failed to poll memory media status', { err });
+    }
+  }, []);
+
   // ── Load memories when switching to list ───────────────────────────────────
 
   const loadMemories = useCallback(async () => {
@@ -289,8 +323,13 @@ const MemoryJournal: React.FC = () => {
         headers: { 'Content-Type': 'multipart/form-data' },
       });
 
-      const aiAnalysis: AiAnalysis = res.data?.data?.aiAnalysis ?? null;
+      // 202: the memory is saved, its analysis arrives once the media pipeline is done
+      const memoryId: string | undefined = res.data?.data?.memoryId;
+      const aiAnalysis: AiAnalysis | null = res.data?.data?.aiAnalysis ?? null;
       setLastResult(aiAnalysis);
+      if (!aiAnalysis && memoryId) {
+        void pollMediaStatus(memoryId);
+      }
 
       // Reset form
       setContent('');
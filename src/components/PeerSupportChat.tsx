@@ -18,6 +18,7 @@ import {
   reportChatMessage,
   updateTypingStatus,
   getRoomPresence,
+  streamChatRoom,
   ChatRoom,
   ChatMessage,
   ChatSession
@@ -40,10 +41,12 @@ interface PeerSupportChatProps {
   username?: string;
 }
 
-// Polling interval for new messages (3 seconds)
+// Polling interval for new messages while the live stream is down (3 seconds)
 const POLL_INTERVAL = 3000;
-// Presence update interval (10 seconds)
+// Presence update interval while the live stream is down (10 seconds)
 const PRESENCE_INTERVAL = 10000;
+// Delay before reopening a dropped live stream (5 seconds)
+const STREAM_RETRY_DELAY = 5000;
 
 export const PeerSupportChat: React.FC<PeerSupportChatProps> = ({ userId }) => {
   const { t, i18n } = useTranslation();
@@ -85,10 +88,25 @@ export const PeerSupportChat: React.FC<PeerSupportChatProps> = ({ userId }) => {
     messagesRef.current = messages;
   }, [messages]);
 
-  const clearRealtimeTimers = useCallback(() => {
+  const stopPolling = useCallback(() => {
     if (pollIntervalRef.current) clearInterval(pollIntervalRef.current);
     if (presenceIntervalRef.current) clearInterval(presenceIntervalRef.current);
+    pollIntervalRef.current = null;
+    presenceIntervalRef.current = null;
+  }, []);
+
+  const clearRealtimeTimers = useCallback(() => {
+    stopPolling();
     if (typingTimeoutRef.current) clearTimeout(typingTimeoutRef.current);
+  }, [stopPolling]);
+
+  const appendMessages = useCallback((newMessages: ChatMessage[]) => {
+    if (newMessages.length === 0) return;
+    setMessages(prev => {
+      const existingIds = new Set(prev.map(m => m.id));
+      const uniqueNewMessages = newMessages.filter(m => !existingIds.has(m.id));
+      return uniqueNewMessages.length > 0 ? [...prev, ...uniqueNewMessages] : prev;
+    });
   }, []);
 
   const loadRooms = useCallback(async () => {
@@ -112,18 +130,11 @@ export const PeerSupportChat: React.FC<PeerSupportChatProps> = ({ userId }) => {
     try {
       const lastMessageId = messagesRef.current.length > 0 ? messagesRef.current[messagesRef.current.length - 1]?.id : undefined;
       const newMessages = await getChatMessages(activeRoom.id, activeSession.session_id, lastMessageId);
-
-      if (newMessages.length > 0) {
-        setMessages(prev => {
-          const existingIds = new Set(prev.map(m => m.id));
-          const uniqueNewMessages = newMessages.filter((m: ChatMessage) => !existingIds.has(m.id));
-          return [...prev, ...uniqueNewMessages];
-        });
-      }
+      appendMessages(newMessages);
     } catch (err) {
       logger.error('Poll messages error:', err);
     }
-  }, []);
+  }, [appendMessages]);
 
   const updatePresence = useCallback(async () => {
     const activeSession = sessionRef.current;
@@ -153,28 +164,63 @@ export const PeerSupportChat: React.FC<PeerSupportChatProps> = ({ userId }) => {
     };
   }, [clearRealtimeTimers, loadRooms]);
 
-  // Start polling when in chat room
+  // Live room events while in a chat room; polling only covers gaps while the stream is down
   useEffect(() => {
-    if (session && selectedRoom) {
-      // Start polling for new messages
+    if (!session || !selectedRoom) return;
+
+    const controller = new AbortController();
+    let retryTimer: NodeJS.Timeout | null = null;
+
+    const startPolling = () => {
+      if (pollIntervalRef.current) return;
       pollIntervalRef.current = setInterval(() => {
         void pollMessages();
       }, POLL_INTERVAL);
-
-      // Start presence updates
       presenceIntervalRef.current = setInterval(() => {
         void updatePresence();
       }, PRESENCE_INTERVAL);
+    };
 
-      // Initial presence fetch
+    const connect = async () => {
+      try {
+        await streamChatRoom(selectedRoom.id, session.session_id, {
+          onMessage: message => appendMessages([message]),
+          onLike: like => setMessages(prev => prev.map(msg =>
+            msg.id === like.message_id ? { ...msg, likes: like.likes } : msg
+          )),
+          onPresence: ({ activeCount, typingUsers }) => {
+            // The server sends presence first, so the stream is live
+            stopPolling();
+            setPresence({ activeCount, typingUsers });
+          },
+          onTyping: ({ anonymousName, isTyping }) => setPresence(prev => {
+            const others = prev.typingUsers.filter(name => name !== anonymousName);
+            return { ...prev, typingUsers: isTyping ? [...others, anonymousName] : others };
+          }),
+        }, controller.signal);
+      } catch (err) {
+        if (controller.signal.aborted) return;
+        logger.warn('Chat stream unavailable, polling instead:', err);
+      }
+      if (controller.signal.aborted) return;
+
+      // Catch up on anything missed, then poll until the stream is back
+      startPolling();
+      void pollMessages();
       void updatePresence();
-    }
+      retryTimer = setTimeout(() => {
+        void connect();
+      }, STREAM_RETRY_DELAY);
+    };
+
+    void connect();
 
     return () => {
-      if (pollIntervalRef.current) clearInterval(pollIntervalRef.current);
-      if (presenceIntervalRef.current) clearInterval(presenceIntervalRef.current);
+      controller.abort();
+      if (retryTimer) clearTimeout(retryTimer);
+      stopPolling();
     };
-  }, [session, selectedRoom, pollMessages, updatePresence]);
+  }, [session, selectedRoom, appendMessages, pollMessages, updatePresence, stopPolling]);
 
   // Scroll to bottom on new messages
   useEffect(() => {
@@ -253,7 +299,8 @@ export const PeerSupportChat: React.FC<PeerSupportChatProps> = ({ userId }) => {
       );
 
       if (sentMessage) {
-        setMessages(prev => [...prev, sentMessage]);
+        // The live stream may have delivered it already
+        appendMessages([sentMessage]);
         setNewMessage('');
 
         trackEvent('peer_chat_message_sent', {
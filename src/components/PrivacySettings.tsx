@@ -75,7 +75,8 @@ export const PrivacySettings: React.FC<PrivacySettingsProps> = ({ userId }) => {
       const url = URL.createObjectURL(dataBlob);
       const a = document.createElement('a');
       a.href = url;
-      a.download = `lugn-trygg-data-${new Date().toISOString().split('T')[0]}.json`;
+      const extension = dataBlob.type === 'application/json' ? 'json' : 'zip';
+      a.download = `lugn-trygg-data-${new Date().toISOString().split('T')[0]}.${extension}`;
       document.body.appendChild(a);
       a.click();
       document.body.removeChild(a);
@@ -132,6 +132,31 @@ describe('Encryption Service - Privacy Settings', () => {
       // Verify blob size is greater than 0 (contains data)
       expect(blob.size).toBeGreaterThan(0);
     });
+
+    it('backs off while polling and honours Retry-After when rate limited', async () => {
+      vi.useFakeTimers();
+      try {
+        const { default: api } = await import('../../api/client');
+        const archive = new Blob(['zip'], { type: 'application/zip' });
+        vi.mocked(api.post).mockResolvedValueOnce({ data: { data: { jobId: 'job1', status: 'running', progress: 0 } } });
+        vi.mocked(api.get)
+          .mockRejectedValueOnce({ response: { status: 429, headers: { 'retry-after': '30' } } })
+          .mockResolvedValueOnce({ data: { data: { jobId: 'job1', status: 'completed', progress: 100 } } })
+          .mockResolvedValueOnce({ data: archive });
+
+        const pending = exportUserData('user123');
+        await vi.advanceTimersByTimeAsync(2000);
+        expect(api.get).toHaveBeenCalledTimes(1);
+        await vi.advanceTimersByTimeAsync(29000);
+        expect(api.get).toHaveBeenCalledTimes(1);
+        await vi.advanceTimersByTimeAsync(1000);
+
+        await expect(pending).resolves.toBe(archive);
+        expect(api.get).toHaveBeenCalledTimes(3);
+      } finally {
+        vi.useRealTimers();
+      }
+    });
   });
 });
 
@@ -265,11 +265,65 @@ export async function savePrivacySettings(settings: PrivacySettings, userId?: st
   }
 }
 
+const EXPORT_POLL_INTERVAL_MS = 2000;
+const EXPORT_POLL_MAX_INTERVAL_MS = 15000;
+const EXPORT_POLL_BACKOFF = 1.5;
+const EXPORT_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
+interface ExportJobStatus {
+  jobId: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  progress: number;
+  error?: string | null;
+}
+
+// Milliseconds to wait before polling again after a 429, or null for other errors
+function exportPollRetryAfterMs(error: unknown): number | null {
+  const response = (error as { response?: { status?: number; headers?: Record<string, string> } })?.response;
+  if (response?.status !== 429) {
+    return null;
+  }
+  const seconds = Number(response.headers?.['retry-after']);
+  return Number.isFinite(seconds) && seconds > 0 ? seconds * 1000 : EXPORT_POLL_MAX_INTERVAL_MS;
+}
+
 // Export all user data (GDPR compliance)
 export async function exportUserData(userId: string): Promise<Blob> {
   try {
     const { default: api } = await import('../api/client');
-    const response = await api.post(`/api/v1/privacy/export/${userId}`, {}, {
+    // The backend builds the export as a background job: start it, poll until
+    // the archive is ready, then download the zip.
+    const started = await api.post(`/api/v1/privacy/export/${userId}`, {});
+    let job: ExportJobStatus | undefined = started.data?.data;
+    if (!job?.jobId) {
+      throw new Error('Export job was not started');
+    }
+
+    // Poll with a growing interval, and wait as long as the server asks when rate limited
+    const deadline = Date.now() + EXPORT_POLL_TIMEOUT_MS;
+    let pollInterval = EXPORT_POLL_INTERVAL_MS;
+    while (job.status !== 'completed') {
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Export failed');
+      }
+      if (Date.now() > deadline) {
+        throw new Error('Export timed out');
+      }
+      await new Promise((resolve) => setTimeout(resolve, pollInterval));
+      try {
+        const status = await api.get(`/api/v1/privacy/export/${userId}/status/${job.jobId}`);
+        job = status.data.data as ExportJobStatus;
+        pollInterval = Math.min(pollInterval * EXPORT_POLL_BACKOFF, EXPORT_POLL_MAX_INTERVAL_MS);
+      } catch (error) {
+        const retryAfter = exportPollRetryAfterMs(error);
+        if (retryAfter === null) {
+          throw error;
+        }
+        pollInterval = Math.max(pollInterval, retryAfter);
+      }
+    }
+
+    const response = await api.get(`/api/v1/privacy/export/${userId}/download/${job.jobId}`, {
       responseType: 'blob',
     });
     return response.data;